@@ -90,7 +90,8 @@ class AITherapistAgent(BaseAgent):
     async def generate_therapeutic_guidance(self, 
                                           patient_profile: Dict[str, Any], 
                                           dialogue_history: List[Dict[str, str]],
-                                          session_goals: Optional[List[str]] = None) -> str:
+                                          session_goals: Optional[List[str]] = None,
+                                          conversation_summary: Optional[str] = None) -> str:
         """
         生成治疗引导对话
         
@@ -98,6 +99,7 @@ class AITherapistAgent(BaseAgent):
             patient_profile: 患者档案信息
             dialogue_history: 对话历史
             session_goals: 本次会话目标
+            conversation_summary: 最近窗口之前的对话摘要
         
         Returns:
             AI咨询师的引导性发言
@@ -116,7 +118,8 @@ class AITherapistAgent(BaseAgent):
             patient_analysis=patient_analysis,
             dialogue_history=dialogue_history,
             strategy=current_strategy,
-            session_goals=session_goals
+            session_goals=session_goals,
+            conversation_summary=conversation_summary
         )
         
         # 获取AI回应
@@ -190,13 +193,15 @@ class AITherapistAgent(BaseAgent):
                                   patient_analysis: str,
                                   dialogue_history: List[Dict[str, str]],
                                   strategy: str,
-                                  session_goals: Optional[List[str]] = None) -> str:
+                                  session_goals: Optional[List[str]] = None,
+                                  conversation_summary: Optional[str] = None) -> str:
         """构建治疗prompt"""
         
         # 格式化对话历史
-        history_text = ""
+        history_text = f"\n{conversation_summary}\n" if conversation_summary else ""
         if dialogue_history:
-            for i, exchange in enumerate(dialogue_history[-5:]):  # 只取最近5轮
+            # 调用方已按配置截取最近窗口（启用滚动摘要时更早的对话在摘要中），这里全部使用
+            for i, exchange in enumerate(dialogue_history):
                 therapist_text = exchange.get('therapist', '')
                 patient_text = exchange.get('patient', '')
                 history_text += f"\n第{i+1}轮："
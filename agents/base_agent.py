@@ -5,6 +5,7 @@ import json
 import logging
 from datetime import datetime
 import uuid
+from pathlib import Path
 
 from rich.console import Console
 from rich.panel import Panel
@@ -12,6 +13,18 @@ from rich.table import Table
 from rich.text import Text
 
 from models.psychology_models import PsychologicalState, LifeEvent, Relationship, EmotionState, DepressionLevel, CognitiveAffectiveState
+from core.bounded_history import BoundedHistory
+from core.memory_index import MemoryIndex
+from core.keyword_matcher import get_keyword_matcher
+
+# 记忆窗口默认大小（可通过simulation_params中的memory配置覆盖）
+DEFAULT_MEMORY_WINDOWS = {
+    "life_events_window": 50,
+    "dialogue_history_window": 50,
+    "thoughts_window": 20,
+    "retrieval_top_k": 5,
+    "retrieval_recent_count": 2
+}
 
 class BaseAgent(ABC):
     """Agent基类"""
@@ -39,14 +52,23 @@ class BaseAgent(ABC):
         # 关系网络
         self.relationships: Dict[str, Relationship] = {}
         
-        # 生活事件历史
-        self.life_events: List[LifeEvent] = []
+        # 生活事件历史（内存中只保留最近窗口，完整历史可落盘）
+        self.life_events: BoundedHistory = BoundedHistory(DEFAULT_MEMORY_WINDOWS["life_events_window"])
         
         # 对话历史
-        self.dialogue_history: List[Dict[str, str]] = []
+        self.dialogue_history: BoundedHistory = BoundedHistory(DEFAULT_MEMORY_WINDOWS["dialogue_history_window"])
         
         # 思考过程记录
-        self.thoughts: List[str] = []
+        self.thoughts: BoundedHistory = BoundedHistory(DEFAULT_MEMORY_WINDOWS["thoughts_window"])
+        
+        # 记忆检索索引（覆盖窗口之外的历史，按相关性挑选提示词上下文）
+        self.memory_config: Dict[str, Any] = dict(DEFAULT_MEMORY_WINDOWS)
+        self.event_memory = MemoryIndex()
+        self.dialogue_memory = MemoryIndex()
+        
+        # 档案缓存：{缓存名: (版本签名, 值)}，状态或关系变化后自动失效
+        self._profile_cache: Dict[str, Any] = {}
+        self._profile_version = 0
         
         # 彩色控制台
         self.console = Console()
@@ -61,33 +83,23 @@ class BaseAgent(ABC):
             self._load_llm_enhancement_components()
     
     def _load_llm_enhancement_components(self):
-        """加载LLM增强组件"""
+        """加载LLM增强组件（配置和评估器在进程内共享，计算历史按agent独立）"""
         try:
-            # 加载LLM增强配置
-            config_path = "/Users/zl_24/Documents/Codes/2025/2025-07/CAD-main/config/llm_enhancement_config.json"
-            with open(config_path, 'r', encoding='utf-8') as f:
-                llm_config = json.load(f)
+            from core.llm_component_registry import get_llm_component_registry
+            registry = get_llm_component_registry()
             
             # 初始化混合影响计算器
-            if (self.ai_client and 
-                llm_config.get("llm_integration", {}).get("psychological_assessment", {}).get("enabled", False)):
+            if self.ai_client and registry.is_enabled("llm_integration", "psychological_assessment"):
                 try:
-                    from core.hybrid_impact_calculator import HybridImpactCalculator
-                    self.hybrid_calculator = HybridImpactCalculator(
-                        self.ai_client, 
-                        llm_config.get("hybrid_calculation", {})
-                    )
+                    self.hybrid_calculator = registry.create_hybrid_calculator(self.ai_client)
                     self.logger.info(f"{self.name}: 混合影响计算器已启用")
                 except ImportError as e:
                     self.logger.warning(f"{self.name}: 无法加载混合影响计算器: {e}")
             
             # 初始化积极影响管理器
-            if llm_config.get("bidirectional_impact", {}).get("enabled", False):
+            if registry.is_enabled("bidirectional_impact"):
                 try:
-                    from core.positive_impact_manager import PositiveImpactManager
-                    self.positive_impact_manager = PositiveImpactManager(
-                        llm_config.get("bidirectional_impact", {})
-                    )
+                    self.positive_impact_manager = registry.create_positive_impact_manager()
                     self.logger.info(f"{self.name}: 积极影响管理器已启用")
                 except ImportError as e:
                     self.logger.warning(f"{self.name}: 无法加载积极影响管理器: {e}")
@@ -95,6 +107,53 @@ class BaseAgent(ABC):
         except Exception as e:
             self.logger.warning(f"{self.name}: 加载LLM增强组件失败: {e}")
         
+    def configure_memory(self, memory_config: Optional[Dict[str, Any]] = None,
+                         store_dir: Optional[Union[str, Path]] = None):
+        """
+        配置记忆窗口大小和完整历史的落盘目录
+        
+        Args:
+            memory_config: 记忆配置（life_events_window / dialogue_history_window / thoughts_window）
+            store_dir: 完整历史存放目录，为None时不落盘
+        """
+        windows = dict(DEFAULT_MEMORY_WINDOWS)
+        windows.update(memory_config or {})
+        self.memory_config = windows
+        
+        retrieval_config = windows.get("retrieval", {})
+        self.event_memory.configure(retrieval_config)
+        self.dialogue_memory.configure(retrieval_config)
+        
+        for attr, key in (("life_events", "life_events_window"),
+                          ("dialogue_history", "dialogue_history_window"),
+                          ("thoughts", "thoughts_window")):
+            old_history = getattr(self, attr)
+            new_history = BoundedHistory(windows.get(key))
+            if store_dir:
+                new_history.attach_store(Path(store_dir) / f"{self.name}_{attr}.jsonl")
+            new_history.extend(old_history)
+            setattr(self, attr, new_history)
+    
+    def recall_life_events(self, query: str, top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """按相关性、时间远近和影响强度检索生活事件（按时间顺序返回字典）"""
+        return self.event_memory.retrieve_context(
+            query,
+            top_k or self.memory_config.get("retrieval_top_k", 5),
+            self.memory_config.get("retrieval_recent_count", 2)
+        )
+    
+    def recall_dialogue(self, query: str, top_k: Optional[int] = None) -> List[Dict[str, str]]:
+        """按相关性检索对话记录（按时间顺序返回）"""
+        return self.dialogue_memory.retrieve_context(
+            query,
+            top_k or self.memory_config.get("retrieval_top_k", 5),
+            self.memory_config.get("retrieval_recent_count", 2)
+        )
+    
+    def get_full_life_events(self) -> List[Dict[str, Any]]:
+        """获取完整生活事件历史（惰性读取磁盘，返回字典列表）"""
+        return self.life_events.full_history()
+    
     @abstractmethod
     def get_role_description(self) -> str:
         """获取角色描述"""
@@ -105,8 +164,44 @@ class BaseAgent(ABC):
         """获取当前关注的问题"""
         pass
     
+    def invalidate_profile_cache(self):
+        """子类修改了影响档案的自有属性（如成绩）时调用，强制重建档案"""
+        self._profile_version += 1
+    
+    def _profile_signature(self) -> tuple:
+        """档案版本签名：心理状态、关系、独白和自有属性的变更计数"""
+        state = self.psychological_state
+        return (
+            id(state), state.state_signature(),
+            tuple((name, id(rel), rel.version) for name, rel in self.relationships.items()),
+            self.thoughts.total_count,
+            self._profile_version
+        )
+    
+    def _cached_profile_part(self, key: str, builder):
+        """按版本签名缓存档案片段，签名不变时直接复用"""
+        signature = self._profile_signature()
+        cached = self._profile_cache.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        value = builder()
+        self._profile_cache[key] = (signature, value)
+        return value
+    
     def get_profile(self) -> Dict[str, Any]:
         """获取完整的角色档案"""
+        return dict(self._cached_profile_part("profile", self._build_profile))
+    
+    def get_profile_fragment(self) -> str:
+        """获取序列化后的角色档案（紧凑JSON，用于提示词）"""
+        return self._cached_profile_part(
+            "profile_fragment",
+            lambda: json.dumps(self._cached_profile_part("profile", self._build_profile),
+                               ensure_ascii=False, separators=(',', ':'))
+        )
+    
+    def _build_profile(self) -> Dict[str, Any]:
+        """构建完整的角色档案"""
         return {
             "name": self.name,
             "age": self.age,
@@ -118,15 +213,66 @@ class BaseAgent(ABC):
             "recent_thoughts": self.thoughts[-3:] if self.thoughts else []
         }
     
+    def get_compact_profile(self) -> Dict[str, Any]:
+        """获取精简角色档案（用于群体对话等对提示词长度敏感的场景）"""
+        return dict(self._cached_profile_part("compact_profile", self._build_compact_profile))
+    
+    def get_compact_profile_fragment(self) -> str:
+        """获取序列化后的精简角色档案"""
+        return self._cached_profile_part(
+            "compact_profile_fragment",
+            lambda: json.dumps(self._cached_profile_part("compact_profile", self._build_compact_profile),
+                               ensure_ascii=False, separators=(',', ':'))
+        )
+    
+    def _build_compact_profile(self) -> Dict[str, Any]:
+        """构建精简角色档案"""
+        state = self.psychological_state
+        return {
+            "age": self.age,
+            "role": self.get_role_description(),
+            "personality": self.personality,
+            "state": {
+                "emotion": state.emotion.value,
+                "depression_level": state.depression_level.name,
+                "stress": state.stress_level,
+                "self_esteem": state.self_esteem,
+                "social": state.social_connection
+            },
+            "concerns": self.get_current_concerns(),
+            "relationships": {
+                other: f"{rel.relationship_type}(亲密{rel.closeness}/信任{rel.trust_level}/冲突{rel.conflict_level})"
+                for other, rel in self.relationships.items()
+            }
+        }
+    
+    def prepare_group_turn(self, situation: str) -> Dict[str, Any]:
+        """准备群体对话中本角色的输入（精简档案+相关历史）"""
+        return {
+            "name": self.name,
+            "profile": self.get_compact_profile_fragment(),
+            "history": [f"{item['speaker']}: {item['content']}" 
+                       for item in self.recall_dialogue(situation)]
+        }
+    
+    def accept_group_response(self, situation: str, response: str):
+        """记录群体对话中生成的本角色回应"""
+        self._record_dialogue({
+            "timestamp": datetime.now().isoformat(),
+            "speaker": self.name,
+            "content": response,
+            "situation": situation
+        })
+    
     async def respond_to_situation(self, situation: str, 
                                  other_agents: List['BaseAgent'] = None) -> str:
         """对情况做出回应"""
-        # 获取角色档案
-        profile = self.get_profile()
+        # 获取角色档案（已序列化，状态未变化时直接复用缓存）
+        profile = self.get_profile_fragment()
         
-        # 获取对话历史
+        # 获取与当前情境最相关的对话历史
         history = [f"{item['speaker']}: {item['content']}" 
-                  for item in self.dialogue_history[-5:]]
+                  for item in self.recall_dialogue(situation)]
         
         # 生成回应
         response = await self.ai_client.generate_agent_response(
@@ -135,7 +281,7 @@ class BaseAgent(ABC):
         
         
         # 记录对话
-        self.dialogue_history.append({
+        self._record_dialogue({
             "timestamp": datetime.now().isoformat(),
             "speaker": self.name,
             "content": response,
@@ -144,9 +290,17 @@ class BaseAgent(ABC):
         
         return response
     
+    def _record_dialogue(self, entry: Dict[str, str]):
+        """记录一条对话并加入检索索引"""
+        self.dialogue_history.append(entry)
+        self.dialogue_memory.add(
+            {"speaker": entry["speaker"], "content": entry["content"]},
+            f"{entry.get('situation', '')} {entry['content']}"
+        )
+    
     async def internal_monologue(self, trigger: str) -> str:
         """内心独白"""
-        profile = self.get_profile()
+        profile = self.get_profile_fragment()
         
         prompt = f"""
         以{self.name}的身份，请写一段内心独白来回应以下触发事件：
@@ -173,6 +327,11 @@ class BaseAgent(ABC):
     def add_life_event(self, event: LifeEvent):
         """添加生活事件"""
         self.life_events.append(event)
+        self.event_memory.add(
+            event.to_dict(),
+            f"{event.description} {' '.join(event.participants or [])}",
+            impact=event.impact_score
+        )
         
         # 根据事件影响调整心理状态
         asyncio.create_task(self._process_event_impact_async(event))
@@ -190,7 +349,7 @@ class BaseAgent(ABC):
                         "age": self.age,
                         "personality": self.personality
                     },
-                    "recent_events": [e.to_dict() for e in self.life_events[-5:]],
+                    "recent_events": self.recall_life_events(event.description),
                     "scenario_name": "default"
                 }
                 
@@ -214,7 +373,7 @@ class BaseAgent(ABC):
                         "age": self.age,
                         "personality": self.personality
                     },
-                    "recent_events": [e.to_dict() for e in self.life_events[-5:]],
+                    "recent_events": self.recall_life_events(event.description),
                     "scenario_name": "default"
                 }
                 
@@ -399,21 +558,21 @@ class BaseAgent(ABC):
             tone_change = impact / 15.0  # 比impact更温和的变化
             cad.affective_tone = max(-10, cad.affective_tone + tone_change)
             
-            # 根据事件类型和描述精准影响核心信念
-            event_desc = event.description.lower()
+            # 根据事件类型和描述精准影响核心信念（一次扫描得到全部命中的关键词类别）
+            matched = get_keyword_matcher().match(event.description)
             
             # 自我信念相关事件：批评、失败、成绩差
-            if any(keyword in event_desc for keyword in ["批评", "失败", "考试", "成绩", "不及格", "差劲"]):
+            if "cad_rules.self_belief" in matched:
                 belief_change = impact * 0.4  # 中等强度影响
                 cad.core_beliefs.self_belief = max(-10, cad.core_beliefs.self_belief + belief_change)
             
             # 世界信念相关事件：霸凌、孤立、拒绝、不公
-            if any(keyword in event_desc for keyword in ["霸凌", "孤立", "拒绝", "嘲笑", "排斥", "冷漠"]):
+            if "cad_rules.world_belief" in matched:
                 belief_change = impact * 0.5  # 较强影响
                 cad.core_beliefs.world_belief = max(-10, cad.core_beliefs.world_belief + belief_change)
             
             # 未来信念相关事件：重大挫折、长期问题
-            if any(keyword in event_desc for keyword in ["前途", "未来", "希望", "绝望", "放弃"]):
+            if "cad_rules.future_belief" in matched:
                 belief_change = impact * 0.3
                 cad.core_beliefs.future_belief = max(-10, cad.core_beliefs.future_belief + belief_change)
         
@@ -78,6 +78,7 @@ class StudentAgent(BaseAgent):
         if self.recent_grades:
             avg_score = sum(self.recent_grades.values()) / len(self.recent_grades)
             self.academic_performance = avg_score / 10  # 转换为0-10分
+            self.invalidate_profile_cache()  # 成绩影响角色描述
         
         # 根据成绩调整心理状态
         if score < 60:  # 不及格
@@ -31,6 +31,7 @@ class ConfigLoader:
             self.config_dir = Path(config_dir)
         
         self.scenarios_dir = self.config_dir / "scenarios"
+        self.corpus_dir = self.config_dir / "event_corpus"
     
     def load_api_config(self) -> Dict[str, Any]:
         """加载API配置（支持YAML和JSON）"""
@@ -215,7 +216,8 @@ class ConfigLoader:
                 "events_per_day": 5,
                 "simulation_speed": 1,
                 "depression_development_stages": 5,
-                "interaction_frequency": 3
+                "interaction_frequency": 3,
+                "group_dialogue": True
             },
             "logging": {
                 "log_level": "INFO",
@@ -234,9 +236,51 @@ class ConfigLoader:
                 "alliance_threshold": 6.0,
                 "evaluation_interval": 5,
                 "deterioration_threshold": 3.0
+            },
+            "memory": {
+                "life_events_window": 50,
+                "dialogue_history_window": 50,
+                "thoughts_window": 20,
+                "simulation_log_window": 200,
+                "conversation_log_window": 200,
+                "retrieval_top_k": 5,
+                "retrieval_recent_count": 2,
+                "retrieval": {
+                    "max_documents": 2000,
+                    "relevance_weight": 0.7,
+                    "recency_weight": 0.2,
+                    "impact_weight": 0.1,
+                    "recency_half_life": 20
+                }
             }
         }
 
+    def load_llm_enhancement_config(self) -> Dict[str, Any]:
+        """加载LLM增强配置（llm_enhancement_config.json），失败时返回空字典"""
+        config_file = self.config_dir / "llm_enhancement_config.json"
+        try:
+            with open(config_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            console.print(f"[yellow]未找到LLM增强配置: {config_file}[/yellow]")
+            return {}
+        except json.JSONDecodeError as e:
+            console.print(f"[red]LLM增强配置文件格式错误: {e}[/red]")
+            return {}
+
+    def load_keyword_sets(self) -> Dict[str, Any]:
+        """加载关键词表配置（keyword_sets.json），文件缺失或格式错误时抛出异常"""
+        config_file = self.config_dir / "keyword_sets.json"
+        if not config_file.exists():
+            console.print(f"[red]未找到关键词配置文件: {config_file}[/red]")
+            raise FileNotFoundError(f"Keyword sets not found: {config_file}")
+        try:
+            with open(config_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except json.JSONDecodeError as e:
+            console.print(f"[red]关键词配置文件格式错误: {e}[/red]")
+            raise
+
     def load_therapy_guidance_config(self, config_type: str = "general") -> dict:
         """
         加载治疗引导配置（支持YAML和JSON）
@@ -395,9 +439,11 @@ def load_complete_config(scenario_name: str = "default_adolescent") -> Dict[str,
             'logging': sim_params.get('logging', {}),
             'therapy': sim_params.get('therapy', {}),
             'recovery': sim_params.get('recovery', {}),
+            'memory': sim_params.get('memory', {}),
             
             # 场景配置
             'scenario': {
+                'key': scenario_name,
                 'name': scenario_config.get('scenario_name', scenario_name),
                 'description': scenario_config.get('description', ''),
                 'characters': scenario_config.get('characters', {}),
@@ -475,4 +521,8 @@ def load_temp_config(temp_name: str = "web_temp") -> Dict[str, Any]:
 
 def load_therapy_guidance_config(config_type: str = "general") -> dict:
     """便捷函数：加载治疗引导配置"""
-    return get_config_loader().load_therapy_guidance_config(config_type) 
\ No newline at end of file
+    return get_config_loader().load_therapy_guidance_config(config_type) 
+
+def load_llm_enhancement_config() -> Dict[str, Any]:
+    """便捷函数：加载LLM增强配置"""
+    return get_config_loader().load_llm_enhancement_config()
@@ -12,7 +12,7 @@ import asyncio
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Any, Optional, Tuple
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict
 
 from rich.console import Console
 from rich.panel import Panel
@@ -31,6 +31,11 @@ from utils.psychology_display import (
     console
 )
 from config.config_loader import load_therapy_guidance_config
+from core.keyword_matcher import get_keyword_matcher
+from core.conversation_summarizer import RollingConversationSummarizer
+from core.simulation_history import load_recent_daily_events
+from core.session_journal import SessionJournal
+from core.session_stopping_policy import SessionStoppingPolicy, TurnObservation, cad_change
 
 # 抑郁程度映射（10级精细分级系统）
 DEPRESSION_LEVELS = {
@@ -103,23 +108,46 @@ class AIToAITherapyManager:
         self.progress_history: List[TherapyProgress] = []
         self.session_id = f"ai_therapy_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         self.current_turn = 0
+        self.logs_dir = Path("logs")  # 会话记录保存目录
         
         # 从配置加载督导间隔
         supervision_config = self.therapy_config.get('supervision_settings', {})
         self.supervision_interval = supervision_config.get('supervision_interval', 3)
         self.evaluation_interval = 1  # 每轮都评估
+        
+        # 自动化设置：轮次间的节奏延迟，以及是否让轮次分析与下一轮对话生成并行
+        automation_config = self.therapy_config.get('automation_settings', {})
+        self.turn_delay_seconds = automation_config.get('turn_delay_seconds', 0.5)
+        self.overlap_turn_analysis = automation_config.get('overlap_turn_analysis', True)
+        self._turn_analysis_task: Optional[asyncio.Task] = None
         self.max_conversation_history = 10  # 保持最近10轮对话的上下文
         
+        # 滚动对话摘要：启用时治疗师提示词只保留最近几轮原文，更早的轮次压缩为摘要
+        self.conversation_summarizer = RollingConversationSummarizer.from_config(
+            ai_client, self.therapy_config.get('conversation_settings', {})
+        )
+        
         # 添加恢复追踪机制（类似TherapySessionManager）
         self.initial_depression_level = None
         self.current_depression_level = None
         self.recovery_progress = []
         self.therapeutic_alliance_score = 0.0
         self.session_effectiveness_scores = []
+        self.alliance_trajectory = []  # 每轮分析后的治疗联盟分数
+        
+        # 会话日志：每轮对话和分析即时追加写入，崩溃后可从日志恢复或压缩为会话记录
+        self.journal_settings = self.therapy_config.get('journal_settings', {})
+        self.session_journal: Optional[SessionJournal] = None
+        self.max_turns: Optional[int] = None
         
         # 初始化恢复追踪
         self._initialize_recovery_tracking()
         
+        # 提前终止：显著改善、恶化或平台期时不再跑满最大轮数
+        self.stopping_policy = SessionStoppingPolicy.from_config(
+            automation_config, DEPRESSION_LEVELS, self.initial_depression_level
+        )
+        
     def _load_patient_data(self) -> Dict[str, Any]:
         """加载患者数据"""
         try:
@@ -131,7 +159,14 @@ class AIToAITherapyManager:
                 # 这是day_X_state.json格式的数据
                 return self._adapt_day_state_data(data)
             elif 'protagonist_character_profile' in data:
-                # 这是final_report.json格式的数据
+                # 这是final_report.json格式的数据；最近几天的事件从同目录的历史事件缓存中补充
+                if 'daily_events' not in data:
+                    try:
+                        recent_events = load_recent_daily_events(Path(self.patient_log_path).parent)
+                        if recent_events:
+                            data['daily_events'] = recent_events
+                    except Exception as e:
+                        console.print(f"[yellow]⚠️ 读取最近每日事件失败: {e}[/yellow]")
                 return data
             else:
                 raise ValueError("未识别的数据格式")
@@ -397,7 +432,14 @@ class AIToAITherapyManager:
         console.print(f"[cyan]📊 当前CAD状态: 自我信念={self.patient_agent.cad_state.core_beliefs.self_belief:.1f}, 情感基调={self.patient_agent.cad_state.affective_tone:.1f}[/cyan]")
         console.print()
         
-        for turn in range(1, max_turns + 1):
+        self.max_turns = max_turns
+        # 从会话日志恢复时从下一轮继续
+        for turn in range(self.current_turn + 1, max_turns + 1):
+            # 轮次分析在后台进行时，终止判断会晚一轮生效
+            if self.stopping_policy and self.stopping_policy.stop_reason:
+                console.print(f"[bold yellow]⏹️ 提前结束会话（第{self.stopping_policy.stop_turn}轮判断）: "
+                              f"{self.stopping_policy.stop_reason}[/bold yellow]")
+                break
             self.current_turn = turn
             
             try:
@@ -442,75 +484,35 @@ class AIToAITherapyManager:
                     turn
                 )
                 
-                # 分析本轮对话效果
-                console.print(f"[grey50]📋 分析第{turn}轮对话效果...[/grey50]")
-                analysis = await self._analyze_dialogue_turn(therapist_message, patient_response)
-                
-                # 记录本轮对话的效果分数
-                effectiveness_score = analysis.get('overall_effectiveness', 5.0)
-                self.session_effectiveness_scores.append(effectiveness_score)
-                
-                # 更新治疗联盟分数
-                alliance_change = (effectiveness_score - 5.0) * 0.1  # 基于效果调整联盟分数
-                self.therapeutic_alliance_score = max(0, min(10, self.therapeutic_alliance_score + alliance_change))
-                
-                # 记录对话轮次
+                # 记录对话轮次（效果分析在后台完成后填入）
                 dialogue_turn = DialogueTurn(
                     turn_number=turn,
                     timestamp=datetime.now().isoformat(),
                     therapist_message=therapist_message,
                     patient_response=patient_response,
-                    therapy_analysis=analysis,
+                    therapy_analysis={},
                     patient_state_change=self._get_patient_state_snapshot()
                 )
+                
+                # 上一轮的分析与本轮的对话生成并行进行，记录本轮之前先等它完成（保持评分顺序）
+                await self._join_turn_analysis()
                 self.dialogue_history.append(dialogue_turn)
+                self._journal_turn(dialogue_turn)
+                if self.conversation_summarizer:
+                    self.conversation_summarizer.schedule(self._get_dialogue_exchanges())
                 
-                # 每隔几轮评估治疗进展和提供督导
-                if turn % self.evaluation_interval == 0:
-                    console.print(f"[grey50]📋 第{turn}轮：评估治疗进展...[/grey50]")
-                    
-                    try:
-                        # 评估进展
-                        progress = await self._evaluate_therapy_progress()
-                        self.progress_history.append(progress)
-                        
-                        # 显示进展
-                        self._display_therapy_progress(progress, turn)
-                        
-                        # 提供督导建议
-                        if turn % self.supervision_interval == 0:
-                            console.print(f"[grey50]👨‍🎓 专业督导分析中...[/grey50]")
-                            try:
-                                supervision = await self._get_therapist_supervision(therapist_message, patient_response)
-                                
-                                supervision_panel = Panel(
-                                    supervision,
-                                    title=f"💡 专业督导建议 (第{turn}轮)",
-                                    border_style="green",
-                                    expand=False
-                                )
-                                console.print(supervision_panel)
-                            except Exception as supervision_error:
-                                console.print(f"[yellow]⚠️ 督导功能暂时不可用: {str(supervision_error)}[/yellow]")
-                                # 提供默认督导建议
-                                default_supervision = "督导建议：继续当前治疗方向，关注患者情感反应和安全状态。"
-                                supervision_panel = Panel(
-                                    default_supervision,
-                                    title=f"💡 基础督导建议 (第{turn}轮)",
-                                    border_style="yellow",
-                                    expand=False
-                                )
-                                console.print(supervision_panel)
-                        
-                        # 显示恢复进展
-                        self._display_recovery_progress()
-                        
-                    except Exception as eval_error:
-                        console.print(f"[yellow]⚠️ 进展评估出错: {str(eval_error)}[/yellow]")
-                        # 继续会话，不中断治疗
+                # 本轮分析、进展评估和督导不影响下一轮治疗师的提示，放到后台与下一轮生成重叠；
+                # 下一轮会继续修改患者状态，这里先同步记下本轮结束时的情绪状态和抑郁等级
+                turn_analysis = self._process_turn_analysis(turn, dialogue_turn, therapist_message, patient_response,
+                                                            self._get_turn_state_snapshot())
+                if self.overlap_turn_analysis:
+                    self._turn_analysis_task = asyncio.create_task(turn_analysis)
+                else:
+                    await turn_analysis
                 
-                # 短暂延迟，模拟真实对话节奏
-                await asyncio.sleep(0.5)
+                # 可选的对话节奏延迟
+                if self.turn_delay_seconds > 0:
+                    await asyncio.sleep(self.turn_delay_seconds)
                 console.print()  # 添加空行分隔
                 
             except Exception as e:
@@ -530,6 +532,7 @@ class AIToAITherapyManager:
                     backup_patient_response = f"嗯...我觉得有点累。"
                     
                     # 记录备用对话
+                    await self._join_turn_analysis()
                     dialogue_turn = DialogueTurn(
                         turn_number=turn,
                         timestamp=datetime.now().isoformat(),
@@ -539,12 +542,19 @@ class AIToAITherapyManager:
                         patient_state_change=self._get_patient_state_snapshot()
                     )
                     self.dialogue_history.append(dialogue_turn)
+                    self._journal_turn(dialogue_turn)
+                    self._journal_turn_analysis(dialogue_turn)
                     console.print(f"[green]✅ 已使用备用对话继续会话[/green]")
                     continue
                 else:
                     console.print(f"[yellow]⚠️ 跳过当前轮次，继续治疗...[/yellow]")
                     continue
         
+        # 等待最后一轮的后台分析（和滚动摘要）完成后再生成会话总结
+        await self._join_turn_analysis()
+        if self.conversation_summarizer:
+            await self.conversation_summarizer.wait()
+        
         # 生成会话总结
         session_summary = await self._generate_session_summary()
         
@@ -554,13 +564,267 @@ class AIToAITherapyManager:
         # 显示最终结果
         console.print("\n" + "=" * 60)
         console.print("🏁 AI对AI治疗会话结束")
-        console.print(f"📁 会话记录已保存: logs/{self.session_id}_ai_therapy.json")
+        console.print(f"📁 会话记录已保存: {Path(self.logs_dir) / (self.session_id + '_ai_therapy.json')}")
         
         # 显示最终进展
         self._display_recovery_progress()
         
         return session_summary
     
+    async def _process_turn_analysis(self, turn: int, dialogue_turn: DialogueTurn,
+                                     therapist_message: str, patient_response: str,
+                                     turn_state: Optional[Dict[str, Any]] = None):
+        """分析一轮对话的效果，更新效果分数和治疗联盟，并按间隔评估进展、提供督导
+        
+        turn_state为调度分析时的患者状态快照（见_get_turn_state_snapshot），缺省时立即获取
+        """
+        turn_state = turn_state or self._get_turn_state_snapshot()
+        # 分析本轮对话效果
+        console.print(f"[grey50]📋 分析第{turn}轮对话效果...[/grey50]")
+        try:
+            analysis = await self._analyze_dialogue_turn(therapist_message, patient_response)
+        except Exception as e:
+            analysis = self._get_default_analysis_result(f"分析任务异常({type(e).__name__})，使用默认评分")
+        dialogue_turn.therapy_analysis = analysis
+        
+        # 记录本轮对话的效果分数
+        effectiveness_score = analysis.get('overall_effectiveness', 5.0)
+        self.session_effectiveness_scores.append(effectiveness_score)
+        
+        # 更新治疗联盟分数
+        alliance_change = (effectiveness_score - 5.0) * 0.1  # 基于效果调整联盟分数
+        self.therapeutic_alliance_score = max(0, min(10, self.therapeutic_alliance_score + alliance_change))
+        self.alliance_trajectory.append(self.therapeutic_alliance_score)
+        
+        # 每隔几轮评估治疗进展和提供督导
+        progress = None
+        if turn % self.evaluation_interval == 0:
+            console.print(f"[grey50]📋 第{turn}轮：评估治疗进展...[/grey50]")
+            
+            try:
+                # 评估进展
+                progress = await self._evaluate_therapy_progress(turn, turn_state['emotional_state'])
+                self.progress_history.append(progress)
+                
+                # 显示进展
+                self._display_therapy_progress(progress, turn)
+                
+                # 提供督导建议
+                if turn % self.supervision_interval == 0:
+                    console.print(f"[grey50]👨‍🎓 专业督导分析中...[/grey50]")
+                    try:
+                        supervision = await self._get_therapist_supervision(therapist_message, patient_response, turn)
+                        
+                        supervision_panel = Panel(
+                            supervision,
+                            title=f"💡 专业督导建议 (第{turn}轮)",
+                            border_style="green",
+                            expand=False
+                        )
+                        console.print(supervision_panel)
+                    except Exception as supervision_error:
+                        console.print(f"[yellow]⚠️ 督导功能暂时不可用: {str(supervision_error)}[/yellow]")
+                        # 提供默认督导建议
+                        default_supervision = "督导建议：继续当前治疗方向，关注患者情感反应和安全状态。"
+                        supervision_panel = Panel(
+                            default_supervision,
+                            title=f"💡 基础督导建议 (第{turn}轮)",
+                            border_style="yellow",
+                            expand=False
+                        )
+                        console.print(supervision_panel)
+                
+                # 显示恢复进展
+                self._display_recovery_progress()
+                
+            except Exception as eval_error:
+                console.print(f"[yellow]⚠️ 进展评估出错: {str(eval_error)}[/yellow]")
+                # 继续会话，不中断治疗
+        
+        self._observe_stopping(dialogue_turn, turn_state)
+        self._journal_turn_analysis(dialogue_turn, progress)
+    
+    def _get_turn_state_snapshot(self) -> Dict[str, Any]:
+        """本轮结束时的情绪状态得分和抑郁等级（供后台分析使用，不受下一轮状态更新影响）"""
+        level_changes = getattr(self, 'depression_level_history', [])
+        return {
+            'emotional_state': self._calculate_emotional_state_score(),
+            'depression_level': level_changes[-1]['new_level'] if level_changes else self.initial_depression_level
+        }
+    
+    def _observe_stopping(self, dialogue_turn: DialogueTurn, turn_state: Dict[str, Any]):
+        """把本轮分析后的指标交给提前终止策略"""
+        if self.stopping_policy is None:
+            return
+        index = self.dialogue_history.index(dialogue_turn) if dialogue_turn in self.dialogue_history else -1
+        previous = self.dialogue_history[index - 1].patient_state_change if index > 0 else None
+        self.stopping_policy.observe(TurnObservation(
+            turn=dialogue_turn.turn_number,
+            effectiveness=float(self.session_effectiveness_scores[-1]) if self.session_effectiveness_scores else 5.0,
+            alliance=self.therapeutic_alliance_score,
+            emotional_state=turn_state['emotional_state'],
+            cad_change=cad_change(previous, dialogue_turn.patient_state_change) if previous else None,
+            depression_level=turn_state['depression_level']
+        ))
+    
+    # ---- 会话日志 ----
+    
+    def _open_journal(self, directory: Optional[Path] = None, session_type: str = "ai_to_ai",
+                      session_id: Optional[str] = None, extra: Optional[Dict[str, Any]] = None):
+        """创建会话日志并写入开始记录（默认保存在logs_dir，以session_id命名）"""
+        session_id = session_id or self.session_id
+        self.session_journal = SessionJournal.from_config(
+            SessionJournal.path_for(directory or self.logs_dir, session_id), self.journal_settings)
+        if self.session_journal is None:
+            return
+        start = {
+            'session_type': session_type,
+            'session_id': session_id,
+            'patient_log_path': str(self.patient_log_path),
+            'logs_dir': str(self.logs_dir),
+            'max_turns': self.max_turns,
+            'initial_depression_level': self.initial_depression_level
+        }
+        start.update(extra or {})
+        self.session_journal.record('start', start, sync=True)
+    
+    def _journal_record(self, record_type: str, data: Dict[str, Any]):
+        """写入一条会话日志（首次写入时创建日志）；写入失败不影响会话"""
+        try:
+            if self.session_journal is None:
+                self._open_journal()
+                if self.session_journal is None:
+                    return
+            self.session_journal.record(record_type, data)
+        except Exception as e:
+            console.print(f"[yellow]⚠️ 写入会话日志失败: {e}[/yellow]")
+    
+    def _journal_turn(self, dialogue_turn: DialogueTurn, extra: Optional[Dict[str, Any]] = None):
+        """记录一轮对话（含患者状态快照）"""
+        data = {'dialogue_turn': asdict(dialogue_turn)}
+        data.update(extra or {})
+        self._journal_record('turn', data)
+    
+    def _journal_turn_analysis(self, dialogue_turn: DialogueTurn, progress: Optional[TherapyProgress] = None):
+        """记录一轮对话的效果分析、进展评估和分析后的恢复追踪状态"""
+        self._journal_record('analysis', {
+            'turn_number': dialogue_turn.turn_number,
+            'therapy_analysis': dialogue_turn.therapy_analysis,
+            'progress': asdict(progress) if progress else None,
+            'stopping_observation': asdict(self.stopping_policy.observations[-1])
+            if self.stopping_policy and self.stopping_policy.observations else None,
+            'state': self._get_recovery_state()
+        })
+    
+    def _get_recovery_state(self) -> Dict[str, Any]:
+        """可从日志恢复的恢复追踪状态"""
+        return {
+            'current_depression_level': self.current_depression_level,
+            'recovery_progress': list(self.recovery_progress),
+            'therapeutic_alliance_score': self.therapeutic_alliance_score,
+            'session_effectiveness_scores': list(self.session_effectiveness_scores),
+            'alliance_trajectory': list(self.alliance_trajectory),
+            'depression_level_history': list(getattr(self, 'depression_level_history', [])),
+            'conversation_summary': {
+                'summary': self.conversation_summarizer.summary,
+                'summarized_turns': self.conversation_summarizer.summarized_turns
+            } if self.conversation_summarizer else None
+        }
+    
+    def _apply_recovery_state(self, state: Dict[str, Any]):
+        """把日志中的恢复追踪状态应用到当前会话"""
+        self.current_depression_level = state.get('current_depression_level', self.current_depression_level)
+        self.recovery_progress = list(state.get('recovery_progress', self.recovery_progress))
+        self.therapeutic_alliance_score = state.get('therapeutic_alliance_score', self.therapeutic_alliance_score)
+        self.session_effectiveness_scores = list(state.get('session_effectiveness_scores', []))
+        self.alliance_trajectory = list(state.get('alliance_trajectory', []))
+        self.depression_level_history = list(state.get('depression_level_history', []))
+        summary_state = state.get('conversation_summary')
+        if self.conversation_summarizer and summary_state:
+            self.conversation_summarizer.summary = summary_state.get('summary', '')
+            self.conversation_summarizer.summarized_turns = summary_state.get('summarized_turns', 0)
+    
+    def _restore_patient_state(self, snapshot: Dict[str, Any]):
+        """按状态快照恢复患者的CAD状态和抑郁程度"""
+        cad = snapshot.get('cad_state', {})
+        cad_state = self.patient_agent.cad_state
+        cad_state.core_beliefs.self_belief = cad.get('self_belief', cad_state.core_beliefs.self_belief)
+        cad_state.core_beliefs.world_belief = cad.get('world_belief', cad_state.core_beliefs.world_belief)
+        cad_state.core_beliefs.future_belief = cad.get('future_belief', cad_state.core_beliefs.future_belief)
+        cad_state.cognitive_processing.rumination = cad.get('rumination', cad_state.cognitive_processing.rumination)
+        cad_state.cognitive_processing.distortions = cad.get('distortions', cad_state.cognitive_processing.distortions)
+        cad_state.behavioral_inclination.social_withdrawal = cad.get(
+            'social_withdrawal', cad_state.behavioral_inclination.social_withdrawal)
+        cad_state.behavioral_inclination.avolition = cad.get('avolition', cad_state.behavioral_inclination.avolition)
+        cad_state.affective_tone = cad.get('affective_tone', cad_state.affective_tone)
+        if snapshot.get('depression_level'):
+            self.patient_agent.depression_level = snapshot['depression_level']
+    
+    def _replay_journal(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """回放会话日志中的对话轮次、分析和状态，返回各轮对话记录（供调用方读取附加字段）"""
+        turn_records = []
+        turns_by_number: Dict[int, DialogueTurn] = {}
+        for record in records:
+            data = record.get('data', {})
+            if record.get('type') == 'turn':
+                dialogue_turn = DialogueTurn(**data['dialogue_turn'])
+                self.dialogue_history.append(dialogue_turn)
+                turns_by_number[dialogue_turn.turn_number] = dialogue_turn
+                turn_records.append(data)
+            elif record.get('type') == 'analysis':
+                dialogue_turn = turns_by_number.get(data.get('turn_number'))
+                if dialogue_turn is not None:
+                    dialogue_turn.therapy_analysis = data.get('therapy_analysis', {})
+                if data.get('progress'):
+                    self.progress_history.append(TherapyProgress(**data['progress']))
+                if self.stopping_policy and data.get('stopping_observation'):
+                    self.stopping_policy.observe(TurnObservation(**data['stopping_observation']))
+                self._apply_recovery_state(data.get('state', {}))
+        
+        if self.dialogue_history:
+            self.current_turn = self.dialogue_history[-1].turn_number
+            self._restore_patient_state(self.dialogue_history[-1].patient_state_change)
+        return turn_records
+    
+    @classmethod
+    def resume_from_journal(cls, journal_path, ai_client=None) -> "AIToAITherapyManager":
+        """从会话日志重建管理器：回放已完成的轮次，之后的轮次继续写入同一日志"""
+        start, records, _ = SessionJournal.load(journal_path)
+        manager = cls(ai_client, start['patient_log_path'])
+        manager.session_id = start.get('session_id', manager.session_id)
+        manager.logs_dir = Path(start.get('logs_dir', manager.logs_dir))
+        manager.max_turns = start.get('max_turns')
+        manager._replay_journal(records)
+        manager._attach_journal(journal_path)
+        return manager
+    
+    def _attach_journal(self, journal_path):
+        """继续写入已有的会话日志"""
+        self.session_journal = SessionJournal.from_config(journal_path, self.journal_settings)
+        if self.session_journal is not None:
+            self.session_journal.record('resume', {'restored_turns': len(self.dialogue_history)}, sync=True)
+        console.print(f"[green]已从会话日志恢复 {len(self.dialogue_history)} 轮对话: {journal_path}[/green]")
+    
+    async def compact_journal(self) -> Optional[Path]:
+        """把恢复的会话保存为会话记录JSON（与正常结束时相同），并结束日志"""
+        await self._join_turn_analysis()
+        if not self.dialogue_history:
+            if self.session_journal is not None:
+                self.session_journal.mark_compacted(None)
+                self.session_journal = None
+            return None
+        session_summary = await self._generate_session_summary()
+        return self._save_session_log(session_summary)
+    
+    async def _join_turn_analysis(self):
+        """等待尚未完成的后台轮次分析"""
+        task, self._turn_analysis_task = self._turn_analysis_task, None
+        if task is not None:
+            try:
+                await task
+            except Exception as e:
+                console.print(f"[yellow]⚠️ 后台对话分析出错: {e}[/yellow]")
+    
     async def _generate_therapist_response(self) -> str:
         """生成AI治疗师的回应"""
         # 准备患者档案
@@ -581,12 +845,18 @@ class AIToAITherapyManager:
             'recent_events': self._get_recent_patient_events()
         }
         
-        # 准备对话历史
-        recent_dialogue = self._get_recent_dialogue_context()
+        # 准备对话历史（启用滚动摘要时为最近窗口 + 早期对话摘要）
+        conversation_summary = None
+        if self.conversation_summarizer:
+            exchanges = self._get_dialogue_exchanges()
+            recent_dialogue = self.conversation_summarizer.recent(exchanges)
+            conversation_summary = self.conversation_summarizer.render_summary(exchanges) or None
+        else:
+            recent_dialogue = self._get_recent_dialogue_context()
         
         # 生成治疗师回应
         return await self.therapist_agent.generate_therapeutic_guidance(
-            patient_profile, recent_dialogue
+            patient_profile, recent_dialogue, conversation_summary=conversation_summary
         )
     
     async def _generate_patient_response(self, therapist_message: str) -> str:
@@ -830,11 +1100,14 @@ class AIToAITherapyManager:
             "analysis_notes": error_message[:50]  # 限制长度
         }
     
-    async def _evaluate_therapy_progress(self) -> TherapyProgress:
-        """评估整体治疗进展"""
+    async def _evaluate_therapy_progress(self, turn_number: int = None,
+                                         emotional_state: Optional[float] = None) -> TherapyProgress:
+        """评估整体治疗进展（turn_number为评估对应的轮次，默认当前轮次；
+        emotional_state为该轮结束时的情绪状态得分，默认按患者当前状态计算）"""
+        turn_number = turn_number or self.current_turn
         if len(self.dialogue_history) < self.evaluation_interval:
             return TherapyProgress(
-                turn_number=self.current_turn,
+                turn_number=turn_number,
                 therapy_effectiveness=5.0,
                 therapeutic_alliance=5.0,
                 patient_emotional_state=5.0,
@@ -865,7 +1138,8 @@ class AIToAITherapyManager:
         therapeutic_alliance = (avg_openness + avg_connection) / 2
         
         # 评估患者情绪状态变化
-        emotional_state = self._calculate_emotional_state_score()
+        if emotional_state is None:
+            emotional_state = self._calculate_emotional_state_score()
         
         # 检测突破性时刻
         breakthrough = (
@@ -884,7 +1158,7 @@ class AIToAITherapyManager:
             risk_indicators.append("情绪状态恶化")
         
         return TherapyProgress(
-            turn_number=self.current_turn,
+            turn_number=turn_number,
             therapy_effectiveness=avg_effectiveness,
             therapeutic_alliance=therapeutic_alliance,
             patient_emotional_state=emotional_state,
@@ -915,21 +1189,15 @@ class AIToAITherapyManager:
             therapy_config = config["therapy_effectiveness"]
             bounds = config["state_bounds"]
             
-            # 分析治疗师技巧和患者回应质量
-            positive_indicators = ['感谢', '理解', '好的', '是的', '明白', '感受到', '尝试', '愿意', '想要']
-            negative_indicators = ['不知道', '算了', '没用', '不想说', '不理解', '烦', '累', '无所谓']
+            # 分析治疗师技巧和患者回应质量（共享关键词表 therapy_dialogue 分组）
+            matcher = get_keyword_matcher()
             
-            # 治疗师技巧质量评估
-            therapist_techniques = ['共情', '反映', '澄清', '总结', '支持', '鼓励', '开放式提问']
-            technique_score = 0
-            for technique in therapist_techniques:
-                if any(word in therapist_msg for word in ['感受', '理解', '听到', '意思是', '总结', '你能']):
-                    technique_score += 1
-            technique_quality = min(technique_score / len(therapist_techniques), 1.0)
+            # 治疗师技巧质量评估：出现任一技巧性表达即视为运用了治疗技巧
+            technique_quality = 1.0 if matcher.has_any(therapist_msg, "therapy_dialogue.therapist_technique") else 0.0
             
             # 患者积极性评估
-            positive_count = sum(1 for indicator in positive_indicators if indicator in patient_response)
-            negative_count = sum(1 for indicator in negative_indicators if indicator in patient_response)
+            positive_count = matcher.count(patient_response, "therapy_dialogue.patient_positive")
+            negative_count = matcher.count(patient_response, "therapy_dialogue.patient_negative")
             
             patient_openness = max(0, min(1.0, (positive_count - negative_count * 0.5) / 3))
             
@@ -1131,6 +1399,17 @@ class AIToAITherapyManager:
             for turn in recent_turns
         ]
     
+    def _get_dialogue_exchanges(self) -> List[Dict[str, Any]]:
+        """完整对话历史（滚动摘要使用的格式）"""
+        return [
+            {
+                'therapist': turn.therapist_message,
+                'patient': turn.patient_response,
+                'turn': turn.turn_number
+            }
+            for turn in self.dialogue_history
+        ]
+    
     async def _generate_session_summary(self) -> Dict[str, Any]:
         """生成会话总结"""
         if not self.dialogue_history:
@@ -1158,13 +1437,44 @@ class AIToAITherapyManager:
             'patient_state_evolution': {
                 'initial_state': self.dialogue_history[0].patient_state_change if self.dialogue_history else {},
                 'final_state': self.dialogue_history[-1].patient_state_change if self.dialogue_history else {}
-            }
+            },
+            'recovery_tracking': self._get_recovery_tracking_summary(),
+            'termination': self._get_termination_summary(),
+            'conversation_summary': self.conversation_summarizer.summary if self.conversation_summarizer else None
+        }
+    
+    def _get_termination_summary(self) -> Dict[str, Any]:
+        """会话结束原因：提前终止条件、达到最大轮数，或被中断后从日志压缩"""
+        termination = self.stopping_policy.get_summary() if self.stopping_policy else {'reason': None, 'details': {}}
+        stopped_early = termination['reason'] is not None
+        if not stopped_early:
+            reached = self.max_turns is None or self.current_turn >= self.max_turns
+            termination['reason'] = 'max_turns_reached' if reached else 'interrupted'
+        completed_turns = len(self.dialogue_history)
+        termination.update({
+            'completed_turns': completed_turns,
+            'max_turns': self.max_turns,
+            # 只有提前终止策略结束的会话才算节省了轮数（被中断的会话只是没有跑完）
+            'turns_saved': max(0, (self.max_turns or completed_turns) - self.current_turn) if stopped_early else 0
+        })
+        return termination
+    
+    def _get_recovery_tracking_summary(self) -> Dict[str, Any]:
+        """恢复追踪摘要：抑郁等级变化、每轮效果分数和治疗联盟轨迹"""
+        level_changes = getattr(self, 'depression_level_history', [])
+        return {
+            'initial_depression_level': self.initial_depression_level,
+            'final_depression_level': level_changes[-1]['new_level'] if level_changes else self.initial_depression_level,
+            'depression_level_changes': list(level_changes),
+            'effectiveness_scores': list(self.session_effectiveness_scores),
+            'alliance_trajectory': list(self.alliance_trajectory),
+            'final_alliance_score': self.therapeutic_alliance_score
         }
     
-    def _save_session_log(self, session_summary: Dict[str, Any]):
-        """保存会话记录到日志文件"""
-        logs_dir = Path("logs")
-        logs_dir.mkdir(exist_ok=True)
+    def _save_session_log(self, session_summary: Dict[str, Any]) -> Optional[Path]:
+        """保存会话记录到日志文件（成功后结束会话日志）"""
+        logs_dir = Path(self.logs_dir)
+        logs_dir.mkdir(parents=True, exist_ok=True)
         
         log_file = logs_dir / f"{self.session_id}_ai_therapy.json"
         
@@ -1173,6 +1483,12 @@ class AIToAITherapyManager:
                 json.dump(session_summary, f, ensure_ascii=False, indent=2)
         except Exception as e:
             print(f"⚠️ 保存会话记录失败: {e}")
+            return None
+        
+        if self.session_journal is not None:
+            self.session_journal.mark_compacted(log_file)
+            self.session_journal = None
+        return log_file
 
     def _initialize_recovery_tracking(self):
         """初始化恢复追踪机制 - 包含CAD状态"""
@@ -1255,8 +1571,9 @@ class AIToAITherapyManager:
         except Exception as e:
             console.print(f"[yellow]⚠️ 更新抑郁等级时出错: {e}[/yellow]")
 
-    async def _get_therapist_supervision(self, therapist_msg: str, patient_response: str) -> str:
-        """获取专业督导建议 - 修复substitute错误"""
+    async def _get_therapist_supervision(self, therapist_msg: str, patient_response: str, turn: int = None) -> str:
+        """获取专业督导建议 - 修复substitute错误（turn为督导对应的轮次，默认当前轮次）"""
+        turn = turn or self.current_turn
         try:
             # 安全处理消息内容，避免substitute错误
             safe_therapist_msg = str(therapist_msg).replace('$', '\\$') if therapist_msg else "无消息"
@@ -1292,7 +1609,7 @@ class AIToAITherapyManager:
 【患者背景】
 - 姓名: {self.patient_agent.name}
 - 当前抑郁程度: {self.current_depression_level}
-- 治疗进行轮次: {self.current_turn}
+- 治疗进行轮次: {turn}
 - 治疗联盟评分: {self.therapeutic_alliance_score:.1f}/10
 
 【最近对话内容】
@@ -1321,7 +1638,7 @@ class AIToAITherapyManager:
                     'patient_profile': {
                         'name': self.patient_agent.name,
                         'depression_level': self.current_depression_level,
-                        'current_turn': self.current_turn
+                        'current_turn': turn
                     },
                     'recent_dialogue': recent_dialogue
                 }
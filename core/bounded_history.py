@@ -0,0 +1,150 @@
+"""
+有界历史记录
+内存中只保留最近的有限窗口，完整历史以JSONL形式追加写入磁盘，
+仅在需要完整历史（如最终报告）时按需读取。
+"""
+
+import json
+import logging
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Union
+
+
+def _default_serializer(item: Any) -> Any:
+    """默认序列化：优先使用对象自带的to_dict"""
+    if hasattr(item, "to_dict"):
+        return item.to_dict()
+    return item
+
+
+class BoundedHistory:
+    """
+    有界历史窗口
+
+    行为上尽量接近list：支持append / extend / 迭代 / 下标与切片（作用于内存窗口）。
+    绑定磁盘文件后，每条记录都会追加写入，窗口外的旧记录可以通过
+    iter_full_history() 惰性读回（读回的是序列化后的字典）。
+    """
+
+    def __init__(self, maxlen: Optional[int] = 100,
+                 spill_path: Optional[Union[str, Path]] = None,
+                 serializer: Callable[[Any], Any] = _default_serializer):
+        """
+        Args:
+            maxlen: 内存窗口大小，None或<=0表示不限制
+            spill_path: 完整历史的JSONL文件路径，None表示不落盘
+            serializer: 写盘时的序列化函数
+        """
+        self.maxlen = maxlen if maxlen and maxlen > 0 else None
+        self._window: Deque[Any] = deque(maxlen=self.maxlen)
+        self._serializer = serializer
+        self._spill_path: Optional[Path] = None
+        self._spilled_count = 0
+        self.total_count = 0
+        self.logger = logging.getLogger(__name__)
+
+        if spill_path:
+            self.attach_store(spill_path)
+
+    # ---- 落盘 ----
+
+    def attach_store(self, spill_path: Union[str, Path]):
+        """绑定磁盘存储，并把当前窗口中已有的记录写入"""
+        self._spill_path = Path(spill_path)
+        self._spill_path.parent.mkdir(parents=True, exist_ok=True)
+        # 新绑定的文件从空开始，避免重复运行时混入旧数据
+        self._spill_path.write_text("", encoding="utf-8")
+        self._spilled_count = 0
+
+        for item in list(self._window):
+            self._write(item)
+
+    @property
+    def spill_path(self) -> Optional[Path]:
+        return self._spill_path
+
+    def _write(self, item: Any):
+        """追加写入一条记录"""
+        if not self._spill_path:
+            return
+        try:
+            with open(self._spill_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(self._serializer(item), ensure_ascii=False, default=str))
+                f.write("\n")
+            self._spilled_count += 1
+        except (IOError, TypeError, ValueError) as e:
+            self.logger.warning(f"历史记录写盘失败({self._spill_path}): {e}")
+
+    # ---- list兼容接口 ----
+
+    def append(self, item: Any):
+        """追加记录"""
+        self._window.append(item)
+        self.total_count += 1
+        self._write(item)
+
+    def extend(self, items):
+        """批量追加记录"""
+        for item in items:
+            self.append(item)
+
+    def clear(self):
+        """清空内存窗口（磁盘文件保留）"""
+        self._window.clear()
+
+    def __len__(self) -> int:
+        return len(self._window)
+
+    def __bool__(self) -> bool:
+        return bool(self._window)
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._window)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self._window)[index]
+        return self._window[index]
+
+    def __repr__(self) -> str:
+        return (f"BoundedHistory(window={len(self._window)}, total={self.total_count}, "
+                f"maxlen={self.maxlen}, store={self._spill_path})")
+
+    # ---- 完整历史 ----
+
+    def iter_full_history(self) -> Iterator[Any]:
+        """
+        惰性遍历完整历史
+
+        已落盘时逐行读取磁盘文件（返回序列化后的字典）；
+        未落盘时只能返回内存窗口中的序列化结果。
+        """
+        if not self._spill_path or not self._spill_path.exists():
+            for item in self._window:
+                yield self._serializer(item)
+            return
+
+        with open(self._spill_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    self.logger.warning(f"跳过损坏的历史记录行: {self._spill_path}")
+
+    def full_history(self) -> List[Any]:
+        """读取完整历史列表"""
+        return list(self.iter_full_history())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        return {
+            "window_size": len(self._window),
+            "maxlen": self.maxlen,
+            "total_count": self.total_count,
+            "spilled_count": self._spilled_count,
+            "store": str(self._spill_path) if self._spill_path else None
+        }
@@ -0,0 +1,245 @@
+"""
+条件事件规则编译器
+把场景JSON中声明式的条件（condition_type / condition_value / condition_operator）
+在场景加载时编译成规则表，每天对主角状态一次性求值全部条件；
+条件可选配置触发概率（trigger_probability）和冷却天数（cooldown_days），
+避免条件持续成立时每天重复触发同一类事件。
+同一张规则表也可以按列对一组角色（列表或NumPy数组）批量求值。
+"""
+
+import logging
+import operator
+import random
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# 比较运算符（同时兼容标量和NumPy数组的逐元素比较）
+OPERATORS: Dict[str, Callable[[Any, Any], Any]] = {
+    "less_than": operator.lt,
+    "less_equal": operator.le,
+    "greater_than": operator.gt,
+    "greater_equal": operator.ge,
+    "equal": operator.eq,
+    "not_equal": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne
+}
+
+
+def _grades_average(state: Dict[str, Any]) -> Optional[float]:
+    """最近成绩平均分，无成绩时返回None（条件不成立）"""
+    grades = state.get("recent_grades") or state.get("grades")
+    if isinstance(grades, dict):
+        grades = list(grades.values())
+    if not grades:
+        return None
+    try:
+        return sum(grades) / len(grades)
+    except TypeError:
+        return None
+
+
+def _mood(state: Dict[str, Any]) -> Optional[float]:
+    """情绪分：把情感基调(-10~10)映射到0~10，与其他状态指标同一量纲"""
+    tone = state.get("affective_tone")
+    if tone is None:
+        return None
+    return (tone + 10) / 2
+
+
+def _depression_level(state: Dict[str, Any]) -> Optional[int]:
+    """抑郁级别数值（状态中可能是枚举名）"""
+    level = state.get("depression_level")
+    if isinstance(level, str):
+        from models.psychology_models import DepressionLevel
+        return DepressionLevel[level].value if level in DepressionLevel.__members__ else None
+    return level
+
+
+# 派生字段：不能直接从状态字典读取的condition_type
+# 其余condition_type（stress_level、social_connection及拍平后的CAD字段等）直接读取状态字典
+DERIVED_FIELDS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    "grades_average": _grades_average,
+    "mood": _mood,
+    "depression_level": _depression_level
+}
+
+
+@dataclass
+class CompiledCondition:
+    """编译后的单条条件"""
+    name: str
+    config: Dict[str, Any]
+    state_field: Optional[str] = None
+    operator_name: Optional[str] = None
+    threshold: Any = None
+    legacy_predicate: Optional[Callable[[Dict[str, Any]], Any]] = None
+    compare: Optional[Callable[[Any, Any], Any]] = field(default=None, repr=False)
+    probability: float = 1.0   # 条件满足时实际触发的概率
+    cooldown_days: int = 0     # 触发后多少天内不再触发
+
+    def matches(self, features: Dict[str, Any], state: Dict[str, Any]) -> bool:
+        """判断条件是否满足"""
+        if self.legacy_predicate is not None:
+            return bool(self.legacy_predicate(state))
+        value = features.get(self.state_field)
+        if value is None:
+            return False
+        return bool(self.compare(value, self.threshold))
+
+
+class ConditionalRuleTable:
+    """条件事件规则表"""
+
+    def __init__(self, conditions: List[CompiledCondition]):
+        self.conditions = conditions
+        self.fields = sorted({c.state_field for c in conditions if c.state_field})
+        self.by_name = {c.name: c for c in conditions}
+        self.last_triggered: Dict[str, int] = {}  # 条件名 -> 最近一次触发的天数
+
+    @classmethod
+    def compile(cls, conditional_events: Any) -> "ConditionalRuleTable":
+        """
+        编译场景中的条件事件配置
+
+        支持声明式条件（condition_type等字段）和旧版配置模块中的可调用condition；
+        列表形式的配置按序号命名。无法识别的条件会记录警告并跳过。
+        """
+        if isinstance(conditional_events, dict):
+            items = list(conditional_events.items())
+        elif isinstance(conditional_events, list):
+            items = [(f"condition_{i}", item) for i, item in enumerate(conditional_events)]
+        else:
+            items = []
+
+        conditions = []
+        for name, config in items:
+            if not isinstance(config, dict):
+                continue
+
+            try:
+                probability = min(1.0, max(0.0, float(config.get("trigger_probability", 1.0))))
+                cooldown_days = max(0, int(config.get("cooldown_days", 0)))
+            except (TypeError, ValueError):
+                logger.warning(f"条件事件 {name} 的触发概率或冷却天数无效，使用默认值")
+                probability, cooldown_days = 1.0, 0
+
+            if callable(config.get("condition")):
+                conditions.append(CompiledCondition(name, config, legacy_predicate=config["condition"],
+                                                    probability=probability, cooldown_days=cooldown_days))
+                continue
+
+            condition_type = config.get("condition_type")
+            operator_name = config.get("condition_operator", "greater_than")
+            compare = OPERATORS.get(operator_name)
+            if not condition_type or compare is None or "condition_value" not in config:
+                logger.warning(f"条件事件 {name} 配置不完整或运算符无效，已跳过")
+                continue
+
+            conditions.append(CompiledCondition(
+                name=name,
+                config=config,
+                state_field=condition_type,
+                operator_name=operator_name,
+                threshold=config["condition_value"],
+                compare=compare,
+                probability=probability,
+                cooldown_days=cooldown_days
+            ))
+
+        return cls(conditions)
+
+    def __len__(self) -> int:
+        return len(self.conditions)
+
+    def extract_features(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """只提取规则表用到的字段"""
+        features = {}
+        for field_name in self.fields:
+            if field_name in DERIVED_FIELDS:
+                features[field_name] = DERIVED_FIELDS[field_name](state)
+            else:
+                features[field_name] = state.get(field_name)
+        return features
+
+    def evaluate(self, state: Dict[str, Any]) -> List[str]:
+        """一次遍历求值全部条件，返回满足条件的名称（保持配置顺序）"""
+        features = self.extract_features(state)
+        triggered = []
+        for condition in self.conditions:
+            try:
+                if condition.matches(features, state):
+                    triggered.append(condition.name)
+            except Exception as e:
+                logger.warning(f"条件事件 {condition.name} 求值失败: {e}")
+        return triggered
+
+    def select_triggered(self, triggered: Sequence[str], day: int, rng: Optional[random.Random] = None) -> List[str]:
+        """
+        按冷却天数和触发概率筛选满足条件的规则，并记录实际触发的天数
+
+        Args:
+            triggered: evaluate返回的满足条件的名称
+            day: 当前模拟天数
+            rng: 随机数生成器（默认使用random模块）
+        """
+        rng = rng or random
+        fired = []
+        for name in triggered:
+            condition = self.by_name[name]
+            last = self.last_triggered.get(name)
+            if last is not None and day - last <= condition.cooldown_days:
+                continue
+            if condition.probability < 1.0 and rng.random() >= condition.probability:
+                continue
+            self.last_triggered[name] = day
+            fired.append(name)
+        return fired
+
+    def reset(self):
+        """清空触发记录（新的模拟开始时调用）"""
+        self.last_triggered.clear()
+
+    def is_satisfied(self, name: str, state: Dict[str, Any]) -> bool:
+        """单独判断某个条件"""
+        condition = self.by_name.get(name)
+        if condition is None:
+            return False
+        try:
+            return condition.matches(self.extract_features(state), state)
+        except Exception as e:
+            logger.warning(f"条件事件 {name} 求值失败: {e}")
+            return False
+
+    def evaluate_cohort(self, states: Sequence[Dict[str, Any]]) -> List[List[str]]:
+        """对一组角色状态逐个求值"""
+        return [self.evaluate(state) for state in states]
+
+    def evaluate_columns(self, columns: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        按列批量求值（列可以是NumPy数组或普通列表）
+
+        Args:
+            columns: {字段名: 该字段在整个群体上的取值}，派生字段需预先算好
+        Returns:
+            {条件名: 布尔掩码}；旧版可调用条件不支持按列求值，会被跳过
+        """
+        masks = {}
+        for condition in self.conditions:
+            if condition.legacy_predicate is not None or condition.state_field not in columns:
+                continue
+            values = columns[condition.state_field]
+            if hasattr(values, "dtype"):
+                masks[condition.name] = condition.compare(values, condition.threshold)
+            else:
+                masks[condition.name] = [
+                    value is not None and bool(condition.compare(value, condition.threshold))
+                    for value in values
+                ]
+        return masks
@@ -0,0 +1,175 @@
+"""
+滚动对话摘要
+治疗对话的提示词只保留最近几轮原文，滑出窗口的轮次每隔K轮在后台用LLM压缩进一段滚动摘要，
+提示词长度不再随会话轮数增长，同时保留早期对话的要点。
+LLM摘要超长时在最大长度内的最后一个句子结尾处截断；
+LLM摘要失败时退回到逐轮截断的摘录，并按最大长度保留最新的内容。
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+
+DEFAULT_SUMMARY_SETTINGS = {
+    "enabled": True,
+    "recent_turns": 6,
+    "update_every": 4,
+    "max_summary_chars": 600
+}
+
+SENTENCE_ENDINGS = "。！？!?；;\n"
+
+
+class RollingConversationSummarizer:
+    """把滑出最近窗口的对话轮次异步压缩为滚动摘要"""
+
+    def __init__(self, ai_client, recent_turns: int = 6, update_every: int = 4, max_summary_chars: int = 600,
+                 therapist_label: str = "咨询师", patient_label: str = "患者"):
+        """
+        Args:
+            ai_client: 用于生成摘要的AI客户端
+            recent_turns: 提示词中保留原文的最近轮数
+            update_every: 滑出窗口的轮次累计到多少轮时更新一次摘要
+            max_summary_chars: 摘要的最大字数
+            therapist_label: 对话中咨询师的称呼
+            patient_label: 对话中患者的称呼
+        """
+        self.ai_client = ai_client
+        self.recent_turns = max(1, int(recent_turns))
+        self.update_every = max(1, int(update_every))
+        self.max_summary_chars = max(100, int(max_summary_chars))
+        self.therapist_label = therapist_label
+        self.patient_label = patient_label
+        self.logger = logging.getLogger(__name__)
+
+        self.summary = ""
+        self.summarized_turns = 0  # 已并入摘要的轮数（从会话开始计）
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"updates": 0, "llm_failures": 0}
+
+    @classmethod
+    def from_config(cls, ai_client, conversation_settings: Dict[str, Any],
+                    **kwargs) -> Optional["RollingConversationSummarizer"]:
+        """按conversation_settings.rolling_summary创建；未启用时返回None"""
+        settings = dict(DEFAULT_SUMMARY_SETTINGS)
+        settings.update((conversation_settings or {}).get("rolling_summary", {}) or {})
+        if not settings.get("enabled", False):
+            return None
+        return cls(ai_client, settings["recent_turns"], settings["update_every"],
+                   settings["max_summary_chars"], **kwargs)
+
+    # ---- 提示词上下文 ----
+
+    def recent(self, history: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """窗口内保留原文的最近轮次"""
+        return list(history[-self.recent_turns:])
+
+    def omitted_turns(self, history: Sequence[Dict[str, Any]]) -> int:
+        """已滑出窗口但尚未并入摘要的轮数"""
+        return max(0, len(history) - self.recent_turns - self.summarized_turns)
+
+    def render_summary(self, history: Sequence[Dict[str, Any]]) -> str:
+        """早期对话部分的提示词文本（没有早期对话时为空字符串）"""
+        parts = []
+        if self.summary:
+            parts.append(f"（前{self.summarized_turns}轮对话摘要）{self.summary}")
+        omitted = self.omitted_turns(history)
+        if omitted:
+            parts.append(f"[之后省略了{omitted}轮对话...]")
+        return "\n".join(parts)
+
+    # ---- 摘要更新 ----
+
+    def schedule(self, history: Sequence[Dict[str, Any]]):
+        """滑出窗口的未摘要轮次达到update_every时，在后台更新摘要（已有更新在进行时跳过）"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # 没有运行中的事件循环时不做摘要
+            return
+        if self._task is not None and not self._task.done():
+            if self._task.get_loop() is loop:
+                return
+            # 每次请求使用新事件循环的调用方（如网页接口）会留下无法继续执行的任务，重新调度
+            self._task = None
+        target = len(history) - self.recent_turns
+        if target - self.summarized_turns < self.update_every:
+            return
+        turns = [dict(turn) for turn in history[self.summarized_turns:target]]
+        self._task = loop.create_task(self._update(turns, target))
+
+    async def _update(self, turns: List[Dict[str, Any]], target: int):
+        try:
+            summary = self._truncate_at_sentence(await self._summarize_with_llm(turns))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.stats["llm_failures"] += 1
+            self.logger.warning(f"滚动对话摘要生成失败，使用摘录: {e}")
+            # 摘录按时间顺序追加，保留最新的部分
+            summary = self._extractive_summary(turns)[-self.max_summary_chars:]
+        self.summary = summary
+        self.summarized_turns = target
+        self.stats["updates"] += 1
+
+    def _truncate_at_sentence(self, summary: str) -> str:
+        """超过最大长度的LLM摘要截断到最后一个完整的句子（没有句子结尾时直接截断）"""
+        if len(summary) <= self.max_summary_chars:
+            return summary
+        head = summary[:self.max_summary_chars]
+        end = max(head.rfind(mark) for mark in SENTENCE_ENDINGS)
+        return head[:end + 1].rstrip() if end > 0 else head
+
+    def _format_turns(self, turns: List[Dict[str, Any]], max_chars: Optional[int] = None) -> str:
+        lines = []
+        for turn in turns:
+            for label, key in ((self.therapist_label, "therapist"), (self.patient_label, "patient")):
+                text = str(turn.get(key, "") or "").strip()
+                if text:
+                    lines.append(f"{label}: {text[:max_chars] if max_chars else text}")
+        return "\n".join(lines)
+
+    async def _summarize_with_llm(self, turns: List[Dict[str, Any]]) -> str:
+        prompt = f"""
+你在为一段心理咨询对话维护滚动摘要。请把“已有摘要”和“新的对话”合并为一段新的摘要。
+
+要求：
+1. 保留患者透露的关键经历、情绪、核心信念和风险信号，以及咨询师使用过的干预方法和患者的反应
+2. 保留治疗关系的变化（信任、阻抗、突破）
+3. 用第三人称客观叙述，不超过{self.max_summary_chars}字，只输出摘要正文
+
+已有摘要：
+{self.summary or "（无）"}
+
+新的对话：
+{self._format_turns(turns)}
+        """.strip()
+        response = await self.ai_client.generate_response(prompt)
+        summary = str(response or "").strip()
+        if not summary:
+            raise ValueError("摘要为空")
+        return summary
+
+    def _extractive_summary(self, turns: List[Dict[str, Any]]) -> str:
+        """LLM不可用时的摘录：每句截断后接在已有摘要之后"""
+        excerpt = self._format_turns(turns, max_chars=40).replace("\n", "；")
+        return f"{self.summary}；{excerpt}" if self.summary else excerpt
+
+    async def wait(self):
+        """等待进行中的摘要更新完成"""
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def reset(self):
+        """开始新会话时清空摘要"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._task = None
+        self.summary = ""
+        self.summarized_turns = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        stats = dict(self.stats)
+        stats.update(summarized_turns=self.summarized_turns, summary_chars=len(self.summary))
+        return stats
@@ -1,9 +1,11 @@
 import openai
 import asyncio
 import json
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Union
 import logging
 
+from core.prompt_usage import PromptUsageTracker
+
 class DeepSeekClient:
     """DeepSeek API客户端"""
     
@@ -17,6 +19,7 @@ class DeepSeekClient:
             base_url=base_url
         )
         self.logger = logging.getLogger(__name__)
+        self.usage = PromptUsageTracker()
         
     async def generate_response(self, prompt: str, context: Optional[Dict] = None) -> str:
         """生成回应"""
@@ -35,12 +38,28 @@ class DeepSeekClient:
                 max_tokens=2048
             )
             
+            self._record_usage(getattr(response, "usage", None))
             return response.choices[0].message.content
             
         except Exception as e:
             self.logger.error(f"生成回应时出错: {e}")
             return "抱歉，我现在无法回应。"
     
+    def _record_usage(self, usage: Any):
+        """记录提示词用量和前缀缓存命中（DeepSeek字段优先，其次OpenAI兼容字段）"""
+        if usage is None:
+            self.usage.record(None, None)
+            return
+        cached_tokens = getattr(usage, "prompt_cache_hit_tokens", None)
+        if cached_tokens is None:
+            details = getattr(usage, "prompt_tokens_details", None)
+            cached_tokens = getattr(details, "cached_tokens", None) if details is not None else None
+        self.usage.record(getattr(usage, "prompt_tokens", None), cached_tokens)
+    
+    def get_usage_stats(self) -> Dict[str, Any]:
+        """获取提示词用量与前缀缓存命中率"""
+        return self.usage.get_stats()
+    
     def _build_prompt(self, prompt: str, context: Optional[Dict] = None) -> str:
         """构建完整的提示词"""
         if not context:
@@ -87,9 +106,14 @@ class DeepSeekClient:
                 "depression_risk": 0
             }
     
-    async def generate_agent_response(self, agent_profile: Dict, situation: str, 
+    async def generate_agent_response(self, agent_profile: Union[Dict, str], situation: str, 
                                     history: list = None) -> str:
-        """为特定agent生成回应"""
+        """为特定agent生成回应（agent_profile可以是已序列化的档案字符串）"""
+        if isinstance(agent_profile, str):
+            profile_str = agent_profile
+        else:
+            profile_str = json.dumps(agent_profile, ensure_ascii=False, indent=2)
+        
         history_str = ""
         if history:
             history_str = "\n".join([f"- {h}" for h in history[-5:]])  # 只取最近5条历史
@@ -98,7 +122,7 @@ class DeepSeekClient:
         你是一个虚拟角色，请根据以下信息进行角色扮演：
         
         角色信息：
-        {json.dumps(agent_profile, ensure_ascii=False, indent=2)}
+        {profile_str}
         
         当前情况：{situation}
         
@@ -117,6 +141,77 @@ class DeepSeekClient:
         
         return await self.generate_response(prompt)
     
+    async def generate_group_response(self, participants: List[Dict[str, Any]],
+                                      situation: str) -> Dict[str, str]:
+        """
+        一次调用为多个agent生成回应
+        
+        Args:
+            participants: 参与者列表，每项包含name、profile（精简档案）和history
+            situation: 当前情况
+            
+        Returns:
+            {角色名: 回应}，解析失败时返回空字典，由调用方逐个回退
+        """
+        blocks = []
+        for participant in participants:
+            profile = participant.get("profile", {})
+            if not isinstance(profile, str):
+                profile = json.dumps(profile, ensure_ascii=False, separators=(',', ':'))
+            history = participant.get("history") or []
+            history_str = "\n".join([f"  - {h}" for h in history[-5:]]) or "  - 无"
+            blocks.append(
+                f"【{participant['name']}】\n"
+                f"角色信息：{profile}\n"
+                f"最近的互动历史：\n{history_str}"
+            )
+        names = [participant["name"] for participant in participants]
+        participants_str = "\n\n".join(blocks)
+        names_str = "、".join(names)
+        example_name = names[0] if names else "角色名"
+        
+        prompt = f"""
+        你需要同时扮演以下多个虚拟角色，他们正在经历同一件事情：
+        
+        当前情况：{situation}
+        
+        {participants_str}
+        
+        请按照 {names_str} 的顺序，依次以每个角色的身份用自然的语言回应。要求：
+        1. 符合各自的性格特点、背景和当前心理状态
+        2. 体现角色之间的关系，后说话的角色可以回应前面角色说的话
+        3. 用第一人称回应，每人50-200字
+        
+        请返回JSON格式，键为角色名，值为该角色的回应：
+        {{
+            "{example_name}": "回应内容"
+        }}
+        
+        只返回JSON格式的结果，不要添加其他文字。
+        """
+        
+        try:
+            response = await self.generate_response(prompt)
+            if "```json" in response:
+                json_str = response.split("```json")[1].split("```")[0].strip()
+            elif "```" in response:
+                json_str = response.split("```")[1].strip()
+            else:
+                json_str = response.strip()
+            
+            result = json.loads(json_str)
+            if not isinstance(result, dict):
+                raise ValueError("群体回应不是JSON对象")
+            
+            return {
+                name: str(result[name]).strip()
+                for name in names
+                if isinstance(result.get(name), str) and result[name].strip()
+            }
+        except Exception as e:
+            self.logger.error(f"群体回应生成失败: {e}")
+            return {}
+    
     async def analyze_interaction_impact(self, interaction: str, 
                                        participants: list) -> Dict[str, Any]:
         """分析互动对参与者的心理影响"""
@@ -0,0 +1,426 @@
+"""
+离线事件语料库
+模拟开始前按场景批量扩展事件模板（每个类别/情感一次请求生成多条），
+经过去重、逻辑验证和违禁词过滤后写入按场景索引的语料文件；
+模拟时EventGenerator直接从语料库抽样，热路径上不再调用LLM。
+
+构建命令：
+    python -m core.event_corpus --scenario default_adolescent
+    python -m core.event_corpus --all --provider deepseek
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import re
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from config.config_loader import get_config_loader
+from core.near_duplicate_index import NearDuplicateIndex
+from core.keyword_matcher import get_keyword_matcher
+
+CORPUS_VERSION = 1
+
+# 运行时由EventGenerator按上下文填充的非角色占位符
+CONTEXT_PLACEHOLDERS = {"subject", "location", "time"}
+
+_PLACEHOLDER = re.compile(r'\{(\w+)\}')
+_NORMALIZE = re.compile(r'[\s，。！？、,.!?；;：:“”"\'（）()]+')
+
+
+def normalize_template(template: str) -> str:
+    """去重用的规范化文本：去掉空白和标点"""
+    return _NORMALIZE.sub("", template)
+
+
+def bucket_key(category: str, sentiment: str) -> str:
+    """语料桶键"""
+    return f"{category}/{sentiment}"
+
+
+def scenario_fingerprint(scenario_config: Dict[str, Any]) -> str:
+    """场景模板指纹：模板、条件事件或角色变化后语料库视为过期"""
+    payload = {
+        "event_templates": scenario_config.get("event_templates", {}),
+        "conditional_events": {
+            name: config.get("events", [])
+            for name, config in scenario_config.get("conditional_events", {}).items()
+            if isinstance(config, dict)
+        },
+        "characters": sorted(scenario_config.get("characters", {}).keys())
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class EventCorpus:
+    """运行时事件语料库（只读，按桶抽样）"""
+
+    def __init__(self, data: Dict[str, Any], path: Optional[Path] = None, recent_exclusion: int = 8):
+        self.path = path
+        self.scenario = data.get("scenario")
+        self.fingerprint = data.get("fingerprint")
+        self.built_at = data.get("built_at")
+        self.buckets: Dict[str, List[str]] = {
+            key: [entry["template"] for entry in entries if entry.get("template")]
+            for key, entries in data.get("buckets", {}).items()
+        }
+        self.conditional: Dict[str, List[str]] = {
+            name: [entry["template"] for entry in entries if entry.get("template")]
+            for name, entries in data.get("conditional", {}).items()
+        }
+        self.recent_exclusion = max(0, int(recent_exclusion))
+        self._recent: Dict[str, Deque[str]] = {}
+        self.samples_served = 0
+
+    @classmethod
+    def corpus_path(cls, scenario_key: str, corpus_dir: Optional[Path] = None) -> Path:
+        """场景语料文件路径"""
+        return Path(corpus_dir or get_config_loader().corpus_dir) / f"{scenario_key}.json"
+
+    @classmethod
+    def load(cls, scenario_key: Optional[str], corpus_dir: Optional[Path] = None,
+             scenario_config: Optional[Dict[str, Any]] = None,
+             recent_exclusion: int = 8) -> Optional["EventCorpus"]:
+        """加载场景语料库，不存在或无法解析时返回None"""
+        logger = logging.getLogger(__name__)
+        if not scenario_key:
+            return None
+
+        path = cls.corpus_path(scenario_key, corpus_dir)
+        if not path.exists():
+            return None
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (IOError, json.JSONDecodeError) as e:
+            logger.warning(f"事件语料库读取失败 {path}: {e}")
+            return None
+
+        if data.get("version") != CORPUS_VERSION:
+            logger.warning(f"事件语料库版本不匹配，请重新构建: {path}")
+            return None
+
+        if scenario_config and data.get("fingerprint") != scenario_fingerprint(scenario_config):
+            logger.warning(f"场景模板已修改，事件语料库可能过期，建议重新构建: {path}")
+
+        corpus = cls(data, path, recent_exclusion)
+        logger.info(f"加载事件语料库 {scenario_key}: {corpus.size()}条模板")
+        return corpus
+
+    def size(self) -> int:
+        return (sum(len(t) for t in self.buckets.values()) +
+                sum(len(t) for t in self.conditional.values()))
+
+    def has(self, category: str, sentiment: str) -> bool:
+        return bool(self.buckets.get(bucket_key(category, sentiment)))
+
+    def _pick(self, key: str, templates: List[str]) -> Optional[str]:
+        """抽样并尽量避开最近用过的模板"""
+        if not templates:
+            return None
+        recent = self._recent.setdefault(key, deque(maxlen=self.recent_exclusion or None))
+        candidates = [t for t in templates if t not in recent] or templates
+        template = random.choice(candidates)
+        if self.recent_exclusion:
+            recent.append(template)
+        self.samples_served += 1
+        return template
+
+    def sample(self, category: str, sentiment: str) -> Optional[str]:
+        """抽取一条常规事件模板"""
+        key = bucket_key(category, sentiment)
+        return self._pick(key, self.buckets.get(key, []))
+
+    def sample_conditional(self, condition_name: str) -> Optional[str]:
+        """抽取一条条件事件模板"""
+        return self._pick(f"conditional/{condition_name}", self.conditional.get(condition_name, []))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        return {
+            "scenario": self.scenario,
+            "built_at": self.built_at,
+            "total_templates": self.size(),
+            "buckets": {key: len(t) for key, t in self.buckets.items()},
+            "conditional": {name: len(t) for name, t in self.conditional.items()},
+            "samples_served": self.samples_served
+        }
+
+
+class EventCorpusBuilder:
+    """事件语料库构建器"""
+
+    def __init__(self, ai_client, scenario_key: str, config: Optional[Dict[str, Any]] = None):
+        from core.event_generator import LogicValidator
+        from core.llm_component_registry import get_llm_component_registry
+
+        self.ai_client = ai_client
+        self.scenario_key = scenario_key
+        self.logger = logging.getLogger(__name__)
+
+        registry = get_llm_component_registry()
+        llm_config = registry.get_config()
+        corpus_config = config if config is not None else llm_config.get("event_corpus", {})
+        build_config = corpus_config.get("build", {})
+
+        self.variants_per_request = build_config.get("variants_per_request", 8)
+        self.target_per_bucket = build_config.get("target_per_bucket", 40)
+        self.max_rounds = build_config.get("max_rounds", 6)
+        self.max_concurrent = llm_config.get("performance_optimization", {}).get("max_concurrent_requests", 5)
+
+        self.scenario_config = get_config_loader().load_scenario(scenario_key)
+        self.characters = {
+            char_id: info.get("name", char_id)
+            for char_id, info in self.scenario_config.get("characters", {}).items()
+            if isinstance(info, dict)
+        }
+        protagonist = self.scenario_config.get("characters", {}).get("protagonist", {})
+        self.protagonist_age = protagonist.get("age", 17)
+        self.allowed_placeholders = set(self.characters) | CONTEXT_PLACEHOLDERS
+
+        self.template_parser = registry.get_llm_event_generator(ai_client) if ai_client else None
+        self.logic_validator = LogicValidator(None)
+        self.validation_context = {
+            "character_context": {
+                "protagonist_name": self.characters.get("protagonist", "主角"),
+                "protagonist_age": self.protagonist_age
+            }
+        }
+
+        self.rejections: Dict[str, int] = {}
+
+    # ---- 验证 ----
+
+    def _reject(self, reason: str) -> bool:
+        self.rejections[reason] = self.rejections.get(reason, 0) + 1
+        return False
+
+    def _render_preview(self, template: str) -> str:
+        """用角色名和中性词渲染模板，供逻辑验证使用"""
+        def replace(match):
+            name = match.group(1)
+            return self.characters.get(name, "某处")
+        return _PLACEHOLDER.sub(replace, template)
+
+    def validate(self, template: str, dedup_index: NearDuplicateIndex) -> bool:
+        """验证单条模板：格式、近重复、占位符、违禁词、年龄适当性和基本逻辑"""
+        if self.template_parser and not self.template_parser._is_template_valid(template, [], dedup_index):
+            return self._reject("format_or_similarity")
+
+        placeholders = set(_PLACEHOLDER.findall(template))
+        if not placeholders or not placeholders <= self.allowed_placeholders:
+            return self._reject("placeholder")
+
+        if get_keyword_matcher().has_any(template, "quality_control.forbidden_words"):
+            return self._reject("forbidden_word")
+
+        preview = self._render_preview(template)
+        if not self.logic_validator._basic_logic_check(preview, self.validation_context):
+            return self._reject("logic")
+        if not self.logic_validator._age_appropriateness_check(preview, self.validation_context):
+            return self._reject("age")
+
+        return True
+
+    def _new_dedup_index(self, seed_templates: List[str]) -> NearDuplicateIndex:
+        """创建以现有模板初始化的近重复索引"""
+        threshold = self.template_parser.similarity_threshold if self.template_parser else 0.8
+        index = NearDuplicateIndex(threshold=threshold)
+        for template in seed_templates:
+            index.add(template, key=template)
+        return index
+
+    # ---- 生成 ----
+
+    def _life_stage(self) -> str:
+        age = self.protagonist_age
+        return "小学生" if age <= 12 else "初中生" if age <= 15 else "高中生" if age <= 18 else "大学生" if age <= 22 else "成年人"
+
+    def _build_batch_prompt(self, examples: List[str], label: str, sentiment: str, count: int) -> str:
+        """构建批量扩展prompt（一次生成多条）"""
+        example_lines = "\n".join(f"- {t}" for t in examples)
+        placeholder_lines = "\n".join(
+            f"- {{{char_id}}}: {name}" for char_id, name in self.characters.items()
+        )
+
+        prompt = f"""
+你是一个心理学专家和事件设计师，需要为心理模拟场景批量生成新的事件模板。
+
+主角：{self.characters.get('protagonist', '主角')}（{self.protagonist_age}岁{self._life_stage()}）
+
+可用的角色占位符：
+{placeholder_lines}
+可用的其他占位符：{{subject}}（科目）、{{location}}（地点）、{{time}}（时间）
+
+现有事件模板（{label}，{sentiment}情感）：
+{example_lines}
+
+请生成{count}个结构相似但内容不同的新事件模板。
+
+要求：
+1. 只使用上面列出的占位符，每个模板必须包含{{protagonist}}
+2. 符合{self.protagonist_age}岁主角的年龄特征和生活场景
+3. 体现{sentiment}的情感倾向，不要与现有模板重复
+4. 每个事件15-25字，使用中文
+
+输出格式：
+每行一个模板，不需要编号或其他说明文字。
+"""
+        return prompt.strip()
+
+    async def _expand_bucket(self, label: str, sentiment: str, base_templates: List[str],
+                             dedup_index: NearDuplicateIndex,
+                             semaphore: asyncio.Semaphore) -> Tuple[List[Dict[str, Any]], int]:
+        """扩展单个桶：多轮批量请求直到达到目标数量（同类别的桶共享近重复索引）"""
+        accepted: List[Dict[str, Any]] = []
+        seen = set()
+        requests_made = 0
+
+        for template in base_templates:
+            key = normalize_template(template)
+            if key not in seen:
+                seen.add(key)
+                accepted.append({"template": template, "source": "base"})
+
+        if not self.ai_client or not self.template_parser:
+            return accepted, requests_made
+
+        known = list(base_templates)
+        for _ in range(self.max_rounds):
+            if len(accepted) >= self.target_per_bucket:
+                break
+
+            examples = base_templates[:4] + random.sample(known[len(base_templates):],
+                                                          min(2, len(known) - len(base_templates)))
+            prompt = self._build_batch_prompt(examples, label, sentiment, self.variants_per_request)
+            try:
+                async with semaphore:
+                    response = await self.ai_client.generate_response(prompt)
+                requests_made += 1
+            except Exception as e:
+                self.logger.error(f"批量扩展失败 {label}-{sentiment}: {e}")
+                break
+
+            added = 0
+            for template in self.template_parser._parse_generated_templates(response):
+                key = normalize_template(template)
+                if key in seen:
+                    self._reject("duplicate")
+                    continue
+                seen.add(key)
+                if self.validate(template, dedup_index):
+                    accepted.append({"template": template, "source": "llm"})
+                    dedup_index.add(template, key=template)
+                    known.append(template)
+                    added += 1
+
+            if added == 0:
+                break
+
+        return accepted[:max(self.target_per_bucket, len(base_templates))], requests_made
+
+    async def build(self) -> Dict[str, Any]:
+        """构建整个场景的语料库数据"""
+        semaphore = asyncio.Semaphore(max(1, self.max_concurrent))
+        jobs = []
+
+        for category, sentiments in self.scenario_config.get("event_templates", {}).items():
+            dedup_index = self._new_dedup_index([t for templates in sentiments.values() for t in templates])
+            for sentiment, templates in sentiments.items():
+                jobs.append(("bucket", bucket_key(category, sentiment),
+                             self._expand_bucket(category, sentiment, list(templates), dedup_index, semaphore)))
+
+        for name, config in self.scenario_config.get("conditional_events", {}).items():
+            if isinstance(config, dict) and config.get("events"):
+                events = list(config["events"])
+                jobs.append(("conditional", name,
+                             self._expand_bucket(f"条件事件{name}", "negative", events,
+                                                 self._new_dedup_index(events), semaphore)))
+
+        results = await asyncio.gather(*(job[2] for job in jobs))
+
+        data = {
+            "version": CORPUS_VERSION,
+            "scenario": self.scenario_key,
+            "built_at": datetime.now().isoformat(),
+            "fingerprint": scenario_fingerprint(self.scenario_config),
+            "buckets": {},
+            "conditional": {}
+        }
+        total_requests = 0
+        for (kind, key, _), (entries, requests_made) in zip(jobs, results):
+            data["buckets" if kind == "bucket" else "conditional"][key] = entries
+            total_requests += requests_made
+
+        data["stats"] = {
+            "llm_requests": total_requests,
+            "total_templates": sum(len(e) for e in data["buckets"].values()) +
+                               sum(len(e) for e in data["conditional"].values()),
+            "rejections": dict(self.rejections)
+        }
+        return data
+
+    def save(self, data: Dict[str, Any], corpus_dir: Optional[Path] = None) -> Path:
+        """写入语料文件（先写临时文件再替换，避免中途失败留下半个文件）"""
+        path = EventCorpus.corpus_path(self.scenario_key, corpus_dir)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".json.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        tmp_path.replace(path)
+        return path
+
+
+async def build_event_corpus(ai_client, scenario_key: str,
+                             corpus_dir: Optional[Path] = None) -> Path:
+    """构建并保存单个场景的事件语料库"""
+    builder = EventCorpusBuilder(ai_client, scenario_key)
+    data = await builder.build()
+    path = builder.save(data, corpus_dir)
+    logging.getLogger(__name__).info(
+        f"场景 {scenario_key} 语料库构建完成: {data['stats']['total_templates']}条模板，"
+        f"{data['stats']['llm_requests']}次LLM请求 -> {path}"
+    )
+    return path
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='构建离线事件语料库')
+    parser.add_argument('--scenario', type=str, help='场景名称（config/scenarios下的文件名）')
+    parser.add_argument('--all', action='store_true', help='为所有场景构建语料库')
+    parser.add_argument('--provider', type=str, help='AI提供商 (gemini/deepseek/qwen)')
+    parser.add_argument('--output-dir', type=str, help='语料库输出目录（默认config/event_corpus）')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if args.all:
+        scenarios = get_config_loader().list_available_scenarios()
+    elif args.scenario:
+        scenarios = [args.scenario]
+    else:
+        parser.error("请指定 --scenario 或 --all")
+
+    from core.ai_client_factory import ai_client_factory
+    ai_client = ai_client_factory.get_client(args.provider)
+    corpus_dir = Path(args.output_dir) if args.output_dir else None
+
+    async def run():
+        for scenario_key in scenarios:
+            path = await build_event_corpus(ai_client, scenario_key, corpus_dir)
+            print(f"{scenario_key}: {path}")
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
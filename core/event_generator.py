@@ -15,6 +15,12 @@ from models.psychology_models import LifeEvent, EventType
 from core.llm_event_generator import LLMEventGenerator
 from core.hybrid_impact_calculator import HybridImpactCalculator
 from core.probabilistic_impact import ProbabilisticImpactModel
+from core.llm_component_registry import get_llm_component_registry
+from core.conditional_rules import ConditionalRuleTable
+from core.event_corpus import EventCorpus
+from core.near_duplicate_index import NearDuplicateIndex
+from core.keyword_matcher import get_keyword_matcher
+from core.speculative_events import SpeculativeEvent, SpeculativeEventQueue, state_snapshot
 
 class EventGenerator:
     """智能事件生成器 - 基于模板分析和发散生成"""
@@ -36,8 +42,9 @@ class EventGenerator:
         self.probabilistic_model = None
         
         if self.ai_client and self.llm_config.get("llm_integration", {}).get("event_generation", {}).get("enabled", False):
-            self.llm_event_generator = LLMEventGenerator(ai_client)
-            self.hybrid_calculator = HybridImpactCalculator(ai_client, self.llm_config.get("hybrid_calculation", {}))
+            registry = get_llm_component_registry()
+            self.llm_event_generator = registry.get_llm_event_generator(ai_client)
+            self.hybrid_calculator = registry.create_hybrid_calculator(ai_client)
             
         if self.llm_config.get("probabilistic_modeling", {}).get("enabled", False):
             self.probabilistic_model = ProbabilisticImpactModel(self.llm_config.get("probabilistic_modeling", {}))
@@ -53,14 +60,43 @@ class EventGenerator:
         self.character_context = self.context_extractor.extract_context()
         self.generation_rules = self._build_generation_rules()
         
-        self.logger.info(f"增强事件生成器初始化完成，LLM增强: {'启用' if self.llm_event_generator else '禁用'}")
+        # 场景加载时编译条件事件规则（声明式条件与旧版可调用条件）
+        self.conditional_rules = ConditionalRuleTable.compile(
+            getattr(config, 'CONDITIONAL_EVENTS', {}) if config else {}
+        )
+        
+        # 离线事件语料库（python -m core.event_corpus 构建），存在时替代在线发散生成
+        corpus_config = self.llm_config.get("event_corpus", {})
+        self.event_corpus = None
+        if corpus_config.get("enabled", False) and config:
+            self.event_corpus = EventCorpus.load(
+                getattr(config, 'SCENARIO_KEY', None),
+                scenario_config={
+                    "event_templates": event_templates,
+                    "conditional_events": getattr(config, 'CONDITIONAL_EVENTS', {}),
+                    "characters": getattr(config, 'CHARACTERS', {})
+                },
+                recent_exclusion=corpus_config.get("recent_exclusion", 8)
+            )
+        
+        # 推测式预生成：agent回应当前事件时，后台为下一个事件预先生成文本
+        speculative_config = self.llm_config.get("speculative_generation", {})
+        self.speculative_queue = None
+        if speculative_config.get("enabled", False):
+            self.speculative_queue = SpeculativeEventQueue(
+                self._produce_speculative_event,
+                lookahead_depth=speculative_config.get("lookahead_depth", 1),
+                max_state_drift=speculative_config.get("max_state_drift", 1.5),
+                max_age_seconds=speculative_config.get("max_age_seconds", 600)
+            )
+        
+        self.logger.info(f"增强事件生成器初始化完成，LLM增强: {'启用' if self.llm_event_generator else '禁用'}，"
+                         f"事件语料库: {'已加载' if self.event_corpus else '未使用'}")
     
     def _load_llm_config(self) -> Dict:
-        """加载LLM增强配置"""
+        """加载LLM增强配置（进程内共享，只读取一次）"""
         try:
-            config_path = "/Users/zl_24/Documents/Codes/2025/2025-07/CAD-main/config/llm_enhancement_config.json"
-            with open(config_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return get_llm_component_registry().get_config()
         except Exception as e:
             self.logger.warning(f"加载LLM配置失败: {e}")
             return {}
@@ -272,14 +308,46 @@ class EventGenerator:
         
         return generated_event, participants, int(final_impact)
     
-    async def _generate_traditional_event(self, category: str, sentiment: str, 
-                                        context: Dict, stage_config: Dict) -> Tuple[str, List[str], int]:
-        """传统事件生成方法"""
+    def schedule_prefetch(self, category: str, sentiment: str, protagonist_state: Dict, stage_config: Dict):
+        """在后台为即将到来的 (类别, 情感) 预生成事件（未启用推测生成时不做任何事）"""
+        if self.speculative_queue:
+            self.speculative_queue.schedule(category, sentiment, protagonist_state, stage_config)
+    
+    def invalidate_speculation(self):
+        """丢弃全部预生成事件（每天开始和阶段切换时调用）"""
+        if self.speculative_queue:
+            self.speculative_queue.invalidate()
+    
+    async def shutdown(self):
+        """取消未完成的预生成任务"""
+        if self.speculative_queue:
+            await self.speculative_queue.shutdown()
+    
+    def get_speculation_stats(self) -> Dict[str, Any]:
+        """推测式预生成的命中统计"""
+        return self.speculative_queue.get_stats() if self.speculative_queue else {}
+    
+    async def _produce_speculative_event(self, category: str, sentiment: str,
+                                         protagonist_state: Dict, stage_config: Dict) -> SpeculativeEvent:
+        """按生成时的状态快照预生成一个事件（只生成文本，影响分数在取用时计算）"""
+        context = self._build_current_context(category, sentiment, protagonist_state, stage_config)
+        event, participants, pattern = await self._produce_traditional_event(category, sentiment, context)
+        return SpeculativeEvent(event, participants, pattern, state_snapshot(protagonist_state))
+    
+    async def _produce_traditional_event(self, category: str, sentiment: str,
+                                         context: Dict) -> Tuple[str, List[str], Dict]:
+        """传统方法生成事件文本，返回 (事件, 参与者, 基础模式)"""
         # 选择基础模板模式
         base_pattern = self.template_analyzer.select_best_pattern(category, sentiment, context)
         
+        # 优先从离线语料库抽样（语料包含原模板和扩展模板，本地查找，无LLM调用）
+        corpus_template = self.event_corpus.sample(category, sentiment) if self.event_corpus else None
+        
+        if corpus_template:
+            base_pattern = self.template_analyzer._analyze_single_template(corpus_template, category, sentiment)
+            generated_event = self._rule_based_generation(base_pattern, context)
         # 发散生成新事件
-        if self.ai_client and random.random() < 0.7:  # 70%概率使用AI发散
+        elif self.ai_client and random.random() < 0.7:  # 70%概率使用AI发散
             generated_event = await self.divergent_generator.generate_from_pattern(
                 base_pattern, context, self.generation_rules
             )
@@ -290,8 +358,26 @@ class EventGenerator:
         # 逻辑验证和修正
         validated_event = self.logic_validator.validate_and_fix(generated_event, context)
         
-        # 提取参与者和计算影响
-        participants = self._extract_participants(validated_event)
+        return validated_event, self._extract_participants(validated_event), base_pattern
+    
+    async def _generate_traditional_event(self, category: str, sentiment: str, 
+                                        context: Dict, stage_config: Dict) -> Tuple[str, List[str], int]:
+        """传统事件生成方法（优先取用仍然有效的预生成事件）"""
+        speculative = None
+        if self.speculative_queue:
+            speculative = await self.speculative_queue.take(category, sentiment, context["protagonist_state"],
+                                                            stage_config)
+        
+        if speculative:
+            validated_event, participants, base_pattern = (
+                speculative.description, speculative.participants, speculative.pattern
+            )
+        else:
+            validated_event, participants, base_pattern = await self._produce_traditional_event(
+                category, sentiment, context
+            )
+        
+        # 影响分数始终按当前状态计算（推测事件在此重新评分）
         impact_score = self._calculate_impact_score(sentiment, context["protagonist_state"], stage_config)
         
         # 记录生成历史
@@ -301,7 +387,8 @@ class EventGenerator:
             "category": category,
             "sentiment": sentiment,
             "timestamp": datetime.now(),
-            "llm_enhanced": False
+            "llm_enhanced": False,
+            "speculative": speculative is not None
         })
         
         return validated_event, participants, impact_score
@@ -540,18 +627,42 @@ class EventGenerator:
             
         return max(-10, min(10, score))
     
+    def evaluate_conditional_events(self, protagonist_state: Dict, day: Optional[int] = None) -> List[str]:
+        """
+        一次性求值全部条件事件，返回当前满足条件的名称
+
+        给出day时再按各条件的冷却天数和触发概率筛选，只返回今天实际触发的条件
+        """
+        triggered = self.conditional_rules.evaluate(protagonist_state)
+        if day is None:
+            return triggered
+        return self.conditional_rules.select_triggered(triggered, day)
+    
     async def generate_conditional_event(self, 
                                        condition_name: str, 
                                        condition_config: Dict, 
-                                       protagonist_state: Dict) -> Optional[Tuple[str, List[str], int]]:
+                                       protagonist_state: Dict,
+                                       condition_checked: bool = False) -> Optional[Tuple[str, List[str], int]]:
         """
         生成条件事件 - 根据主角状态触发特定条件事件
+        
+        Args:
+            condition_checked: 调用方已通过evaluate_conditional_events确认条件满足时为True
         """
         try:
             # 检查条件是否满足
-            condition_func = condition_config.get("condition")
-            if not condition_func or not condition_func(protagonist_state):
-                return None
+            if not condition_checked:
+                condition_func = condition_config.get("condition")
+                if callable(condition_func):
+                    if not condition_func(protagonist_state):
+                        return None
+                elif condition_name in self.conditional_rules.by_name:
+                    if not self.conditional_rules.is_satisfied(condition_name, protagonist_state):
+                        return None
+                else:
+                    compiled = ConditionalRuleTable.compile({condition_name: condition_config})
+                    if not compiled.evaluate(protagonist_state):
+                        return None
             
             # 获取可用事件模板
             available_events = condition_config.get("events", [])
@@ -559,8 +670,9 @@ class EventGenerator:
                 self.logger.warning(f"条件事件 {condition_name} 没有可用的事件模板")
                 return None
             
-            # 随机选择一个事件模板
-            selected_template = random.choice(available_events)
+            # 优先从离线语料库抽样，否则随机选择一个事件模板
+            corpus_template = self.event_corpus.sample_conditional(condition_name) if self.event_corpus else None
+            selected_template = corpus_template or random.choice(available_events)
             
             # 构建生成上下文
             context = {
@@ -589,7 +701,7 @@ class EventGenerator:
             }
             
             # 生成事件
-            if self.ai_client and random.random() < 0.5:  # 50%概率使用AI
+            if not corpus_template and self.ai_client and random.random() < 0.5:  # 50%概率使用AI
                 generated_event = await self.divergent_generator.generate_from_pattern(
                     pattern, context, self.generation_rules
                 )
@@ -660,18 +772,21 @@ class EventGenerator:
         return max(-10, base_score)
     
     def get_event_variety_score(self) -> float:
-        """计算事件多样性分数"""
+        """
+        计算事件多样性分数
+        
+        以MinHash+LSH把近重复的事件文本归为一簇，分数 = 簇数 / 事件数 * 100，
+        反复出现的同一事件（即使换了个别词）会拉低分数。
+        """
         if not self.event_history:
             return 0.0
         
-        # 统计不同类别的事件数量
-        categories = [event.get("category", "unknown") for event in self.event_history]
-        unique_categories = len(set(categories))
-        total_events = len(categories)
+        index = NearDuplicateIndex(threshold=self.llm_config.get("llm_integration", {}).get(
+            "event_generation", {}).get("template_similarity_threshold", 0.8))
+        for event in self.event_history:
+            index.add(event.get("event", ""))
         
-        # 计算多样性分数
-        variety_score = (unique_categories / max(1, total_events)) * 100
-        return round(variety_score, 2)
+        return round(index.variety_ratio() * 100, 2)
 
 
 class TemplateAnalyzer:
@@ -681,17 +796,32 @@ class TemplateAnalyzer:
         self.event_templates = event_templates
         self.character_mapping = character_mapping
         
-    def analyze_patterns(self) -> List[Dict]:
-        """分析模板模式"""
-        patterns = []
+        # 预计算索引：构造时分析一次，之后按 (类别, 情感) / 类别 直接取用
+        self._patterns: List[Dict] = []
+        self._by_key: Dict[Tuple[str, str], List[Dict]] = {}
+        self._by_category: Dict[str, List[Dict]] = {}
+        self._build_index()
+    
+    def _build_index(self):
+        """分析全部模板并建立索引"""
+        self._patterns = []
+        self._by_key = {}
+        self._by_category = {}
         
         for category, sentiments in self.event_templates.items():
             for sentiment, templates in sentiments.items():
                 for template in templates:
-                    pattern = self._analyze_single_template(template, category, sentiment)
-                    patterns.append(pattern)
-        
-        return patterns
+                    self._index_pattern(self._analyze_single_template(template, category, sentiment))
+    
+    def _index_pattern(self, pattern: Dict):
+        """把单个模式加入索引"""
+        self._patterns.append(pattern)
+        self._by_key.setdefault((pattern["category"], pattern["sentiment"]), []).append(pattern)
+        self._by_category.setdefault(pattern["category"], []).append(pattern)
+    
+    def analyze_patterns(self) -> List[Dict]:
+        """分析模板模式（返回预计算结果）"""
+        return list(self._patterns)
     
     def _analyze_single_template(self, template: str, category: str, sentiment: str) -> Dict:
         """分析单个模板"""
@@ -760,24 +890,14 @@ class TemplateAnalyzer:
     
     def select_best_pattern(self, category: str, sentiment: str, context: Dict) -> Dict:
         """选择最佳模板模式"""
-        # 过滤匹配的模式
-        matching_patterns = [
-            p for p in self.analyze_patterns()
-            if p["category"] == category and p["sentiment"] == sentiment
-        ]
-        
-        if not matching_patterns:
-            # 退而求其次，只匹配类别
-            matching_patterns = [
-                p for p in self.analyze_patterns()
-                if p["category"] == category
-            ]
-        
-        if not matching_patterns:
-            # 最后兜底
-            matching_patterns = self.analyze_patterns()
+        # 精确匹配 -> 只匹配类别 -> 全部模式 的顺序取预建索引
+        if (category, sentiment) in self._by_key:
+            matching_patterns = self._by_key[(category, sentiment)]
+        elif category in self._by_category:
+            matching_patterns = self._by_category[category]
+        else:
+            matching_patterns = self._patterns
         
-        # 简单选择策略：随机选择
         return random.choice(matching_patterns) if matching_patterns else {
             "template": "{protagonist}度过了平凡的一天",
             "category": category,
@@ -872,17 +992,9 @@ class LogicValidator:
         age = context.get("character_context", {}).get("protagonist_age", 17)
         
         if age <= 18:
-            # 禁止的成年人内容 - 更全面的检查
-            forbidden_adult_content = [
-                "结婚", "离婚", "妻子", "丈夫", "老婆", "老公", "儿子", "女儿", "孩子",
-                "工作", "下班", "上班", "同事", "老板", "员工", "职场", "薪水", "工资",
-                "办公室", "会议室", "公司", "写字楼", "商务", "客户", "出差", "加班"
-            ]
-            
-            # 检查是否包含任何禁止内容
-            for forbidden in forbidden_adult_content:
-                if forbidden in event:
-                    return False
+            # 禁止的成年人内容（共享关键词表 age_check.adult_content）
+            if get_keyword_matcher().has_any(event, "age_check.adult_content"):
+                return False
         
         return True
     
@@ -11,18 +11,20 @@ from datetime import datetime
 
 from models.psychology_models import LifeEvent, PsychologicalState, CognitiveAffectiveState
 from core.llm_psychological_assessor import LLMPsychologicalAssessor, LLMPsychologicalImpact
+from core.keyword_matcher import get_keyword_matcher
+from models.surrogate_model import get_assessment_recorder, state_features
 
 
 class HybridImpactCalculator:
     """混合影响计算器 - 规则+LLM+概率性+非线性"""
     
-    def __init__(self, ai_client, config: Dict = None):
+    def __init__(self, ai_client, config: Dict = None, llm_assessor: LLMPsychologicalAssessor = None):
         self.ai_client = ai_client
         self.config = config or {}
         self.logger = logging.getLogger(__name__)
         
-        # 初始化LLM评估器
-        self.llm_assessor = LLMPsychologicalAssessor(ai_client)
+        # 初始化LLM评估器（可传入共享实例，见LLMComponentRegistry）
+        self.llm_assessor = llm_assessor or LLMPsychologicalAssessor(ai_client)
         
         # 影响计算配置
         self.rule_weight = self.config.get("rule_weight", 0.6)  # 规则权重
@@ -87,11 +89,15 @@ class HybridImpactCalculator:
                 "hybrid_impact": hybrid_impact,
                 "probabilistic_impact": probabilistic_impact,
                 "final_impact": final_impact,
+                "state": state_features(current_state),
                 "context": context or {}
             }
             
             self.calculation_history.append(calculation_record)
             self._maintain_history_size()
+            if not self.llm_assessor.is_default_assessment(llm_assessment):
+                get_assessment_recorder().record_assessor_result(
+                    event, calculation_record["state"], calculation_record["llm_assessment"], "hybrid_calculator")
             
             self.logger.debug(f"综合影响计算完成: {final_impact['total_impact']:.2f}")
             
@@ -136,25 +142,22 @@ class HybridImpactCalculator:
                                        current_state: PsychologicalState) -> Dict:
         """基于规则的CAD状态影响计算"""
         
-        event_desc = event.description.lower()
+        matched = get_keyword_matcher().match(event.description)
         impact = event.impact_score
         
         # 自我信念影响关键词
-        self_keywords = ["批评", "失败", "成绩", "表现", "能力", "聪明", "笨", "优秀"]
         self_belief_impact = 0.0
-        if any(keyword in event_desc for keyword in self_keywords):
+        if "hybrid_rules.self_belief" in matched:
             self_belief_impact = impact * 0.4
         
         # 世界信念影响关键词
-        world_keywords = ["霸凌", "孤立", "拒绝", "友善", "帮助", "支持", "关心"]
         world_belief_impact = 0.0
-        if any(keyword in event_desc for keyword in world_keywords):
+        if "hybrid_rules.world_belief" in matched:
             world_belief_impact = impact * 0.3
         
         # 未来信念影响关键词
-        future_keywords = ["希望", "绝望", "未来", "梦想", "目标", "机会", "可能"]
         future_belief_impact = 0.0
-        if any(keyword in event_desc for keyword in future_keywords):
+        if "hybrid_rules.future_belief" in matched:
             future_belief_impact = impact * 0.2
         
         # 认知加工影响
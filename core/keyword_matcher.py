@@ -0,0 +1,154 @@
+"""
+共享关键词匹配器
+把各模块使用的关键词表（CAD规则、CBT触发词、社交事件、年龄适当性、违禁词、
+恢复事件类型、治疗对话指标等）一次性编译成Aho-Corasick自动机，
+对一段文本只扫描一遍即可得到所有命中的关键词类别。
+"""
+
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, FrozenSet, Iterable, List, Optional
+
+def flatten_keyword_sets(keyword_sets: Dict[str, Dict[str, List[str]]]) -> Dict[str, List[str]]:
+    """把 {分组: {名称: 关键词}} 展平为 {"分组.名称": 关键词}"""
+    flat = {}
+    for group, sets in keyword_sets.items():
+        if not isinstance(sets, dict):
+            continue
+        for name, keywords in sets.items():
+            if isinstance(keywords, list):
+                flat[f"{group}.{name}"] = [str(k) for k in keywords if k]
+    return flat
+
+
+class KeywordMatcher:
+    """Aho-Corasick多模式关键词匹配器（不区分大小写）"""
+
+    def __init__(self, keyword_sets: Dict[str, Iterable[str]], cache_size: int = 2048):
+        """
+        Args:
+            keyword_sets: {类别: 关键词列表}
+            cache_size: 最近匹配结果缓存条数（同一事件描述常在多个模块中被重复匹配）
+        """
+        self.keyword_sets: Dict[str, FrozenSet[str]] = {
+            category: frozenset(k.lower() for k in keywords if k)
+            for category, keywords in keyword_sets.items()
+        }
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[str]] = [[]]
+        self._keyword_categories: Dict[str, List[str]] = {}
+        self._cache: "OrderedDict[str, Dict[str, FrozenSet[str]]]" = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+        self._build()
+
+    def _build(self):
+        """构建字典树和失败指针"""
+        for category, keywords in self.keyword_sets.items():
+            for keyword in keywords:
+                self._keyword_categories.setdefault(keyword, []).append(category)
+
+        for keyword in self._keyword_categories:
+            node = 0
+            for char in keyword:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                node = next_node
+            self._output[node].append(keyword)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def find_keywords(self, text: str) -> FrozenSet[str]:
+        """扫描一遍文本，返回命中的全部关键词"""
+        found = set()
+        node = 0
+        for char in (text or "").lower():
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            if self._output[node]:
+                found.update(self._output[node])
+        return frozenset(found)
+
+    def match(self, text: str) -> Dict[str, FrozenSet[str]]:
+        """返回 {命中的类别: 命中的关键词}（结果有缓存，不要修改）"""
+        text = text or ""
+        with self._lock:
+            cached = self._cache.get(text)
+            if cached is not None:
+                self._cache.move_to_end(text)
+                return cached
+
+        result: Dict[str, set] = {}
+        for keyword in self.find_keywords(text):
+            for category in self._keyword_categories[keyword]:
+                result.setdefault(category, set()).add(keyword)
+        frozen = {category: frozenset(keywords) for category, keywords in result.items()}
+
+        with self._lock:
+            self._cache[text] = frozen
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return frozen
+
+    def categories(self, text: str) -> FrozenSet[str]:
+        """命中的全部类别"""
+        return frozenset(self.match(text))
+
+    def has_any(self, text: str, category: str) -> bool:
+        """文本是否命中某个类别"""
+        return category in self.match(text)
+
+    def count(self, text: str, category: str) -> int:
+        """文本命中某个类别中不同关键词的个数"""
+        return len(self.match(text).get(category, ()))
+
+    def keywords(self, category: str) -> List[str]:
+        """获取某个类别的关键词"""
+        return sorted(self.keyword_sets.get(category, ()))
+
+
+# 单例模式的共享匹配器
+_keyword_matcher: Optional[KeywordMatcher] = None
+_matcher_lock = threading.Lock()
+
+
+def _load_configured_keyword_sets() -> Dict[str, List[str]]:
+    """加载 config/keyword_sets.json（关键词表只在此文件中维护，缺失或格式错误时直接报错）"""
+    from config.config_loader import get_config_loader
+    keyword_sets = flatten_keyword_sets(get_config_loader().load_keyword_sets())
+    if not keyword_sets:
+        raise ValueError("关键词配置 config/keyword_sets.json 中没有任何关键词表")
+    return keyword_sets
+
+
+def get_keyword_matcher() -> KeywordMatcher:
+    """获取全局关键词匹配器（首次调用时编译全部关键词表）"""
+    global _keyword_matcher
+    if _keyword_matcher is None:
+        with _matcher_lock:
+            if _keyword_matcher is None:
+                _keyword_matcher = KeywordMatcher(_load_configured_keyword_sets())
+    return _keyword_matcher
+
+
+def reset_keyword_matcher():
+    """丢弃已编译的匹配器（关键词配置修改后重新编译）"""
+    global _keyword_matcher
+    with _matcher_lock:
+        _keyword_matcher = None
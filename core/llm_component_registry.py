@@ -0,0 +1,107 @@
+"""
+LLM增强组件注册表
+进程内共享的LLM增强配置和组件：配置只读取一次，昂贵的共享组件
+（LLM评估器、LLM事件生成器）按AI客户端复用；带有个体历史的组件
+（混合影响计算器、积极影响管理器）为每个agent单独创建，但共享上述组件和配置。
+"""
+
+import copy
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config.config_loader import get_config_loader
+
+
+class LLMComponentRegistry:
+    """LLM增强组件注册表（单例）"""
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._config: Optional[Dict[str, Any]] = None
+        # {id(ai_client): (ai_client, 组件)}，保存客户端引用避免id复用导致错配
+        self._assessors: Dict[int, Tuple[Any, Any]] = {}
+        self._event_generators: Dict[int, Tuple[Any, Any]] = {}
+
+    # ---- 配置 ----
+
+    def get_config(self) -> Dict[str, Any]:
+        """获取LLM增强配置（首次调用时从config目录读取）"""
+        if self._config is None:
+            with self._lock:
+                if self._config is None:
+                    self._config = get_config_loader().load_llm_enhancement_config() or {}
+        return self._config
+
+    def get_section(self, section: str) -> Dict[str, Any]:
+        """获取配置中的某个部分（返回副本，避免调用方修改共享配置）"""
+        return copy.deepcopy(self.get_config().get(section, {}))
+
+    def is_enabled(self, *path: str) -> bool:
+        """按路径判断功能是否启用，如 is_enabled("llm_integration", "event_generation")"""
+        node: Any = self.get_config()
+        for key in path:
+            if not isinstance(node, dict):
+                return False
+            node = node.get(key, {})
+        return bool(node.get("enabled", False)) if isinstance(node, dict) else False
+
+    # ---- 共享组件 ----
+
+    def _get_shared(self, cache: Dict[int, Tuple[Any, Any]], ai_client, factory: Callable[[], Any]):
+        """按AI客户端获取或创建共享组件"""
+        entry = cache.get(id(ai_client))
+        if entry is None or entry[0] is not ai_client:
+            with self._lock:
+                entry = cache.get(id(ai_client))
+                if entry is None or entry[0] is not ai_client:
+                    entry = (ai_client, factory())
+                    cache[id(ai_client)] = entry
+        return entry[1]
+
+    def get_assessor(self, ai_client):
+        """获取共享的LLM心理评估器（每个AI客户端一个）"""
+        from core.llm_psychological_assessor import LLMPsychologicalAssessor
+        return self._get_shared(self._assessors, ai_client,
+                                lambda: LLMPsychologicalAssessor(ai_client))
+
+    def get_llm_event_generator(self, ai_client):
+        """获取共享的LLM事件生成器（场景模板只加载一次）"""
+        from core.llm_event_generator import LLMEventGenerator
+        return self._get_shared(self._event_generators, ai_client,
+                                lambda: LLMEventGenerator(ai_client))
+
+    # ---- 个体组件 ----
+
+    def create_hybrid_calculator(self, ai_client):
+        """为单个agent创建混合影响计算器（独立计算历史，共享评估器和配置）"""
+        from core.hybrid_impact_calculator import HybridImpactCalculator
+        return HybridImpactCalculator(
+            ai_client,
+            self.get_section("hybrid_calculation"),
+            llm_assessor=self.get_assessor(ai_client)
+        )
+
+    def create_positive_impact_manager(self):
+        """为单个agent创建积极影响管理器（独立恢复轨迹，共享配置）"""
+        from core.positive_impact_manager import PositiveImpactManager
+        return PositiveImpactManager(self.get_section("bidirectional_impact"))
+
+    def reset(self):
+        """清空注册表（配置文件修改后重新加载）"""
+        with self._lock:
+            self._config = None
+            self._assessors.clear()
+            self._event_generators.clear()
+
+
+# 单例模式的组件注册表
+_component_registry = None
+
+def get_llm_component_registry() -> LLMComponentRegistry:
+    """获取全局LLM增强组件注册表"""
+    global _component_registry
+    if _component_registry is None:
+        _component_registry = LLMComponentRegistry()
+    return _component_registry
@@ -13,6 +13,10 @@ from datetime import datetime
 from pathlib import Path
 
 from models.psychology_models import LifeEvent, EventType
+from config.config_loader import get_config_loader
+from core.llm_component_registry import get_llm_component_registry
+from core.near_duplicate_index import NearDuplicateIndex
+from core.keyword_matcher import get_keyword_matcher
 
 
 class LLMEventGenerator:
@@ -32,6 +36,11 @@ class LLMEventGenerator:
         self.generation_history = []
         self.quality_threshold = 0.7
         self.generation_probability = 0.3  # 30%概率使用LLM生成
+        self.similarity_threshold = get_llm_component_registry().get_config().get(
+            "llm_integration", {}).get("event_generation", {}).get("template_similarity_threshold", 0.8)
+        
+        # 按 (场景, 类别) 维护的近重复索引，用于模板查重和多样性统计
+        self._dedup_indexes: Dict[Tuple[str, str], NearDuplicateIndex] = {}
         
         # 加载配置
         self._load_scenario_configs()
@@ -40,7 +49,7 @@ class LLMEventGenerator:
     
     def _load_scenario_configs(self):
         """加载所有scenario配置文件"""
-        scenarios_dir = Path("/Users/zl_24/Documents/Codes/2025/2025-07/CAD-main/config/scenarios")
+        scenarios_dir = get_config_loader().scenarios_dir
         
         if not scenarios_dir.exists():
             self.logger.warning(f"scenarios目录不存在: {scenarios_dir}")
@@ -117,7 +126,8 @@ class LLMEventGenerator:
             new_templates = self._parse_generated_templates(response)
             
             # 质量验证
-            validated_templates = self._validate_templates(new_templates, base_templates)
+            validated_templates = self._validate_templates(new_templates, base_templates,
+                                                           scenario_name, category)
             
             self.logger.info(f"生成并验证了{len(validated_templates)}个新模板 ({category}-{sentiment})")
             return validated_templates
@@ -200,17 +210,36 @@ class LLMEventGenerator:
         
         return templates
     
-    def _validate_templates(self, new_templates: List[str], base_templates: List[str]) -> List[str]:
-        """验证生成的模板质量"""
+    def get_dedup_index(self, scenario_name: Optional[str], category: str,
+                        seed_templates: Optional[List[str]] = None) -> NearDuplicateIndex:
+        """获取 (场景, 类别) 的近重复索引，首次使用时以该类别的现有模板初始化"""
+        key = (scenario_name or "default", category)
+        index = self._dedup_indexes.get(key)
+        if index is None:
+            index = NearDuplicateIndex(threshold=self.similarity_threshold)
+            for templates in self.event_templates.get(scenario_name, {}).get(category, {}).values():
+                for template in templates:
+                    index.add(template, key=template)
+            self._dedup_indexes[key] = index
+        for template in seed_templates or []:
+            index.add(template, key=template)
+        return index
+    
+    def _validate_templates(self, new_templates: List[str], base_templates: List[str],
+                            scenario_name: str = None, category: str = None) -> List[str]:
+        """验证生成的模板质量（通过的模板加入索引，同批次内也互相查重）"""
+        dedup_index = self.get_dedup_index(scenario_name, category or "default", base_templates)
         validated = []
         
         for template in new_templates:
-            if self._is_template_valid(template, base_templates):
+            if self._is_template_valid(template, base_templates, dedup_index):
                 validated.append(template)
+                dedup_index.add(template, key=template)
         
         return validated
     
-    def _is_template_valid(self, template: str, base_templates: List[str]) -> bool:
+    def _is_template_valid(self, template: str, base_templates: List[str],
+                           dedup_index: Optional[NearDuplicateIndex] = None) -> bool:
         """检查模板是否有效"""
         # 基本格式检查
         if len(template) < 10 or len(template) > 50:
@@ -220,28 +249,26 @@ class LLMEventGenerator:
         if not re.search(r'\{[a-zA-Z_]+\}', template):
             return False
         
-        # 不能与现有模板过于相似
-        for base in base_templates:
-            similarity = self._calculate_similarity(template, base)
-            if similarity > 0.8:  # 相似度过高
-                return False
+        # 不能与现有模板过于相似（MinHash+LSH近重复检查）
+        if dedup_index is None:
+            dedup_index = NearDuplicateIndex(threshold=self.similarity_threshold)
+            for base in base_templates:
+                dedup_index.add(base, key=base)
+        if dedup_index.is_duplicate(template):
+            return False
         
-        # 不能包含不当内容
-        forbidden_words = ["死", "杀", "血", "暴力", "性", "毒品"]
-        if any(word in template for word in forbidden_words):
+        # 不能包含不当内容（违禁词来自quality_control配置）
+        if get_keyword_matcher().has_any(template, "quality_control.forbidden_words"):
             return False
         
         return True
     
-    def _calculate_similarity(self, text1: str, text2: str) -> float:
-        """计算两个文本的相似度（简单实现）"""
-        words1 = set(text1)
-        words2 = set(text2)
-        
-        intersection = len(words1 & words2)
-        union = len(words1 | words2)
-        
-        return intersection / union if union > 0 else 0
+    def get_variety_statistics(self) -> Dict[str, Dict[str, Any]]:
+        """各 (场景, 类别) 模板的近重复簇统计"""
+        return {
+            f"{scenario}/{category}": index.get_stats()
+            for (scenario, category), index in self._dedup_indexes.items()
+        }
     
     async def generate_contextual_event(self, context: Dict, sentiment: str) -> Dict:
         """基于上下文生成个性化事件"""
@@ -452,7 +479,8 @@ class LLMEventGenerator:
             "llm_generated_events": llm_events,
             "llm_generation_rate": llm_events / total_events if total_events > 0 else 0,
             "loaded_scenarios": len(self.event_templates),
-            "average_event_length": self._calculate_average_event_length()
+            "average_event_length": self._calculate_average_event_length(),
+            "template_variety": self.get_variety_statistics()
         }
     
     def _calculate_average_event_length(self) -> float:
@@ -343,6 +343,11 @@ CAD状态调整（调整幅度-2.0到+2.0）：
             protective_factors=[]
         )
     
+    @staticmethod
+    def is_default_assessment(assessment: LLMPsychologicalImpact) -> bool:
+        """是否为LLM不可用时的默认评估（不是真实的LLM输出）"""
+        return "LLM评估不可用" in (assessment.risk_indicators or [])
+    
     def _record_assessment(self, event: LifeEvent, 
                          current_state: PsychologicalState,
                          assessment: LLMPsychologicalImpact,
@@ -12,6 +12,7 @@ from dataclasses import dataclass
 
 from models.psychology_models import PsychologicalState
 from core.llm_psychological_assessor import LLMPsychologicalAssessor
+from core.llm_component_registry import get_llm_component_registry
 
 
 @dataclass
@@ -40,10 +41,22 @@ class ConversationAnalysis:
 class LLMTherapyEnhancer:
     """LLM治疗增强器"""
     
-    def __init__(self, ai_client):
+    def __init__(self, ai_client, fused_response: Optional[bool] = None):
+        """
+        Args:
+            ai_client: AI客户端
+            fused_response: 是否用一次LLM调用同时完成消息分析和回应生成
+                           （None时读取llm_integration.therapy_enhancement.fused_response，默认启用）
+        """
         self.ai_client = ai_client
         self.logger = logging.getLogger(__name__)
         
+        if fused_response is None:
+            settings = get_llm_component_registry().get_section("llm_integration").get("therapy_enhancement", {})
+            fused_response = settings.get("fused_response", True)
+        self.fused_response = bool(fused_response)
+        self.response_stats = {"fused": 0, "two_step": 0, "fused_fallbacks": 0}
+        
         # 治疗技术库
         self.therapeutic_techniques = self._load_therapeutic_techniques()
         
@@ -232,31 +245,30 @@ class LLMTherapyEnhancer:
             return self._default_therapeutic_response()
         
         try:
-            # 分析患者消息中的关键信息
-            message_analysis = await self._analyze_patient_message(patient_message, patient_state)
-            
-            # 选择合适的治疗技术
-            recommended_techniques = self._select_therapeutic_techniques(
-                message_analysis, patient_state, conversation_analysis)
-            
-            # 构建回应生成prompt
-            prompt = self._build_response_generation_prompt(
-                patient_message, patient_state, dialogue_history, 
-                message_analysis, recommended_techniques)
-            
-            # 生成回应
-            response = await self.ai_client.generate_response(prompt)
+            therapeutic_response = None
+            if self.fused_response:
+                try:
+                    message_analysis, therapeutic_response, techniques_used = \
+                        await self._generate_fused_response(
+                            patient_message, patient_state, dialogue_history, conversation_analysis)
+                    self.response_stats["fused"] += 1
+                except Exception as e:
+                    self.response_stats["fused_fallbacks"] += 1
+                    self.logger.warning(f"单次调用生成治疗回应失败，改用分步生成: {e}")
             
-            # 解析回应
-            therapeutic_response = self._parse_therapeutic_response(
-                response, recommended_techniques)
+            if therapeutic_response is None:
+                message_analysis, therapeutic_response, techniques_used = \
+                    await self._generate_two_step_response(
+                        patient_message, patient_state, dialogue_history, conversation_analysis)
+                self.response_stats["two_step"] += 1
             
             # 记录回应历史
             self.therapy_responses.append({
                 "timestamp": datetime.now(),
                 "patient_message": patient_message,
+                "message_analysis": message_analysis,
                 "response": therapeutic_response,
-                "techniques_used": recommended_techniques
+                "techniques_used": techniques_used
             })
             
             return therapeutic_response
@@ -265,6 +277,147 @@ class LLMTherapyEnhancer:
             self.logger.error(f"生成治疗回应失败: {e}")
             return self._default_therapeutic_response()
     
+    async def _generate_two_step_response(self, patient_message: str,
+                                        patient_state: PsychologicalState,
+                                        dialogue_history: List[Dict],
+                                        conversation_analysis: ConversationAnalysis = None
+                                        ) -> Tuple[Dict, TherapeuticResponse, List[str]]:
+        """分步生成：先分析患者消息并选择技术，再按技术生成回应（两次LLM调用）"""
+        # 分析患者消息中的关键信息
+        message_analysis = await self._analyze_patient_message(patient_message, patient_state)
+        
+        # 选择合适的治疗技术
+        recommended_techniques = self._select_therapeutic_techniques(
+            message_analysis, patient_state, conversation_analysis)
+        
+        # 构建回应生成prompt
+        prompt = self._build_response_generation_prompt(
+            patient_message, patient_state, dialogue_history, 
+            message_analysis, recommended_techniques)
+        
+        # 生成回应
+        response = await self.ai_client.generate_response(prompt)
+        
+        # 解析回应
+        therapeutic_response = self._parse_therapeutic_response(
+            response, recommended_techniques)
+        return message_analysis, therapeutic_response, recommended_techniques
+    
+    async def _generate_fused_response(self, patient_message: str,
+                                     patient_state: PsychologicalState,
+                                     dialogue_history: List[Dict],
+                                     conversation_analysis: ConversationAnalysis = None
+                                     ) -> Tuple[Dict, TherapeuticResponse, List[str]]:
+        """
+        单次生成：一次LLM调用同时返回消息分析和治疗回应，
+        再在本地按分析结果选择治疗技术；结果无法解析时抛出异常，由调用方改用分步生成。
+        返回的技术列表为回应实际采用的技术（LLM未给出时为本地选择的技术）
+        """
+        prompt = self._build_fused_response_prompt(patient_message, patient_state, dialogue_history)
+        response = await self.ai_client.generate_response(prompt)
+        
+        data = json.loads(self._extract_json_text(response))
+        message_analysis = data.get("message_analysis")
+        response_data = data.get("response")
+        if not isinstance(message_analysis, dict) or not isinstance(response_data, dict) \
+                or not str(response_data.get("content", "")).strip():
+            raise ValueError("缺少message_analysis或response字段")
+        
+        # 技术选择是规则判断，不需要单独的LLM调用
+        recommended_techniques = self._select_therapeutic_techniques(
+            message_analysis, patient_state, conversation_analysis)
+        
+        therapeutic_response = TherapeuticResponse(
+            content=str(response_data["content"]).strip(),
+            response_type=response_data.get("response_type", "supportive"),
+            therapeutic_techniques=response_data.get("therapeutic_techniques") or recommended_techniques,
+            expected_impact=response_data.get("expected_impact", {}),
+            confidence=self._clamp_value(response_data.get("confidence", 0.5), 0.0, 1.0),
+            reasoning=response_data.get("reasoning", "")
+        )
+        return message_analysis, therapeutic_response, therapeutic_response.therapeutic_techniques
+    
+    def _build_fused_response_prompt(self, patient_message: str,
+                                   patient_state: PsychologicalState,
+                                   dialogue_history: List[Dict]) -> str:
+        """构建单次调用的分析+回应prompt"""
+        
+        # 可用治疗技术（由模型按消息分析自行选用）
+        technique_descriptions = "\n".join(
+            f"- {tech}: {info['description']}" for tech, info in self.therapeutic_techniques.items()
+        )
+        
+        # 对话上下文
+        context = "\n".join([
+            f"{item.get('speaker', '未知')}: {item.get('content', '')}"
+            for item in dialogue_history[-5:]  # 最近5轮对话
+        ])
+        
+        prompt = f"""
+你是一位专业的心理治疗师。请先分析患者的消息，再基于分析结果为患者提供治疗性回应。
+
+患者消息："{patient_message}"
+
+患者状态：
+- 抑郁程度：{patient_state.depression_level.name}
+- 压力水平：{patient_state.stress_level}/10
+- 自尊水平：{patient_state.self_esteem}/10
+
+对话上下文：
+{context}
+
+可用的治疗技术：
+{technique_descriptions}
+
+第一步，分析消息：主要情感及强度（0-10）、关键主题、认知模式、行为提及、风险信号。
+第二步，生成治疗性回应，要求：
+1. 体现共情和理解
+2. 根据分析选用最合适的1-2种治疗技术
+3. 避免给出直接建议，而是引导思考
+4. 长度适中（50-100字）
+5. 语调温和、专业
+
+输出JSON格式：
+{{
+  "message_analysis": {{
+    "emotional_intensity": 数值,
+    "primary_emotion": "情感类型",
+    "key_themes": ["主题1", "主题2"],
+    "cognitive_patterns": ["模式1", "模式2"],
+    "behavioral_mentions": ["行为1", "行为2"],
+    "risk_signals": ["风险1", "风险2"]
+  }},
+  "response": {{
+    "content": "回应内容",
+    "response_type": "supportive/challenging/educational/exploratory",
+    "therapeutic_techniques": ["使用的技术1", "技术2"],
+    "expected_impact": {{
+      "emotional_support": 0.0-1.0,
+      "insight_promotion": 0.0-1.0,
+      "behavioral_change": 0.0-1.0
+    }},
+    "confidence": 0.0-1.0,
+    "reasoning": "选择这种回应的理由"
+  }}
+}}
+"""
+        
+        return prompt.strip()
+    
+    @staticmethod
+    def _extract_json_text(response: str) -> str:
+        """清理响应文本并截取JSON部分"""
+        clean_response = str(response or "").strip()
+        if clean_response.startswith("```json"):
+            clean_response = clean_response[7:]
+        if clean_response.endswith("```"):
+            clean_response = clean_response[:-3]
+        clean_response = clean_response.strip()
+        
+        if '{' in clean_response and '}' in clean_response:
+            clean_response = clean_response[clean_response.find('{'):clean_response.rfind('}') + 1]
+        return clean_response
+    
     async def _analyze_patient_message(self, message: str, 
                                      patient_state: PsychologicalState) -> Dict:
         """分析患者消息"""
@@ -542,7 +695,8 @@ class LLMTherapyEnhancer:
                 "total_conversation_analyses": 0,
                 "total_therapeutic_responses": total_responses,
                 "average_therapeutic_alliance": 0.0,
-                "most_used_techniques": []
+                "most_used_techniques": [],
+                "response_generation": self.get_response_stats()
             }
         
         # 计算平均治疗联盟强度
@@ -563,5 +717,12 @@ class LLMTherapyEnhancer:
             "total_therapeutic_responses": total_responses,
             "average_therapeutic_alliance": round(avg_alliance, 2),
             "most_used_techniques": [technique for technique, count in most_used],
-            "technique_usage": technique_counts
-        }
\ No newline at end of file
+            "technique_usage": technique_counts,
+            "response_generation": self.get_response_stats()
+        }
+    
+    def get_response_stats(self) -> Dict:
+        """获取治疗回应生成方式的统计（单次调用/分步生成/单次调用失败回退）"""
+        stats = dict(self.response_stats)
+        stats["mode"] = "fused" if self.fused_response else "two_step"
+        return stats
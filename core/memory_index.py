@@ -0,0 +1,173 @@
+"""
+角色记忆检索索引
+基于中文字符二元组的BM25相关性，结合时间远近和事件影响强度进行加权，
+为提示词挑选最相关的少量历史记忆，而不是简单截取最近N条。
+"""
+
+import math
+import re
+from collections import Counter, OrderedDict
+from itertools import islice
+from typing import Any, Dict, List, Optional, Tuple
+
+# 单独出现时几乎不携带语义的常见汉字
+_STOP_CHARS = set("的了是在我你他她它们这那就也都和与及而吗呢吧啊呀哦")
+
+_CJK_RUN = re.compile(r"[\u4e00-\u9fff]+")
+_WORD = re.compile(r"[A-Za-z0-9_]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """中文按字符二元组切分，英文数字按单词切分"""
+    if not text:
+        return []
+
+    tokens = []
+    for run in _CJK_RUN.findall(text):
+        if len(run) == 1:
+            if run not in _STOP_CHARS:
+                tokens.append(run)
+            continue
+        for i in range(len(run) - 1):
+            bigram = run[i:i + 2]
+            if bigram[0] in _STOP_CHARS and bigram[1] in _STOP_CHARS:
+                continue
+            tokens.append(bigram)
+    tokens.extend(word.lower() for word in _WORD.findall(text))
+    return tokens
+
+
+class MemoryIndex:
+    """
+    单个角色的记忆索引
+
+    每条记忆包含：用于检索的文本、原始载荷（如事件字典）和影响强度。
+    综合得分 = 相关性权重 * 归一化BM25 + 时间权重 * 指数衰减 + 影响权重 * |影响|/10
+    """
+
+    def __init__(self, max_documents: int = 2000,
+                 k1: float = 1.5, b: float = 0.75,
+                 relevance_weight: float = 0.7,
+                 recency_weight: float = 0.2,
+                 impact_weight: float = 0.1,
+                 recency_half_life: float = 20.0):
+        self.max_documents = max_documents
+        self.k1 = k1
+        self.b = b
+        self.relevance_weight = relevance_weight
+        self.recency_weight = recency_weight
+        self.impact_weight = impact_weight
+        self.recency_half_life = recency_half_life
+
+        self._next_id = 0
+        self._docs: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._total_length = 0
+
+    def configure(self, config: Optional[Dict[str, Any]] = None):
+        """根据配置更新检索参数（只覆盖已有属性）"""
+        for key, value in (config or {}).items():
+            if hasattr(self, key) and not key.startswith("_") and value is not None:
+                setattr(self, key, value)
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, payload: Any, text: str, impact: float = 0.0) -> int:
+        """添加一条记忆，返回记忆ID（单调递增，可用于时间排序）"""
+        doc_id = self._next_id
+        self._next_id += 1
+
+        term_freqs = Counter(tokenize(text))
+        length = sum(term_freqs.values())
+        self._docs[doc_id] = {
+            "payload": payload,
+            "length": length,
+            "terms": term_freqs,
+            "impact": abs(float(impact or 0.0))
+        }
+        self._total_length += length
+        for term, freq in term_freqs.items():
+            self._postings.setdefault(term, {})[doc_id] = freq
+
+        while self.max_documents and len(self._docs) > self.max_documents:
+            self._evict_oldest()
+
+        return doc_id
+
+    def _evict_oldest(self):
+        """淘汰最早的记忆"""
+        doc_id, doc = self._docs.popitem(last=False)
+        self._total_length -= doc["length"]
+        for term in doc["terms"]:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[term]
+
+    def _bm25_scores(self, query_terms: List[str]) -> Dict[int, float]:
+        """计算查询词命中文档的BM25得分"""
+        scores: Dict[int, float] = {}
+        doc_count = len(self._docs)
+        if not doc_count or not query_terms:
+            return scores
+
+        avg_length = self._total_length / doc_count or 1.0
+        for term in set(query_terms):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, freq in postings.items():
+                doc_length = self._docs[doc_id]["length"]
+                norm = freq + self.k1 * (1 - self.b + self.b * doc_length / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * freq * (self.k1 + 1) / norm
+        return scores
+
+    def search_with_scores(self, query: str, top_k: int = 5) -> List[Tuple[int, float, Any]]:
+        """检索最相关的记忆，返回 (记忆ID, 综合得分, 载荷) 列表，按得分降序"""
+        if not self._docs or top_k <= 0:
+            return []
+
+        bm25 = self._bm25_scores(tokenize(query))
+        max_bm25 = max(bm25.values()) if bm25 else 0.0
+        newest_id = self._next_id - 1
+        decay = math.log(2) / self.recency_half_life if self.recency_half_life > 0 else 0.0
+
+        scored = []
+        for doc_id, doc in self._docs.items():
+            relevance = bm25.get(doc_id, 0.0) / max_bm25 if max_bm25 > 0 else 0.0
+            recency = math.exp(-decay * (newest_id - doc_id))
+            impact = min(doc["impact"], 10.0) / 10.0
+            score = (self.relevance_weight * relevance +
+                     self.recency_weight * recency +
+                     self.impact_weight * impact)
+            scored.append((doc_id, score, doc["payload"]))
+
+        scored.sort(key=lambda item: (item[1], item[0]), reverse=True)
+        return scored[:top_k]
+
+    def search(self, query: str, top_k: int = 5) -> List[Any]:
+        """检索最相关的记忆载荷，按得分降序"""
+        return [payload for _, _, payload in self.search_with_scores(query, top_k)]
+
+    def recent(self, count: int) -> List[Tuple[int, Any]]:
+        """获取最近的若干条记忆 (记忆ID, 载荷)，按时间升序"""
+        if count <= 0:
+            return []
+        doc_ids = list(islice(reversed(self._docs), count))
+        return [(doc_id, self._docs[doc_id]["payload"]) for doc_id in reversed(doc_ids)]
+
+    def retrieve_context(self, query: str, top_k: int = 5, recent_count: int = 2) -> List[Any]:
+        """
+        组合检索：保留最近几条保证对话连贯，其余名额按综合得分补充，
+        最终按时间顺序返回载荷
+        """
+        selected: Dict[int, Any] = dict(self.recent(min(recent_count, top_k)))
+        for doc_id, _, payload in self.search_with_scores(query, top_k + len(selected)):
+            if len(selected) >= top_k:
+                break
+            selected.setdefault(doc_id, payload)
+        return [selected[doc_id] for doc_id in sorted(selected)]
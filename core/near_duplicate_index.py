@@ -0,0 +1,211 @@
+"""
+近重复文本索引
+基于字符n-gram的MinHash签名 + LSH分桶：查重只比较落入同一桶的候选，
+不再与全部已有文本逐一计算相似度，适合对数万条生成事件去重和衡量多样性。
+"""
+
+import hashlib
+import random
+import re
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+# 2^61-1（梅森素数），用于通用哈希 (a*x + b) mod P
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+_PLACEHOLDER = re.compile(r'\{(\w+)\}')
+_IGNORED = re.compile(r'[\s，。！？、,.!?；;：:“”"\'（）()]+')
+
+
+def shingles(text: str, ngram: int = 2) -> Set[str]:
+    """
+    字符n-gram集合
+
+    占位符（如{protagonist}）整体视为一个符号，避免模板中的英文占位符主导相似度。
+    """
+    if not text:
+        return set()
+    symbols: List[str] = []
+    position = 0
+    for match in _PLACEHOLDER.finditer(text):
+        symbols.extend(_IGNORED.sub("", text[position:match.start()]))
+        symbols.append(match.group(0))
+        position = match.end()
+    symbols.extend(_IGNORED.sub("", text[position:]))
+
+    if len(symbols) < ngram:
+        return {"".join(symbols)} if symbols else set()
+    return {"".join(symbols[i:i + ngram]) for i in range(len(symbols) - ngram + 1)}
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    """精确Jaccard相似度"""
+    union = len(a | b)
+    return len(a & b) / union if union else 0.0
+
+
+def _hash_shingle(shingle: str) -> int:
+    """稳定的32位哈希（不受PYTHONHASHSEED影响）"""
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "little")
+
+
+class NearDuplicateIndex:
+    """
+    MinHash + LSH近重复索引
+
+    签名长度 num_perm = bands * rows；两条文本至少在一个band上完全一致才会成为候选，
+    候选再用签名估计的Jaccard与阈值比较。
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 64,
+                 bands: Optional[int] = None, ngram: int = 2, seed: int = 1):
+        self.threshold = threshold
+        self.ngram = ngram
+        self.num_perm = num_perm
+        self.bands, self.rows = self._choose_bands(threshold, num_perm, bands)
+
+        rng = random.Random(seed)
+        self._perms = [(rng.randint(1, _MERSENNE_PRIME - 1), rng.randint(0, _MERSENNE_PRIME - 1))
+                       for _ in range(self.bands * self.rows)]
+
+        self._signatures: Dict[Hashable, Tuple[int, ...]] = {}
+        self._buckets: List[Dict[Tuple[int, ...], List[Hashable]]] = [{} for _ in range(self.bands)]
+        self._parent: Dict[Hashable, Hashable] = {}
+        self._clusters = 0
+        self._next_key = 0
+
+    @staticmethod
+    def _choose_bands(threshold: float, num_perm: int, bands: Optional[int]) -> Tuple[int, int]:
+        """选择band数，使LSH的S曲线拐点 (1/b)^(1/r) 接近阈值"""
+        if bands:
+            return bands, max(1, num_perm // bands)
+        best = (1, num_perm)
+        best_error = float("inf")
+        for b in range(1, num_perm + 1):
+            if num_perm % b:
+                continue
+            r = num_perm // b
+            error = abs((1.0 / b) ** (1.0 / r) - threshold)
+            if error < best_error:
+                best, best_error = (b, r), error
+        return best
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._signatures
+
+    # ---- 签名 ----
+
+    def signature(self, text: str) -> Tuple[int, ...]:
+        """计算文本的MinHash签名"""
+        hashes = [_hash_shingle(s) for s in shingles(text, self.ngram)]
+        if not hashes:
+            return tuple([_MAX_HASH] * len(self._perms))
+        return tuple(
+            min((a * h + b) % _MERSENNE_PRIME for h in hashes) & _MAX_HASH
+            for a, b in self._perms
+        )
+
+    def _band_keys(self, signature: Tuple[int, ...]) -> List[Tuple[int, ...]]:
+        r = self.rows
+        return [signature[i * r:(i + 1) * r] for i in range(self.bands)]
+
+    @staticmethod
+    def estimate(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+        """由签名估计Jaccard相似度"""
+        if not sig_a:
+            return 0.0
+        return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+    # ---- 查询与插入 ----
+
+    def _query_signature(self, signature: Tuple[int, ...]) -> List[Tuple[Hashable, float]]:
+        candidates: Set[Hashable] = set()
+        for band, band_key in enumerate(self._band_keys(signature)):
+            candidates.update(self._buckets[band].get(band_key, ()))
+
+        matches = []
+        for key in candidates:
+            similarity = self.estimate(signature, self._signatures[key])
+            if similarity >= self.threshold:
+                matches.append((key, similarity))
+        matches.sort(key=lambda item: item[1], reverse=True)
+        return matches
+
+    def query(self, text: str) -> List[Tuple[Hashable, float]]:
+        """查找近重复文本，返回 (键, 估计相似度) 列表，按相似度降序"""
+        return self._query_signature(self.signature(text))
+
+    def is_duplicate(self, text: str) -> bool:
+        """是否与索引中的某条文本近重复"""
+        return bool(self.query(text))
+
+    def add(self, text: str, key: Optional[Hashable] = None) -> Hashable:
+        """加入一条文本（近重复的文本归入同一簇），返回键"""
+        if key is None:
+            key = self._next_key
+            self._next_key += 1
+        if key in self._signatures:
+            return key
+
+        signature = self.signature(text)
+        duplicates = self._query_signature(signature)
+
+        self._signatures[key] = signature
+        for band, band_key in enumerate(self._band_keys(signature)):
+            self._buckets[band].setdefault(band_key, []).append(key)
+
+        self._parent[key] = key
+        self._clusters += 1
+        for other, _ in duplicates:
+            self._union(key, other)
+        return key
+
+    def add_if_new(self, text: str, key: Optional[Hashable] = None) -> bool:
+        """不是近重复时加入索引并返回True，否则返回False"""
+        if self.is_duplicate(text):
+            return False
+        self.add(text, key)
+        return True
+
+    def extend(self, texts: Iterable[str]):
+        """批量加入文本"""
+        for text in texts:
+            self.add(text)
+
+    # ---- 多样性 ----
+
+    def _find(self, key: Hashable) -> Hashable:
+        root = key
+        while self._parent[root] != root:
+            root = self._parent[root]
+        while self._parent[key] != root:
+            self._parent[key], key = root, self._parent[key]
+        return root
+
+    def _union(self, a: Hashable, b: Hashable):
+        root_a, root_b = self._find(a), self._find(b)
+        if root_a != root_b:
+            self._parent[root_a] = root_b
+            self._clusters -= 1
+
+    def cluster_count(self) -> int:
+        """近重复簇数量（互为近重复的文本算作一簇）"""
+        return self._clusters
+
+    def variety_ratio(self) -> float:
+        """多样性比例：簇数 / 文本数（1.0表示没有任何近重复）"""
+        return self._clusters / len(self._signatures) if self._signatures else 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        return {
+            "documents": len(self._signatures),
+            "clusters": self._clusters,
+            "variety_ratio": round(self.variety_ratio(), 4),
+            "threshold": self.threshold,
+            "bands": self.bands,
+            "rows": self.rows
+        }
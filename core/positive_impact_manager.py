@@ -9,6 +9,7 @@ from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime, timedelta
 
 from models.psychology_models import LifeEvent, PsychologicalState, CognitiveAffectiveState
+from core.keyword_matcher import get_keyword_matcher
 
 
 class PositiveImpactManager:
@@ -96,21 +97,18 @@ class PositiveImpactManager:
     def _get_event_type_multiplier(self, event: LifeEvent) -> float:
         """根据事件类型获取恢复倍数"""
         
-        event_desc = event.description.lower()
+        matched = get_keyword_matcher().match(event.description)
         
         # 成就相关事件
-        achievement_keywords = ["成功", "完成", "获得", "表扬", "认可", "优秀", "第一"]
-        if any(keyword in event_desc for keyword in achievement_keywords):
+        if "positive_impact.achievement" in matched:
             return self.achievement_weight + 1.0
         
         # 社会支持相关事件
-        social_keywords = ["朋友", "家人", "帮助", "支持", "关心", "陪伴", "理解"]
-        if any(keyword in event_desc for keyword in social_keywords):
+        if "positive_impact.social_support" in matched:
             return self.social_support_weight + 1.0
         
         # 自我效能相关事件
-        efficacy_keywords = ["自己", "独立", "解决", "克服", "努力", "坚持", "进步"]
-        if any(keyword in event_desc for keyword in efficacy_keywords):
+        if "positive_impact.self_efficacy" in matched:
             return self.self_efficacy_weight + 1.0
         
         return 1.0  # 默认倍数
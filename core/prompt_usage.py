@@ -0,0 +1,41 @@
+"""
+提示词用量统计
+记录每个AI客户端的提示词token数，以及提供方返回的前缀缓存命中token数
+（DeepSeek: usage.prompt_cache_hit_tokens；OpenAI兼容接口: usage.prompt_tokens_details.cached_tokens；
+Gemini: usage_metadata.cached_content_token_count），用于计算前缀缓存命中率。
+"""
+
+import threading
+from typing import Any, Dict, Optional
+
+
+class PromptUsageTracker:
+    """累计提示词token和前缀缓存命中token"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stats = {
+            "requests": 0,
+            "prompt_tokens": 0,
+            "cache_reported_requests": 0,   # 提供方返回了缓存信息的请求数
+            "cache_reported_prompt_tokens": 0,
+            "cached_prompt_tokens": 0
+        }
+
+    def record(self, prompt_tokens: Optional[int], cached_tokens: Optional[int]):
+        """记录一次请求的用量（提供方没有返回的字段传None）"""
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["prompt_tokens"] += prompt_tokens or 0
+            if cached_tokens is not None:
+                self.stats["cache_reported_requests"] += 1
+                self.stats["cache_reported_prompt_tokens"] += prompt_tokens or 0
+                self.stats["cached_prompt_tokens"] += cached_tokens
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息；提供方没有返回缓存信息时命中率为None"""
+        with self._lock:
+            stats = dict(self.stats)
+        reported = stats["cache_reported_prompt_tokens"]
+        stats["prefix_cache_hit_rate"] = round(stats["cached_prompt_tokens"] / reported, 4) if reported else None
+        return stats
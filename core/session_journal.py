@@ -0,0 +1,246 @@
+"""
+治疗会话日志（journal）
+每轮对话发生时立即以JSONL追加写入（对话内容、效果分析、状态快照），每条记录写入后立即flush，
+按记录数/时间间隔批量fsync；会话正常保存时写入结束记录并压缩为原有的会话总结JSON。
+程序崩溃或浏览器关闭后，可以从日志重建治疗管理器继续会话，或直接压缩为会话总结JSON。
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from rich.console import Console
+from rich.table import Table
+
+JOURNAL_SUFFIX = ".journal.jsonl"
+DEFAULT_JOURNAL_SETTINGS = {
+    "enabled": True,
+    "fsync_every_records": 4,       # 每写入多少条记录fsync一次
+    "fsync_interval_seconds": 5.0,  # 距上次fsync超过多少秒时立即fsync
+    "keep_after_compaction": False  # 压缩为会话总结后是否保留日志文件
+}
+
+console = Console()
+logger = logging.getLogger(__name__)
+
+
+class SessionJournal:
+    """单个治疗会话的追加写入日志"""
+
+    def __init__(self, path: Union[str, Path], fsync_every_records: int = 4,
+                 fsync_interval_seconds: float = 5.0, keep_after_compaction: bool = False):
+        """
+        Args:
+            path: 日志文件路径（以 .journal.jsonl 结尾）
+            fsync_every_records: 每写入多少条记录fsync一次
+            fsync_interval_seconds: 距上次fsync超过多少秒时立即fsync
+            keep_after_compaction: 压缩为会话总结后是否保留日志文件
+        """
+        self.path = Path(path)
+        self.fsync_every_records = max(1, int(fsync_every_records))
+        self.fsync_interval_seconds = float(fsync_interval_seconds)
+        self.keep_after_compaction = keep_after_compaction
+        self._lock = threading.Lock()
+        self._file = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self.stats = {"records": 0, "fsyncs": 0}
+
+    @classmethod
+    def from_config(cls, path: Union[str, Path],
+                    journal_settings: Optional[Dict[str, Any]]) -> Optional["SessionJournal"]:
+        """按journal_settings创建；未启用时返回None"""
+        settings = dict(DEFAULT_JOURNAL_SETTINGS)
+        settings.update(journal_settings or {})
+        if not settings.get("enabled", False):
+            return None
+        return cls(path, settings["fsync_every_records"], settings["fsync_interval_seconds"],
+                   settings["keep_after_compaction"])
+
+    @staticmethod
+    def path_for(directory: Union[str, Path], session_id: str) -> Path:
+        """会话日志文件路径"""
+        return Path(directory) / f"{session_id}{JOURNAL_SUFFIX}"
+
+    # ---- 写入 ----
+
+    def record(self, record_type: str, data: Dict[str, Any], sync: bool = False):
+        """追加一条记录（写入后立即flush，按批量策略fsync）"""
+        line = json.dumps({"type": record_type, "time": datetime.now().isoformat(), "data": data},
+                          ensure_ascii=False, default=str)
+        with self._lock:
+            if self._file is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(line + "\n")
+            self._file.flush()
+            self.stats["records"] += 1
+            self._unsynced += 1
+            if (sync or self._unsynced >= self.fsync_every_records
+                    or time.monotonic() - self._last_sync >= self.fsync_interval_seconds):
+                self._fsync()
+
+    def _fsync(self):
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self.stats["fsyncs"] += 1
+
+    def sync(self):
+        """立即把已写入的记录fsync到磁盘"""
+        with self._lock:
+            if self._file is not None and self._unsynced:
+                self._fsync()
+
+    def close(self):
+        """fsync并关闭文件（会话未结束，之后仍可恢复）"""
+        with self._lock:
+            if self._file is not None:
+                if self._unsynced:
+                    self._fsync()
+                self._file.close()
+                self._file = None
+
+    def mark_compacted(self, output_path: Optional[Union[str, Path]]):
+        """会话总结已保存：写入结束记录，按设置删除日志文件"""
+        self.record("end", {"output_path": str(output_path) if output_path else None}, sync=True)
+        self.close()
+        if not self.keep_after_compaction:
+            try:
+                self.path.unlink()
+            except OSError as e:
+                logger.warning(f"删除会话日志失败 {self.path}: {e}")
+
+    # ---- 读取 ----
+
+    @staticmethod
+    def iter_records(path: Union[str, Path]) -> Iterator[Dict[str, Any]]:
+        """逐条读取日志记录（崩溃时写了一半的最后一行会被跳过）"""
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    logger.warning(f"跳过损坏的日志记录: {path}")
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> Tuple[Dict[str, Any], List[Dict[str, Any]], bool]:
+        """读取日志，返回 (开始记录的数据, 其余记录, 是否已正常结束)"""
+        start: Optional[Dict[str, Any]] = None
+        records = []
+        finished = False
+        for record in cls.iter_records(path):
+            if record.get("type") == "start" and start is None:
+                start = record.get("data", {})
+            elif record.get("type") == "end":
+                finished = True
+            else:
+                records.append(record)
+        if start is None:
+            raise ValueError(f"会话日志缺少开始记录: {path}")
+        return start, records, finished
+
+
+def find_unfinished_journals(root: Union[str, Path]) -> List[Path]:
+    """查找目录下（递归）尚未正常结束的会话日志"""
+    root = Path(root)
+    candidates = [root] if root.is_file() else sorted(root.rglob(f"*{JOURNAL_SUFFIX}"))
+    unfinished = []
+    for path in candidates:
+        try:
+            _, _, finished = SessionJournal.load(path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"无法读取会话日志 {path}: {e}")
+            continue
+        if not finished:
+            unfinished.append(path)
+    return unfinished
+
+
+def resume_session(journal_path: Union[str, Path], ai_client=None):
+    """按会话类型从日志重建治疗管理器"""
+    start, _, _ = SessionJournal.load(journal_path)
+    session_type = start.get("session_type")
+    if session_type == "human":
+        from core.therapy_session_manager import TherapySessionManager
+        return TherapySessionManager.resume_from_journal(journal_path, ai_client)
+    if session_type == "ai_to_ai":
+        from core.ai_to_ai_therapy_manager import AIToAITherapyManager
+        return AIToAITherapyManager.resume_from_journal(journal_path, ai_client)
+    if session_type == "web_ai_to_ai":
+        from core.web_therapy_manager import WebTherapyManager
+        return WebTherapyManager.resume_from_journal(journal_path, ai_client)
+    raise ValueError(f"未知的会话类型: {session_type}")
+
+
+async def compact_journal(journal_path: Union[str, Path], ai_client=None) -> Optional[Path]:
+    """把未结束的会话日志压缩为会话总结JSON（与正常结束时保存的格式相同），返回总结文件路径"""
+    manager = resume_session(journal_path, ai_client)
+    return await manager.compact_journal()
+
+
+async def _run_resumed(manager, max_turns: Optional[int]):
+    """继续被中断的会话"""
+    if hasattr(manager, "start_interactive_session"):
+        await manager.start_interactive_session(continue_session=True)
+    elif hasattr(manager, "start_ai_to_ai_therapy"):
+        await manager.start_ai_to_ai_therapy(max_turns or manager.max_turns)
+    else:
+        await manager.start_therapy_session(max_turns or manager.max_turns)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """命令行入口：列出、压缩或继续未结束的会话日志"""
+    parser = argparse.ArgumentParser(description="治疗会话日志：列出、压缩或继续未结束的会话")
+    parser.add_argument("path", nargs="?", default="logs", help="日志文件或搜索目录（默认 logs）")
+    parser.add_argument("--compact", action="store_true", help="把未结束的会话日志压缩为会话总结JSON")
+    parser.add_argument("--resume", action="store_true", help="从指定日志文件继续会话")
+    parser.add_argument("--provider", default=None, help="继续会话时使用的AI提供商")
+    parser.add_argument("--max-turns", type=int, default=None, help="继续AI-AI会话时的总轮数")
+    args = parser.parse_args(argv)
+
+    if args.resume:
+        from core.ai_client_factory import ai_client_factory
+        ai_client = ai_client_factory.get_client(args.provider)
+        manager = resume_session(args.path, ai_client)
+        asyncio.run(_run_resumed(manager, args.max_turns))
+        return 0
+
+    journals = find_unfinished_journals(args.path)
+    if not journals:
+        console.print("[green]没有未结束的会话日志。[/green]")
+        return 0
+
+    table = Table(title="未结束的会话日志")
+    table.add_column("日志文件")
+    table.add_column("类型")
+    table.add_column("已记录轮数", justify="right")
+    table.add_column("结果")
+    for path in journals:
+        start, records, _ = SessionJournal.load(path)
+        turns = sum(1 for record in records if record.get("type") == "turn")
+        result = ""
+        if args.compact:
+            try:
+                output = asyncio.run(compact_journal(path))
+                result = f"[green]{output}[/green]" if output else "[yellow]无对话可保存[/yellow]"
+            except Exception as e:
+                result = f"[red]压缩失败: {e}[/red]"
+        table.add_row(str(path), str(start.get("session_type")), str(turns), result)
+    console.print(table)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""
+AI-AI治疗会话的提前终止策略
+每轮分析完成后记录效果分数、治疗联盟、情绪状态得分和CAD状态变化，按滑动窗口判断：
+显著改善（达到目标抑郁等级或情绪状态）、恶化（效果持续低下且联盟下降，或抑郁等级明显加重）、
+平台期（效果、联盟、情绪和CAD变化的滑动平均都趋于稳定）。
+各条件由 automation_settings.auto_termination_conditions 中的开关控制，阈值见 early_stopping。
+"""
+
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional
+
+CAD_FIELDS = ("self_belief", "world_belief", "future_belief", "rumination", "distortions",
+              "social_withdrawal", "avolition", "affective_tone")
+
+DEFAULT_EARLY_STOPPING = {
+    "enabled": True,
+    "min_turns": 6,                       # 至少进行的轮数
+    "window": 3,                          # 滑动窗口轮数
+    "target_depression_level": "MILD_RISK",
+    "target_emotional_state": 7.0,
+    "plateau_effectiveness_delta": 0.5,   # 相邻窗口效果均值之差
+    "plateau_alliance_delta": 0.2,        # 窗口内治疗联盟变化
+    "plateau_emotional_delta": 0.3,       # 窗口内情绪状态得分变化
+    "plateau_cad_change": 0.05,           # 每轮CAD平均绝对变化的窗口均值
+    "deterioration_effectiveness": 3.0,   # 窗口效果均值低于此值
+    "deterioration_levels": 1             # 抑郁等级比初始加重的级数
+}
+
+
+@dataclass
+class TurnObservation:
+    """一轮分析后的会话指标"""
+    turn: int
+    effectiveness: float
+    alliance: float
+    emotional_state: float
+    cad_change: Optional[float]  # 与上一轮相比的CAD平均绝对变化（第一轮为None）
+    depression_level: Optional[str]
+
+
+def cad_change(previous: Dict[str, Any], current: Dict[str, Any]) -> Optional[float]:
+    """两个患者状态快照之间CAD各维度的平均绝对变化"""
+    prev_cad, cur_cad = (previous or {}).get("cad_state", {}), (current or {}).get("cad_state", {})
+    diffs = [abs(float(cur_cad[f]) - float(prev_cad[f])) for f in CAD_FIELDS if f in cur_cad and f in prev_cad]
+    return sum(diffs) / len(diffs) if diffs else None
+
+
+def _mean(values: List[float]) -> float:
+    return sum(values) / len(values) if values else 0.0
+
+
+class SessionStoppingPolicy:
+    """根据滑动窗口指标决定是否提前结束会话"""
+
+    def __init__(self, level_values: Dict[str, int], early_stopping: Optional[Dict[str, Any]] = None,
+                 conditions: Optional[Dict[str, bool]] = None, initial_depression_level: Optional[str] = None):
+        """
+        Args:
+            level_values: 抑郁等级名称到数值的映射（数值越大越严重）
+            early_stopping: 阈值设置（automation_settings.early_stopping）
+            conditions: 各终止条件开关（automation_settings.auto_termination_conditions）
+            initial_depression_level: 会话开始时的抑郁等级
+        """
+        self.level_values = level_values
+        self.config = dict(DEFAULT_EARLY_STOPPING)
+        self.config.update(early_stopping or {})
+        self.conditions = {"significant_improvement": True, "deterioration_detected": True, "plateau_detected": True}
+        self.conditions.update(conditions or {})
+        self.initial_depression_level = initial_depression_level
+        self.observations: List[TurnObservation] = []
+        self.stop_reason: Optional[str] = None
+        self.stop_turn: Optional[int] = None
+        self.stop_details: Dict[str, Any] = {}
+
+    @classmethod
+    def from_config(cls, automation_settings: Dict[str, Any], level_values: Dict[str, int],
+                    initial_depression_level: Optional[str] = None) -> Optional["SessionStoppingPolicy"]:
+        """按automation_settings创建；未启用时返回None"""
+        settings = automation_settings or {}
+        early_stopping = settings.get("early_stopping", {}) or {}
+        if not early_stopping.get("enabled", DEFAULT_EARLY_STOPPING["enabled"]):
+            return None
+        return cls(level_values, early_stopping, settings.get("auto_termination_conditions"), initial_depression_level)
+
+    # ---- 观测 ----
+
+    def observe(self, observation: TurnObservation) -> Optional[str]:
+        """记录一轮指标并重新判断（从会话日志恢复时按相同顺序回放）；返回终止原因（尚未满足条件时为None）"""
+        self.observations.append(observation)
+        self.observations.sort(key=lambda o: o.turn)
+        if self.stop_reason is None:
+            self._evaluate()
+        return self.stop_reason
+
+    def _evaluate(self):
+        window = max(1, int(self.config["window"]))
+        if len(self.observations) < max(int(self.config["min_turns"]), window):
+            return
+        recent = self.observations[-window:]
+        latest = recent[-1]
+        effectiveness_ma = _mean([o.effectiveness for o in recent])
+        emotional_ma = _mean([o.emotional_state for o in recent])
+
+        level = self.level_values.get(latest.depression_level)
+        initial = self.level_values.get(self.initial_depression_level)
+        target = self.level_values.get(self.config["target_depression_level"])
+
+        if self.conditions.get("significant_improvement"):
+            if level is not None and target is not None and level <= target and (initial is None or level < initial):
+                return self._stop("significant_improvement", latest, depression_level=latest.depression_level)
+            if emotional_ma >= self.config["target_emotional_state"]:
+                return self._stop("significant_improvement", latest, emotional_state_avg=round(emotional_ma, 3))
+
+        if self.conditions.get("deterioration_detected"):
+            if level is not None and initial is not None and level - initial >= self.config["deterioration_levels"]:
+                return self._stop("deterioration_detected", latest, depression_level=latest.depression_level)
+            alliance_falling = recent[-1].alliance < recent[0].alliance
+            if effectiveness_ma < self.config["deterioration_effectiveness"] and alliance_falling:
+                return self._stop("deterioration_detected", latest, effectiveness_avg=round(effectiveness_ma, 3))
+
+        if self.conditions.get("plateau_detected") and len(self.observations) >= 2 * window:
+            previous = self.observations[-2 * window:-window]
+            effectiveness_delta = abs(effectiveness_ma - _mean([o.effectiveness for o in previous]))
+            alliance_delta = abs(recent[-1].alliance - recent[0].alliance)
+            emotional_delta = max(o.emotional_state for o in recent) - min(o.emotional_state for o in recent)
+            cad_changes = [o.cad_change for o in recent if o.cad_change is not None]
+            cad_ma = _mean(cad_changes) if cad_changes else 0.0
+            if (effectiveness_delta < self.config["plateau_effectiveness_delta"]
+                    and alliance_delta < self.config["plateau_alliance_delta"]
+                    and emotional_delta < self.config["plateau_emotional_delta"]
+                    and cad_ma < self.config["plateau_cad_change"]):
+                return self._stop("plateau_detected", latest,
+                                  effectiveness_delta=round(effectiveness_delta, 3),
+                                  alliance_delta=round(alliance_delta, 3),
+                                  emotional_delta=round(emotional_delta, 3),
+                                  cad_change_avg=round(cad_ma, 4))
+
+    def _stop(self, reason: str, latest: TurnObservation, **details):
+        self.stop_reason = reason
+        self.stop_turn = latest.turn
+        self.stop_details = details
+
+    # ---- 结果 ----
+
+    def get_summary(self) -> Dict[str, Any]:
+        """会话总结中的终止判断信息"""
+        return {
+            "reason": self.stop_reason,
+            "decided_at_turn": self.stop_turn,
+            "details": dict(self.stop_details),
+            "observations": [asdict(o) for o in self.observations]
+        }
@@ -18,12 +18,18 @@ from rich.text import Text
 
 from core.ai_client_factory import ai_client_factory
 from core.event_generator import EventGenerator
+from core.bounded_history import BoundedHistory
+from core.llm_component_registry import get_llm_component_registry
+from models.surrogate_model import get_assessment_recorder, ASSESSMENT_LOG_NAME
 from models.psychology_models import (
     LifeEvent, EventType, PsychologicalState, EmotionState, 
     DepressionLevel, Relationship
 )
 from agents.base_agent import BaseAgent
 
+# 多人事件默认使用群体对话模式（与config_loader中simulation.group_dialogue的默认值一致）
+DEFAULT_GROUP_DIALOGUE = True
+
 class SimulationEngine:
     """抽象的心理健康模拟引擎"""
     
@@ -47,6 +53,10 @@ class SimulationEngine:
         self.simulation_log_dir = Path("logs") / self.simulation_id
         self.simulation_log_dir.mkdir(parents=True, exist_ok=True)
         
+        # 记录本次模拟中的LLM评估，作为代理模型的训练数据
+        if get_llm_component_registry().get_section("surrogate_model").get("record_assessments", False):
+            get_assessment_recorder().set_output(self.simulation_log_dir / ASSESSMENT_LOG_NAME)
+        
         # 加载配置 - 支持新的JSON配置系统
         if config_data:
             # 使用新的JSON配置数据
@@ -65,7 +75,13 @@ class SimulationEngine:
         self.agents: Dict[str, BaseAgent] = {}
         self.protagonist: Optional[BaseAgent] = None
         self.current_day = 1
-        self.simulation_log: List[Dict[str, Any]] = []
+        
+        # 记忆窗口配置：内存中只保留最近记录，完整历史追加写入模拟日志目录
+        self.memory_config = getattr(self.config, 'MEMORY_CONFIG', {}) or {}
+        self.simulation_log: BoundedHistory = BoundedHistory(
+            self.memory_config.get('simulation_log_window', 200),
+            spill_path=self.simulation_log_dir / "simulation_log.jsonl"
+        )
         self.story_stages = list(self.config.STAGE_CONFIG.keys())
         self.current_stage = 0
         
@@ -75,8 +91,14 @@ class SimulationEngine:
         # 初始化Rich Console用于美化显示
         self.console = Console()
         
-        # 初始化对话记录列表
-        self.conversation_log = []
+        # 初始化对话记录（有界窗口 + 磁盘完整历史）
+        self.conversation_log: BoundedHistory = BoundedHistory(
+            self.memory_config.get('conversation_log_window', 200),
+            spill_path=self.simulation_log_dir / "conversation_log.jsonl"
+        )
+        
+        # 多人事件是否使用一次调用的群体对话模式
+        self.group_dialogue_enabled = getattr(self.config, 'GROUP_DIALOGUE', DEFAULT_GROUP_DIALOGUE)
         
         # 存储心理模型实例
         self.psychological_model = psychological_model
@@ -104,6 +126,7 @@ class SimulationEngine:
                 scenario = data.get('scenario', {})
                 
                 # 设置主要配置属性
+                self.SCENARIO_KEY = scenario.get('key')
                 self.CHARACTERS = scenario.get('characters', {})
                 self.RELATIONSHIPS = scenario.get('relationships', [])
                 self.EVENT_TEMPLATES = scenario.get('event_templates', {})
@@ -118,6 +141,7 @@ class SimulationEngine:
                 self.SIMULATION_SPEED = simulation_config.get('simulation_speed', 1)
                 self.DEPRESSION_DEVELOPMENT_STAGES = simulation_config.get('depression_development_stages', 5)
                 self.INTERACTION_FREQUENCY = simulation_config.get('interaction_frequency', 3)
+                self.GROUP_DIALOGUE = simulation_config.get('group_dialogue', DEFAULT_GROUP_DIALOGUE)
                 
                 # 设置日志参数
                 logging_config = data.get('logging', {})
@@ -139,6 +163,9 @@ class SimulationEngine:
                 self.ALLIANCE_THRESHOLD = recovery_config.get('alliance_threshold', 6.0)
                 self.EVALUATION_INTERVAL = recovery_config.get('evaluation_interval', 5)
                 self.DETERIORATION_THRESHOLD = recovery_config.get('deterioration_threshold', 3.0)
+                
+                # 设置记忆窗口参数
+                self.MEMORY_CONFIG = data.get('memory', {})
         
         return ConfigObject(config_data)
         
@@ -204,7 +231,9 @@ class SimulationEngine:
             if "extra_params" in config:
                 kwargs.update(config["extra_params"])
                 
-            return agent_class(**kwargs)
+            agent = agent_class(**kwargs)
+            agent.configure_memory(self.memory_config, self.simulation_log_dir / "history")
+            return agent
             
         except Exception as e:
             self.logger.error(f"Failed to create agent {agent_id}: {e}")
@@ -242,6 +271,12 @@ class SimulationEngine:
         )
         self.console.print(start_panel)
         
+        # 心理模型按单次模拟计算的LLM调用/token预算从零开始
+        if self.psychological_model:
+            self.psychological_model.start_simulation()
+        # 条件事件的冷却记录同样按单次模拟计算
+        self.event_generator.conditional_rules.reset()
+        
         for day in range(1, days + 1):
             self.current_day = day
             self.current_stage = self._determine_stage(day, days)
@@ -258,6 +293,9 @@ class SimulationEngine:
             
             self.logger.info(f"第{day}天 - {stage_name} (模拟ID: {self.simulation_id})")
             
+            # 前一天剩下的预生成事件基于过时的状态（可能还是上一阶段），不跨天复用
+            self.event_generator.invalidate_speculation()
+            
             await self._simulate_day()
             self._log_daily_state()
             
@@ -266,6 +304,11 @@ class SimulationEngine:
             
         # 保存对话记录
         self._save_conversation_log()
+        
+        await self.event_generator.shutdown()
+        speculation_stats = self.event_generator.get_speculation_stats()
+        if speculation_stats:
+            self.logger.info(f"推测式事件预生成统计: {speculation_stats}")
             
         self.logger.info(f"模拟结束 (ID: {self.simulation_id})")
         final_report_content = await self._generate_final_report()
@@ -282,22 +325,29 @@ class SimulationEngine:
         stage_name = self.story_stages[self.current_stage]
         stage_config = self.config.STAGE_CONFIG[stage_name]
         
-        # 生成今天的事件数量
+        # 生成今天的事件数量，并预先确定每个事件的类型（便于下一个事件的推测式预生成）
         event_count = random.randint(3, 6)
+        event_plan = [
+            (random.choice(stage_config["event_categories"]), self._choose_sentiment(stage_config["event_weights"]))
+            for _ in range(event_count)
+        ]
         
-        for _ in range(event_count):
-            # 根据权重选择事件类型
-            sentiment = self._choose_sentiment(stage_config["event_weights"])
-            category = random.choice(stage_config["event_categories"])
+        for index, (category, sentiment) in enumerate(event_plan):
+            protagonist_state = self._get_protagonist_state()
             
             # 生成事件
             event_desc, participants, impact = await self.event_generator.generate_event(
                 category=category,
                 sentiment=sentiment,
-                protagonist_state=self._get_protagonist_state(),
+                protagonist_state=protagonist_state,
                 stage_config=stage_config
             )
             
+            # agent回应本事件期间，后台预生成下一个事件
+            if index + 1 < len(event_plan):
+                next_category, next_sentiment = event_plan[index + 1]
+                self.event_generator.schedule_prefetch(next_category, next_sentiment, protagonist_state, stage_config)
+            
             # 处理事件
             await self._process_event(event_desc, participants, impact)
             
@@ -328,7 +378,7 @@ class SimulationEngine:
             "depression_level": state.depression_level.name,
             "social_connection": state.social_connection,
             "self_esteem": state.self_esteem,
-            "recent_grades": getattr(self.protagonist, 'grades', {})
+            "recent_grades": list(getattr(self.protagonist, 'recent_grades', {}).values())
         }
         
         # === 新增：将CAD状态拍平，支持条件事件访问 ===
@@ -384,41 +434,36 @@ class SimulationEngine:
             self.protagonist.add_life_event(life_event)
         
         # 获取参与者响应并美化显示
-        responses = {}
-        for agent_name in participants:
-            if agent_name in self.agents:
-                agent = self.agents[agent_name]
-                response = await agent.respond_to_situation(event_description)
-                responses[agent_name] = response
-                
-                # 美化角色回应显示
-                if agent_name == self.protagonist.name:
-                    response_color = "cyan"
-                    response_icon = "💭"
-                else:
-                    response_color = "white"
-                    response_icon = "💬"
-                
-                response_panel = Panel.fit(
-                    f"[{response_color}]{response}[/{response_color}]",
-                    border_style=response_color,
-                    title=f"{response_icon} {agent_name}"
-                )
-                # 显示角色响应面板
-                self.console.print(response_panel)
-                
-                self.logger.info(f"【{agent_name}】 回应: {response}")
-                
-                # 记录对话到conversation_log
-                self.conversation_log.append({
-                    "day": self.current_day,
-                    "stage": self.story_stages[self.current_stage],
-                    "timestamp": datetime.now().isoformat(),
-                    "event": event_description,
-                    "speaker": agent_name,
-                    "content": response,
-                    "impact_score": impact_score
-                })
+        responses = await self._collect_responses(event_description, participants)
+        for agent_name, response in responses.items():
+            # 美化角色回应显示
+            if agent_name == self.protagonist.name:
+                response_color = "cyan"
+                response_icon = "💭"
+            else:
+                response_color = "white"
+                response_icon = "💬"
+            
+            response_panel = Panel.fit(
+                f"[{response_color}]{response}[/{response_color}]",
+                border_style=response_color,
+                title=f"{response_icon} {agent_name}"
+            )
+            # 显示角色响应面板
+            self.console.print(response_panel)
+            
+            self.logger.info(f"【{agent_name}】 回应: {response}")
+            
+            # 记录对话到conversation_log
+            self.conversation_log.append({
+                "day": self.current_day,
+                "stage": self.story_stages[self.current_stage],
+                "timestamp": datetime.now().isoformat(),
+                "event": event_description,
+                "speaker": agent_name,
+                "content": response,
+                "impact_score": impact_score
+            })
         
         # 分析互动影响
         impact_analysis = await self.ai_client.analyze_interaction_impact(
@@ -439,13 +484,49 @@ class SimulationEngine:
             "timestamp": datetime.now().isoformat()
         })
     
+    async def _collect_responses(self, event_description: str, participants: List[str]) -> Dict[str, str]:
+        """
+        获取事件参与者的回应
+        
+        多人事件优先使用一次群体对话调用生成所有回应，
+        解析失败或缺失的角色再逐个回退到单独生成。
+        """
+        agents = [self.agents[name] for name in participants if name in self.agents]
+        group_responses: Dict[str, str] = {}
+        
+        if (self.group_dialogue_enabled and len(agents) > 1 and
+                hasattr(self.ai_client, 'generate_group_response')):
+            try:
+                group_responses = await self.ai_client.generate_group_response(
+                    [agent.prepare_group_turn(event_description) for agent in agents],
+                    event_description
+                )
+            except Exception as e:
+                self.logger.warning(f"群体对话生成失败，回退到逐个生成: {e}")
+                group_responses = {}
+        
+        responses = {}
+        for agent in agents:
+            if agent.name in group_responses:
+                response = group_responses[agent.name]
+                agent.accept_group_response(event_description, response)
+            else:
+                response = await agent.respond_to_situation(event_description)
+            responses[agent.name] = response
+        
+        return responses
+    
     async def _check_conditional_events(self, stage_config: Dict):
         """检查并触发条件事件"""
         protagonist_state = self._get_protagonist_state()
         
-        for condition_name, condition_config in self.config.CONDITIONAL_EVENTS.items():
+        # 编译好的规则表一次遍历求值全部条件，再按冷却天数和触发概率筛选
+        triggered = self.event_generator.evaluate_conditional_events(protagonist_state, self.current_day)
+        
+        for condition_name in triggered:
+            condition_config = self.event_generator.conditional_rules.by_name[condition_name].config
             result = await self.event_generator.generate_conditional_event(
-                condition_name, condition_config, protagonist_state
+                condition_name, condition_config, protagonist_state, condition_checked=True
             )
             
             if result:
@@ -551,7 +632,7 @@ class SimulationEngine:
     
     def _save_conversation_log(self):
         """保存对话记录到JSON文件"""
-        if not self.conversation_log:
+        if not self.conversation_log.total_count:
             return
             
         conversation_file = self.simulation_log_dir / "conversation_log.json"
@@ -559,8 +640,8 @@ class SimulationEngine:
             conversation_data = {
                 "simulation_id": self.simulation_id,
                 "protagonist_name": self.protagonist.name if self.protagonist else "未知",
-                "total_conversations": len(self.conversation_log),
-                "conversations": self.conversation_log,
+                "total_conversations": self.conversation_log.total_count,
+                "conversations": self.conversation_log.full_history(),
                 "generated_at": datetime.now().isoformat()
             }
             
@@ -572,7 +653,7 @@ class SimulationEngine:
             save_panel = Panel.fit(
                 f"[bold green]💾 对话记录已保存[/bold green]\n"
                 f"[dim]文件位置: {conversation_file}[/dim]\n"
-                f"[dim]总对话数: {len(self.conversation_log)}[/dim]",
+                f"[dim]总对话数: {self.conversation_log.total_count}[/dim]",
                 border_style="green",
                 title="📝 记录保存"
             )
@@ -652,7 +733,7 @@ class SimulationEngine:
                 "total_days": self.current_day,
                 "final_stage": self.story_stages[self.current_stage],
                 "final_depression_level": self.protagonist.psychological_state.depression_level.value,
-                "total_events": len(self.simulation_log),
+                "total_events": self.simulation_log.total_count,
                 "event_variety_score": self.event_generator.get_event_variety_score()
             },
             "protagonist_character_profile": character_profile,
@@ -669,8 +750,8 @@ class SimulationEngine:
                 for name, rel in self.protagonist.relationships.items()
             },
             "significant_events": [
-                event.to_dict() for event in self.protagonist.life_events
-                if event.impact_score <= -5
+                event for event in self.protagonist.get_full_life_events()
+                if event.get("impact_score", 0) <= -5
             ]
         }
         
@@ -0,0 +1,195 @@
+"""
+模拟历史事件缓存
+把一次模拟运行目录下所有 day_*_state.json 中的事件整理为同目录下的JSONL缓存
+（首行是各每日文件的修改时间和大小，之后每行对应一天的事件），再次打开时逐行流式读取，
+不再逐个解析完整的每日状态文件。每日文件有新增或变化时只重新读取变化的文件（并行读取），
+其余天的缓存行原样保留。
+每次加载都从缓存文件重新读取，返回调用方独占的事件列表，进程内不保留共享的事件对象。
+"""
+
+import json
+import logging
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+HISTORY_CACHE_FILE = "history_events_cache.jsonl"
+CACHE_VERSION = 1
+DEFAULT_MAX_WORKERS = 8
+
+logger = logging.getLogger(__name__)
+
+# (文件名, 天数, 修改时间ns, 文件大小)
+FileEntry = Tuple[str, int, int, int]
+
+
+def day_number_from_file(day_file_path: Path) -> Union[int, float]:
+    """从文件名中提取天数，用于正确排序（支持 day_X_state.json 和 day_state_X.json）"""
+    parts = Path(day_file_path).stem.split('_')
+    if len(parts) >= 3 and parts[0] == 'day' and parts[2] == 'state' and parts[1].isdigit():
+        return int(parts[1])
+    if len(parts) >= 3 and parts[0] == 'day' and parts[1] == 'state' and parts[2].isdigit():
+        return int(parts[2])
+    # 兜底：尝试找到任何数字部分
+    for part in parts:
+        if part.isdigit():
+            return int(part)
+    return float('inf')  # 如果找不到数字，排在最后面
+
+
+def _scan_day_files(sim_dir: Path) -> List[FileEntry]:
+    """按天数排序列出每日状态文件及其修改时间和大小"""
+    entries = []
+    for day_file in sim_dir.glob("day_*_state.json"):
+        try:
+            stat = day_file.stat()
+        except OSError:
+            continue
+        day = day_number_from_file(day_file)
+        entries.append((day_file.name, day if day != float('inf') else -1, stat.st_mtime_ns, stat.st_size))
+    entries.sort(key=lambda entry: (entry[1] if entry[1] >= 0 else float('inf'), entry[0]))
+    return entries
+
+
+def _read_day_events(day_file: Path) -> List[Dict[str, Any]]:
+    """读取单个每日状态文件，只保留事件列表"""
+    with open(day_file, 'r', encoding='utf-8') as f:
+        return json.load(f).get("events", []) or []
+
+
+def _read_cache_header(cache_file: Path) -> Optional[List[FileEntry]]:
+    """读取缓存首行记录的文件列表；缓存不存在或版本不符时返回None"""
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            header = json.loads(f.readline())
+    except (OSError, ValueError):
+        return None
+    if not isinstance(header, dict) or header.get("version") != CACHE_VERSION:
+        return None
+    return [tuple(entry) for entry in header.get("files", [])]
+
+
+def _iter_cached_lines(cache_file: Path) -> Iterator[str]:
+    """逐行读取缓存中每天的事件行（跳过首行）"""
+    with open(cache_file, 'r', encoding='utf-8') as f:
+        f.readline()
+        for line in f:
+            yield line
+
+
+def _rebuild_cache(sim_dir: Path, files: List[FileEntry], cached: Optional[List[FileEntry]],
+                   max_workers: int) -> Tuple[int, int]:
+    """
+    增量重建缓存：未变化的天直接复用旧缓存行，变化或新增的文件并行读取。
+    返回 (复用天数, 重新读取天数)
+    """
+    cache_file = sim_dir / HISTORY_CACHE_FILE
+    cached = cached or []
+    cached_set = set(cached)
+    changed = [entry for entry in files if entry not in cached_set]
+
+    # 变化的文件并行读取，读取后只保留事件
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(changed) or 1))) as pool:
+        fresh = dict(zip((entry[0] for entry in changed),
+                         pool.map(lambda entry: _read_day_events(sim_dir / entry[0]), changed)))
+
+    tmp_file = cache_file.with_name(cache_file.name + ".tmp")
+    reused = 0
+    old_lines = _iter_cached_lines(cache_file) if cached else iter(())
+    old_index = 0
+    try:
+        with open(tmp_file, 'w', encoding='utf-8') as out:
+            out.write(json.dumps({"version": CACHE_VERSION, "files": [list(entry) for entry in files]},
+                                 ensure_ascii=False) + "\n")
+            for entry in files:
+                if entry[0] in fresh:
+                    events = fresh[entry[0]]
+                    out.write(json.dumps({"file": entry[0], "day": entry[1], "events": events},
+                                         ensure_ascii=False) + "\n")
+                    continue
+                # 旧缓存与当前列表同序，向前推进到对应的行
+                while old_index < len(cached) and cached[old_index] != entry:
+                    next(old_lines, None)
+                    old_index += 1
+                line = next(old_lines, None)
+                old_index += 1
+                if line is None:
+                    raise ValueError(f"缓存缺少 {entry[0]} 的事件行")
+                out.write(line if line.endswith("\n") else line + "\n")
+                reused += 1
+        os.replace(tmp_file, cache_file)
+    finally:
+        if hasattr(old_lines, "close"):
+            old_lines.close()
+        if tmp_file.exists():
+            tmp_file.unlink()
+    return reused, len(changed)
+
+
+def _ensure_cache(sim_dir: Path, files: List[FileEntry], max_workers: int) -> bool:
+    """确保缓存与当前每日文件一致；缓存无法写入时返回False"""
+    cache_file = sim_dir / HISTORY_CACHE_FILE
+    cached = _read_cache_header(cache_file)
+    if cached == files:
+        return True
+    try:
+        reused, reread = _rebuild_cache(sim_dir, files, cached, max_workers)
+    except (OSError, ValueError) as e:
+        logger.warning(f"无法更新历史事件缓存 {cache_file}: {e}")
+        # 复用旧缓存行失败时整份重建一次
+        if cached:
+            try:
+                reused, reread = _rebuild_cache(sim_dir, files, None, max_workers)
+            except (OSError, ValueError):
+                return False
+        else:
+            return False
+    logger.debug(f"历史事件缓存已更新 {sim_dir.name}: 复用{reused}天，读取{reread}天")
+    return True
+
+
+def iter_history_events(sim_run_path: Union[str, Path],
+                        max_workers: int = DEFAULT_MAX_WORKERS) -> Iterator[Dict[str, Any]]:
+    """按天数顺序逐条流式返回模拟运行的所有每日事件（必要时先更新缓存）"""
+    sim_dir = Path(sim_run_path)
+    files = _scan_day_files(sim_dir)
+    if _ensure_cache(sim_dir, files, max_workers):
+        for line in _iter_cached_lines(sim_dir / HISTORY_CACHE_FILE):
+            if line.strip():
+                yield from json.loads(line).get("events", [])
+        return
+
+    # 目录不可写：直接并行读取每日文件
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        for events in pool.map(lambda entry: _read_day_events(sim_dir / entry[0]), files):
+            yield from events
+
+
+def load_history_events(sim_run_path: Union[str, Path],
+                        max_workers: int = DEFAULT_MAX_WORKERS) -> List[Dict[str, Any]]:
+    """获取模拟运行的全部每日事件列表（每次调用返回新的列表，调用方可以自由修改）"""
+    return list(iter_history_events(sim_run_path, max_workers))
+
+
+def load_recent_daily_events(sim_run_path: Union[str, Path], days: int = 3,
+                             max_workers: int = DEFAULT_MAX_WORKERS) -> Dict[str, List[Dict[str, Any]]]:
+    """流式读取缓存，只保留最近几天的事件，返回 {"day_N": [事件...]}"""
+    sim_dir = Path(sim_run_path)
+    files = _scan_day_files(sim_dir)
+    recent: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+    if not files:
+        return {}
+    if _ensure_cache(sim_dir, files, max_workers):
+        for line in _iter_cached_lines(sim_dir / HISTORY_CACHE_FILE):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            recent[f"day_{record.get('day')}"] = record.get("events", [])
+            while len(recent) > days:
+                recent.popitem(last=False)
+    else:
+        for entry in files[-days:]:
+            recent[f"day_{entry[1]}"] = _read_day_events(sim_dir / entry[0])
+    return dict(recent)
@@ -0,0 +1,171 @@
+"""
+推测式事件预生成
+在agent回应当前事件的同时，后台为接下来可能用到的 (阶段, 类别, 情感) 预先生成事件文本，
+每个键只保留很短的有界队列。取用时检查主角状态是否已明显偏离生成时的快照：
+偏离过大的推测事件直接丢弃，其余事件按当前状态重新计算影响分数。
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+# 用于判断状态偏移的数值字段（0-10量纲）
+DRIFT_FIELDS = ("stress_level", "self_esteem", "social_connection")
+
+
+@dataclass
+class SpeculativeEvent:
+    """预生成的事件"""
+    description: str
+    participants: List[str]
+    pattern: Dict[str, Any]
+    state_snapshot: Dict[str, Any]
+    created_at: float = field(default_factory=time.monotonic)
+
+
+def state_snapshot(state: Dict[str, Any]) -> Dict[str, Any]:
+    """提取用于判断过期的状态快照"""
+    snapshot = {key: state.get(key) for key in DRIFT_FIELDS}
+    snapshot["depression_level"] = state.get("depression_level")
+    if "affective_tone" in state:
+        snapshot["affective_tone"] = state.get("affective_tone")
+    return snapshot
+
+
+def stage_key(stage_config: Dict[str, Any]) -> str:
+    """阶段配置的规范化键：不同阶段的事件类别和权重不同，预生成事件不跨阶段复用"""
+    return json.dumps(stage_config or {}, ensure_ascii=False, sort_keys=True, default=str)
+
+
+def state_drift(snapshot: Dict[str, Any], state: Dict[str, Any]) -> float:
+    """快照与当前状态的最大偏移；抑郁等级变化视为无穷大"""
+    if snapshot.get("depression_level") != state.get("depression_level"):
+        return float("inf")
+
+    drift = 0.0
+    for key in DRIFT_FIELDS:
+        old, new = snapshot.get(key), state.get(key)
+        if isinstance(old, (int, float)) and isinstance(new, (int, float)):
+            drift = max(drift, abs(new - old))
+    # 情感基调范围为-10~10，折半后与其他字段同一量纲
+    old, new = snapshot.get("affective_tone"), state.get("affective_tone")
+    if isinstance(old, (int, float)) and isinstance(new, (int, float)):
+        drift = max(drift, abs(new - old) / 2)
+    return drift
+
+
+class SpeculativeEventQueue:
+    """按 (阶段, 类别, 情感) 分组的有界预生成队列"""
+
+    def __init__(self, producer: Callable[[str, str, Dict[str, Any], Dict[str, Any]], Awaitable[SpeculativeEvent]],
+                 lookahead_depth: int = 1, max_state_drift: float = 1.5, max_age_seconds: float = 600):
+        """
+        Args:
+            producer: 生成单个推测事件的协程函数 (类别, 情感, 状态, 阶段配置)
+            lookahead_depth: 每个键最多预生成的事件数
+            max_state_drift: 状态偏移超过该值时丢弃推测事件
+            max_age_seconds: 推测事件的最长保留时间
+        """
+        self.producer = producer
+        self.lookahead_depth = max(1, int(lookahead_depth))
+        self.max_state_drift = max_state_drift
+        self.max_age_seconds = max_age_seconds
+        self.logger = logging.getLogger(__name__)
+
+        self._queues: Dict[Tuple[str, str, str], Deque[SpeculativeEvent]] = {}
+        self._tasks: Dict[Tuple[str, str, str], asyncio.Task] = {}
+        self.stats = {"scheduled": 0, "produced": 0, "hits": 0, "misses": 0,
+                      "discarded_stale": 0, "failed": 0}
+
+    def schedule(self, category: str, sentiment: str, state: Dict[str, Any], stage_config: Dict[str, Any]):
+        """在后台补满某个键的预生成队列（已有任务在运行时不重复调度）"""
+        key = (stage_key(stage_config), category, sentiment)
+        queue = self._queues.setdefault(key, deque(maxlen=self.lookahead_depth))
+        task = self._tasks.get(key)
+        if len(queue) >= self.lookahead_depth or (task and not task.done()):
+            return
+        try:
+            self._tasks[key] = asyncio.get_running_loop().create_task(
+                self._fill(key, dict(state), dict(stage_config or {}))
+            )
+            self.stats["scheduled"] += 1
+        except RuntimeError:
+            # 没有运行中的事件循环时不做预生成
+            pass
+
+    async def _fill(self, key: Tuple[str, str, str], state: Dict[str, Any], stage_config: Dict[str, Any]):
+        queue = self._queues[key]
+        while len(queue) < self.lookahead_depth:
+            try:
+                event = await self.producer(key[1], key[2], state, stage_config)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["failed"] += 1
+                self.logger.warning(f"推测事件预生成失败 {key}: {e}")
+                return
+            queue.append(event)
+            self.stats["produced"] += 1
+
+    def _is_fresh(self, event: SpeculativeEvent, state: Dict[str, Any]) -> bool:
+        if time.monotonic() - event.created_at > self.max_age_seconds:
+            return False
+        return state_drift(event.state_snapshot, state) <= self.max_state_drift
+
+    async def take(self, category: str, sentiment: str, state: Dict[str, Any],
+                   stage_config: Dict[str, Any]) -> Optional[SpeculativeEvent]:
+        """
+        取出一个按当前阶段生成、仍然有效的推测事件
+
+        队列为空但该键的预生成任务正在运行时，等待它完成（工作已经开始，避免重复生成）；
+        过期事件被丢弃。没有可用事件时返回None，由调用方同步生成。
+        """
+        key = (stage_key(stage_config), category, sentiment)
+        queue = self._queues.get(key)
+        task = self._tasks.get(key)
+
+        if not queue and task and not task.done():
+            try:
+                await asyncio.shield(task)
+            except Exception:
+                pass
+            queue = self._queues.get(key)
+
+        while queue:
+            event = queue.popleft()
+            if self._is_fresh(event, state):
+                self.stats["hits"] += 1
+                return event
+            self.stats["discarded_stale"] += 1
+
+        self.stats["misses"] += 1
+        return None
+
+    def invalidate(self):
+        """清空所有预生成事件并取消未完成的预生成（新的一天或阶段切换时）"""
+        for queue in self._queues.values():
+            self.stats["discarded_stale"] += len(queue)
+            queue.clear()
+        for task in self._tasks.values():
+            if not task.done():
+                task.cancel()
+        self._tasks.clear()
+
+    async def shutdown(self):
+        """取消所有未完成的预生成任务"""
+        tasks = [task for task in self._tasks.values() if not task.done()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        stats = dict(self.stats)
+        stats["queued"] = sum(len(q) for q in self._queues.values())
+        return stats
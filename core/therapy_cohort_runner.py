@@ -0,0 +1,437 @@
+"""
+AI对AI治疗批量运行器
+非交互地对一组模拟运行（logs/sim_*目录或每日状态文件）并发运行AIToAITherapyManager会话，
+所有会话共享同一个并发/速率预算；每个会话的记录单独保存，
+并汇总治疗效果、治疗联盟轨迹和抑郁等级变化到一份总结中。
+
+运行命令：
+    python -m core.therapy_cohort_runner logs --provider deepseek --max-turns 15
+    python -m core.therapy_cohort_runner logs/sim_* --day 25 --sessions 6 --requests-per-minute 120
+    python start_ai_to_ai_therapy.py --cohort logs
+"""
+
+import argparse
+import asyncio
+import functools
+import inspect
+import json
+import statistics
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from rich.console import Console
+from rich.table import Table
+
+from config.config_loader import load_therapy_guidance_config
+from core.ai_to_ai_therapy_manager import AIToAITherapyManager, DEPRESSION_LEVELS
+from utils import psychology_display
+
+console = Console()
+
+DEFAULT_COHORT_SETTINGS = {
+    "max_concurrent_sessions": 4,
+    "max_concurrent_requests": 8,
+    "requests_per_minute": 0,
+    "max_turns": 15,
+    "quiet": True
+}
+
+
+def load_cohort_settings() -> Dict[str, Any]:
+    """读取ai_to_ai_therapy配置中的cohort_settings"""
+    settings = dict(DEFAULT_COHORT_SETTINGS)
+    try:
+        settings.update(load_therapy_guidance_config("ai_to_ai_therapy").get("cohort_settings", {}) or {})
+    except Exception as e:
+        console.print(f"[yellow]⚠️ 读取批量治疗配置失败，使用默认值: {e}[/yellow]")
+    settings.pop("description", None)
+    return settings
+
+
+def _day_number(day_file: Path) -> Optional[int]:
+    try:
+        return int(day_file.stem.split('_')[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def _select_sim_data(sim_dir: Path, day: Optional[int]) -> Optional[Path]:
+    """在一个模拟运行目录中选择患者数据文件：指定天数的状态文件，否则优先最终报告"""
+    day_files = sorted(
+        (f for f in sim_dir.glob("day_*_state.json") if _day_number(f) is not None),
+        key=_day_number
+    )
+    if day is not None:
+        return next((f for f in day_files if _day_number(f) == day), None)
+    final_report = sim_dir / "final_report.json"
+    if final_report.exists():
+        return final_report
+    return day_files[-1] if day_files else None
+
+
+def discover_patient_logs(paths: Sequence[str], day: Optional[int] = None) -> List[Path]:
+    """
+    把命令行给出的路径展开为患者数据文件列表
+
+    Args:
+        paths: logs/sim_*目录、包含sim_*目录的父目录（如logs），或final_report/day_*_state文件
+        day: 使用第几天的状态文件（默认使用最终报告，没有时用最后一天）
+
+    Returns:
+        去重后的患者数据文件路径
+    """
+    found: List[Path] = []
+    for raw in paths:
+        path = Path(raw)
+        if path.is_file():
+            found.append(path)
+            continue
+        if not path.is_dir():
+            console.print(f"[yellow]⚠️ 路径不存在，跳过: {raw}[/yellow]")
+            continue
+
+        sim_dirs = [path] if path.name.startswith("sim_") else sorted(
+            d for d in path.iterdir() if d.is_dir() and d.name.startswith("sim_")
+        )
+        for sim_dir in sim_dirs:
+            data_file = _select_sim_data(sim_dir, day)
+            if data_file is None:
+                console.print(f"[yellow]⚠️ {sim_dir.name} 中没有可用的数据文件，跳过[/yellow]")
+            else:
+                found.append(data_file)
+
+    unique: Dict[Path, None] = {}
+    for data_file in found:
+        unique.setdefault(data_file.resolve(), None)
+    return list(unique)
+
+
+class RequestRateLimiter:
+    """所有会话共享的LLM请求预算：并发请求上限 + 每分钟请求数"""
+
+    def __init__(self, max_concurrent_requests: int = 8, requests_per_minute: float = 0):
+        """
+        Args:
+            max_concurrent_requests: 同时进行的LLM请求上限
+            requests_per_minute: 每分钟请求数上限，<=0表示不限速
+        """
+        self._semaphore = asyncio.Semaphore(max(1, int(max_concurrent_requests)))
+        self.interval = 60.0 / requests_per_minute if requests_per_minute and requests_per_minute > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+        self.stats = {"requests": 0, "throttled_seconds": 0.0}
+
+    async def _wait_for_slot(self):
+        """按固定间隔分配请求时间槽"""
+        if self.interval <= 0:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            self.stats["throttled_seconds"] += wait
+            await asyncio.sleep(wait)
+
+    @asynccontextmanager
+    async def acquire(self):
+        """占用一个请求名额"""
+        async with self._semaphore:
+            await self._wait_for_slot()
+            self.stats["requests"] += 1
+            yield
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        stats = dict(self.stats)
+        stats["throttled_seconds"] = round(stats["throttled_seconds"], 2)
+        return stats
+
+
+class RateLimitedAIClient:
+    """AI客户端代理：所有异步方法调用都经过共享的请求预算"""
+
+    def __init__(self, client, limiter: RequestRateLimiter):
+        self._client = client
+        self._limiter = limiter
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not inspect.iscoroutinefunction(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def limited(*args, **kwargs):
+            async with self._limiter.acquire():
+                return await attr(*args, **kwargs)
+
+        return limited
+
+
+def _session_label(data_file: Path) -> str:
+    """会话标签：模拟运行名（每日状态文件再加上天数）"""
+    if data_file.name == "final_report.json":
+        return data_file.parent.name
+    return f"{data_file.parent.name}_{data_file.stem}"
+
+
+def _session_record(data_file: Path, session_id: str, summary: Dict[str, Any],
+                    duration: float, log_file: Path) -> Dict[str, Any]:
+    """从会话总结中提取汇总需要的数据"""
+    recovery = summary.get("recovery_tracking", {})
+    return {
+        "label": _session_label(data_file),
+        "patient_log_path": str(data_file),
+        "session_id": session_id,
+        "status": "completed",
+        "log_file": str(log_file),
+        "patient_name": summary.get("patient_name"),
+        "total_turns": summary.get("total_turns", 0),
+        "average_effectiveness": summary.get("average_effectiveness"),
+        "effectiveness_scores": recovery.get("effectiveness_scores", []),
+        "alliance_trajectory": recovery.get("alliance_trajectory", []),
+        "final_alliance_score": recovery.get("final_alliance_score"),
+        "initial_depression_level": recovery.get("initial_depression_level"),
+        "final_depression_level": recovery.get("final_depression_level"),
+        "termination_reason": summary.get("termination", {}).get("reason"),
+        "duration_seconds": round(duration, 2)
+    }
+
+
+def _describe(values: List[float]) -> Dict[str, Any]:
+    """均值、标准差和范围"""
+    values = [float(v) for v in values if v is not None]
+    if not values:
+        return {"n": 0}
+    return {
+        "n": len(values),
+        "mean": round(statistics.mean(values), 3),
+        "std": round(statistics.pstdev(values), 3),
+        "min": round(min(values), 3),
+        "max": round(max(values), 3)
+    }
+
+
+def _per_turn_mean(series: List[List[float]]) -> List[Dict[str, Any]]:
+    """按轮次对齐的平均轨迹（每轮只统计达到该轮的会话）"""
+    trajectory = []
+    for index in range(max((len(s) for s in series), default=0)):
+        values = [s[index] for s in series if len(s) > index]
+        trajectory.append({"turn": index + 1, "n": len(values), "mean": round(statistics.mean(values), 3)})
+    return trajectory
+
+
+def aggregate_cohort(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """汇总治疗效果、治疗联盟轨迹和抑郁等级变化"""
+    completed = [r for r in records if r["status"] == "completed"]
+
+    transitions = Counter()
+    direction = Counter()
+    for record in completed:
+        initial, final = record["initial_depression_level"], record["final_depression_level"]
+        transitions[f"{initial} → {final}"] += 1
+        if initial not in DEPRESSION_LEVELS or final not in DEPRESSION_LEVELS:
+            direction["unknown"] += 1
+        elif DEPRESSION_LEVELS[final] < DEPRESSION_LEVELS[initial]:
+            direction["improved"] += 1
+        elif DEPRESSION_LEVELS[final] > DEPRESSION_LEVELS[initial]:
+            direction["worsened"] += 1
+        else:
+            direction["unchanged"] += 1
+
+    return {
+        "sessions": len(records),
+        "completed": len(completed),
+        "failed": len(records) - len(completed),
+        "total_turns": _describe([r["total_turns"] for r in completed]),
+        "effectiveness": {
+            "session_average": _describe([r["average_effectiveness"] for r in completed]),
+            "per_turn": _per_turn_mean([r["effectiveness_scores"] for r in completed])
+        },
+        "alliance": {
+            "final": _describe([r["final_alliance_score"] for r in completed]),
+            "per_turn": _per_turn_mean([r["alliance_trajectory"] for r in completed])
+        },
+        "depression_level": {
+            "transitions": dict(transitions.most_common()),
+            "improved": direction["improved"],
+            "unchanged": direction["unchanged"],
+            "worsened": direction["worsened"],
+            "unknown": direction["unknown"]
+        },
+        "termination_reasons": dict(Counter(r.get("termination_reason") for r in completed).most_common())
+    }
+
+
+async def run_therapy_cohort(ai_client, patient_logs: Sequence[Path], max_turns: Optional[int] = None,
+                             output_dir: Optional[Path] = None, **overrides) -> Dict[str, Any]:
+    """
+    并发运行一组AI对AI治疗会话并汇总结果
+
+    Args:
+        ai_client: AI客户端（所有会话共享，经过统一的请求预算）
+        patient_logs: 患者数据文件列表
+        max_turns: 每个会话的最大对话轮数（默认取cohort_settings）
+        output_dir: 输出目录（默认logs/therapy_cohort_<时间戳>）
+        **overrides: 覆盖cohort_settings中的其他参数
+
+    Returns:
+        批量运行总结（同时保存为output_dir/cohort_summary.json）
+    """
+    settings = load_cohort_settings()
+    settings.update({k: v for k, v in overrides.items() if v is not None})
+    if max_turns is not None:
+        settings["max_turns"] = max_turns
+
+    cohort_id = f"therapy_cohort_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    output_dir = Path(output_dir) if output_dir else Path("logs") / cohort_id
+    sessions_dir = output_dir / "sessions"
+    sessions_dir.mkdir(parents=True, exist_ok=True)
+
+    limiter = RequestRateLimiter(settings["max_concurrent_requests"], settings["requests_per_minute"])
+    client = RateLimitedAIClient(ai_client, limiter)
+    session_semaphore = asyncio.Semaphore(max(1, int(settings["max_concurrent_sessions"])))
+    total = len(patient_logs)
+    finished = 0
+
+    async def run_session(index: int, data_file: Path) -> Dict[str, Any]:
+        nonlocal finished
+        session_id = f"{cohort_id}_{index:03d}_{_session_label(data_file)}"
+        async with session_semaphore:
+            start = time.monotonic()
+            try:
+                manager = AIToAITherapyManager(client, str(data_file))
+                manager.session_id = session_id
+                manager.logs_dir = sessions_dir
+                manager.turn_delay_seconds = 0
+                summary = await manager.start_therapy_session(settings["max_turns"])
+                if summary.get("error"):
+                    raise RuntimeError(summary["error"])
+                record = _session_record(data_file, session_id, summary, time.monotonic() - start,
+                                         sessions_dir / f"{session_id}_ai_therapy.json")
+            except Exception as e:
+                record = {
+                    "label": _session_label(data_file),
+                    "patient_log_path": str(data_file),
+                    "session_id": session_id,
+                    "status": "failed",
+                    "error": f"{type(e).__name__}: {e}",
+                    "duration_seconds": round(time.monotonic() - start, 2)
+                }
+
+        finished += 1
+        if record["status"] == "completed":
+            console.print(
+                f"[green]✅ [{finished}/{total}] {record['label']}: "
+                f"平均效果 {record['average_effectiveness']:.1f}, 治疗联盟 {record['final_alliance_score']:.1f}, "
+                f"{record['initial_depression_level']} → {record['final_depression_level']}[/green]"
+            )
+        else:
+            console.print(f"[red]❌ [{finished}/{total}] {record['label']}: {record['error']}[/red]")
+        return record
+
+    console.print(f"[bold cyan]🚀 批量AI-AI治疗: {total}个会话，并发{settings['max_concurrent_sessions']}，"
+                  f"每会话{settings['max_turns']}轮[/bold cyan]")
+
+    # 并发会话的逐轮输出会交错在一起，批量运行时默认关闭
+    display_console = psychology_display.console
+    previous_quiet = display_console.quiet
+    display_console.quiet = bool(settings["quiet"])
+    started = time.monotonic()
+    try:
+        records = await asyncio.gather(*(run_session(i, f) for i, f in enumerate(patient_logs, 1)))
+    finally:
+        display_console.quiet = previous_quiet
+
+    cohort_summary = {
+        "cohort_id": cohort_id,
+        "timestamp": datetime.now().isoformat(),
+        "settings": settings,
+        "wall_time_seconds": round(time.monotonic() - started, 2),
+        "request_stats": limiter.get_stats(),
+        "aggregate": aggregate_cohort(list(records)),
+        "sessions": list(records)
+    }
+
+    summary_file = output_dir / "cohort_summary.json"
+    try:
+        with open(summary_file, 'w', encoding='utf-8') as f:
+            json.dump(cohort_summary, f, ensure_ascii=False, indent=2)
+    except Exception as e:
+        console.print(f"[yellow]⚠️ 保存批量治疗总结失败: {e}[/yellow]")
+    cohort_summary["summary_file"] = str(summary_file)
+    return cohort_summary
+
+
+def display_cohort_summary(cohort_summary: Dict[str, Any]):
+    """显示批量治疗总结"""
+    aggregate = cohort_summary["aggregate"]
+    effectiveness = aggregate["effectiveness"]["session_average"]
+    alliance = aggregate["alliance"]["final"]
+    depression = aggregate["depression_level"]
+
+    table = Table(title=f"📊 批量AI-AI治疗总结 ({cohort_summary['cohort_id']})",
+                  show_header=True, header_style="bold magenta")
+    table.add_column("指标", style="cyan", min_width=16)
+    table.add_column("结果", min_width=30)
+
+    def fmt(stats: Dict[str, Any]) -> str:
+        if not stats.get("n"):
+            return "-"
+        return f"{stats['mean']:.2f} ± {stats['std']:.2f} (范围 {stats['min']:.1f}-{stats['max']:.1f})"
+
+    table.add_row("会话", f"完成 {aggregate['completed']}/{aggregate['sessions']}，失败 {aggregate['failed']}")
+    table.add_row("平均治疗效果", fmt(effectiveness))
+    table.add_row("最终治疗联盟", fmt(alliance))
+    table.add_row("抑郁等级", f"改善 {depression['improved']}，不变 {depression['unchanged']}，"
+                           f"恶化 {depression['worsened']}")
+    for transition, count in depression["transitions"].items():
+        table.add_row("", f"{transition}: {count}")
+    table.add_row("结束原因", "，".join(f"{reason} {count}" for reason, count in aggregate["termination_reasons"].items()))
+    table.add_row("耗时", f"{cohort_summary['wall_time_seconds']}秒，"
+                        f"LLM请求 {cohort_summary['request_stats']['requests']}次")
+    console.print(table)
+    console.print(f"[bold blue]📁 批量总结已保存: {cohort_summary.get('summary_file')}[/bold blue]")
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='批量运行AI对AI治疗会话并汇总结果')
+    parser.add_argument('paths', nargs='+', help='logs/sim_*目录、包含它们的logs目录，或患者数据文件')
+    parser.add_argument('--day', type=int, help='使用第几天的状态文件（默认最终报告）')
+    parser.add_argument('--provider', type=str, help='AI提供商 (gemini/deepseek/qwen)')
+    parser.add_argument('--max-turns', type=int, help='每个会话的最大对话轮数')
+    parser.add_argument('--sessions', type=int, help='同时进行的会话数')
+    parser.add_argument('--max-requests', type=int, help='同时进行的LLM请求数')
+    parser.add_argument('--requests-per-minute', type=float, help='每分钟LLM请求数上限（0不限速）')
+    parser.add_argument('--output-dir', type=str, help='输出目录（默认logs/therapy_cohort_<时间戳>）')
+    parser.add_argument('--verbose', action='store_true', help='显示每个会话的逐轮对话输出')
+    args = parser.parse_args(argv)
+
+    patient_logs = discover_patient_logs(args.paths, args.day)
+    if not patient_logs:
+        console.print("[red]❌ 未找到任何患者数据文件[/red]")
+        return
+
+    from core.ai_client_factory import ai_client_factory
+    ai_client = ai_client_factory.get_client(args.provider)
+
+    cohort_summary = asyncio.run(run_therapy_cohort(
+        ai_client,
+        patient_logs,
+        max_turns=args.max_turns,
+        output_dir=Path(args.output_dir) if args.output_dir else None,
+        max_concurrent_sessions=args.sessions,
+        max_concurrent_requests=args.max_requests,
+        requests_per_minute=args.requests_per_minute,
+        quiet=False if args.verbose else None
+    ))
+    display_cohort_summary(cohort_summary)
+
+
+if __name__ == "__main__":
+    main()
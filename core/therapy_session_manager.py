@@ -17,6 +17,9 @@ from utils.psychology_display import (
     console as display_console
 )
 from config.config_loader import load_therapy_guidance_config, load_simulation_params
+from core.conversation_summarizer import RollingConversationSummarizer
+from core.simulation_history import load_history_events
+from core.session_journal import SessionJournal
 
 # 可配置的常量，现在从JSON配置文件加载
 DEFAULT_CONVERSATION_HISTORY_LENGTH = 20
@@ -71,6 +74,14 @@ class TherapySessionManager:
         self.supervision_interval = supervision_settings.get('supervision_interval', 3)
         self.supervision_analysis_depth = conversation_settings.get('supervision_analysis_depth', 'COMPREHENSIVE')
         
+        # 滚动对话摘要：启用时提示词只保留最近几轮原文，更早的轮次压缩为摘要
+        self.conversation_summarizer = RollingConversationSummarizer.from_config(ai_client, conversation_settings)
+        
+        # 患者静态前言缓存（每轮提示词的固定前缀）
+        self._patient_preamble: Optional[str] = None
+        self._patient_preamble_key = None
+        self.prompt_cache_stats = {"preamble_builds": 0, "preamble_reuses": 0, "preamble_chars": 0, "prompt_chars": 0}
+        
         self.current_patient_file_path: Optional[Path] = None # 新增，用于存储加载文件的原始路径
         self.current_simulation_id: Optional[str] = None # 新增，用于存储当前模拟的ID
         self.loaded_data_type: Optional[str] = None # 新增，记录加载的数据类型
@@ -82,6 +93,11 @@ class TherapySessionManager:
         self.therapeutic_alliance_score: float = 0.0  # 治疗联盟分数 (0-10)
         self.session_effectiveness_scores: List[float] = []  # 每轮对话的效果分数
         
+        # 会话日志：每轮对话即时追加写入，崩溃后可从日志恢复或压缩为会话记录
+        self.journal_settings = self.therapy_config.get('journal_settings', {})
+        self.session_journal: Optional[SessionJournal] = None
+        self.session_log_prefix = "session"
+        
         console.print(f"[debug]TherapySessionManager initialized with history_length={self.conversation_history_length}, max_events={self.max_events_to_show}, supervision_interval={self.supervision_interval}[/debug]")
 
     def _load_therapy_config(self):
@@ -203,7 +219,6 @@ class TherapySessionManager:
                     return False
                 sim_run_path = input_path
                 self.patient_data = {}
-                all_daily_events_combined = []
                 
                 if load_type == "all_history":
                     final_report_file = sim_run_path / "final_report.json"
@@ -228,39 +243,8 @@ class TherapySessionManager:
                      self.patient_data["name"] = "主角 (每日历史)"
                      # ... (可能需要从最新一天获取一些基础信息)
 
-                def extract_day_number_from_file(day_file_path):
-                    """从文件名中提取天数，用于正确排序"""
-                    try:
-                        # 支持格式: day_X_state.json 或 day_state_X.json
-                        stem = day_file_path.stem  # 不带扩展名的文件名
-                        parts = stem.split('_')
-                        
-                        # 尝试 day_X_state 格式
-                        if len(parts) >= 3 and parts[0] == 'day' and parts[2] == 'state':
-                            if parts[1].isdigit():
-                                return int(parts[1])
-                        
-                        # 尝试 day_state_X 格式
-                        if len(parts) >= 3 and parts[0] == 'day' and parts[1] == 'state':
-                            if parts[2].isdigit():
-                                return int(parts[2])
-                                
-                        # 兜底：尝试找到任何数字部分
-                        for part in parts:
-                            if part.isdigit():
-                                return int(part)
-                                
-                        return float('inf')  # 如果找不到数字，排在最后面
-                    except (IndexError, ValueError):
-                        return float('inf')
-
-                day_state_files = sorted(list(sim_run_path.glob("day_*_state.json")), key=extract_day_number_from_file)
-                for day_file in day_state_files:
-                    with open(day_file, 'r', encoding='utf-8') as f:
-                        day_content = json.load(f)
-                    # 每日事件列表中的每个事件都是一个字典
-                    daily_events_for_this_day = day_content.get("events", []) 
-                    all_daily_events_combined.extend(daily_events_for_this_day)
+                # 每日事件从模拟目录下的历史事件缓存流式读取，每日文件未变化时不再重新解析
+                all_daily_events_combined = load_history_events(sim_run_path)
                 
                 self.patient_data["all_daily_events_combined"] = all_daily_events_combined
                 # significant_events 字段现在可以从 all_daily_events_combined 的尾部获取，如果最终报告没有提供的话
@@ -446,6 +430,10 @@ class TherapySessionManager:
         """重置会话状态，清空患者数据、对话历史和文件路径信息。"""
         self.patient_data = None
         self.conversation_history = []
+        self._patient_preamble = None
+        if self.conversation_summarizer:
+            self.conversation_summarizer.reset()
+        self._close_session_journal()
         self.current_patient_file_path = None
         self.current_simulation_id = None
         self.loaded_data_type = None
@@ -560,24 +548,24 @@ class TherapySessionManager:
         except ValueError:
             console.print("[red]❌ 请输入有效数字[/red]\n")
 
-    async def _generate_prompt_for_patient(self, therapist_input: str) -> str:
-        """为患者回应构建详细的prompt。"""
-        if not self.patient_data:
-            return "错误：患者数据未加载。"
+    def _get_patient_preamble(self) -> str:
+        """
+        获取患者静态前言（背景、症状、发展历程、事件、性格、认知分析和回应要求）
 
-        # 构建最近对话历史
-        recent_conversation = ""
-        if self.conversation_history:
-            history_to_use = self.conversation_history[-self.conversation_history_length:]
-            patient_name = self.patient_data.get('name', '李明')
-            recent_conversation = "\n".join([
-                f"咨询师: {conv.get('therapist', '')}\n{patient_name}: {conv.get('patient', '')}"
-                for conv in history_to_use
-            ])
-            if len(self.conversation_history) > self.conversation_history_length:
-                omitted_count = len(self.conversation_history) - self.conversation_history_length
-                recent_conversation = f"[之前省略了{omitted_count}轮对话...]\n\n" + recent_conversation
+        这些内容在一次会话中不变，只渲染一次并原样复用，作为每轮提示词字节级相同的前缀，
+        便于提供方的前缀缓存命中；换患者或修改显示事件数时重新渲染。
+        """
+        key = (id(self.patient_data), str(self.current_patient_file_path), self.max_events_to_show)
+        if self._patient_preamble is None or self._patient_preamble_key != key:
+            self._patient_preamble = self._build_patient_preamble()
+            self._patient_preamble_key = key
+            self.prompt_cache_stats["preamble_builds"] += 1
+        else:
+            self.prompt_cache_stats["preamble_reuses"] += 1
+        return self._patient_preamble
 
+    def _build_patient_preamble(self) -> str:
+        """渲染患者静态前言"""
         symptoms_text = ', '.join(self.patient_data.get('symptoms', [])[:6])
         risk_factors_text = ', '.join(self.patient_data.get('risk_factors', [])[:4])
         
@@ -636,17 +624,6 @@ class TherapySessionManager:
             else:
                 events_text = "（暂无重要事件记录）"
 
-        conversation_count = len(self.conversation_history)
-        context_note = ""
-        if conversation_count == 0:
-            context_note = "这是第一次见面，你可能会有些紧张和防备。"
-        elif conversation_count < 3:
-            context_note = "你们刚开始对话不久，你还在观察和适应这个咨询师。"
-        elif conversation_count < 10:
-            context_note = "你们已经对话一段时间了，你可能开始有些信任但仍保持谨慎。"
-        else:
-            context_note = "你们已经进行了较长时间的对话，治疗关系正在建立中。"
-
         # 构建基础背景信息
         data_richness_note = ""
         if has_full_history:
@@ -654,20 +631,6 @@ class TherapySessionManager:
         else:
             data_richness_note = f"注意：你只记得一些重要的经历片段，但这些已经深深影响了你的心理状态。"
 
-        # 使用当前的抑郁程度（如果有恢复追踪）
-        current_depression = self.current_depression_level or self.patient_data.get('depression_level', 'MODERATE')
-        
-        # 如果抑郁程度有改善，添加相关背景
-        recovery_context = ""
-        if self.current_depression_level and self.initial_depression_level:
-            initial_value = DEPRESSION_LEVELS.get(self.initial_depression_level, 2)
-            current_value = DEPRESSION_LEVELS.get(self.current_depression_level, 2)
-            if current_value < initial_value:
-                recovery_context = f"\n        - 治疗进展：你的状态从 {self.initial_depression_level} 改善到了 {self.current_depression_level}，你能感受到一些积极的变化"
-                recovery_context += f"\n        - 治疗联盟：你与咨询师的关系评分为 {self.therapeutic_alliance_score:.1f}/10"
-            elif current_value > initial_value:
-                recovery_context = f"\n        - 治疗挑战：你的状态从 {self.initial_depression_level} 变为 {self.current_depression_level}，你可能感到更加困难"
-        
         # === 新增：深度认知状态分析 ===
         cad_analysis = self._generate_cognitive_state_analysis()
         cognitive_instruction = ""
@@ -680,15 +643,15 @@ class TherapySessionManager:
             请严格按照上述深层认知状态来回应治疗师，让你的每一句话都体现出这些内在的信念、思维模式和行为特征。
             """
 
-        prompt = f"""
+        return f"""
         你是{self.patient_data.get('name', '李明')}，一个{self.patient_data.get('age', 17)}岁的高中生，正在接受心理咨询。
 
         你的完整背景：
         - 数据来源：{self.patient_data.get('data_source', '模拟记录')}
         - 当前状态描述：{self.patient_data.get('final_state_description', '心理健康状况不佳')}
-        - 抑郁程度：{current_depression}
+        - 咨询开始前的抑郁程度：{self.patient_data.get('depression_level', 'MODERATE')}
         - 主要症状：{symptoms_text}
-        - 风险因素：{risk_factors_text}{recovery_context}
+        - 风险因素：{risk_factors_text}
         
         {data_richness_note}
         {psychological_development_text if has_full_history else ""}
@@ -701,27 +664,102 @@ class TherapySessionManager:
         
         {cognitive_instruction}
 
-        对话背景：
-        {context_note} (对话历史长度配置为 {self.conversation_history_length} 轮)
-
-        最近的咨询对话：
-        {recent_conversation}
-
-        现在你的心理咨询师对你说："{therapist_input}"
-
         请以{self.patient_data.get('name', '李明')}的身份回应，请确保你的回应：
         1. 真实反映基于你独特背景、经历和当前心理状态的情绪和想法。
-        2. 符合你当前被评估的抑郁程度（{current_depression}）。
+        2. 符合下方“当前状态”中你当前被评估的抑郁程度。
         3. 使用符合你年龄和性格的语言风格。
         4. 体现出对咨询师可能的防备心理，但也可能流露出求助的渴望或对被理解的期待。
         5. 自然地展现情绪波动，这可能包括沉默、犹豫、悲伤、愤怒、麻木或困惑等。
         6. 考虑到当前对话所处的阶段和与咨询师之间正在建立的关系。
         {"7. 在合适的时候，可以引用你发展历程中的具体事件或感受，展现出深层的心理创伤和复杂情感。" if has_full_history else ""}
-        {"8. 如果状态有所改善，可以适当表现出一些积极的变化，但要符合青少年的表达方式。" if recovery_context and "改善" in recovery_context else ""}
+        8. 如果“当前状态”显示有所改善，可以适当表现出一些积极的变化，但要符合青少年的表达方式。
 
         你的回应应当自然且符合情境，避免过于冗长或戏剧化，一般不超过100字。
         """
-        return prompt
+
+    async def _generate_prompt_for_patient(self, therapist_input: str) -> str:
+        """为患者回应构建prompt：会话内不变的静态前言 + 本轮的动态部分。"""
+        if not self.patient_data:
+            return "错误：患者数据未加载。"
+
+        # 构建最近对话历史
+        recent_conversation = ""
+        if self.conversation_history:
+            summarizer = self.conversation_summarizer
+            if summarizer:
+                history_to_use = summarizer.recent(self.conversation_history)
+            else:
+                history_to_use = self.conversation_history[-self.conversation_history_length:]
+            patient_name = self.patient_data.get('name', '李明')
+            recent_conversation = "\n".join([
+                f"咨询师: {conv.get('therapist', '')}\n{patient_name}: {conv.get('patient', '')}"
+                for conv in history_to_use
+            ])
+            if summarizer:
+                earlier_conversation = summarizer.render_summary(self.conversation_history)
+                if earlier_conversation:
+                    recent_conversation = f"{earlier_conversation}\n\n" + recent_conversation
+            elif len(self.conversation_history) > self.conversation_history_length:
+                omitted_count = len(self.conversation_history) - self.conversation_history_length
+                recent_conversation = f"[之前省略了{omitted_count}轮对话...]\n\n" + recent_conversation
+
+        conversation_count = len(self.conversation_history)
+        context_note = ""
+        if conversation_count == 0:
+            context_note = "这是第一次见面，你可能会有些紧张和防备。"
+        elif conversation_count < 3:
+            context_note = "你们刚开始对话不久，你还在观察和适应这个咨询师。"
+        elif conversation_count < 10:
+            context_note = "你们已经对话一段时间了，你可能开始有些信任但仍保持谨慎。"
+        else:
+            context_note = "你们已经进行了较长时间的对话，治疗关系正在建立中。"
+
+        # 使用当前的抑郁程度（如果有恢复追踪）
+        current_depression = self.current_depression_level or self.patient_data.get('depression_level', 'MODERATE')
+        
+        # 如果抑郁程度有改善，添加相关背景
+        recovery_context = ""
+        if self.current_depression_level and self.initial_depression_level:
+            initial_value = DEPRESSION_LEVELS.get(self.initial_depression_level, 2)
+            current_value = DEPRESSION_LEVELS.get(self.current_depression_level, 2)
+            if current_value < initial_value:
+                recovery_context = f"\n        - 治疗进展：你的状态从 {self.initial_depression_level} 改善到了 {self.current_depression_level}，你能感受到一些积极的变化"
+                recovery_context += f"\n        - 治疗联盟：你与咨询师的关系评分为 {self.therapeutic_alliance_score:.1f}/10"
+            elif current_value > initial_value:
+                recovery_context = f"\n        - 治疗挑战：你的状态从 {self.initial_depression_level} 变为 {self.current_depression_level}，你可能感到更加困难"
+
+        # 静态前言在前（每轮字节级相同），本轮变化的内容只追加在后面
+        preamble = self._get_patient_preamble()
+        dynamic_part = f"""
+        当前状态：
+        - 抑郁程度：{current_depression}{recovery_context}
+
+        对话背景：
+        {context_note} (对话历史长度配置为 {self.conversation_history_length} 轮)
+
+        最近的咨询对话：
+        {recent_conversation}
+
+        现在你的心理咨询师对你说："{therapist_input}"
+
+        请以{self.patient_data.get('name', '李明')}的身份回应。
+        """
+        self.prompt_cache_stats["preamble_chars"] += len(preamble)
+        self.prompt_cache_stats["prompt_chars"] += len(preamble) + len(dynamic_part)
+        return preamble + dynamic_part
+
+    def get_prompt_cache_stats(self) -> Dict[str, Any]:
+        """
+        提示词前缀复用统计
+
+        static_prefix_ratio为发送的提示词中静态前言所占的字符比例；
+        客户端能拿到提供方返回的缓存用量时附带provider（含prefix_cache_hit_rate）。
+        """
+        stats = dict(self.prompt_cache_stats)
+        stats["static_prefix_ratio"] = round(stats["preamble_chars"] / stats["prompt_chars"], 4) if stats["prompt_chars"] else 0.0
+        get_usage_stats = getattr(self.ai_client, 'get_usage_stats', None)
+        stats["provider"] = get_usage_stats() if callable(get_usage_stats) else None
+        return stats
 
     def _get_patient_display_data(self) -> Dict[str, Any]:
         """获取用于显示的患者数据，包含完整的心理状态信息"""
@@ -753,6 +791,8 @@ class TherapySessionManager:
         if not self.patient_data:
             return "（系统提示：无法生成回应，患者数据未加载。）"
         
+        # 上一轮的摘要更新没能完成时（如事件循环已结束），与本轮回应并行补上
+        self._update_conversation_summary()
         prompt = await self._generate_prompt_for_patient(therapist_input)
         if "错误：" in prompt:
             return f"（系统提示：{prompt}）"
@@ -794,9 +834,152 @@ class TherapySessionManager:
             'patient': patient_response,
             'timestamp': datetime.now().isoformat()
         })
+        self._update_conversation_summary()
+        self._journal_exchange(self.conversation_history[-1])
         
         return patient_response
     
+    def _update_conversation_summary(self):
+        """滑出窗口的轮次足够多时在后台更新滚动摘要"""
+        if self.conversation_summarizer:
+            self.conversation_summarizer.schedule(self.conversation_history)
+    
+    # ---- 会话日志 ----
+    
+    def _get_session_log_dir(self) -> Path:
+        """会话记录的保存目录：原始报告所在的模拟子目录，否则为主 logs 目录"""
+        if self.current_simulation_id and self.current_patient_file_path:
+            return self.current_patient_file_path.parent
+        return Path("logs")
+    
+    def _get_recovery_state(self) -> Dict[str, Any]:
+        """可从日志恢复的会话状态快照"""
+        return {
+            'initial_depression_level': self.initial_depression_level,
+            'current_depression_level': self.current_depression_level,
+            'therapeutic_alliance_score': self.therapeutic_alliance_score,
+            'session_effectiveness_scores': list(self.session_effectiveness_scores),
+            'recovery_progress': list(self.recovery_progress),
+            'conversation_summary': {
+                'summary': self.conversation_summarizer.summary,
+                'summarized_turns': self.conversation_summarizer.summarized_turns
+            } if self.conversation_summarizer else None
+        }
+    
+    def _apply_recovery_state(self, state: Dict[str, Any]):
+        """把日志中的状态快照恢复到当前会话"""
+        self.initial_depression_level = state.get('initial_depression_level', self.initial_depression_level)
+        self.current_depression_level = state.get('current_depression_level', self.current_depression_level)
+        self.therapeutic_alliance_score = state.get('therapeutic_alliance_score', self.therapeutic_alliance_score)
+        self.session_effectiveness_scores = list(state.get('session_effectiveness_scores', []))
+        self.recovery_progress = list(state.get('recovery_progress', []))
+        summary_state = state.get('conversation_summary')
+        if self.conversation_summarizer and summary_state:
+            self.conversation_summarizer.summary = summary_state.get('summary', '')
+            self.conversation_summarizer.summarized_turns = summary_state.get('summarized_turns', 0)
+    
+    def _journal_record(self, record_type: str, data: Dict[str, Any]):
+        """写入一条会话日志（首次写入时创建日志并记录会话来源）；写入失败不影响会话"""
+        try:
+            if self.session_journal is None:
+                patient_name = (self.patient_data or {}).get('name', 'patient')
+                session_id = f"{self.session_log_prefix}_{patient_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+                session_id = session_id.replace(" ", "_").replace("(", "").replace(")", "")
+                # 同一患者的多个Web会话可能在同一秒开始，日志文件名不能重复
+                base_id, suffix = session_id, 1
+                while SessionJournal.path_for(self._get_session_log_dir(), session_id).exists():
+                    session_id = f"{base_id}_{suffix}"
+                    suffix += 1
+                self.session_journal = SessionJournal.from_config(
+                    SessionJournal.path_for(self._get_session_log_dir(), session_id), self.journal_settings)
+                if self.session_journal is None:
+                    return
+                self.session_journal.record('start', {
+                    'session_type': 'human',
+                    'session_id': session_id,
+                    'session_prefix': self.session_log_prefix,
+                    'patient_file': str(self.current_patient_file_path) if self.current_patient_file_path else None,
+                    'load_type': self.loaded_data_type,
+                    'simulation_id': self.current_simulation_id
+                }, sync=True)
+            self.session_journal.record(record_type, data)
+        except Exception as e:
+            console.print(f"[yellow]写入会话日志失败: {e}[/yellow]")
+    
+    def _journal_exchange(self, exchange: Dict[str, Any]):
+        """记录一轮对话及当时的会话状态"""
+        self._journal_record('turn', {'exchange': exchange, 'state': self._get_recovery_state()})
+    
+    def _journal_state(self):
+        """效果评估或抑郁程度更新后记录最新的会话状态"""
+        if self.session_journal is not None:
+            self._journal_record('state', self._get_recovery_state())
+    
+    def _close_session_journal(self):
+        """关闭当前会话日志（未压缩，之后仍可恢复）"""
+        if self.session_journal is not None:
+            self.session_journal.close()
+            self.session_journal = None
+    
+    @classmethod
+    def resume_from_journal(cls, journal_path: Union[str, Path], ai_client=None) -> "TherapySessionManager":
+        """从会话日志重建管理器：重新加载患者数据并回放已记录的对话和状态，之后的轮次继续写入同一日志"""
+        start, records, _ = SessionJournal.load(journal_path)
+        manager = cls(ai_client=ai_client)
+        if not start.get('patient_file') or not manager.load_patient_data_from_file(
+                start['patient_file'], start.get('load_type') or "auto"):
+            raise ValueError(f"无法加载会话日志中的患者数据: {start.get('patient_file')}")
+        manager._initialize_recovery_tracking()
+        manager.session_log_prefix = start.get('session_prefix', manager.session_log_prefix)
+        
+        for record in records:
+            data = record.get('data', {})
+            if record.get('type') == 'turn':
+                manager.conversation_history.append(data['exchange'])
+                manager._apply_recovery_state(data.get('state', {}))
+            elif record.get('type') == 'state':
+                manager._apply_recovery_state(data)
+        
+        manager.session_journal = SessionJournal.from_config(journal_path, manager.journal_settings)
+        if manager.session_journal is not None:
+            manager.session_journal.record('resume', {'restored_exchanges': len(manager.conversation_history)}, sync=True)
+        console.print(f"[green]已从会话日志恢复 {len(manager.conversation_history)} 轮对话: {journal_path}[/green]")
+        return manager
+    
+    def export_session_state(self) -> Dict[str, Any]:
+        """可序列化的会话快照（患者数据来源、对话历史和会话状态），供Web会话存储换出到磁盘"""
+        return {
+            'patient_file': str(self.current_patient_file_path) if self.current_patient_file_path else None,
+            'load_type': self.loaded_data_type,
+            'session_prefix': self.session_log_prefix,
+            'conversation_history': list(self.conversation_history),
+            'state': self._get_recovery_state(),
+            'journal_path': str(self.session_journal.path) if self.session_journal is not None else None
+        }
+    
+    @classmethod
+    def from_session_state(cls, snapshot: Dict[str, Any], ai_client=None) -> "TherapySessionManager":
+        """按会话快照重建管理器：重新加载患者数据并恢复对话和状态，之后的轮次继续写入原有日志"""
+        manager = cls(ai_client=ai_client)
+        if not snapshot.get('patient_file') or not manager.load_patient_data_from_file(
+                snapshot['patient_file'], snapshot.get('load_type') or "auto"):
+            raise ValueError(f"无法加载会话快照中的患者数据: {snapshot.get('patient_file')}")
+        manager.session_log_prefix = snapshot.get('session_prefix', manager.session_log_prefix)
+        manager.conversation_history = list(snapshot.get('conversation_history', []))
+        manager._apply_recovery_state(snapshot.get('state', {}))
+        if snapshot.get('journal_path'):
+            manager.session_journal = SessionJournal.from_config(snapshot['journal_path'], manager.journal_settings)
+        return manager
+    
+    async def compact_journal(self) -> Optional[Path]:
+        """把恢复的会话保存为会话记录JSON（与正常结束时相同），并结束日志"""
+        journal = self.session_journal
+        session_file_path = await self.save_session_log(session_id_prefix=self.session_log_prefix)
+        if session_file_path is None and journal is not None:
+            journal.mark_compacted(None)
+            self.session_journal = None
+        return session_file_path
+    
     def get_patient_info(self) -> Dict[str, Any]:
         """获取患者基本信息"""
         if not self.patient_data:
@@ -815,7 +998,8 @@ class TherapySessionManager:
             'total_exchanges': len(self.conversation_history),
             'therapeutic_alliance_score': self.therapeutic_alliance_score,
             'current_depression_level': self.current_depression_level or 'MODERATE',
-            'session_effectiveness_scores': self.session_effectiveness_scores
+            'session_effectiveness_scores': self.session_effectiveness_scores,
+            'prompt_cache': self.get_prompt_cache_stats()
         }
     
     def get_dialogue_history(self) -> List[Dict[str, Any]]:
@@ -858,13 +1042,8 @@ class TherapySessionManager:
             console.print("[yellow]没有对话记录可保存。[/yellow]")
             return None
 
-        # 决定保存路径
-        if self.current_simulation_id and self.current_patient_file_path:
-            # 保存到原始报告所在的模拟子目录中
-            target_dir = self.current_patient_file_path.parent 
-        else:
-            # 回退到主 logs 目录
-            target_dir = Path("logs")
+        # 决定保存路径（原始报告所在的模拟子目录，或主 logs 目录）
+        target_dir = self._get_session_log_dir()
         
         target_dir.mkdir(parents=True, exist_ok=True)
         
@@ -893,20 +1072,26 @@ class TherapySessionManager:
             "patient_background_at_start": self.patient_data,
             "conversation": self.conversation_history,
             "recovery_progress": self.recovery_progress,
-            "session_effectiveness_scores": self.session_effectiveness_scores
+            "session_effectiveness_scores": self.session_effectiveness_scores,
+            "prompt_cache": self.get_prompt_cache_stats()
         }
         
         try:
             with open(session_file_path, 'w', encoding='utf-8') as f:
                 json.dump(session_data, f, ensure_ascii=False, indent=2)
             console.print(f"[green]咨询记录已保存到: {session_file_path}[/green]")
+            # 完整记录已保存，结束会话日志
+            if self.session_journal is not None:
+                self.session_journal.mark_compacted(session_file_path)
+                self.session_journal = None
             return session_file_path
         except Exception as e:
             console.print(f"[red]保存咨询记录失败到 {session_file_path}: {e}[/red]")
             return None
 
-    async def start_interactive_session(self, provide_supervision: bool = None, supervision_interval: int = None):
-        """开始一个交互式的心理咨询会话。"""
+    async def start_interactive_session(self, provide_supervision: bool = None, supervision_interval: int = None,
+                                        continue_session: bool = False):
+        """开始一个交互式的心理咨询会话（continue_session为True时继续从会话日志恢复的对话）。"""
         if not self.patient_data:
             console.print("[red]错误: 患者数据未加载。请先调用 load_patient_data_from_file() 方法。[/red]")
             return
@@ -915,10 +1100,15 @@ class TherapySessionManager:
         provide_supervision  = provide_supervision if provide_supervision is not None else self.enable_supervision
         supervision_interval = supervision_interval if supervision_interval is not None else self.supervision_interval
 
-        self.conversation_history = [] # 开始新会话前清空历史
-        
-        # 初始化恢复追踪
-        self._initialize_recovery_tracking()
+        if not continue_session:
+            self.conversation_history = [] # 开始新会话前清空历史
+            if self.conversation_summarizer:
+                self.conversation_summarizer.reset()
+            self._close_session_journal()
+            self.session_log_prefix = f"therapy_session_{self.patient_data.get('name', 'patient')}"
+            
+            # 初始化恢复追踪
+            self._initialize_recovery_tracking()
         
         console.print(Panel(
             f"[bold blue]与 {self.patient_data.get('name', '李明')} 的心理咨询已开始[/bold blue]\n\n"
@@ -971,6 +1161,8 @@ class TherapySessionManager:
                     "patient": patient_response,
                     "timestamp": datetime.now().isoformat()
                 })
+                self._update_conversation_summary()
+                self._journal_exchange(self.conversation_history[-1])
                 
                 # 每supervision_interval轮对话进行一次评估和督导
                 if len(self.conversation_history) % supervision_interval == 0:
@@ -1006,10 +1198,12 @@ class TherapySessionManager:
                             expand=False
                         ))
                         console.print()
+                    self._journal_state()
                 
                 # 每5轮对话检查是否可以更新抑郁程度
                 if len(self.conversation_history) % 5 == 0:
                     self._update_depression_level()
+                    self._journal_state()
 
         except KeyboardInterrupt:
             console.print("\n[yellow]咨询被用户中断。[/yellow]")
@@ -1017,7 +1211,11 @@ class TherapySessionManager:
             console.print(f"[red]咨询过程中发生意外错误: {e}[/red]")
         finally:
             if self.conversation_history:
-                await self.save_session_log(session_id_prefix=f"therapy_session_{self.patient_data.get('name', 'patient')}")
+                await self.save_session_log(session_id_prefix=self.session_log_prefix)
+                cache_stats = self.get_prompt_cache_stats()
+                provider_hit_rate = (cache_stats["provider"] or {}).get("prefix_cache_hit_rate")
+                console.print(f"[dim]提示词静态前缀占比: {cache_stats['static_prefix_ratio']:.0%}，"
+                              f"提供方前缀缓存命中率: {f'{provider_hit_rate:.0%}' if provider_hit_rate is not None else '未提供'}[/dim]")
             console.print("感谢使用本咨询模块。")
 
     def _initialize_recovery_tracking(self):
@@ -15,6 +15,7 @@ from dataclasses import dataclass, asdict
 
 from .ai_to_ai_therapy_manager import AIToAITherapyManager, TherapyProgress, DialogueTurn
 from .therapy_session_manager import TherapySessionManager
+from .session_journal import SessionJournal
 from utils.psychology_display import format_psychological_state_for_web
 
 
@@ -53,6 +54,7 @@ class WebTherapyManager:
         self.session_id = f"web_therapy_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         self.messages: List[WebTherapyMessage] = []
         self.current_turn = 0
+        self._journaled_messages = 0  # 已写入会话日志的消息数
         
     def _send_message(self, msg_type: str, content: str, metadata: Dict[str, Any] = None):
         """发送消息到Web界面"""
@@ -163,10 +165,13 @@ class WebTherapyManager:
             
             self._send_message('system', '🚀 正在启动AI对AI治疗会话...')
             
-            # 修改原始治疗管理器以支持Web回调
-            original_dialogue_history = []
+            # 会话日志与Web会话记录保存在同一模拟目录（从日志恢复时沿用原有日志）
+            self.therapy_manager.max_turns = max_turns
+            if self.therapy_manager.session_journal is None:
+                self.therapy_manager._open_journal(self._get_session_dir(), "web_ai_to_ai", self.session_id)
             
-            for turn in range(1, max_turns + 1):
+            # 从会话日志恢复时从下一轮继续
+            for turn in range(self.current_turn + 1, max_turns + 1):
                 self.current_turn = turn
                 
                 # 发送回合开始信息
@@ -216,13 +221,16 @@ class WebTherapyManager:
                     patient_state_change=patient_state
                 )
                 self.therapy_manager.dialogue_history.append(dialogue_turn)
+                self.therapy_manager._journal_turn(dialogue_turn, {'web_messages': self._take_unjournaled_messages()})
                 
                 # 评估治疗进展
+                progress = None
                 if turn % self.therapy_manager.evaluation_interval == 0:
                     self._send_message('system', '📈 正在评估治疗进展...')
                     progress = await self.therapy_manager._evaluate_therapy_progress()
                     self._send_therapy_progress(progress)
                     self.therapy_manager.progress_history.append(progress)
+                self.therapy_manager._journal_turn_analysis(dialogue_turn, progress)
                 
                 # 短暂延迟以便Web界面显示
                 await asyncio.sleep(1)
@@ -230,14 +238,7 @@ class WebTherapyManager:
             # 生成最终总结
             self._send_message('system', '📋 正在生成治疗总结...')
             
-            final_summary = {
-                'session_id': self.session_id,
-                'total_turns': max_turns,
-                'patient_name': patient_name,
-                'average_effectiveness': sum(d.therapy_analysis.get('overall_effectiveness', 0) 
-                                           for d in self.therapy_manager.dialogue_history) / len(self.therapy_manager.dialogue_history),
-                'final_progress': self.therapy_manager.progress_history[-1] if self.therapy_manager.progress_history else None
-            }
+            final_summary = self._build_final_summary(patient_name, max_turns)
             
             # 保存会话记录
             self._save_web_session_log(final_summary)
@@ -250,15 +251,64 @@ class WebTherapyManager:
             self._send_message('system', f'❌ 治疗会话出错: {str(e)}')
             raise
     
-    def _save_web_session_log(self, summary: Dict[str, Any]):
-        """保存Web会话记录"""
+    def _build_final_summary(self, patient_name: str, total_turns: int) -> Dict[str, Any]:
+        """生成会话总结"""
+        return {
+            'session_id': self.session_id,
+            'total_turns': total_turns,
+            'patient_name': patient_name,
+            'average_effectiveness': sum(d.therapy_analysis.get('overall_effectiveness', 0) 
+                                       for d in self.therapy_manager.dialogue_history) / len(self.therapy_manager.dialogue_history),
+            'final_progress': asdict(self.therapy_manager.progress_history[-1]) if self.therapy_manager.progress_history else None
+        }
+    
+    def _get_session_dir(self) -> Path:
+        """Web会话记录保存在对应的模拟目录"""
+        return Path(self.patient_log_path).parent
+    
+    def _take_unjournaled_messages(self) -> List[Dict[str, Any]]:
+        """取出尚未写入会话日志的Web消息"""
+        messages = [msg.to_dict() for msg in self.messages[self._journaled_messages:]]
+        self._journaled_messages = len(self.messages)
+        return messages
+    
+    @classmethod
+    def resume_from_journal(cls, journal_path, ai_client=None,
+                            socketio_emit_func: Callable = None) -> "WebTherapyManager":
+        """从会话日志重建Web治疗管理器（包括已发送的Web消息），之后的轮次继续写入同一日志"""
+        start, records, _ = SessionJournal.load(journal_path)
+        manager = cls(ai_client, start['patient_log_path'], socketio_emit_func or (lambda event, data: None))
+        manager.session_id = start.get('session_id', manager.session_id)
+        therapy_manager = manager.therapy_manager
+        therapy_manager.max_turns = start.get('max_turns')
+        for turn_record in therapy_manager._replay_journal(records):
+            manager.messages.extend(WebTherapyMessage(**msg) for msg in turn_record.get('web_messages', []))
+        manager._journaled_messages = len(manager.messages)
+        manager.current_turn = therapy_manager.current_turn
+        therapy_manager._attach_journal(journal_path)
+        return manager
+    
+    @property
+    def max_turns(self) -> Optional[int]:
+        """会话总轮数（由底层治疗管理器记录）"""
+        return self.therapy_manager.max_turns
+    
+    async def compact_journal(self) -> Optional[Path]:
+        """把恢复的会话保存为Web会话记录JSON（与正常结束时相同），并结束日志"""
+        therapy_manager = self.therapy_manager
+        if not therapy_manager.dialogue_history:
+            if therapy_manager.session_journal is not None:
+                therapy_manager.session_journal.mark_compacted(None)
+                therapy_manager.session_journal = None
+            return None
+        patient_name = therapy_manager.patient_data.get('protagonist_character_profile', {}).get('name', '患者')
+        return self._save_web_session_log(self._build_final_summary(patient_name, len(therapy_manager.dialogue_history)))
+    
+    def _save_web_session_log(self, summary: Dict[str, Any]) -> Optional[Path]:
+        """保存Web会话记录（成功后结束会话日志）"""
         try:
             # 保存到对应的模拟目录
-            patient_log_path = Path(self.patient_log_path)
-            if patient_log_path.name == 'final_report.json':
-                sim_dir = patient_log_path.parent
-            else:
-                sim_dir = patient_log_path.parent
+            sim_dir = self._get_session_dir()
             
             # 创建Web会话记录
             web_session_file = sim_dir / f"web_therapy_{self.session_id}.json"
@@ -281,6 +331,12 @@ class WebTherapyManager:
                 
         except Exception as e:
             self._send_message('system', f'⚠️ 保存会话记录失败: {str(e)}')
+            return None
+        
+        if self.therapy_manager.session_journal is not None:
+            self.therapy_manager.session_journal.mark_compacted(web_session_file)
+            self.therapy_manager.session_journal = None
+        return web_session_file
 
 
 async def run_web_ai_to_ai_therapy(ai_client, patient_log_path: str, max_turns: int = 15, socketio_emit_func: Callable = None) -> Dict[str, Any]:
@@ -10,6 +10,7 @@ from models.psychological_model_base import (
     PsychologicalModelBase, ModelImpactResult, PsychologicalModelType
 )
 from models.psychology_models import LifeEvent, PsychologicalState, DepressionLevel, EmotionState
+from core.keyword_matcher import get_keyword_matcher
 
 
 class BasicRulesModel(PsychologicalModelBase):
@@ -135,13 +136,7 @@ class BasicRulesModel(PsychologicalModelBase):
     
     def _is_social_event(self, event: LifeEvent) -> bool:
         """判断是否为社交相关事件"""
-        social_keywords = [
-            "朋友", "同学", "老师", "父母", "家人", "聊天", "对话", 
-            "聚会", "活动", "合作", "冲突", "争吵", "表扬", "批评"
-        ]
-        
-        description = event.description.lower()
-        return any(keyword in description for keyword in social_keywords)
+        return get_keyword_matcher().has_any(event.description, "basic_rules.social")
     
     def _calculate_depression_change(self, 
                                    event: LifeEvent, 
@@ -10,6 +10,16 @@ from models.psychological_model_base import (
     PsychologicalModelBase, ModelImpactResult, PsychologicalModelType
 )
 from models.psychology_models import LifeEvent, PsychologicalState, DepressionLevel, EmotionState
+from core.keyword_matcher import get_keyword_matcher
+
+# CBT触发词类别（共享关键词表中的 cbt.<名称>）
+CBT_TRIGGER_SETS = (
+    "self_belief_triggers",
+    "world_belief_triggers",
+    "future_belief_triggers",
+    "social_triggers",
+    "academic_triggers"
+)
 
 
 class CADEnhancedModel(PsychologicalModelBase):
@@ -57,23 +67,11 @@ class CADEnhancedModel(PsychologicalModelBase):
         self.logger.info("CAD增强模型初始化完成")
     
     def _load_cbt_framework(self) -> Dict[str, List[str]]:
-        """加载CBT认知行为理论框架"""
+        """加载CBT认知行为理论框架（触发词来自共享关键词表的cbt分组）"""
+        matcher = get_keyword_matcher()
         return {
-            "self_belief_triggers": [
-                "批评", "失败", "考试", "成绩", "不及格", "差劲", "能力", "表现", "竞争"
-            ],
-            "world_belief_triggers": [
-                "霸凌", "孤立", "拒绝", "嘲笑", "排斥", "冷漠", "不公", "欺骗", "背叛"
-            ],
-            "future_belief_triggers": [
-                "前途", "未来", "希望", "绝望", "放弃", "机会", "目标", "梦想", "计划"
-            ],
-            "social_triggers": [
-                "朋友", "同学", "聚会", "活动", "合作", "团队", "交往", "关系", "沟通"
-            ],
-            "academic_triggers": [
-                "学习", "作业", "考试", "成绩", "老师", "课程", "知识", "理解", "记忆"
-            ]
+            name: matcher.keywords(f"cbt.{name}")
+            for name in CBT_TRIGGER_SETS
         }
     
     def supports_cad_state(self) -> bool:
@@ -172,29 +170,11 @@ class CADEnhancedModel(PsychologicalModelBase):
     
     def _analyze_event_triggers(self, event: LifeEvent) -> Dict[str, bool]:
         """分析事件触发的心理机制"""
-        description = event.description.lower()
+        matched = get_keyword_matcher().match(event.description)
         
         return {
-            "self_belief_triggered": any(
-                trigger in description 
-                for trigger in self.cbt_framework["self_belief_triggers"]
-            ),
-            "world_belief_triggered": any(
-                trigger in description 
-                for trigger in self.cbt_framework["world_belief_triggers"]
-            ),
-            "future_belief_triggered": any(
-                trigger in description 
-                for trigger in self.cbt_framework["future_belief_triggers"]
-            ),
-            "social_triggered": any(
-                trigger in description 
-                for trigger in self.cbt_framework["social_triggers"]
-            ),
-            "academic_triggered": any(
-                trigger in description 
-                for trigger in self.cbt_framework["academic_triggers"]
-            )
+            f"{name[:-len('_triggers')]}_triggered": f"cbt.{name}" in matched
+            for name in CBT_TRIGGER_SETS
         }
     
     def _calculate_affective_tone_impact(self, 
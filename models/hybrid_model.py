@@ -33,9 +33,17 @@ class HybridModel(PsychologicalModelBase):
             "llm_weight": 0.3,              # LLM评估权重
             
             # LLM使用策略
-            "llm_trigger_threshold": 3,     # 触发LLM的事件重要性阈值
-            "llm_frequency": 0.5,           # LLM使用频率 (0-1)
+            "llm_policy": "static",         # static: 固定阈值+频率; adaptive: 按事件类型的历史分歧分配调用
+            "llm_trigger_threshold": 3,     # 触发LLM的事件重要性阈值（static策略）
+            "llm_frequency": 0.5,           # LLM使用频率 (0-1)（static策略）
             "llm_timeout": 15,              # LLM超时时间（秒）
+            "llm_call_budget": None,        # 单次模拟的LLM评估次数上限（None表示不限）
+            "llm_token_budget": None,       # 单次模拟的估算token上限（None表示不限）
+            "policy_critical_impact": 8,    # 影响分数绝对值达到该值的事件总是调用LLM
+            "policy_min_samples": 3,        # 每种事件类型先收集的LLM结果数
+            "policy_divergence_target": 0.5, # 历史分歧达到该值时该类型事件总是调用LLM
+            "policy_min_probability": 0.1,  # 分歧很小的事件类型的最低抽查概率
+            "policy_ewma_alpha": 0.3,       # 分歧滑动平均系数
             
             # 一致性检查
             "consistency_threshold": 2.0,   # 模型间一致性阈值
@@ -48,6 +56,11 @@ class HybridModel(PsychologicalModelBase):
             # 性能优化
             "enable_parallel_processing": True, # 启用并行处理
             "cache_llm_results": True,      # 缓存LLM结果
+            "llm_cache_size": None,         # 缓存条数（None时使用performance_optimization.cache_size）
+            "llm_cache_ttl_minutes": None,  # 缓存有效期（None时使用performance_optimization.cache_ttl_minutes）
+            "llm_cache_state_tolerance": 1.0, # 心理状态量化步长（越大越容易命中）
+            "use_surrogate": True,          # 代理模型置信度足够时跳过LLM
+            "surrogate_confidence_threshold": None, # None时使用surrogate_model.skip_llm_confidence
         }
         
         # 合并用户配置
@@ -57,6 +70,11 @@ class HybridModel(PsychologicalModelBase):
         
         # 初始化子模型
         self._initialize_sub_models()
+        self.llm_cache = self._create_llm_cache()
+        
+        # LLM调用策略（策略模块导入时会触发模型自动注册，其中包括本模块，延迟导入避免循环导入）
+        from models.llm_invocation_policy import LLMInvocationPolicy
+        self.llm_policy = LLMInvocationPolicy(self.config)
         
         # 权重历史记录（用于自适应调整）
         self.weight_history = []
@@ -95,10 +113,113 @@ class HybridModel(PsychologicalModelBase):
                 self.llm_model = None
                 self.logger.warning("未提供AI客户端，LLM模型不可用")
             
+            # 初始化代理模型（只有训练过的代理模型才用于替代LLM）
+            self.surrogate_model = None
+            self.surrogate_skips = 0
+            surrogate_config = self._get_surrogate_config()
+            if self.llm_model and self.config["use_surrogate"] and surrogate_config.get("enabled", False):
+                surrogate = ModelFactory.create_model(PsychologicalModelType.SURROGATE, {})
+                if surrogate.is_trained:
+                    self.surrogate_model = surrogate
+                    if self.config["surrogate_confidence_threshold"] is None:
+                        self.config["surrogate_confidence_threshold"] = surrogate_config.get("skip_llm_confidence", 0.75)
+            
         except Exception as e:
             self.logger.error(f"初始化子模型失败: {e}")
             raise e
     
+    def _get_surrogate_config(self) -> Dict[str, Any]:
+        """读取代理模型配置"""
+        try:
+            from core.llm_component_registry import get_llm_component_registry
+            return get_llm_component_registry().get_section("surrogate_model")
+        except Exception as e:
+            self.logger.warning(f"读取代理模型配置失败: {e}")
+            return {}
+    
+    async def _try_surrogate(self, 
+                           event: LifeEvent, 
+                           current_state: PsychologicalState,
+                           context: Dict[str, Any]) -> Optional[ModelImpactResult]:
+        """代理模型置信度达到阈值时返回其结果（用于替代LLM评估），否则返回None"""
+        if self.surrogate_model is None:
+            return None
+        try:
+            result = await self.surrogate_model.calculate_impact(event, current_state, context)
+        except Exception as e:
+            self.logger.warning(f"代理模型预测失败: {e}")
+            return None
+        if result.confidence < self.config["surrogate_confidence_threshold"]:
+            return None
+        self.surrogate_skips += 1
+        return result
+    
+    def _create_llm_cache(self) -> Optional["LLMResultCache"]:
+        """按配置创建LLM结果缓存（cache_llm_results或performance_optimization.enable_caching关闭时不缓存）"""
+        if not self.llm_model or not self.config["cache_llm_results"]:
+            return None
+        # 缓存模块导入时会触发模型自动注册（其中包括本模块），延迟导入避免循环导入
+        from models.llm_result_cache import LLMResultCache
+        try:
+            from core.llm_component_registry import get_llm_component_registry
+            performance = get_llm_component_registry().get_section("performance_optimization")
+        except Exception as e:
+            self.logger.warning(f"读取性能优化配置失败，使用默认缓存参数: {e}")
+            performance = {}
+        if not performance.get("enable_caching", True):
+            return None
+
+        cache_size = self.config["llm_cache_size"] or performance.get("cache_size", 1000)
+        ttl_minutes = self.config["llm_cache_ttl_minutes"]
+        if ttl_minutes is None:
+            ttl_minutes = performance.get("cache_ttl_minutes", 60)
+        return LLMResultCache(
+            max_size=cache_size,
+            ttl_seconds=ttl_minutes * 60,
+            state_tolerance=self.config["llm_cache_state_tolerance"]
+        )
+    
+    async def _calculate_llm_impact(self, 
+                                  event: LifeEvent, 
+                                  current_state: PsychologicalState,
+                                  context: Dict[str, Any]) -> ModelImpactResult:
+        """调用LLM模型（启用缓存时先查缓存，缓存命中时归还_should_use_llm预留的调用预算）"""
+        if self.llm_cache is None:
+            return await self.llm_model.calculate_impact(event, current_state, context)
+        
+        computed = False
+        
+        async def compute() -> ModelImpactResult:
+            nonlocal computed
+            computed = True
+            return await self.llm_model.calculate_impact(event, current_state, context)
+        
+        result = await self.llm_cache.get_or_compute(event, current_state, context, compute)
+        if not computed:
+            self.llm_policy.release_call()
+        return result
+    
+    def start_simulation(self):
+        """新的模拟开始时重置LLM调用次数和估算token预算（保留已学到的分歧统计和缓存）"""
+        self.llm_policy.reset_budget()
+        if self.llm_model:
+            self.llm_model.start_simulation()
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """获取LLM结果缓存统计"""
+        if self.llm_cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.llm_cache.get_stats()}
+    
+    def get_model_info(self) -> Dict[str, Any]:
+        """获取模型信息（包含LLM缓存统计）"""
+        info = super().get_model_info()
+        info["statistics"]["llm_cache"] = self.get_cache_stats()
+        info["statistics"]["surrogate_skips"] = self.surrogate_skips
+        info["statistics"]["llm_policy"] = self.llm_policy.get_stats()
+        info["statistics"]["performance_metrics"] = dict(self.performance_metrics)
+        return info
+    
     def supports_cad_state(self) -> bool:
         """混合模型支持CAD状态"""
         return True
@@ -125,38 +246,22 @@ class HybridModel(PsychologicalModelBase):
         start_time = time.time()
         
         try:
-            # 决定是否使用LLM
+            # 决定是否使用LLM（代理模型足够可信时用代理结果替代）
             use_llm = self._should_use_llm(event, current_state)
+            surrogate_result = await self._try_surrogate(event, current_state, context) if use_llm else None
+            if surrogate_result:
+                use_llm = False
+                self.llm_policy.release_call()
             
             # 并行或串行计算各模型结果
             if self.config["enable_parallel_processing"] and use_llm:
                 results = await self._calculate_parallel(event, current_state, context, use_llm)
             else:
                 results = await self._calculate_sequential(event, current_state, context, use_llm)
+            if surrogate_result:
+                results["llm"] = surrogate_result
             
-            # 融合结果
-            hybrid_result = self._fusion_results(results, event)
-            
-            # 一致性检查
-            if self.config["enable_cross_validation"]:
-                self._validate_consistency(results)
-            
-            # 自适应权重调整
-            if self.config["enable_adaptive_weights"]:
-                self._adaptive_weight_adjustment(results, hybrid_result)
-            
-            # 设置元信息
-            hybrid_result.model_type = self.model_type.value
-            processing_time = (time.time() - start_time) * 1000
-            hybrid_result.processing_time = processing_time
-            
-            # 生成混合推理
-            hybrid_result.reasoning = self._generate_hybrid_reasoning(results, use_llm)
-            
-            # 记录统计信息
-            self._record_calculation(processing_time, True)
-            
-            return hybrid_result
+            return self._combine_results(results, event, use_llm, start_time)
             
         except Exception as e:
             processing_time = (time.time() - start_time) * 1000
@@ -166,25 +271,122 @@ class HybridModel(PsychologicalModelBase):
             # 回退到CAD模型
             return await self._fallback_to_cad(event, current_state, context, processing_time, str(e))
     
-    def _should_use_llm(self, event: LifeEvent, current_state: PsychologicalState) -> bool:
-        """决定是否使用LLM"""
-        if not self.llm_model:
-            return False
+    async def calculate_impacts_batch(self, 
+                                    events: List[LifeEvent], 
+                                    current_state: PsychologicalState,
+                                    context: Dict[str, Any] = None) -> List[ModelImpactResult]:
+        """
+        在日终屏障处一次性计算多个事件的影响
+        
+        需要LLM评估的事件合并为一次批量调用（见LLMDrivenModel.calculate_impacts_batch的顺序语义），
+        规则和CAD子模型逐个事件基于传入状态计算。返回结果与events一一对应，调用方应按顺序应用。
+        批量调用失败或超时时，这些事件按各自的规则+CAD结果融合。
+        """
+        if not events:
+            return []
+        
+        use_llm = [self._should_use_llm(event, current_state) for event in events]
+        llm_results: List[Optional[ModelImpactResult]] = [None] * len(events)
+        for i, event in enumerate(events):
+            if use_llm[i]:
+                llm_results[i] = await self._try_surrogate(event, current_state, context)
+                use_llm[i] = llm_results[i] is None
+                if not use_llm[i]:
+                    self.llm_policy.release_call()
+        llm_indexes = [i for i, flag in enumerate(use_llm) if flag]
+        
+        # 先查缓存（同一批次中相同的事件只评估一次），只把未命中的事件交给批量调用
+        if llm_indexes and self.llm_cache is not None:
+            keys, cached, pending = self.llm_cache.lookup_batch(
+                [events[i] for i in llm_indexes], current_state, context
+            )
+        else:
+            keys, cached, pending = None, [None] * len(llm_indexes), list(range(len(llm_indexes)))
+        
+        # 逐个事件的决策已预留调用预算，由缓存（含同批次的重复事件）提供结果的归还预算
+        self.llm_policy.release_call(len(llm_indexes) - len(pending))
+        computed: Dict[int, ModelImpactResult] = {}
+        if pending:
+            try:
+                batch_results = await asyncio.wait_for(
+                    self.llm_model.calculate_impacts_batch(
+                        [events[llm_indexes[j]] for j in pending], current_state, context
+                    ),
+                    timeout=self.config["llm_timeout"] * len(pending)
+                )
+                computed = dict(zip(pending, batch_results))
+            except Exception as e:
+                self.logger.warning(f"LLM批量评估失败: {e}")
+        
+        if keys is not None:
+            # 与单事件路径一致，按批次开始时的状态写入缓存
+            cached = self.llm_cache.put_batch(keys, cached, computed)
+        else:
+            cached = [computed.get(j) for j in range(len(llm_indexes))]
+        for i, result in zip(llm_indexes, cached):
+            llm_results[i] = result
+            use_llm[i] = result is not None
+        
+        results = []
+        for event, flag, llm_result in zip(events, use_llm, llm_results):
+            start_time = time.time()
+            try:
+                sub_results = await self._calculate_sequential(event, current_state, context, False)
+                sub_results["llm"] = llm_result
+                results.append(self._combine_results(sub_results, event, flag, start_time))
+            except Exception as e:
+                processing_time = (time.time() - start_time) * 1000
+                self._record_calculation(processing_time, False)
+                self.logger.error(f"混合模型计算失败: {e}")
+                results.append(await self._fallback_to_cad(event, current_state, context, processing_time, str(e)))
         
-        # 基于事件重要性
-        if abs(event.impact_score) >= self.config["llm_trigger_threshold"]:
-            return True
+        return results
+    
+    def _combine_results(self, 
+                         results: Dict[str, ModelImpactResult], 
+                         event: LifeEvent,
+                         use_llm: bool,
+                         start_time: float) -> ModelImpactResult:
+        """融合各子模型结果并设置元信息"""
+        # 融合结果
+        hybrid_result = self._fusion_results(results, event)
+        
+        # 一致性检查
+        if self.config["enable_cross_validation"]:
+            self._validate_consistency(results)
+        
+        # 记录LLM与规则侧的分歧（只统计真实的LLM评估）
+        if self._is_llm_assessment(results.get("llm")):
+            self.llm_policy.observe(event, results)
+        
+        # 自适应权重调整
+        if self.config["enable_adaptive_weights"]:
+            self._adaptive_weight_adjustment(results, hybrid_result)
         
-        # 基于当前状态严重程度
-        if current_state.depression_level.value >= 3:
-            return True
+        # 设置元信息
+        hybrid_result.model_type = self.model_type.value
+        processing_time = (time.time() - start_time) * 1000
+        hybrid_result.processing_time = processing_time
         
-        # 基于随机频率
-        import random
-        if random.random() < self.config["llm_frequency"]:
-            return True
+        # 生成混合推理
+        hybrid_result.reasoning = self._generate_hybrid_reasoning(results, use_llm)
         
-        return False
+        # 记录统计信息
+        self._record_calculation(processing_time, True)
+        
+        return hybrid_result
+    
+    def _should_use_llm(self, event: LifeEvent, current_state: PsychologicalState) -> bool:
+        """决定是否使用LLM（由LLM调用策略决定，并受调用/token预算约束）"""
+        if not self.llm_model:
+            return False
+        return self.llm_policy.should_call(
+            event, current_state, getattr(self.llm_model, "estimated_tokens_used", 0.0)
+        )
+    
+    def _is_llm_assessment(self, result: Optional[ModelImpactResult]) -> bool:
+        """是否为LLM模型的正常评估结果（不含回退结果和代理模型结果）"""
+        return result is not None and result.model_type == PsychologicalModelType.LLM_DRIVEN.value
     
     async def _calculate_parallel(self, 
                                 event: LifeEvent, 
@@ -208,7 +410,7 @@ class HybridModel(PsychologicalModelBase):
         if use_llm:
             tasks.append(asyncio.create_task(
                 asyncio.wait_for(
-                    self.llm_model.calculate_impact(event, current_state, context),
+                    self._calculate_llm_impact(event, current_state, context),
                     timeout=self.config["llm_timeout"]
                 )
             ))
@@ -261,7 +463,7 @@ class HybridModel(PsychologicalModelBase):
         if use_llm:
             try:
                 results["llm"] = await asyncio.wait_for(
-                    self.llm_model.calculate_impact(event, current_state, context),
+                    self._calculate_llm_impact(event, current_state, context),
                     timeout=self.config["llm_timeout"]
                 )
             except Exception as e:
@@ -399,10 +601,29 @@ class HybridModel(PsychologicalModelBase):
     def _adaptive_weight_adjustment(self, 
                                   results: Dict[str, ModelImpactResult],
                                   fusion_result: ModelImpactResult):
-        """自适应权重调整"""
-        # 这里可以实现基于结果质量的权重调整逻辑
-        # 暂时保持简单实现
-        pass
+        """
+        自适应权重调整
+        
+        以LLM评估为参照，用指数滑动平均更新基础规则和CAD模型的准确度
+        （准确度 = 1 / (1 + 与LLM结果的平均绝对差)），_get_current_weights据此调整融合权重。
+        """
+        llm_result = results.get("llm")
+        if not self._is_llm_assessment(llm_result):
+            return
+        
+        from models.llm_invocation_policy import field_divergence, BASIC_FIELDS, CAD_FIELDS
+        rate = self.config["weight_adjustment_rate"]
+        for model_name, fields in (("basic_rules", BASIC_FIELDS), ("cad", BASIC_FIELDS + CAD_FIELDS)):
+            result = results.get(model_name)
+            if result is None:
+                continue
+            agreement = 1.0 / (1.0 + field_divergence(result, llm_result, fields))
+            key = f"{model_name}_accuracy"
+            self.performance_metrics[key] = (1 - rate) * self.performance_metrics[key] + rate * agreement
+        
+        self.weight_history.append(dict(self.performance_metrics))
+        if len(self.weight_history) > 100:
+            self.weight_history = self.weight_history[-100:]
     
     def _generate_hybrid_reasoning(self, 
                                  results: Dict[str, ModelImpactResult],
@@ -424,6 +645,8 @@ class HybridModel(PsychologicalModelBase):
             reasoning_parts.append("包含LLM深度分析")
         elif used_llm:
             reasoning_parts.append("LLM分析失败，使用规则+CAD")
+        elif results.get("llm"):
+            reasoning_parts.append("代理模型置信度足够，替代LLM分析")
         else:
             reasoning_parts.append("基于规则+CAD快速分析")
         
@@ -38,6 +38,8 @@ class LLMDrivenModel(PsychologicalModelBase):
             "enable_detailed_analysis": True,  # 启用详细分析
             "enable_risk_assessment": True,    # 启用风险评估
             "context_window_size": 5,      # 上下文窗口大小
+            "max_batch_size": 6,           # 批量评估时单次请求的最大事件数
+            "chars_per_token": 1.5,        # 估算token用量时每个token对应的字符数
         }
         
         # 合并用户配置
@@ -48,9 +50,16 @@ class LLMDrivenModel(PsychologicalModelBase):
         # 加载心理学理论提示模板
         self.prompt_templates = self._load_prompt_templates()
         
+        # 估算的累计token用量（提示+回复字符数 / chars_per_token）
+        self.estimated_tokens_used = 0.0
+        
         self.is_initialized = True
         self.logger.info("LLM驱动模型初始化完成")
     
+    def start_simulation(self):
+        """新的模拟开始时重置估算的token用量"""
+        self.estimated_tokens_used = 0.0
+    
     def _load_prompt_templates(self) -> Dict[str, str]:
         """加载LLM提示模板"""
         return {
@@ -135,6 +144,69 @@ class LLMDrivenModel(PsychologicalModelBase):
 - 基于循证心理学原理评估
 - 重点关注认知模式变化""",
             
+            "batch_assessment_prompt": """
+患者基本信息：
+- 年龄：{age}岁
+- 人格特质：{personality}
+- 当前抑郁程度：{depression_level}
+- 当前焦虑水平：{anxiety_level}
+- 自尊水平：{self_esteem}
+- 社交连接：{social_connection}
+
+当前认知-情感状态(CAD)：
+- 情感基调：{affective_tone}/10 (负值=悲观)
+- 自我信念：{self_belief}/10 (负值=负面自我观)
+- 世界信念：{world_belief}/10 (负值=世界悲观)
+- 未来信念：{future_belief}/10 (负值=未来悲观)
+- 思维反刍：{rumination}/10
+- 认知扭曲：{distortions}/10
+- 社交退缩：{social_withdrawal}/10
+- 动机缺失：{avolition}/10
+
+最近重要事件：
+{recent_events}
+
+今天按时间顺序依次发生了以下{event_count}个事件：
+{events_block}
+
+请基于CBT理论和贝克认知三角，按顺序逐个评估每个事件的心理影响。
+评估第N个事件时，假设第1到N-1个事件已经发生、其影响已经作用在患者身上；
+每个事件只给出它本身带来的增量变化（不要把前面事件的影响重复计入）。
+
+输出JSON格式（assessments按事件编号顺序，每个事件一项）：
+{{
+  "assessments": [
+    {{
+      "index": 事件编号,
+      "basic_psychological_impact": {{
+        "depression_change": 数值(-3.0到3.0),
+        "anxiety_change": 数值(-3.0到3.0),
+        "stress_change": 数值(-3.0到3.0),
+        "self_esteem_change": 数值(-3.0到3.0),
+        "social_connection_change": 数值(-3.0到3.0)
+      }},
+      "cad_state_impact": {{
+        "affective_tone_change": 数值(-2.0到2.0),
+        "self_belief_change": 数值(-2.0到2.0),
+        "world_belief_change": 数值(-2.0到2.0),
+        "future_belief_change": 数值(-2.0到2.0),
+        "rumination_change": 数值(-2.0到2.0),
+        "distortion_change": 数值(-2.0到2.0),
+        "social_withdrawal_change": 数值(-2.0到2.0),
+        "avolition_change": 数值(-2.0到2.0)
+      }},
+      "meta_analysis": {{
+        "confidence_level": 数值(0.0到1.0),
+        "reasoning": "简要的心理学分析（50-150字）"
+      }}
+    }}
+  ]
+}}
+
+注意：
+- 负值表示恶化，正值表示改善
+- 考虑同一天内事件的累积效应和个体韧性""",
+            
             "fallback_prompt": """基于以下信息，简要评估事件的心理影响：
 事件：{event_description}
 影响分数：{impact_score}
@@ -186,6 +258,9 @@ class LLMDrivenModel(PsychologicalModelBase):
             # 记录统计信息
             self._record_calculation(processing_time, True)
             
+            # 记录评估样本（供代理模型离线训练）
+            self._record_assessment(event, current_state, result)
+            
             return result
             
         except Exception as e:
@@ -196,11 +271,134 @@ class LLMDrivenModel(PsychologicalModelBase):
             # 返回回退结果
             return await self._generate_fallback_result(event, current_state, processing_time, str(e))
     
+    async def calculate_impacts_batch(self, 
+                                    events: List[LifeEvent], 
+                                    current_state: PsychologicalState,
+                                    context: Dict[str, Any] = None) -> List[ModelImpactResult]:
+        """
+        在一次结构化调用中评估多个事件（如一天内的全部事件）
+        
+        顺序语义：events按发生顺序排列，第i个结果是在前i-1个事件的影响已经作用后，
+        第i个事件带来的增量变化。调用方按顺序依次应用这些结果，与逐个调用calculate_impact
+        并在每次调用后更新状态等价（current_state为第一个事件发生前的状态）。
+        事件数超过max_batch_size时分多次请求，后一批以前一批之后的状态为前提由模型推断。
+        单个事件缺失或解析失败时，该事件回退到规则评估；整批失败时全部回退。
+        
+        Args:
+            events: 按发生顺序排列的生活事件
+            current_state: 第一个事件发生前的心理状态
+            context: 上下文信息
+            
+        Returns:
+            List[ModelImpactResult]: 与events一一对应的影响结果
+        """
+        results: List[ModelImpactResult] = []
+        batch_size = max(1, int(self.config["max_batch_size"]))
+        
+        for offset in range(0, len(events), batch_size):
+            batch = events[offset:offset + batch_size]
+            batch_context = dict(context or {})
+            if offset:
+                # 后续批次把本批之前已经评估过的当天事件作为最近事件提供给模型
+                batch_context["recent_events"] = list(batch_context.get("recent_events", [])) + [
+                    e.to_dict() for e in events[:offset]
+                ]
+            results.extend(await self._calculate_batch_chunk(batch, current_state, batch_context))
+        
+        return results
+    
+    async def _calculate_batch_chunk(self, 
+                                   events: List[LifeEvent], 
+                                   current_state: PsychologicalState,
+                                   context: Dict[str, Any]) -> List[ModelImpactResult]:
+        """评估一批事件（一次LLM调用）"""
+        start_time = time.time()
+        
+        try:
+            prompt = self._build_batch_assessment_prompt(events, current_state, context)
+            llm_response = await self._call_llm_with_retry(prompt)
+            assessments = self._parse_batch_response(llm_response, len(events))
+        except Exception as e:
+            self.logger.error(f"LLM批量评估失败，全部事件回退到规则评估: {e}")
+            assessments = [None] * len(events)
+        
+        processing_time = (time.time() - start_time) * 1000
+        per_event_time = processing_time / len(events)
+        
+        results = []
+        for event, result in zip(events, assessments):
+            if result is None:
+                result = self._rule_based_fallback(event)
+                result.model_type = self.model_type.value + "_fallback"
+                result.confidence = 0.3
+                result.reasoning = "LLM批量评估中缺少该事件的有效结果，使用规则回退"
+                self._record_calculation(per_event_time, False)
+            else:
+                result.model_type = self.model_type.value
+                self._record_calculation(per_event_time, True)
+            result.processing_time = per_event_time
+            results.append(result)
+        
+        # 只有批次中第一个事件的评估前提是current_state，仅记录它作为训练样本
+        if results and not results[0].model_type.endswith("_fallback"):
+            self._record_assessment(events[0], current_state, results[0])
+        
+        return results
+    
+    def _build_batch_assessment_prompt(self, 
+                                     events: List[LifeEvent], 
+                                     current_state: PsychologicalState,
+                                     context: Dict[str, Any] = None) -> str:
+        """构建批量评估提示"""
+        events_block = "\n".join(
+            f"{i}. 事件描述：{event.description}；参与者：{', '.join(event.participants) or '无'}；"
+            f"事件影响分数：{event.impact_score}"
+            for i, event in enumerate(events, 1)
+        )
+        return self.prompt_templates["batch_assessment_prompt"].format(
+            **self._build_state_fields(current_state, context),
+            event_count=len(events),
+            events_block=events_block
+        )
+    
+    def _parse_batch_response(self, response: str, event_count: int) -> List[Optional[ModelImpactResult]]:
+        """解析批量评估响应，返回按事件顺序排列的结果（无法解析的事件为None）"""
+        data = json.loads(self._extract_json_text(response))
+        assessments = data.get("assessments", []) if isinstance(data, dict) else data
+        if not isinstance(assessments, list):
+            raise ValueError("批量评估响应缺少assessments列表")
+        
+        results: List[Optional[ModelImpactResult]] = [None] * event_count
+        for position, item in enumerate(assessments):
+            if not isinstance(item, dict):
+                continue
+            try:
+                index = int(item.get("index", position + 1)) - 1
+            except (TypeError, ValueError):
+                index = position
+            if 0 <= index < event_count and results[index] is None:
+                try:
+                    results[index] = self._result_from_assessment(item)
+                except Exception as e:
+                    self.logger.warning(f"解析第{index + 1}个事件的评估失败: {e}")
+        return results
+    
     def _build_assessment_prompt(self, 
                                event: LifeEvent, 
                                current_state: PsychologicalState,
                                context: Dict[str, Any] = None) -> str:
         """构建LLM评估提示"""
+        return self.prompt_templates["assessment_prompt"].format(
+            **self._build_state_fields(current_state, context),
+            event_description=event.description,
+            participants=", ".join(event.participants),
+            impact_score=event.impact_score
+        )
+    
+    def _build_state_fields(self, 
+                            current_state: PsychologicalState,
+                            context: Dict[str, Any] = None) -> Dict[str, Any]:
+        """评估提示中与患者状态相关的字段"""
         
         # 获取角色信息
         character_info = context.get("character_info", {}) if context else {}
@@ -214,8 +412,7 @@ class LLMDrivenModel(PsychologicalModelBase):
         # 获取CAD状态
         cad_state = current_state.cad_state
         
-        # 构建完整提示
-        prompt = self.prompt_templates["assessment_prompt"].format(
+        return dict(
             age=age,
             personality=str(personality),
             depression_level=current_state.depression_level.name,
@@ -230,13 +427,8 @@ class LLMDrivenModel(PsychologicalModelBase):
             distortions=cad_state.cognitive_processing.distortions,
             social_withdrawal=cad_state.behavioral_inclination.social_withdrawal,
             avolition=cad_state.behavioral_inclination.avolition,
-            recent_events=recent_summary,
-            event_description=event.description,
-            participants=", ".join(event.participants),
-            impact_score=event.impact_score
+            recent_events=recent_summary
         )
-        
-        return prompt
     
     def _summarize_recent_events(self, recent_events: List[Dict]) -> str:
         """总结最近事件"""
@@ -268,6 +460,7 @@ class LLMDrivenModel(PsychologicalModelBase):
                     temperature=self.config["temperature"]
                 )
                 
+                self._count_tokens(system_prompt, prompt, response)
                 if response and response.strip():
                     return response
                 else:
@@ -282,65 +475,74 @@ class LLMDrivenModel(PsychologicalModelBase):
                 else:
                     raise e
     
+    def _count_tokens(self, *texts: Optional[str]):
+        """累加估算的token用量"""
+        chars = sum(len(text) for text in texts if text)
+        self.estimated_tokens_used += chars / self.config["chars_per_token"]
+    
     def _parse_llm_response(self, response: str, event: LifeEvent) -> ModelImpactResult:
         """解析LLM响应"""
         try:
-            # 清理响应文本
-            clean_response = response.strip()
-            if clean_response.startswith("```json"):
-                clean_response = clean_response[7:]
-            if clean_response.endswith("```"):
-                clean_response = clean_response[:-3]
-            clean_response = clean_response.strip()
-            
-            # 尝试找到JSON部分
-            if '{' in clean_response and '}' in clean_response:
-                start_idx = clean_response.find('{')
-                end_idx = clean_response.rfind('}') + 1
-                clean_response = clean_response[start_idx:end_idx]
-            
-            # 解析JSON
-            data = json.loads(clean_response)
-            
-            # 创建结果对象
-            result = ModelImpactResult()
-            
-            # 解析基础心理影响
-            basic_impact = data.get("basic_psychological_impact", {})
-            result.depression_change = self._clamp_value(basic_impact.get("depression_change", 0), -3.0, 3.0)
-            result.anxiety_change = self._clamp_value(basic_impact.get("anxiety_change", 0), -3.0, 3.0)
-            result.stress_change = self._clamp_value(basic_impact.get("stress_change", 0), -3.0, 3.0)
-            result.self_esteem_change = self._clamp_value(basic_impact.get("self_esteem_change", 0), -3.0, 3.0)
-            result.social_connection_change = self._clamp_value(basic_impact.get("social_connection_change", 0), -3.0, 3.0)
-            
-            # 解析CAD状态影响
-            cad_impact = data.get("cad_state_impact", {})
-            result.affective_tone_change = self._clamp_value(cad_impact.get("affective_tone_change", 0), -2.0, 2.0)
-            result.self_belief_change = self._clamp_value(cad_impact.get("self_belief_change", 0), -2.0, 2.0)
-            result.world_belief_change = self._clamp_value(cad_impact.get("world_belief_change", 0), -2.0, 2.0)
-            result.future_belief_change = self._clamp_value(cad_impact.get("future_belief_change", 0), -2.0, 2.0)
-            result.rumination_change = self._clamp_value(cad_impact.get("rumination_change", 0), -2.0, 2.0)
-            result.distortion_change = self._clamp_value(cad_impact.get("distortion_change", 0), -2.0, 2.0)
-            result.social_withdrawal_change = self._clamp_value(cad_impact.get("social_withdrawal_change", 0), -2.0, 2.0)
-            result.avolition_change = self._clamp_value(cad_impact.get("avolition_change", 0), -2.0, 2.0)
-            
-            # 解析元分析
-            meta_analysis = data.get("meta_analysis", {})
-            result.confidence = self._clamp_value(meta_analysis.get("confidence_level", 0.5), 0.0, 1.0)
-            result.reasoning = meta_analysis.get("reasoning", "LLM分析")
-            
-            # 检查置信度阈值
-            if result.confidence < self.config["confidence_threshold"]:
-                self.logger.warning(f"LLM评估置信度过低: {result.confidence}")
-                # 可以选择返回降级结果或继续使用
-            
-            self.logger.debug(f"LLM评估成功解析，置信度: {result.confidence:.2f}")
-            return result
+            data = json.loads(self._extract_json_text(response))
+            return self._result_from_assessment(data)
             
         except Exception as e:
             self.logger.error(f"解析LLM响应失败: {e}\n响应内容: {response[:200]}...")
             raise ValueError(f"LLM响应解析失败: {e}")
     
+    def _extract_json_text(self, response: str) -> str:
+        """清理响应文本并截取JSON部分"""
+        clean_response = response.strip()
+        if clean_response.startswith("```json"):
+            clean_response = clean_response[7:]
+        if clean_response.endswith("```"):
+            clean_response = clean_response[:-3]
+        clean_response = clean_response.strip()
+        
+        # 尝试找到JSON部分
+        if '{' in clean_response and '}' in clean_response:
+            start_idx = clean_response.find('{')
+            end_idx = clean_response.rfind('}') + 1
+            clean_response = clean_response[start_idx:end_idx]
+        return clean_response
+    
+    def _result_from_assessment(self, data: Dict[str, Any]) -> ModelImpactResult:
+        """把单个事件的评估JSON转换为影响结果"""
+        # 创建结果对象
+        result = ModelImpactResult()
+        
+        # 解析基础心理影响
+        basic_impact = data.get("basic_psychological_impact", {})
+        result.depression_change = self._clamp_value(basic_impact.get("depression_change", 0), -3.0, 3.0)
+        result.anxiety_change = self._clamp_value(basic_impact.get("anxiety_change", 0), -3.0, 3.0)
+        result.stress_change = self._clamp_value(basic_impact.get("stress_change", 0), -3.0, 3.0)
+        result.self_esteem_change = self._clamp_value(basic_impact.get("self_esteem_change", 0), -3.0, 3.0)
+        result.social_connection_change = self._clamp_value(basic_impact.get("social_connection_change", 0), -3.0, 3.0)
+        
+        # 解析CAD状态影响
+        cad_impact = data.get("cad_state_impact", {})
+        result.affective_tone_change = self._clamp_value(cad_impact.get("affective_tone_change", 0), -2.0, 2.0)
+        result.self_belief_change = self._clamp_value(cad_impact.get("self_belief_change", 0), -2.0, 2.0)
+        result.world_belief_change = self._clamp_value(cad_impact.get("world_belief_change", 0), -2.0, 2.0)
+        result.future_belief_change = self._clamp_value(cad_impact.get("future_belief_change", 0), -2.0, 2.0)
+        result.rumination_change = self._clamp_value(cad_impact.get("rumination_change", 0), -2.0, 2.0)
+        result.distortion_change = self._clamp_value(cad_impact.get("distortion_change", 0), -2.0, 2.0)
+        result.social_withdrawal_change = self._clamp_value(cad_impact.get("social_withdrawal_change", 0), -2.0, 2.0)
+        result.avolition_change = self._clamp_value(cad_impact.get("avolition_change", 0), -2.0, 2.0)
+        
+        # 解析元分析
+        meta_analysis = data.get("meta_analysis", {})
+        result.confidence = self._clamp_value(meta_analysis.get("confidence_level", 0.5), 0.0, 1.0)
+        result.reasoning = meta_analysis.get("reasoning", "LLM分析")
+        
+        # 检查置信度阈值
+        if result.confidence < self.config["confidence_threshold"]:
+            self.logger.warning(f"LLM评估置信度过低: {result.confidence}")
+            # 可以选择返回降级结果或继续使用
+        
+        self.logger.debug(f"LLM评估成功解析，置信度: {result.confidence:.2f}")
+        return result
+
     def _clamp_value(self, value: Any, min_val: float, max_val: float) -> float:
         """限制数值在指定范围内"""
         try:
@@ -363,6 +565,7 @@ class LLMDrivenModel(PsychologicalModelBase):
             )
             
             response = await self.ai_client.generate_response(fallback_prompt)
+            self._count_tokens(fallback_prompt, response)
             result = self._parse_simple_response(response)
             
         except Exception:
@@ -382,6 +585,12 @@ class LLMDrivenModel(PsychologicalModelBase):
         # 暂时返回基础结果
         return ModelImpactResult()
     
+    def _record_assessment(self, event: LifeEvent, current_state: PsychologicalState, result: ModelImpactResult):
+        """记录评估样本（供代理模型离线训练）"""
+        # 代理模型模块导入时会触发模型自动注册（其中包括本模块），延迟导入避免循环导入
+        from models.surrogate_model import get_assessment_recorder
+        get_assessment_recorder().record_model_result(event, current_state, result, self.model_type.value)
+    
     def _rule_based_fallback(self, event: LifeEvent) -> ModelImpactResult:
         """基于规则的回退方案"""
         result = ModelImpactResult()
@@ -0,0 +1,188 @@
+"""
+LLM调用策略
+混合模型按事件类型跟踪LLM结果与规则/CAD结果的分歧程度（指数滑动平均），
+把LLM调用花在历史分歧大的事件类型上，分歧小的类型以较低概率抽查；
+同时限制单次模拟的LLM调用次数和估算token数。
+"""
+
+import random
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from models.psychological_model_base import ModelImpactResult
+from models.psychology_models import LifeEvent, PsychologicalState
+
+BASIC_FIELDS = ("depression_change", "anxiety_change", "stress_change",
+                "self_esteem_change", "social_connection_change")
+CAD_FIELDS = ("affective_tone_change", "self_belief_change", "world_belief_change", "future_belief_change",
+              "rumination_change", "distortion_change", "social_withdrawal_change", "avolition_change")
+
+
+def field_divergence(a: ModelImpactResult, b: ModelImpactResult, fields=BASIC_FIELDS) -> float:
+    """两个结果在指定字段上的平均绝对差"""
+    return sum(abs(getattr(a, field) - getattr(b, field)) for field in fields) / len(fields)
+
+
+def result_divergence(results: Dict[str, Optional[ModelImpactResult]]) -> Optional[float]:
+    """
+    LLM结果与规则侧结果的平均绝对分歧
+
+    基础指标与基础规则/CAD结果的均值比较，CAD指标与CAD模型结果比较；没有LLM结果时返回None。
+    """
+    llm = results.get("llm")
+    rule_side = [r for r in (results.get("basic_rules"), results.get("cad")) if r is not None]
+    if llm is None or not rule_side:
+        return None
+
+    diffs = []
+    for field in BASIC_FIELDS:
+        reference = sum(getattr(r, field) for r in rule_side) / len(rule_side)
+        diffs.append(abs(getattr(llm, field) - reference))
+    cad = results.get("cad")
+    if cad is not None:
+        diffs.extend(abs(getattr(llm, field) - getattr(cad, field)) for field in CAD_FIELDS)
+    return sum(diffs) / len(diffs)
+
+
+@dataclass
+class EventTypeStats:
+    """某一事件类型的分歧统计"""
+    observations: int = 0
+    divergence: float = 0.0  # 指数滑动平均
+
+    def update(self, value: float, alpha: float):
+        if self.observations == 0:
+            self.divergence = value
+        else:
+            self.divergence = alpha * value + (1 - alpha) * self.divergence
+        self.observations += 1
+
+
+class LLMInvocationPolicy:
+    """自适应、受预算约束的LLM调用策略"""
+
+    def __init__(self, config: Dict[str, Any], rng: random.Random = None):
+        """
+        Args:
+            config: 混合模型配置（使用其中的llm_*与policy_*参数）
+            rng: 随机数生成器（便于复现）
+        """
+        self.config = config
+        self.rng = rng or random.Random()
+        self.type_stats: Dict[str, EventTypeStats] = {}
+        self.calls = 0
+        self.decisions = {"llm": 0, "skipped": 0, "budget_exhausted": 0}
+
+    # ---- 预算 ----
+
+    def remaining_calls(self) -> Optional[int]:
+        budget = self.config.get("llm_call_budget")
+        return None if budget is None else max(0, budget - self.calls)
+
+    def budget_exhausted(self, tokens_used: float = 0.0) -> bool:
+        """调用次数或估算token数是否已达上限"""
+        remaining = self.remaining_calls()
+        if remaining is not None and remaining <= 0:
+            return True
+        token_budget = self.config.get("llm_token_budget")
+        return token_budget is not None and tokens_used >= token_budget
+
+    def _budget_pressure(self) -> float:
+        """剩余调用预算越少，抽查概率越低（1.0表示无压力）"""
+        budget = self.config.get("llm_call_budget")
+        if not budget:
+            return 1.0
+        return max(0.0, 1.0 - self.calls / budget)
+
+    def reset_budget(self):
+        """开始新的模拟时重置预算计数（保留已学到的分歧统计）"""
+        self.calls = 0
+
+    # ---- 决策 ----
+
+    def should_call(self, event: LifeEvent, current_state: PsychologicalState, tokens_used: float = 0.0) -> bool:
+        """
+        决定本事件是否需要LLM评估
+
+        决定调用时立即预留一次调用预算（并发的评估不会同时通过预算检查），
+        之后由缓存命中或代理模型替代的评估应通过release_call归还。
+        """
+        if self.budget_exhausted(tokens_used):
+            self.decisions["budget_exhausted"] += 1
+            return False
+
+        if self.config.get("llm_policy", "static") == "static":
+            use_llm = self._static_decision(event, current_state)
+        else:
+            use_llm = self._adaptive_decision(event)
+
+        if use_llm and not self.reserve_calls(1):
+            return False
+        self.decisions["llm" if use_llm else "skipped"] += 1
+        return use_llm
+
+    def record_call(self, assessments: int = 1):
+        """计入实际发起的LLM评估"""
+        self.calls += assessments
+
+    def release_call(self, assessments: int = 1):
+        """归还已预留但未实际发起的LLM评估（缓存命中或代理模型替代）"""
+        self.calls = max(0, self.calls - assessments)
+
+    def reserve_calls(self, requested: int) -> int:
+        """按剩余调用预算预留调用，返回允许发起的评估数（超出部分计为预算耗尽）"""
+        remaining = self.remaining_calls()
+        allowed = requested if remaining is None else min(requested, remaining)
+        self.decisions["budget_exhausted"] += requested - allowed
+        self.record_call(allowed)
+        return allowed
+
+    def _static_decision(self, event: LifeEvent, current_state: PsychologicalState) -> bool:
+        """原有的固定规则：重要事件、重度抑郁或按频率随机"""
+        if abs(event.impact_score) >= self.config["llm_trigger_threshold"]:
+            return True
+        if current_state.depression_level.value >= 3:
+            return True
+        return self.rng.random() < self.config["llm_frequency"]
+
+    def _adaptive_decision(self, event: LifeEvent) -> bool:
+        """按事件类型的历史分歧决定调用概率"""
+        if abs(event.impact_score) >= self.config["policy_critical_impact"]:
+            return True
+
+        stats = self.type_stats.get(self._event_key(event))
+        if stats is None or stats.observations < self.config["policy_min_samples"]:
+            # 对新事件类型先收集若干次LLM结果
+            return True
+
+        probability = min(1.0, stats.divergence / self.config["policy_divergence_target"])
+        probability = max(self.config["policy_min_probability"], probability) * self._budget_pressure()
+        return self.rng.random() < probability
+
+    # ---- 学习 ----
+
+    def observe(self, event: LifeEvent, results: Dict[str, Optional[ModelImpactResult]]) -> Optional[float]:
+        """记录一次LLM结果与规则侧结果的分歧"""
+        divergence = result_divergence(results)
+        if divergence is not None:
+            self.type_stats.setdefault(self._event_key(event), EventTypeStats()).update(
+                divergence, self.config["policy_ewma_alpha"]
+            )
+        return divergence
+
+    @staticmethod
+    def _event_key(event: LifeEvent) -> str:
+        return getattr(event.event_type, "value", str(event.event_type))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        return {
+            "policy": self.config.get("llm_policy", "static"),
+            "calls": self.calls,
+            "remaining_calls": self.remaining_calls(),
+            "decisions": dict(self.decisions),
+            "divergence_by_event_type": {
+                key: {"observations": s.observations, "divergence": round(s.divergence, 4)}
+                for key, s in self.type_stats.items()
+            }
+        }
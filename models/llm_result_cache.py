@@ -0,0 +1,193 @@
+"""
+LLM评估结果缓存
+放在LLM驱动模型之前的记忆化层：以规范化的事件签名 + 粗粒度量化的CAD状态向量为键，
+相似事件在相近心理状态下重复出现时直接复用之前的LLM评估，减少混合模型的LLM调用。
+"""
+
+import asyncio
+import copy
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from models.psychological_model_base import ModelImpactResult
+from models.psychology_models import LifeEvent, PsychologicalState
+
+_DIGITS = re.compile(r'\d+')
+_IGNORED = re.compile(r'[\s，。！？、,.!?；;：:“”"\'（）()…—\-]+')
+
+
+def normalize_event_text(text: str) -> str:
+    """规范化事件描述：去除空白与标点，数字统一替换为#"""
+    text = _IGNORED.sub("", (text or "").lower())
+    return _DIGITS.sub("#", text)
+
+
+def event_signature(event: LifeEvent, context: Optional[Dict[str, Any]] = None) -> Tuple:
+    """事件签名：事件类型、规范化描述、参与者、影响分数以及角色（年龄+人格）"""
+    event_type = getattr(event.event_type, "value", event.event_type)
+    character_info = (context or {}).get("character_info", {}) or {}
+    character = hashlib.blake2b(
+        repr((character_info.get("age"), sorted((character_info.get("personality") or {}).items(), key=str)))
+        .encode("utf-8"),
+        digest_size=8
+    ).hexdigest()
+    return (
+        event_type,
+        normalize_event_text(event.description),
+        tuple(sorted(event.participants or [])),
+        event.impact_score,
+        character
+    )
+
+
+def quantized_state(state: PsychologicalState, tolerance: float = 1.0) -> Tuple:
+    """
+    粗粒度量化的心理状态向量
+
+    每个维度按tolerance分桶；抑郁等级不量化，等级不同的状态永远不会共用缓存。
+    """
+    step = tolerance if tolerance and tolerance > 0 else 1.0
+    values = [state.stress_level, state.self_esteem, state.social_connection]
+    values.extend(state.get_flattened_cad_state().values())
+    return (state.depression_level.value,) + tuple(int(round(v / step)) for v in values)
+
+
+class LLMResultCache:
+    """带TTL的LRU缓存，并合并同一键上并发进行中的评估"""
+
+    def __init__(self, max_size: int = 1000, ttl_seconds: float = 3600, state_tolerance: float = 1.0):
+        """
+        Args:
+            max_size: 最大缓存条数
+            ttl_seconds: 缓存有效期（秒），<=0表示不过期
+            state_tolerance: 心理状态量化步长，越大越容易命中
+        """
+        self.max_size = max(1, int(max_size))
+        self.ttl_seconds = ttl_seconds
+        self.state_tolerance = state_tolerance
+
+        self._entries: "OrderedDict[Tuple, Tuple[float, ModelImpactResult]]" = OrderedDict()
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0, "coalesced": 0}
+
+    def make_key(self, event: LifeEvent, state: PsychologicalState,
+                 context: Optional[Dict[str, Any]] = None) -> Tuple:
+        """缓存键：事件签名 + 量化状态"""
+        return event_signature(event, context), quantized_state(state, self.state_tolerance)
+
+    def get(self, key: Tuple) -> Optional[ModelImpactResult]:
+        """读取未过期的缓存结果（返回副本）"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, result = entry
+        if self.ttl_seconds > 0 and time.monotonic() - stored_at > self.ttl_seconds:
+            del self._entries[key]
+            self.stats["expired"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return copy.copy(result)
+
+    def put(self, key: Tuple, result: ModelImpactResult):
+        """写入缓存（LLM回退结果不缓存）"""
+        if result is None or result.model_type.endswith("_fallback"):
+            return
+        self._entries[key] = (time.monotonic(), copy.copy(result))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.stats["evicted"] += 1
+
+    async def get_or_compute(self, event: LifeEvent, state: PsychologicalState,
+                             context: Optional[Dict[str, Any]],
+                             compute: Callable[[], Awaitable[ModelImpactResult]]) -> ModelImpactResult:
+        """命中则直接返回缓存结果；同一键已有评估在进行时等待其结果，否则调用compute"""
+        key = self.make_key(event, state, context)
+        cached = self._hit(key)
+        if cached is not None:
+            return cached
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.stats["coalesced"] += 1
+            await asyncio.wait({pending})
+            if pending.cancelled():
+                raise RuntimeError("合并的LLM评估已取消")
+            return copy.copy(pending.result())
+
+        self.stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 没有等待者时避免“exception was never retrieved”警告
+            future.exception()
+            raise
+        else:
+            self.put(key, result)
+            future.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    def lookup_batch(self, events: List[LifeEvent], state: PsychologicalState,
+                     context: Optional[Dict[str, Any]] = None) -> Tuple[List[Tuple], List[Optional[ModelImpactResult]], List[int]]:
+        """
+        批量查缓存
+
+        Returns:
+            (各事件的缓存键, 命中的结果（未命中为None）, 需要评估的事件下标)；
+            同一批次中键相同的事件只评估第一个，其余在put_batch时复用其结果
+        """
+        keys = [self.make_key(event, state, context) for event in events]
+        results = [self._hit(key) for key in keys]
+        pending, seen = [], set()
+        for i, (key, result) in enumerate(zip(keys, results)):
+            if result is not None:
+                continue
+            if key in seen:
+                self.stats["coalesced"] += 1
+                continue
+            seen.add(key)
+            self.stats["misses"] += 1
+            pending.append(i)
+        return keys, results, pending
+
+    def put_batch(self, keys: List[Tuple], results: List[Optional[ModelImpactResult]],
+                  computed: Dict[int, ModelImpactResult]) -> List[Optional[ModelImpactResult]]:
+        """写入批量评估结果（computed: 事件下标 -> 结果），并填充同一批次中键相同的其他事件"""
+        by_key = {}
+        for i, result in computed.items():
+            self.put(keys[i], result)
+            by_key[keys[i]] = result
+        return [result if result is not None else (copy.copy(by_key[key]) if key in by_key else None)
+                for key, result in zip(keys, results)]
+
+    def _hit(self, key: Tuple) -> Optional[ModelImpactResult]:
+        """命中时返回标记为缓存结果的副本并计入命中次数"""
+        cached = self.get(key)
+        if cached is not None:
+            self.stats["hits"] += 1
+            cached.reasoning = f"[缓存] {cached.reasoning}"
+            cached.processing_time = 0.0
+        return cached
+
+    def clear(self):
+        """清空缓存"""
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        stats = dict(self.stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["size"] = len(self._entries)
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
@@ -62,9 +62,12 @@ class ModelSelector:
                     "basic_rules_weight": 0.3,
                     "cad_weight": 0.4,
                     "llm_weight": 0.3,
+                    "llm_policy": "static",
                     "llm_trigger_threshold": 3,
                     "llm_frequency": 0.5,
-                    "enable_adaptive_weights": True
+                    "enable_adaptive_weights": True,
+                    "cache_llm_results": True,
+                    "llm_cache_state_tolerance": 1.0
                 }
             },
             "performance_settings": {
@@ -154,7 +157,8 @@ class ModelSelector:
             PsychologicalModelType.BASIC_RULES: "快速测试、教学演示",
             PsychologicalModelType.CAD_ENHANCED: "科研分析、准确模拟",
             PsychologicalModelType.LLM_DRIVEN: "深度分析、复杂案例",
-            PsychologicalModelType.HYBRID: "生产环境、综合评估"
+            PsychologicalModelType.HYBRID: "生产环境、综合评估",
+            PsychologicalModelType.SURROGATE: "大批量模拟、离线复现"
         }
         
         for model_type, info in model_info.items():
@@ -285,9 +289,12 @@ class ModelSelector:
                 "basic_rules_weight": "基础规则权重 (0.0-1.0)",
                 "cad_weight": "CAD模型权重 (0.0-1.0)", 
                 "llm_weight": "LLM模型权重 (0.0-1.0)",
-                "llm_trigger_threshold": "LLM触发阈值 (1-10)",
-                "llm_frequency": "LLM使用频率 (0.0-1.0)",
-                "enable_adaptive_weights": "启用自适应权重"
+                "llm_policy": "LLM调用策略 (static/adaptive)",
+                "llm_trigger_threshold": "LLM触发阈值 (1-10, static策略)",
+                "llm_frequency": "LLM使用频率 (0.0-1.0, static策略)",
+                "enable_adaptive_weights": "启用自适应权重",
+                "cache_llm_results": "缓存LLM评估结果",
+                "llm_cache_state_tolerance": "缓存状态量化步长 (0.5-3.0)"
             }
         }
         
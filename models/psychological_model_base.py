@@ -18,6 +18,7 @@ class PsychologicalModelType(Enum):
     CAD_ENHANCED = "cad_enhanced"        # CAD增强模型  
     LLM_DRIVEN = "llm_driven"           # LLM驱动模型
     HYBRID = "hybrid"                   # 混合模型
+    SURROGATE = "surrogate"             # 代理模型（蒸馏自LLM评估）
 
 
 @dataclass
@@ -122,6 +123,10 @@ class PsychologicalModelBase(ABC):
         """
         pass
     
+    def start_simulation(self):
+        """新的模拟开始时调用（重置按单次模拟计算的预算等状态），默认无操作"""
+        pass
+    
     @abstractmethod
     def supports_cad_state(self) -> bool:
         """返回模型是否支持CAD状态计算"""
@@ -166,7 +171,8 @@ class PsychologicalModelBase(ABC):
             PsychologicalModelType.BASIC_RULES: "基础规则模型",
             PsychologicalModelType.CAD_ENHANCED: "CAD认知增强模型", 
             PsychologicalModelType.LLM_DRIVEN: "LLM驱动模型",
-            PsychologicalModelType.HYBRID: "混合模型"
+            PsychologicalModelType.HYBRID: "混合模型",
+            PsychologicalModelType.SURROGATE: "代理模型"
         }
         return display_names.get(self.model_type, self.model_type.value)
     
@@ -180,7 +186,9 @@ class PsychologicalModelBase(ABC):
             PsychologicalModelType.LLM_DRIVEN: 
                 "完全基于大语言模型的心理评估，最为智能但耗时较长",
             PsychologicalModelType.HYBRID: 
-                "结合多种模型优势的混合方案，平衡准确性与效率"
+                "结合多种模型优势的混合方案，平衡准确性与效率",
+            PsychologicalModelType.SURROGATE: 
+                "从历史LLM评估中训练的本地回归模型，接近LLM的输出、规则模型的速度"
         }
         return descriptions.get(self.model_type, "未知模型类型")
 
@@ -265,6 +273,7 @@ def _auto_import_models():
         import models.cad_enhanced_model
         import models.llm_driven_model
         import models.hybrid_model
+        import models.surrogate_model
     except ImportError as e:
         # 如果某些模型导入失败，记录警告但不中断
         logging.getLogger(__name__).warning(f"自动导入模型失败: {e}")
@@ -1,8 +1,23 @@
 from dataclasses import dataclass, field
 from typing import List, Dict, Optional
 from enum import Enum
+import itertools
 import json
 
+# 全局单调递增的版本号，保证替换后的新对象不会与旧对象的版本冲突
+_version_counter = itertools.count(1)
+
+class VersionTracked:
+    """变更版本追踪：任何字段赋值都会刷新版本号，供档案缓存判断是否失效"""
+    
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        object.__setattr__(self, "_version", next(_version_counter))
+    
+    @property
+    def version(self) -> int:
+        return self.__dict__.get("_version", 0)
+
 class EmotionState(Enum):
     """情绪状态枚举"""
     HAPPY = "开心"
@@ -39,7 +54,7 @@ class EventType(Enum):
 # ===== CAD-MD模型核心数据结构 =====
 
 @dataclass
-class CoreBeliefs:
+class CoreBeliefs(VersionTracked):
     """核心信念 - 贝克认知三角"""
     self_belief: float = 0.0      # 自我信念 (-10: 极负面, 10: 极正面)
     world_belief: float = 0.0     # 世界信念 (-10 to 10)
@@ -82,7 +97,7 @@ class CoreBeliefs:
             else: return "未来是绝望的、没有意义的"
 
 @dataclass  
-class CognitiveProcessing:
+class CognitiveProcessing(VersionTracked):
     """认知加工方式"""
     rumination: float = 0.0       # 负性思维反刍 (0: 无, 10: 严重)
     distortions: float = 0.0      # 认知扭曲程度 (0: 无, 10: 严重)
@@ -94,7 +109,7 @@ class CognitiveProcessing:
         }
 
 @dataclass
-class BehavioralInclination:
+class BehavioralInclination(VersionTracked):
     """行为倾向"""
     social_withdrawal: float = 0.0 # 社交退缩 (0: 无, 10: 严重)
     avolition: float = 0.0         # 动机降低/快感缺失 (0: 无, 10: 严重)
@@ -106,7 +121,7 @@ class BehavioralInclination:
         }
 
 @dataclass
-class CognitiveAffectiveState:
+class CognitiveAffectiveState(VersionTracked):
     """完整的认知-情感动力学状态"""
     affective_tone: float = 0.0    # 情感基调 (-10: 悲观, 10: 乐观)
     core_beliefs: CoreBeliefs = field(default_factory=CoreBeliefs)
@@ -256,7 +271,7 @@ class CognitiveAffectiveState:
         else: return DepressionLevel.CRITICAL
 
 @dataclass
-class PsychologicalState:
+class PsychologicalState(VersionTracked):
     """心理状态 - 整合版（包含传统指标和CAD-MD深度建模）"""
     # 原有字段保持不变，确保向后兼容
     emotion: EmotionState
@@ -269,6 +284,16 @@ class PsychologicalState:
     # 新增CAD-MD深度建模
     cad_state: CognitiveAffectiveState = field(default_factory=CognitiveAffectiveState)
     
+    def state_signature(self) -> tuple:
+        """状态版本签名：任意字段（含嵌套CAD状态）变化都会改变签名"""
+        cad = self.cad_state
+        return (
+            self.version, id(cad), cad.version,
+            cad.core_beliefs.version,
+            cad.cognitive_processing.version,
+            cad.behavioral_inclination.version
+        )
+    
     def to_dict(self) -> Dict:
         base_dict = {
             "emotion": self.emotion.value,
@@ -423,7 +448,7 @@ class LifeEvent:
         }
 
 @dataclass
-class Relationship:
+class Relationship(VersionTracked):
     """关系模型"""
     person_a: str
     person_b: str
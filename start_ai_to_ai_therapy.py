@@ -7,6 +7,8 @@ import utils
 """
 AI对AI治疗启动脚本
 自动运行AI心理咨询师与AI患者的对话会话
+
+批量运行（非交互）：python start_ai_to_ai_therapy.py --cohort logs --max-turns 15
 """
 
 import os
@@ -451,4 +453,10 @@ def run_interactive_selection():
 
 
 if __name__ == "__main__":
-    run_interactive_selection() 
\ No newline at end of file
+    import sys
+    if len(sys.argv) > 1 and sys.argv[1] == "--cohort":
+        # 非交互批量模式: python start_ai_to_ai_therapy.py --cohort logs [选项]
+        from core.therapy_cohort_runner import main as run_cohort
+        run_cohort(sys.argv[2:])
+    else:
+        run_interactive_selection() 
\ No newline at end of file
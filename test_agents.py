@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Agent测试脚本
+测试agent的有界历史窗口、按相关性检索记忆、群体对话、档案缓存和共享LLM增强组件等功能
+（不需要真实的AI客户端，可直接运行，也可由pytest收集）
+"""
+
+import asyncio
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+
+def _student(name: str = "李明"):
+    """创建不连接AI客户端的学生agent"""
+    from agents.student_agent import StudentAgent
+    return StudentAgent(name, 16, {"traits": ["内向"]}, None)
+
+
+def test_bounded_history():
+    """测试有界历史窗口与完整历史落盘"""
+    print("\n=== 测试 有界历史 ===")
+    from core.bounded_history import BoundedHistory
+
+    with tempfile.TemporaryDirectory() as tmp:
+        history = BoundedHistory(maxlen=3, spill_path=Path(tmp) / "history.jsonl")
+        history.extend({"day": day} for day in range(1, 6))
+
+        # 内存中只保留最近3条，切片和下标作用于窗口
+        assert len(history) == 3
+        assert [item["day"] for item in history] == [3, 4, 5]
+        assert history[-1] == {"day": 5}
+        assert history[:2] == [{"day": 3}, {"day": 4}]
+
+        # 完整历史从磁盘读回
+        assert [item["day"] for item in history.full_history()] == [1, 2, 3, 4, 5]
+        stats = history.get_stats()
+        assert stats["total_count"] == 5 and stats["spilled_count"] == 5
+        print(f"✓ 窗口 {len(history)} 条，完整历史 {stats['total_count']} 条")
+
+        # 重新绑定文件时只写入当前窗口
+        history.attach_store(Path(tmp) / "rebound.jsonl")
+        assert [item["day"] for item in history.full_history()] == [3, 4, 5]
+
+    # 未落盘时完整历史只能返回窗口
+    unbounded = BoundedHistory(maxlen=None)
+    unbounded.extend(range(10))
+    assert len(unbounded) == 10 and unbounded.full_history() == list(range(10))
+    print("✓ 不限长度、不落盘的历史")
+
+
+def test_agent_memory_windows():
+    """测试agent按配置缩小记忆窗口，并把完整历史写入存储目录"""
+    print("\n=== 测试 Agent记忆窗口 ===")
+    agent = _student()
+    for i in range(4):
+        agent.thoughts.append(f"第{i}条想法")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # 重新配置时保留已有记录
+        agent.configure_memory({"thoughts_window": 3, "dialogue_history_window": 2}, store_dir=tmp)
+        assert agent.memory_config["life_events_window"] == 50
+        assert list(agent.thoughts) == ["第1条想法", "第2条想法", "第3条想法"]
+        assert (Path(tmp) / "李明_thoughts.jsonl").exists()
+
+        for i in range(5):
+            agent._record_dialogue({"speaker": "王老师", "content": f"第{i}句话", "situation": "课堂"})
+        assert [item["content"] for item in agent.dialogue_history] == ["第3句话", "第4句话"]
+        assert len(agent.dialogue_history.full_history()) == 5
+        print(f"✓ 对话窗口 {len(agent.dialogue_history)} 条，完整历史 "
+              f"{len(agent.dialogue_history.full_history())} 条")
+
+        # 档案中的最近想法来自窗口
+        assert agent.get_profile()["recent_thoughts"] == ["第1条想法", "第2条想法", "第3条想法"]
+    print("✓ 档案使用窗口内的最近想法")
+
+
+def test_memory_index():
+    """测试记忆检索的相关性排序、淘汰和组合检索"""
+    print("\n=== 测试 记忆检索索引 ===")
+    from core.memory_index import MemoryIndex, tokenize
+
+    assert tokenize("数学考试") == ["数学", "学考", "考试"]
+    assert "exam" in tokenize("期中exam")
+
+    index = MemoryIndex(max_documents=4)
+    index.add({"id": 0}, "数学考试不及格，被老师批评", impact=-6)
+    index.add({"id": 1}, "和朋友一起打篮球", impact=3)
+    index.add({"id": 2}, "午饭吃了面条", impact=0)
+    index.add({"id": 3}, "在食堂排队", impact=0)
+
+    # 相关的旧记忆排在不相关的新记忆前面
+    assert index.search("这次数学考试又没考好", top_k=1) == [{"id": 0}]
+    print("✓ 相关性优先于时间远近")
+
+    # 超过上限时淘汰最早的记忆
+    index.add({"id": 4}, "放学后一个人回家", impact=2)
+    assert len(index) == 4
+    assert {"id": 0} not in index.search("数学考试", top_k=4)
+
+    # 组合检索保留最近的记忆，并按时间顺序返回
+    context = index.retrieve_context("打篮球", top_k=3, recent_count=2)
+    assert context == [{"id": 1}, {"id": 3}, {"id": 4}]
+    print(f"✓ 组合检索: {[item['id'] for item in context]}")
+
+
+def test_agent_recall():
+    """测试agent按当前情境检索相关对话，而不是只取最近几条"""
+    print("\n=== 测试 Agent记忆检索 ===")
+    agent = _student()
+    agent.configure_memory({"retrieval_top_k": 3, "retrieval_recent_count": 1})
+    lines = ["数学考试又没考好，爸爸很生气", "今天食堂的饭很好吃", "周末去打篮球",
+             "下午要交物理作业", "晚上看了一部电影"]
+    for line in lines:
+        agent._record_dialogue({"speaker": "李明", "content": line, "situation": "日常"})
+
+    # 与情境相关的早期对话被检索出来，最近一条始终保留，结果按时间顺序排列
+    recalled = [item["content"] for item in agent.recall_dialogue("数学考试成绩")]
+    assert recalled[0] == lines[0] and recalled[-1] == lines[-1] and len(recalled) <= 3
+    turn = agent.prepare_group_turn("数学考试成绩")
+    assert turn["history"][0] == f"李明: {lines[0]}"
+    print(f"✓ 检索结果: {recalled}")
+
+
+def test_group_dialogue():
+    """测试多人事件一次调用生成全部回应，缺失的角色逐个回退"""
+    print("\n=== 测试 群体对话 ===")
+    from core.deepseek_client import DeepSeekClient
+    from core.simulation_engine import SimulationEngine
+
+    class GroupClient:
+        """群体回应只包含部分角色，单独回应记录调用次数"""
+
+        def __init__(self):
+            self.group_calls = []
+            self.single_calls = 0
+
+        async def generate_group_response(self, participants, situation):
+            self.group_calls.append([p["name"] for p in participants])
+            return {"李明": "我不想说话。"}
+
+        async def generate_agent_response(self, profile, situation, history=None):
+            self.single_calls += 1
+            return "你怎么了？"
+
+    client = GroupClient()
+    engine = SimulationEngine.__new__(SimulationEngine)
+    # 未配置时与config_loader的默认值一致
+    assert engine._create_config_object({}).GROUP_DIALOGUE is True
+    engine.ai_client, engine.group_dialogue_enabled = client, True
+    engine.agents = {name: _student(name) for name in ("李明", "王芳")}
+    for agent in engine.agents.values():
+        agent.ai_client = client
+
+    responses = asyncio.run(engine._collect_responses("课间被同学嘲笑", ["李明", "王芳", "不存在"]))
+    assert responses == {"李明": "我不想说话。", "王芳": "你怎么了？"}
+    assert client.group_calls == [["李明", "王芳"]] and client.single_calls == 1
+    assert engine.agents["李明"].dialogue_history[-1]["content"] == "我不想说话。"
+    print(f"✓ 群体调用 {len(client.group_calls)} 次，单独回退 {client.single_calls} 次")
+
+    # 解析客户端返回的JSON，只保留参与者中非空的回应
+    deepseek = DeepSeekClient.__new__(DeepSeekClient)
+    deepseek.logger = engine.agents["李明"].logger
+
+    async def reply(prompt):
+        return "```json\n" + json.dumps({"李明": " 嗯。 ", "王芳": "", "路人": "你好"}, ensure_ascii=False) + "\n```"
+
+    deepseek.generate_response = reply
+    parsed = asyncio.run(deepseek.generate_group_response(
+        [{"name": "李明", "profile": {}, "history": []}, {"name": "王芳", "profile": "{}"}], "放学"))
+    assert parsed == {"李明": "嗯。"}
+    print("✓ 群体回应解析")
+
+
+def test_profile_cache():
+    """测试角色档案只在状态、关系、独白或自有属性变化后重建"""
+    print("\n=== 测试 角色档案缓存 ===")
+    from models.psychology_models import Relationship
+
+    agent = _student()
+    agent.add_relationship(Relationship("李明", "王芳", "同学", 6, 6, 1))
+    fragment = agent.get_profile_fragment()
+    assert agent.get_profile_fragment() is fragment
+    assert json.loads(fragment) == agent.get_profile()
+    print("✓ 状态未变化时复用序列化档案")
+
+    # 返回的档案是副本，调用方修改不会污染缓存
+    agent.get_profile()["name"] = "别人"
+    assert agent.get_profile()["name"] == "李明"
+
+    changes = [
+        ("心理状态", lambda: setattr(agent.psychological_state, "stress_level", 8)),
+        ("CAD状态", lambda: setattr(agent.psychological_state.cad_state.core_beliefs, "self_belief", -5)),
+        ("关系", lambda: agent.update_relationship("王芳", conflict_change=3)),
+        ("内心独白", lambda: agent.thoughts.append("我是不是做错了什么")),
+        # 子类自有属性（成绩影响角色描述）需要显式使缓存失效
+        ("成绩", lambda: (setattr(agent, "academic_performance", 9), agent.invalidate_profile_cache())),
+    ]
+    for name, change in changes:
+        before = agent.get_profile_fragment()
+        change()
+        after = agent.get_profile_fragment()
+        assert after != before, name
+        assert after is agent.get_profile_fragment(), name
+    assert json.loads(agent.get_compact_profile_fragment())["relationships"]["王芳"].endswith("冲突4)")
+    print(f"✓ {len(changes)} 类变化都会使缓存失效")
+
+
+def test_shared_llm_components():
+    """测试agent共享LLM评估器和配置，但各自保留独立的计算历史"""
+    print("\n=== 测试 共享LLM增强组件 ===")
+    from core.llm_component_registry import get_llm_component_registry
+
+    class SilentClient:
+        async def generate_response(self, prompt, context=None):
+            return "{}"
+
+    registry = get_llm_component_registry()
+    registry.reset()
+    client = SilentClient()
+    first, second = _student("李明"), _student("王芳")
+    first.ai_client = second.ai_client = client
+    first._load_llm_enhancement_components()
+    second._load_llm_enhancement_components()
+
+    if registry.is_enabled("llm_integration", "psychological_assessment"):
+        assert first.hybrid_calculator is not second.hybrid_calculator
+        assert first.hybrid_calculator.llm_assessor is second.hybrid_calculator.llm_assessor
+        assert first.hybrid_calculator.calculation_history is not second.hybrid_calculator.calculation_history
+        print("✓ 评估器按AI客户端共享，计算历史按agent独立")
+    if registry.is_enabled("bidirectional_impact"):
+        assert first.positive_impact_manager is not second.positive_impact_manager
+
+    # 不同客户端使用各自的评估器；配置只读取一次，返回的配置部分是副本
+    assert registry.get_assessor(SilentClient()) is not registry.get_assessor(client)
+    config = registry.get_config()
+    registry.get_section("hybrid_calculation")["rule_weight"] = -1
+    assert registry.get_config() is config
+    assert registry.get_section("hybrid_calculation").get("rule_weight") != -1
+    registry.reset()
+    print("✓ 配置只加载一次，调用方拿到的是副本")
+
+
+TESTS = [
+    ("有界历史", test_bounded_history),
+    ("Agent记忆窗口", test_agent_memory_windows),
+    ("记忆检索索引", test_memory_index),
+    ("Agent记忆检索", test_agent_recall),
+    ("群体对话", test_group_dialogue),
+    ("角色档案缓存", test_profile_cache),
+    ("共享LLM增强组件", test_shared_llm_components),
+]
+
+
+def main():
+    """主测试函数"""
+    print("开始Agent测试...")
+    print("=" * 50)
+
+    passed = 0
+    for name, test in TESTS:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"✗ {name}测试失败: {e!r}")
+
+    print("\n" + "=" * 50)
+    print(f"测试完成: {passed}/{len(TESTS)} 项测试通过")
+    return 0 if passed == len(TESTS) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+事件生成测试脚本
+测试模板索引、条件事件规则表、离线事件语料库、推测式预生成、近重复检测和关键词匹配等事件生成组件
+（不需要真实的AI客户端，可直接运行，也可由pytest收集）
+"""
+
+import asyncio
+import json
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+
+TEMPLATES = {
+    "academic": {
+        "negative": ["{protagonist}的数学考试不及格", "{teacher}当众批评了{protagonist}"],
+        "positive": ["{protagonist}在物理竞赛中获得了奖项"]
+    },
+    "social": {
+        "neutral": ["{protagonist}和{friend}在{location}聊天"]
+    }
+}
+
+CHARACTERS = {"protagonist": "李明", "teacher": "王老师", "friend": "张伟"}
+
+
+def test_template_index():
+    """测试模板分析器预建索引，并按 类别+情感 -> 类别 -> 全部 的顺序选择模式"""
+    print("\n=== 测试 模板索引 ===")
+    from core.event_generator import TemplateAnalyzer
+
+    analyzer = TemplateAnalyzer(TEMPLATES, CHARACTERS)
+    patterns = analyzer.analyze_patterns()
+    assert len(patterns) == 4
+    analyzer.analyze_patterns().clear()  # 返回副本，不影响索引
+    assert len(analyzer.analyze_patterns()) == 4
+
+    social = patterns[-1]
+    assert social["elements"]["characters"] == {"protagonist": "李明", "friend": "张伟"}
+    assert social["elements"]["others"] == {"location": "contextual"}
+    assert patterns[2]["emotional_tone"] == "积极" and patterns[2]["keywords"] == ["获得"]
+    print(f"✓ 分析 {len(patterns)} 个模式")
+
+    random.seed(0)
+    exact = {analyzer.select_best_pattern("academic", "negative", {})["template"] for _ in range(50)}
+    assert exact == set(TEMPLATES["academic"]["negative"])
+    by_category = {analyzer.select_best_pattern("academic", "neutral", {})["category"] for _ in range(20)}
+    assert by_category == {"academic"}
+    anything = {analyzer.select_best_pattern("family", "negative", {})["template"] for _ in range(100)}
+    assert len(anything) == 4
+    print("✓ 精确匹配、按类别回退和全部模式")
+
+    # 没有任何模板时返回默认模式
+    empty = TemplateAnalyzer({}, CHARACTERS).select_best_pattern("academic", "negative", {})
+    assert empty["template"] == "{protagonist}度过了平凡的一天" and empty["category"] == "academic"
+    print("✓ 空模板的默认模式")
+
+
+def test_conditional_rule_table():
+    """测试条件事件规则表的编译、求值、冷却和按列求值"""
+    print("\n=== 测试 条件事件规则表 ===")
+    import numpy as np
+    from core.conditional_rules import ConditionalRuleTable
+
+    table = ConditionalRuleTable.compile({
+        "low_grades": {"condition_type": "grades_average", "condition_value": 70,
+                       "condition_operator": "less_than", "cooldown_days": 2},
+        "high_stress": {"condition_type": "stress_level", "condition_value": 7,
+                        "condition_operator": "greater_than", "trigger_probability": 0.0},
+        "low_mood": {"condition_type": "mood", "condition_value": 3, "condition_operator": "<"},
+        "legacy": {"condition": lambda state: state.get("self_esteem", 10) < 3},
+        "broken": {"condition_type": "stress_level", "condition_operator": "unknown", "condition_value": 1}
+    })
+    assert len(table) == 4 and "broken" not in table.by_name
+
+    state = {"recent_grades": [55, 60], "stress_level": 9, "affective_tone": -6, "self_esteem": 2}
+    assert table.evaluate(state) == ["low_grades", "high_stress", "low_mood", "legacy"]
+    assert table.evaluate({"recent_grades": [], "stress_level": 3}) == []
+    print("✓ 声明式条件、派生字段和旧版可调用条件")
+
+    # 冷却期内不再触发，概率为0的条件不会触发
+    rng = random.Random(0)
+    fired = [table.select_triggered(table.evaluate(state), day, rng) for day in range(1, 5)]
+    assert [("low_grades" in names) for names in fired] == [True, False, False, True]
+    assert all("high_stress" not in names and "legacy" in names for names in fired)
+    table.reset()
+    assert "low_grades" in table.select_triggered(["low_grades"], 2)
+    print("✓ 冷却天数和触发概率")
+
+    masks = table.evaluate_columns({"stress_level": np.array([5, 8, 10]), "mood": [1.0, None, 6.0]})
+    assert masks["high_stress"].tolist() == [False, True, True]
+    assert masks["low_mood"] == [True, False, False]
+    print("✓ 按列批量求值")
+
+
+def test_protagonist_grades_condition():
+    """测试引擎把主角最近成绩交给成绩条件求值"""
+    print("\n=== 测试 成绩条件 ===")
+    from agents.student_agent import StudentAgent
+    from core.conditional_rules import ConditionalRuleTable
+    from core.simulation_engine import SimulationEngine
+
+    engine = SimulationEngine.__new__(SimulationEngine)
+    engine.protagonist = StudentAgent("李明", 16, {}, None)
+    engine.protagonist.add_grade("数学", 52)
+    engine.protagonist.add_grade("语文", 70)
+    state = engine._get_protagonist_state()
+    assert state["recent_grades"] == [52, 70]
+
+    table = ConditionalRuleTable.compile({"low_grades": {
+        "condition_type": "grades_average", "condition_value": 65, "condition_operator": "less_than"}})
+    assert table.evaluate(state) == ["low_grades"]
+    print(f"✓ 最近成绩 {state['recent_grades']} 触发低分条件")
+
+
+def test_event_corpus():
+    """测试离线语料库的批量扩展、验证过滤、保存加载和避开最近模板的抽样"""
+    print("\n=== 测试 离线事件语料库 ===")
+    from core.event_corpus import EventCorpus, EventCorpusBuilder, normalize_template
+
+    class BatchClient:
+        """每次请求返回一批模板：新模板、只差标点的重复、未知占位符、违禁词"""
+
+        def __init__(self):
+            self.prompts = []
+
+        async def generate_response(self, prompt, context=None):
+            self.prompts.append(prompt)
+            return "\n".join([
+                "{protagonist}在图书馆里复习到很晚才回家休息",
+                "{protagonist}的数学考试，不及格！",
+                "{stranger}在校门口拦住了{protagonist}问路",
+                "{protagonist}看到了一部关于毒品的纪录片",
+            ])
+
+    client = BatchClient()
+    builder = EventCorpusBuilder(client, "default_adolescent",
+                                 {"build": {"variants_per_request": 4, "target_per_bucket": 10, "max_rounds": 3}})
+    builder.scenario_config = {
+        "event_templates": {"academic": {"negative": ["{protagonist}的数学考试不及格",
+                                                      "{teacher}当众批评了{protagonist}的作业"]}},
+        "conditional_events": {"low_grades": {"events": ["{protagonist}的成绩持续下滑，被{teacher}约谈"]}}
+    }
+    data = asyncio.run(builder.build())
+
+    # 第二轮没有新增模板时停止，不会用满max_rounds
+    assert len(client.prompts) == 4 and data["stats"]["llm_requests"] == 4
+    academic = [entry["template"] for entry in data["buckets"]["academic/negative"]]
+    assert academic == ["{protagonist}的数学考试不及格", "{teacher}当众批评了{protagonist}的作业",
+                        "{protagonist}在图书馆里复习到很晚才回家休息"]
+    assert normalize_template("{protagonist}的数学考试，不及格！") == normalize_template(academic[0])
+    rejections = data["stats"]["rejections"]
+    assert rejections["placeholder"] >= 1 and rejections["format_or_similarity"] >= 1
+    print(f"✓ 批量扩展 {data['stats']['total_templates']} 条模板，拒绝统计: {rejections}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        builder.save(data, tmp)
+        corpus = EventCorpus.load("default_adolescent", tmp, recent_exclusion=2)
+        assert corpus.size() == data["stats"]["total_templates"]
+        assert EventCorpus.load("missing", tmp) is None
+
+    # 最近用过的模板在排除窗口内不会再次抽到
+    random.seed(1)
+    picks = [corpus.sample("academic", "negative") for _ in range(6)]
+    assert all(len(set(picks[i:i + 3])) == 3 for i in range(4))
+    assert corpus.sample("family", "negative") is None
+    assert corpus.sample_conditional("low_grades") is not None
+    print(f"✓ 抽样: {corpus.get_stats()['samples_served']} 次")
+
+
+def test_speculative_queue():
+    """测试推测事件的取用、状态偏移丢弃、按阶段区分和失效"""
+    print("\n=== 测试 推测式事件预生成 ===")
+    from core.event_generator import EventGenerator
+    from core.speculative_events import SpeculativeEvent, SpeculativeEventQueue, state_snapshot
+
+    # 默认配置下不启用推测生成
+    assert EventGenerator(None, TEMPLATES, CHARACTERS).speculative_queue is None
+
+    produced = []
+
+    async def producer(category, sentiment, state, stage_config):
+        await asyncio.sleep(0.01)
+        produced.append((category, sentiment))
+        return SpeculativeEvent(f"{category}-{sentiment}-{len(produced)}", ["李明"], {}, state_snapshot(state))
+
+    calm = {"stress_level": 4, "self_esteem": 6, "social_connection": 6, "depression_level": "MILD"}
+    stage_one, stage_two = {"event_categories": ["academic"]}, {"event_categories": ["family"]}
+
+    async def run():
+        queue = SpeculativeEventQueue(producer, lookahead_depth=1, max_state_drift=1.5)
+        results = {}
+
+        # 队列为空但预生成正在进行时等待它完成，而不是重复生成
+        queue.schedule("academic", "negative", calm, stage_one)
+        queue.schedule("academic", "negative", calm, stage_one)
+        results["hit"] = await queue.take("academic", "negative", dict(calm, stress_level=5), stage_one)
+
+        # 状态偏移过大或抑郁等级变化的事件被丢弃
+        queue.schedule("academic", "negative", calm, stage_one)
+        await asyncio.sleep(0.05)
+        results["drifted"] = await queue.take("academic", "negative", dict(calm, stress_level=7), stage_one)
+        queue.schedule("academic", "negative", calm, stage_one)
+        await asyncio.sleep(0.05)
+        results["level_changed"] = await queue.take("academic", "negative",
+                                                    dict(calm, depression_level="MODERATE"), stage_one)
+
+        # 上一阶段预生成的事件不会在新阶段取出
+        queue.schedule("academic", "negative", calm, stage_one)
+        await asyncio.sleep(0.05)
+        results["other_stage"] = await queue.take("academic", "negative", calm, stage_two)
+
+        # 失效时清空队列并取消未完成的预生成
+        queue.schedule("social", "neutral", calm, stage_one)
+        queue.invalidate()
+        results["invalidated"] = await queue.take("academic", "negative", calm, stage_one)
+        await asyncio.sleep(0.05)
+        await queue.shutdown()
+        return queue, results
+
+    queue, results = asyncio.run(run())
+    assert results["hit"].description == "academic-negative-1"
+    assert all(results[name] is None for name in ("drifted", "level_changed", "other_stage", "invalidated"))
+    assert ("social", "neutral") not in produced and len(produced) == 4
+    stats = queue.get_stats()
+    assert stats["hits"] == 1 and stats["discarded_stale"] == 3 and stats["queued"] == 0
+    print(f"✓ 推测事件统计: {stats}")
+
+
+def test_near_duplicate_index():
+    """测试MinHash/LSH近重复查找和多样性统计"""
+    print("\n=== 测试 近重复文本索引 ===")
+    from core.near_duplicate_index import NearDuplicateIndex, shingles, jaccard
+
+    # 占位符整体视为一个符号，标点和空白被忽略
+    assert shingles("{father}很生气。") == {"{father}很", "很生", "生气"}
+    assert jaccard({"a", "b"}, {"b", "c"}) == 1 / 3
+
+    index = NearDuplicateIndex(threshold=0.6, num_perm=64)
+    base = "{protagonist}在数学考试中成绩不及格，回家后被{father}严厉批评"
+    assert index.add_if_new(base)
+    # 只差标点的文本与原文完全相同，几乎相同的文本也会被识别
+    assert not index.add_if_new(base.replace("，", "。"))
+    assert index.is_duplicate(base + "了")
+    assert index.add_if_new("{friend}约{protagonist}周末去公园打羽毛球")
+    assert len(index) == 2 and index.cluster_count() == 2
+    print(f"✓ 近重复判断: {index.get_stats()}")
+
+    # add 不去重，但把近重复文本归入同一簇
+    index.add(base + "了")
+    assert len(index) == 3 and index.cluster_count() == 2
+    assert abs(index.variety_ratio() - 2 / 3) < 1e-9
+    print(f"✓ 多样性比例: {index.variety_ratio():.2f}")
+
+
+def test_event_variety_score():
+    """测试事件多样性分数把换了个别字的重复事件算作同一簇"""
+    print("\n=== 测试 事件多样性分数 ===")
+    from core.event_generator import EventGenerator
+
+    generator = EventGenerator(None, TEMPLATES, CHARACTERS)
+    assert generator.get_event_variety_score() == 0.0
+    for text in ("李明的数学考试不及格，回家后被爸爸狠狠批评了一顿",
+                 "李明的数学考试不及格，回家后被爸爸狠狠地批评了一顿",
+                 "周末李明和张伟去公园打羽毛球，玩得很开心"):
+        generator.event_history.append({"event": text})
+    assert generator.get_event_variety_score() == round(2 / 3 * 100, 2)
+    print(f"✓ 多样性分数: {generator.get_event_variety_score()}")
+
+
+def test_keyword_matcher():
+    """测试多模式关键词匹配和配置加载"""
+    print("\n=== 测试 关键词匹配器 ===")
+    from core.keyword_matcher import (KeywordMatcher, flatten_keyword_sets, get_keyword_matcher,
+                                      reset_keyword_matcher)
+
+    flat = flatten_keyword_sets({"cad": {"self": ["失败", "考试失败"], "world": ["嘲笑"]}, "bad": "忽略"})
+    assert flat == {"cad.self": ["失败", "考试失败"], "cad.world": ["嘲笑"]}
+
+    matcher = KeywordMatcher({**flat, "english": ["Exam"]})
+    # 重叠的关键词（失败 是 考试失败 的后缀）都能命中，英文不区分大小写
+    result = matcher.match("他这次EXAM考试失败，又被同学嘲笑")
+    assert result == {"cad.self": frozenset({"失败", "考试失败"}), "cad.world": frozenset({"嘲笑"}),
+                      "english": frozenset({"exam"})}
+    assert matcher.count("考试失败", "cad.self") == 2
+    assert matcher.has_any("被嘲笑", "cad.world") and not matcher.has_any("被嘲笑", "cad.self")
+    assert matcher.match("") == {}
+    assert matcher.match("他这次EXAM考试失败，又被同学嘲笑") is result  # 重复文本命中缓存
+    print(f"✓ 命中类别: {sorted(result)}")
+
+    # 全局匹配器从 config/keyword_sets.json 加载全部分组
+    reset_keyword_matcher()
+    shared = get_keyword_matcher()
+    assert "therapy_dialogue.patient_positive" in shared.keyword_sets
+    assert shared.has_any("他在考试中失败了", "cad_rules.self_belief")
+    assert get_keyword_matcher() is shared
+    assert shared.has_any("他们在讨论暴力电影", "quality_control.forbidden_words")
+    age_check = json.loads((Path(__file__).parent / "config" / "keyword_sets.json").read_text(encoding="utf-8"))["age_check"]
+    assert shared.keywords("age_check.adult_content") == sorted(age_check["adult_content"])
+    print(f"✓ 配置关键词表: {len(shared.keyword_sets)} 个类别")
+
+    # 关键词表缺失或格式错误时直接报错，不会悄悄关闭规则判断
+    from config.config_loader import ConfigLoader
+    with tempfile.TemporaryDirectory() as tmp:
+        loader = ConfigLoader(Path(tmp))
+        for content in (None, "{not json"):
+            if content is not None:
+                (Path(tmp) / "keyword_sets.json").write_text(content, encoding="utf-8")
+            try:
+                loader.load_keyword_sets()
+            except (FileNotFoundError, ValueError):
+                pass
+            else:
+                raise AssertionError("关键词配置缺失或损坏时应该报错")
+    print("✓ 关键词配置缺失或损坏时报错")
+
+
+TESTS = [
+    ("模板索引", test_template_index),
+    ("条件事件规则表", test_conditional_rule_table),
+    ("成绩条件", test_protagonist_grades_condition),
+    ("离线事件语料库", test_event_corpus),
+    ("推测式事件预生成", test_speculative_queue),
+    ("近重复文本索引", test_near_duplicate_index),
+    ("事件多样性分数", test_event_variety_score),
+    ("关键词匹配器", test_keyword_matcher),
+]
+
+
+def main():
+    """主测试函数"""
+    print("开始事件生成测试...")
+    print("=" * 50)
+
+    passed = 0
+    for name, test in TESTS:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"✗ {name}测试失败: {e!r}")
+
+    print("\n" + "=" * 50)
+    print(f"测试完成: {passed}/{len(TESTS)} 项测试通过")
+    return 0 if passed == len(TESTS) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
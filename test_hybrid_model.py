@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+混合心理模型测试脚本
+测试LLM评估结果缓存、日终批量评估和代理模型等混合模型组件
+（不调用真实的LLM，可直接运行，也可由pytest收集；异步接口在测试内用asyncio.run驱动）
+"""
+
+import asyncio
+import contextlib
+import io
+import json
+import random
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+
+def _state(stress_level: int = 5):
+    """中等压力、轻度抑郁的心理状态"""
+    from models.psychology_models import PsychologicalState, EmotionState, DepressionLevel
+    return PsychologicalState(
+        emotion=EmotionState.NEUTRAL,
+        depression_level=DepressionLevel.MILD,
+        stress_level=stress_level,
+        self_esteem=5,
+        social_connection=5,
+        academic_pressure=5
+    )
+
+
+def _event(description: str, impact_score: int = -4):
+    """主角经历的学业事件"""
+    from models.psychology_models import LifeEvent, EventType
+    return LifeEvent(
+        event_type=EventType.ACADEMIC_FAILURE,
+        description=description,
+        impact_score=impact_score,
+        timestamp=datetime.now().isoformat(),
+        participants=["李明"]
+    )
+
+
+class _StubClient:
+    """不发起真实请求的AI客户端（LLM子模型的评估在测试中被替换）"""
+
+    async def generate_response(self, prompt: str, context=None) -> str:
+        return "{}"
+
+
+def _hybrid_model(config=None):
+    """创建混合模型，LLM子模型的单个/批量评估替换为记录调用的桩函数"""
+    from models.psychological_model_base import ModelFactory, PsychologicalModelType, ModelImpactResult
+    model = ModelFactory.create_model(PsychologicalModelType.HYBRID, dict(config or {}), _StubClient())
+    model.surrogate_model = None
+    llm_calls = []
+
+    def assessment():
+        return ModelImpactResult(depression_change=-1.0, model_type="llm_driven", reasoning="LLM评估")
+
+    async def fake_single(event, state, context):
+        llm_calls.append(1)
+        return assessment()
+
+    async def fake_batch(events, state, context):
+        llm_calls.append(len(events))
+        return [assessment() for _ in events]
+
+    model.llm_model.calculate_impact = fake_single
+    model.llm_model.calculate_impacts_batch = fake_batch
+    return model, llm_calls
+
+
+def test_llm_result_cache():
+    """测试LLM评估结果缓存的键规范化、命中、合并并发评估和淘汰"""
+    print("\n=== 测试 LLM评估结果缓存 ===")
+    from models.llm_result_cache import LLMResultCache, normalize_event_text
+    from models.psychological_model_base import ModelImpactResult
+
+    assert normalize_event_text("第3次 考试，不及格！") == "第#次考试不及格"
+
+    cache = LLMResultCache(max_size=2, ttl_seconds=0, state_tolerance=1.0)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return ModelImpactResult(stress_change=1.5, model_type="llm_driven", reasoning="LLM评估")
+
+    async def run():
+        event = _event("数学考试不及格")
+        # 并发的相同评估只调用一次
+        first, second = await asyncio.gather(
+            cache.get_or_compute(event, _state(), None, compute),
+            cache.get_or_compute(event, _state(), None, compute))
+        # 只差标点的描述、量化后相同的状态直接命中
+        cached = await cache.get_or_compute(_event("数学考试，不及格。"), _state(), None, compute)
+        # 状态差别较大时重新评估
+        await cache.get_or_compute(event, _state(stress_level=9), None, compute)
+        return first, second, cached
+
+    first, second, cached = asyncio.run(run())
+    assert len(calls) == 2
+    assert first.stress_change == second.stress_change == cached.stress_change == 1.5
+    assert cached.reasoning.startswith("[缓存]") and cached.processing_time == 0.0
+    stats = cache.get_stats()
+    assert stats["hits"] == 1 and stats["coalesced"] == 1 and stats["misses"] == 2
+    print(f"✓ 缓存统计: {stats}")
+
+    # 回退结果不缓存；超过容量时淘汰最久未使用的条目
+    cache.put(("fallback",), ModelImpactResult(model_type="llm_driven_fallback"))
+    assert cache.get(("fallback",)) is None
+    cache.put(("extra",), ModelImpactResult(model_type="llm_driven"))
+    assert cache.get_stats()["size"] == 2 and cache.get_stats()["evicted"] == 1
+    print("✓ 回退结果不缓存，LRU淘汰")
+
+
+def test_hybrid_single_event_cache():
+    """测试混合模型的单事件路径命中缓存时不再调用LLM，也不计入调用预算"""
+    print("\n=== 测试 单事件评估与结果缓存 ===")
+    model, llm_calls = _hybrid_model({"llm_call_budget": 5})
+
+    async def run():
+        first = await model.calculate_impact(_event("期末考试排名倒数", -9), _state(), {})
+        second = await model.calculate_impact(_event("期末考试排名倒数！", -9), _state(), {})
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert llm_calls == [1]
+    assert model.get_cache_stats()["hits"] == 1 and model.llm_policy.calls == 1
+    assert "包含LLM深度分析" in first.reasoning and "包含LLM深度分析" in second.reasoning
+    print(f"✓ LLM调用 {len(llm_calls)} 次，缓存统计: {model.get_cache_stats()}")
+
+
+def test_llm_result_cache_batch():
+    """测试批量评估路径先查缓存，只把未命中的事件交给LLM"""
+    print("\n=== 测试 批量评估与结果缓存 ===")
+    model, batch_sizes = _hybrid_model()
+    state = _state()
+    events = [_event("考试失败", -9), _event("考试失败", -9), _event("被老师批评", -9)]
+
+    # 同一批次中相同的事件只评估一次
+    asyncio.run(model.calculate_impacts_batch(events, state, {}))
+    assert batch_sizes == [2]
+    stats = model.get_cache_stats()
+    assert stats["misses"] == 2 and stats["coalesced"] == 1 and stats["size"] == 2
+
+    # 再次评估相同事件时全部命中缓存，不再调用LLM
+    results = asyncio.run(model.calculate_impacts_batch(events, state, {}))
+    assert batch_sizes == [2] and len(results) == 3
+    assert model.get_cache_stats()["hits"] == 3
+    print(f"✓ 批次大小 {batch_sizes}，缓存统计: {model.get_cache_stats()}")
+
+
+def test_llm_invocation_policy_budget():
+    """测试LLM调用策略的预算预留、自适应抽查和按模拟重置"""
+    print("\n=== 测试 LLM调用策略与预算 ===")
+    from models.llm_invocation_policy import LLMInvocationPolicy
+    from models.psychological_model_base import ModelImpactResult
+
+    assert LLMInvocationPolicy({}).get_stats()["policy"] == "static"
+    policy = LLMInvocationPolicy({
+        "llm_policy": "adaptive", "llm_call_budget": 3, "llm_token_budget": 1000,
+        "policy_critical_impact": 8, "policy_min_samples": 2, "policy_divergence_target": 1.0,
+        "policy_min_probability": 0.0, "policy_ewma_alpha": 0.5
+    }, rng=random.Random(0))
+    state = _state()
+    routine = _event("作业写完了", -2)
+
+    # 新事件类型先收集样本；分歧为0的类型之后不再调用（最低抽查概率为0）
+    assert policy.should_call(routine, state) and policy.calls == 1
+    same = ModelImpactResult(depression_change=0.5)
+    for _ in range(2):
+        policy.observe(routine, {"llm": same, "basic_rules": same, "cad": same})
+    assert not policy.should_call(routine, state)
+    assert policy.should_call(_event("考试严重失利", -9), state)  # 重大事件总是调用
+    assert not policy.should_call(_event("考试严重失利", -9), state, tokens_used=1000)
+    assert policy.calls == 2
+    print(f"✓ 自适应决策: {policy.decisions}")
+
+    # 归还未实际发起的调用，预留不超过剩余预算
+    policy.release_call()
+    assert policy.reserve_calls(5) == 2
+    assert policy.remaining_calls() == 0 and policy.decisions["budget_exhausted"] == 4
+    assert not policy.should_call(_event("考试严重失利", -9), state)
+    policy.reset_budget()
+    assert policy.remaining_calls() == 3
+
+    # 混合模型的批量评估不超出预算，新的模拟开始时预算和token估算重置
+    model, llm_calls = _hybrid_model({"llm_call_budget": 2})
+    events = [_event(text, -9) for text in ("考试失败", "被孤立", "被嘲笑", "和父母争吵")]
+    asyncio.run(model.calculate_impacts_batch(events, _state(), {}))
+    assert llm_calls == [2] and model.llm_policy.remaining_calls() == 0
+    model.llm_model.estimated_tokens_used = 500.0
+    model.start_simulation()
+    assert model.llm_policy.remaining_calls() == 2 and model.llm_model.estimated_tokens_used == 0.0
+    print(f"✓ 批量评估预算: {model.llm_policy.get_stats()['decisions']}")
+
+
+def test_llm_budget_concurrent():
+    """测试并发的单事件评估不会超出调用预算"""
+    print("\n=== 测试 并发评估的调用预算 ===")
+    model, llm_calls = _hybrid_model({"llm_call_budget": 2})
+    single = model.llm_model.calculate_impact
+
+    async def slow_single(event, state, context):
+        await asyncio.sleep(0.01)
+        return await single(event, state, context)
+
+    model.llm_model.calculate_impact = slow_single
+    events = [_event(f"{text}，很难过", -9) for text in ("考试失败", "被孤立", "被嘲笑", "和父母争吵", "丢了钱包")]
+
+    async def run():
+        return await asyncio.gather(*(model.calculate_impact(event, _state(), {}) for event in events))
+
+    results = asyncio.run(run())
+    assert len(results) == 5 and len(llm_calls) == 2
+    assert model.llm_policy.calls == 2 and model.llm_policy.decisions["budget_exhausted"] == 3
+
+    # 缓存命中归还预留的调用
+    model.start_simulation()
+    asyncio.run(model.calculate_impact(events[0], _state(), {}))
+    assert len(llm_calls) == 2 and model.llm_policy.calls == 0
+    print(f"✓ 5个并发评估只发起 {len(llm_calls)} 次LLM调用")
+
+
+EVENT_TEXTS = ["数学考试不及格", "被同学在背后议论", "和好朋友一起打球", "被老师表扬作业认真",
+               "和父母因为手机吵架", "周末一个人待在家里", "参加社团活动认识了新朋友", "体育课上摔倒被嘲笑"]
+
+
+def _surrogate_samples(count: int, source: str = "llm_driven", scale: float = 1.0):
+    """压力变化与影响分数线性相关的合成评估样本"""
+    from models.surrogate_model import state_features
+    rng = random.Random(count)
+    samples = []
+    for i in range(count):
+        impact = rng.randint(-9, 9)
+        samples.append({
+            "source": source,
+            "event": {"description": EVENT_TEXTS[i % len(EVENT_TEXTS)], "event_type": "学业失败",
+                      "impact_score": impact},
+            "state": state_features(_state(rng.randint(3, 7))),
+            "targets": {"stress_change": -0.2 * impact * scale, "self_esteem_change": 0.1 * impact * scale}
+        })
+    return samples
+
+
+def test_surrogate_round_trip():
+    """测试代理模型训练、保存、加载后的预测和置信度"""
+    print("\n=== 测试 代理模型训练与预测 ===")
+    from models.psychological_model_base import ModelFactory, PsychologicalModelType
+    from models.surrogate_model import RidgeSurrogate, align_target_scales, state_features, train_surrogate
+
+    # 不同来源的量纲先对齐到LLM驱动模型
+    mixed = _surrogate_samples(40) + _surrogate_samples(40, "hybrid_calculator", scale=4.0)
+    aligned, factors = align_target_scales(mixed)
+    assert factors["llm_driven"]["stress_change"] == 1.0
+    assert abs(factors["hybrid_calculator"]["stress_change"] - 0.25) < 0.05
+    assert len(aligned) == len(mixed) and mixed[-1]["targets"] is not aligned[-1]["targets"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "surrogate.npz"
+        report = train_surrogate(mixed, path, {"hash_dim": 64, "min_samples": 30})
+        assert report["samples"] == 80 and report["sources"] == {"hybrid_calculator": 40, "llm_driven": 40}
+        assert report["fit_quality"] > 0.8
+        print(f"✓ 训练报告: 拟合质量 {report['fit_quality']}，样本 {report['samples']}")
+
+        model = ModelFactory.create_model(PsychologicalModelType.SURROGATE, {"model_path": str(path)})
+        assert model.is_trained
+        result = asyncio.run(model.calculate_impact(_event("数学考试不及格", -8), _state(), {}))
+        assert abs(result.stress_change - 1.6) < 0.5 and result.confidence > 0.5
+        print(f"✓ 预测压力变化 {result.stress_change:.2f}，置信度 {result.confidence:.2f}")
+
+        # 重新加载后预测一致；远离训练分布的输入置信度更低
+        reloaded = RidgeSurrogate.load(path)
+        near, near_confidence = reloaded.predict(_event("数学考试不及格", -8).to_dict(), state_features(_state()))
+        assert abs(near["stress_change"] - result.stress_change) < 1e-9
+        far_state = {"stress_level": 10, "self_esteem": 0, "depression_level": 4, "rumination": 10}
+        _, far_confidence = reloaded.predict({"description": "完全没有见过的事情" * 3, "impact_score": 10},
+                                             far_state)
+        assert far_confidence < near_confidence
+    print(f"✓ 置信度: 训练分布内 {near_confidence:.2f}，分布外 {far_confidence:.2f}")
+
+
+def test_surrogate_confidence_gate():
+    """测试混合模型只在代理模型置信度达到阈值时跳过LLM"""
+    print("\n=== 测试 代理模型置信度门槛 ===")
+    from models.psychological_model_base import ModelImpactResult
+
+    class FixedSurrogate:
+        def __init__(self, confidence):
+            self.confidence = confidence
+
+        async def calculate_impact(self, event, state, context):
+            return ModelImpactResult(stress_change=0.5, model_type="surrogate", confidence=self.confidence)
+
+    for confidence, expect_llm in ((0.9, False), (0.5, True)):
+        model, llm_calls = _hybrid_model({"surrogate_confidence_threshold": 0.75, "llm_call_budget": 3})
+        model.surrogate_model = FixedSurrogate(confidence)
+        result = asyncio.run(model.calculate_impact(_event("被同学孤立", -9), _state(), {}))
+        assert bool(llm_calls) == expect_llm and model.surrogate_skips == (0 if expect_llm else 1)
+        # 代理模型替代的评估不占用LLM调用预算
+        assert model.llm_policy.remaining_calls() == (2 if expect_llm else 3)
+        assert result.model_type == "hybrid"
+    print("✓ 高置信度跳过LLM，低置信度仍调用LLM")
+
+
+def test_surrogate_cli():
+    """测试命令行从已有模拟日志（每日状态 + LLM评估记录）训练代理模型"""
+    print("\n=== 测试 代理模型命令行训练 ===")
+    from models import surrogate_model
+
+    def mental_state(day):
+        return {"depression_level": 1, "stress_level": 3 + day % 4, "self_esteem": 6 - day % 3,
+                "social_connection": 5, "cad_state": {
+                    "affective_tone": -day / 4,
+                    "core_beliefs": {"self_belief": -day / 5, "world_belief": 0, "future_belief": 0},
+                    "cognitive_processing": {"rumination": day / 3, "distortions": 2},
+                    "behavioral_inclination": {"social_withdrawal": 1, "avolition": 1}}}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        logs_dir = Path(tmp) / "logs"
+        sim_dir = logs_dir / "sim_old"
+        sim_dir.mkdir(parents=True)
+        for day in range(1, 13):
+            events = [{"description": f"第{day}天{EVENT_TEXTS[(day + i) % len(EVENT_TEXTS)]}",
+                       "participants": ["李明"], "impact_score": (-1) ** i * (i + 2)} for i in range(3)]
+            (sim_dir / f"day_{day}_state.json").write_text(json.dumps({
+                "day": day, "events": events, "protagonist": {"current_mental_state": mental_state(day)}
+            }, ensure_ascii=False), encoding="utf-8")
+
+        daily = surrogate_model.load_daily_state_samples(logs_dir)
+        assert len(daily) == 33 and {s["source"] for s in daily} == {"daily_state"}
+        # 当天的状态变化按影响分数绝对值比例分摊：2:3:4
+        day_two = [s["targets"]["stress_change"] for s in daily[:3]]
+        assert abs(sum(day_two) - 1.0) < 1e-9 and abs(day_two[2] / day_two[0] - 2.0) < 1e-9
+        assert daily[0]["state"]["stress_level"] == 4 and daily[0]["state"]["rumination"] == 1 / 3
+
+        (logs_dir / "sim_new").mkdir()
+        with open(logs_dir / "sim_new" / surrogate_model.ASSESSMENT_LOG_NAME, "w", encoding="utf-8") as f:
+            for sample in _surrogate_samples(12):
+                f.write(json.dumps(sample, ensure_ascii=False) + "\n")
+
+        output = Path(tmp) / "model.npz"
+        argv, sys.argv = sys.argv, ["surrogate_model", "--logs-dir", str(logs_dir), "--output", str(output)]
+        buffer = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(buffer):
+                surrogate_model.main()
+        finally:
+            sys.argv = argv
+        report = json.loads(buffer.getvalue())
+        assert output.exists() and report["samples"] == 45
+        assert report["sources"] == {"daily_state": 33, "llm_driven": 12}
+        assert report["scale_factors"]["llm_driven"]["stress_change"] == 1.0
+        print(f"✓ 命令行训练: {report['sources']}")
+
+
+TESTS = [
+    ("LLM评估结果缓存", test_llm_result_cache),
+    ("单事件评估与结果缓存", test_hybrid_single_event_cache),
+    ("批量评估与结果缓存", test_llm_result_cache_batch),
+    ("LLM调用策略与预算", test_llm_invocation_policy_budget),
+    ("并发评估的调用预算", test_llm_budget_concurrent),
+    ("代理模型训练与预测", test_surrogate_round_trip),
+    ("代理模型置信度门槛", test_surrogate_confidence_gate),
+    ("代理模型命令行训练", test_surrogate_cli),
+]
+
+
+def main():
+    """主测试函数"""
+    print("开始混合心理模型测试...")
+    print("=" * 50)
+
+    passed = 0
+    for name, test in TESTS:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"✗ {name}测试失败: {e!r}")
+
+    print("\n" + "=" * 50)
+    print(f"测试完成: {passed}/{len(TESTS)} 项测试通过")
+    return 0 if passed == len(TESTS) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
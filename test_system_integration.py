@@ -180,9 +180,9 @@ def test_configuration_loading():
     
     try:
         # 测试LLM增强配置
-        config_path = "/Users/zl_24/Documents/Codes/2025/2025-07/CAD-main/config/llm_enhancement_config.json"
-        with open(config_path, 'r', encoding='utf-8') as f:
-            llm_config = json.load(f)
+        from config.config_loader import get_config_loader
+        loader = get_config_loader()
+        llm_config = loader.load_llm_enhancement_config()
         
         print("✓ LLM增强配置加载成功")
         print(f"  事件生成启用: {llm_config.get('llm_integration', {}).get('event_generation', {}).get('enabled', False)}")
@@ -191,7 +191,7 @@ def test_configuration_loading():
         print(f"  双向影响启用: {llm_config.get('bidirectional_impact', {}).get('enabled', False)}")
         
         # 测试场景配置
-        scenarios_dir = Path("/Users/zl_24/Documents/Codes/2025/2025-07/CAD-main/config/scenarios")
+        scenarios_dir = loader.scenarios_dir
         scenario_files = list(scenarios_dir.glob("*.json"))
         print(f"✓ 发现 {len(scenario_files)} 个场景配置文件")
         
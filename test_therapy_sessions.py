@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+治疗会话测试脚本
+测试治疗会话的后台轮次分析、批量运行、滚动摘要、提示词前缀复用、治疗回应生成，
+以及模拟历史缓存、会话日志恢复和提前终止等组件
+（不需要真实的AI客户端，可直接运行，也可由pytest收集；异步接口在测试内用asyncio.run驱动）
+"""
+
+import asyncio
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+
+class _TherapyClient:
+    """不发起真实请求的AI客户端：分析类请求返回固定评分，角色请求返回固定台词"""
+
+    async def generate_response(self, prompt: str, context=None) -> str:
+        return json.dumps({"overall_effectiveness": 6, "patient_openness": 6, "emotional_connection": 6})
+
+    async def generate_agent_response(self, profile, situation, *args, **kwargs) -> str:
+        return "我最近总是睡不好。"
+
+
+def _write_report(path: Path, name: str = "李明") -> Path:
+    """写入一份中度抑郁患者的最终报告"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({
+        "protagonist_character_profile": {"name": name, "age": 16, "personality": {}},
+        "final_psychological_state": {"depression_level": "MODERATE", "cad_state": {
+            "affective_tone": -5,
+            "core_beliefs": {"self_belief": -6, "world_belief": -4, "future_belief": -6},
+            "cognitive_processing": {"rumination": 7, "distortions": 6},
+            "behavioral_inclination": {"social_withdrawal": 6, "avolition": 6}}}
+    }, ensure_ascii=False), encoding="utf-8")
+    return path
+
+
+def _manager(tmp: str, client=None):
+    """在临时目录中创建AI-AI治疗管理器（不保存到logs/、没有节奏延迟）"""
+    from core.ai_to_ai_therapy_manager import AIToAITherapyManager
+    manager = AIToAITherapyManager(client or _TherapyClient(), str(_write_report(Path(tmp) / "final_report.json")))
+    manager.logs_dir = Path(tmp)
+    manager.turn_delay_seconds = 0
+    manager.stopping_policy = None
+    return manager
+
+
+def test_turn_analysis_overlap():
+    """测试轮次分析在后台与下一轮对话重叠，并按调度时的患者状态评估进展"""
+    print("\n=== 测试 后台轮次分析 ===")
+
+    def run_session(overlap: bool):
+        with tempfile.TemporaryDirectory() as tmp:
+            manager = _manager(tmp)
+            manager.overlap_turn_analysis = overlap
+            timeline, analysed = [], []
+            generate_therapist_response = manager._generate_therapist_response
+
+            async def therapist_response():
+                timeline.append(("therapist", len(manager.dialogue_history) + 1))
+                return await generate_therapist_response()
+
+            async def slow_analysis(therapist_message, patient_response):
+                analysed.append(patient_response)
+                turn = len(analysed)
+                await asyncio.sleep(0.05)
+                timeline.append(("analysis", turn))
+                return {"overall_effectiveness": turn, "patient_openness": 6, "emotional_connection": 6}
+
+            manager._generate_therapist_response = therapist_response
+            manager._analyze_dialogue_turn = slow_analysis
+            summary = asyncio.run(manager.start_therapy_session(3))
+            return manager, summary, timeline
+
+    manager, summary, timeline = run_session(overlap=True)
+    # 第1轮的分析完成前已经开始生成第2轮；分数仍按轮次顺序记录，最后一轮的分析在总结前完成
+    assert timeline.index(("therapist", 2)) < timeline.index(("analysis", 1))
+    assert manager.session_effectiveness_scores == [1, 2, 3]
+    assert [turn.therapy_analysis["overall_effectiveness"] for turn in manager.dialogue_history] == [1, 2, 3]
+    assert [p.turn_number for p in manager.progress_history] == [1, 2, 3]
+    assert summary["total_turns"] == 3
+    print(f"✓ 重叠执行: {timeline}")
+
+    _, _, serial = run_session(overlap=False)
+    assert serial.index(("analysis", 1)) < serial.index(("therapist", 2))
+    print("✓ overlap_turn_analysis=false 时串行执行")
+
+    # 进展评估使用调度时的快照，而不是分析完成时（已被下一轮修改）的患者状态
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = _manager(tmp)
+        cad = manager.patient_agent.cad_state
+        cad.affective_tone, cad.core_beliefs.self_belief = 8, 6
+        snapshot = manager._get_turn_state_snapshot()
+        cad.affective_tone, cad.core_beliefs.self_belief = -8, -6
+        assert manager._calculate_emotional_state_score() != snapshot["emotional_state"]
+
+        from core.ai_to_ai_therapy_manager import DialogueTurn
+        turn = DialogueTurn(turn_number=1, timestamp="", therapist_message="你好", patient_response="嗯",
+                            therapy_analysis={}, patient_state_change={})
+        manager.dialogue_history.append(turn)
+        asyncio.run(manager._process_turn_analysis(1, turn, "你好", "嗯", snapshot))
+        assert manager.progress_history[-1].patient_emotional_state == snapshot["emotional_state"]
+        print(f"✓ 进展评估使用快照情绪得分 {snapshot['emotional_state']:.1f}")
+
+
+def test_therapy_cohort():
+    """测试批量运行的患者数据发现、共享请求预算和结果汇总"""
+    print("\n=== 测试 批量AI-AI治疗 ===")
+    from core.therapy_cohort_runner import (RateLimitedAIClient, RequestRateLimiter, discover_patient_logs,
+                                            run_therapy_cohort)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        logs = Path(tmp) / "logs"
+        report = _write_report(logs / "sim_a" / "final_report.json")
+        _write_report(logs / "sim_b" / "day_2_state.json", "王芳")
+        _write_report(logs / "sim_b" / "day_10_state.json", "王芳")
+        (logs / "sim_empty").mkdir()
+
+        # 优先最终报告，否则按天数（而不是文件名）取最后一天；--day 指定天数
+        found = discover_patient_logs([str(logs), str(report)])
+        assert [(p.parent.name, p.name) for p in found] == [("sim_a", "final_report.json"),
+                                                             ("sim_b", "day_10_state.json")]
+        assert [p.name for p in discover_patient_logs([str(logs / "sim_b")], day=2)] == ["day_2_state.json"]
+        print(f"✓ 发现 {len(found)} 个患者数据文件")
+
+        # 所有会话共享并发请求上限
+        active, peak = [0], [0]
+
+        class SlowClient(_TherapyClient):
+            async def generate_response(self, prompt: str, context=None) -> str:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+                await asyncio.sleep(0.01)
+                active[0] -= 1
+                return await super().generate_response(prompt, context)
+
+        async def burst():
+            client = RateLimitedAIClient(SlowClient(), RequestRateLimiter(max_concurrent_requests=2))
+            await asyncio.gather(*(client.generate_response("评估") for _ in range(6)))
+            return client
+
+        assert asyncio.run(burst())._limiter.get_stats()["requests"] == 6 and peak[0] == 2
+        print("✓ 并发请求不超过上限")
+
+        output_dir = Path(tmp) / "cohort"
+        summary = asyncio.run(run_therapy_cohort(SlowClient(), found, max_turns=2, output_dir=output_dir,
+                                                 max_concurrent_sessions=2, max_concurrent_requests=3))
+        aggregate = summary["aggregate"]
+        assert aggregate["sessions"] == 2 and aggregate["completed"] == 2 and peak[0] <= 3
+        assert [r["label"] for r in summary["sessions"]] == ["sim_a", "sim_b_day_10_state"]
+        assert [s["turn"] for s in aggregate["effectiveness"]["per_turn"]] == [1, 2]
+        assert sum(aggregate["depression_level"]["transitions"].values()) == 2
+        assert all(Path(r["log_file"]).exists() for r in summary["sessions"])
+        saved = json.loads((output_dir / "cohort_summary.json").read_text(encoding="utf-8"))
+        assert saved["aggregate"] == aggregate
+        print(f"✓ 汇总 {aggregate['completed']} 个会话: {aggregate['depression_level']['transitions']}")
+
+
+def test_conversation_summarizer():
+    """测试滚动对话摘要的窗口、后台更新和超长摘要的截断"""
+    print("\n=== 测试 滚动对话摘要 ===")
+    from core.conversation_summarizer import RollingConversationSummarizer
+
+    class SummaryClient:
+        def __init__(self, reply):
+            self.reply = reply
+
+        async def generate_response(self, prompt: str, context=None) -> str:
+            if isinstance(self.reply, Exception):
+                raise self.reply
+            return self.reply
+
+    assert RollingConversationSummarizer.from_config(None, {"rolling_summary": {"enabled": False}}) is None
+    history = [{"therapist": f"第{i}轮咨询师的提问", "patient": f"第{i}轮患者的回答"} for i in range(1, 11)]
+
+    async def summarize(reply):
+        summarizer = RollingConversationSummarizer(SummaryClient(reply), recent_turns=4, update_every=3,
+                                                   max_summary_chars=100)
+        summarizer.schedule(history[:6])  # 只有2轮滑出窗口，还不更新
+        assert summarizer._task is None and summarizer.omitted_turns(history[:6]) == 2
+        summarizer.schedule(history)
+        await summarizer.wait()
+        return summarizer
+
+    # 超长的LLM摘要保留开头，在最大长度内的最后一个句子结尾处截断
+    sentences = [f"第{i}句摘要记录了患者在学校和家里的经历。" for i in range(1, 9)]
+    summarizer = asyncio.run(summarize("".join(sentences)))
+    assert summarizer.summarized_turns == 6 and summarizer.recent(history) == history[-4:]
+    assert summarizer.summary.startswith(sentences[0]) and summarizer.summary.endswith("。")
+    assert summarizer.summary == "".join(sentences[:5])  # 每句20字
+    assert summarizer.render_summary(history).startswith("（前6轮对话摘要）第1句")
+    print(f"✓ LLM摘要在句子边界截断: {len(summarizer.summary)}字")
+
+    # LLM失败时的摘录保留最新的内容
+    summarizer = asyncio.run(summarize(RuntimeError("网络错误")))
+    assert summarizer.stats["llm_failures"] == 1 and len(summarizer.summary) <= 100
+    assert summarizer.summary.endswith("第6轮患者的回答")
+    print(f"✓ 摘录保留最新内容: ...{summarizer.summary[-20:]}")
+
+
+def test_patient_prompt_preamble():
+    """测试患者提示词的静态前言只渲染一次并作为每轮提示词的相同前缀"""
+    print("\n=== 测试 患者提示词静态前言 ===")
+    from core.prompt_usage import PromptUsageTracker
+    from core.therapy_session_manager import TherapySessionManager
+
+    tracker = PromptUsageTracker()
+    tracker.record(100, 80)
+    tracker.record(60, None)  # 提供方没有返回缓存信息的请求不计入命中率
+    assert tracker.get_stats()["prefix_cache_hit_rate"] == 0.8 and tracker.get_stats()["prompt_tokens"] == 160
+
+    class UsageClient(_TherapyClient):
+        def get_usage_stats(self):
+            return tracker.get_stats()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = TherapySessionManager(UsageClient())
+        assert manager.load_patient_data_from_file(str(_write_report(Path(tmp) / "final_report.json")))
+
+        first = asyncio.run(manager._generate_prompt_for_patient("你最近睡得好吗？"))
+        manager.conversation_history.append({"therapist": "你最近睡得好吗？", "patient": "不太好。"})
+        second = asyncio.run(manager._generate_prompt_for_patient("能多说说吗？"))
+        preamble = manager._get_patient_preamble()
+        assert first.startswith(preamble) and second.startswith(preamble)
+        assert "能多说说吗？" in second[len(preamble):] and "不太好。" in second[len(preamble):]
+        assert "不太好。" not in preamble
+
+        stats = manager.get_prompt_cache_stats()
+        assert stats["preamble_builds"] == 1 and stats["preamble_reuses"] == 2
+        assert 0 < stats["static_prefix_ratio"] < 1 and stats["provider"]["prefix_cache_hit_rate"] == 0.8
+        print(f"✓ 静态前缀占比 {stats['static_prefix_ratio']:.0%}")
+
+        # 修改显示事件数后重新渲染
+        manager.max_events_to_show += 1
+        asyncio.run(manager._generate_prompt_for_patient("还有呢？"))
+        assert manager.get_prompt_cache_stats()["preamble_builds"] == 2
+        print("✓ 显示设置变化时重新渲染前言")
+
+
+def test_fused_therapeutic_response():
+    """测试单次调用同时生成消息分析和治疗回应，以及无法解析时回退到分步生成"""
+    print("\n=== 测试 单次调用生成治疗回应 ===")
+    from core.llm_therapy_enhancer import LLMTherapyEnhancer
+    from models.psychology_models import PsychologicalState, EmotionState, DepressionLevel
+
+    class ScriptedClient:
+        def __init__(self, *replies):
+            self.replies = list(replies)
+            self.prompts = []
+
+        async def generate_response(self, prompt: str, context=None) -> str:
+            self.prompts.append(prompt)
+            return self.replies.pop(0)
+
+    state = PsychologicalState(emotion=EmotionState.SAD, depression_level=DepressionLevel.MODERATE,
+                               stress_level=8, self_esteem=3, social_connection=3, academic_pressure=7)
+    analysis = {"key_themes": ["学业"], "cognitive_patterns": ["负面的自我评价"], "emotional_intensity": 8}
+
+    fused = json.dumps({
+        "message_analysis": analysis,
+        "response": {"content": "听起来这次考试让你很受打击。", "response_type": "supportive",
+                     "therapeutic_techniques": ["cognitive_restructuring"], "confidence": 0.8}
+    }, ensure_ascii=False)
+    client = ScriptedClient(f"```json\n{fused}\n```")
+    enhancer = LLMTherapyEnhancer(client, fused_response=True)
+    response = asyncio.run(enhancer.generate_therapeutic_response("我什么都做不好", state, []))
+    assert len(client.prompts) == 1 and response.content == "听起来这次考试让你很受打击。"
+    # 记录的是回应实际采用的技术，而不是本地按分析选择的技术
+    assert enhancer.therapy_responses[-1]["techniques_used"] == ["cognitive_restructuring"]
+    assert enhancer.therapy_responses[-1]["message_analysis"] == analysis
+    print(f"✓ 单次调用: {enhancer.get_response_stats()}")
+
+    # 单次调用的结果无法解析时改用分步生成（分析 + 回应两次调用）
+    client = ScriptedClient("抱歉，我无法回答。", json.dumps(analysis, ensure_ascii=False),
+                            json.dumps({"content": "我在听。", "response_type": "supportive"}, ensure_ascii=False))
+    enhancer = LLMTherapyEnhancer(client, fused_response=True)
+    response = asyncio.run(enhancer.generate_therapeutic_response("我什么都做不好", state, []))
+    stats = enhancer.get_response_stats()
+    assert len(client.prompts) == 3 and response.content == "我在听。"
+    assert (stats["fused"], stats["fused_fallbacks"], stats["two_step"]) == (0, 1, 1)
+    assert "cognitive_restructuring" in enhancer.therapy_responses[-1]["techniques_used"]
+    print(f"✓ 回退到分步生成: {stats}")
+
+
+def test_simulation_history_cache():
+    """测试模拟历史事件的JSONL缓存、增量更新，以及每次加载返回独立的列表"""
+    print("\n=== 测试 模拟历史事件缓存 ===")
+    from core import simulation_history as history
+
+    def write_day(sim_dir: Path, day: int, *descriptions: str):
+        events = [{"day": day, "description": d} for d in descriptions]
+        (sim_dir / f"day_{day}_state.json").write_text(
+            json.dumps({"day": day, "events": events}, ensure_ascii=False), encoding="utf-8")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sim_dir = Path(tmp)
+        for day in (1, 2, 10):
+            write_day(sim_dir, day, f"第{day}天的事件")
+
+        # 按天数（而不是文件名）排序，并生成缓存文件
+        events = history.load_history_events(sim_dir)
+        assert [e["day"] for e in events] == [1, 2, 10]
+        assert (sim_dir / history.HISTORY_CACHE_FILE).exists()
+
+        # 调用方修改返回的列表不影响下一次加载
+        events[0]["description"] = "被调用方修改"
+        events.pop()
+        reloaded = history.load_history_events(sim_dir)
+        assert reloaded is not events and [e["description"] for e in reloaded] == [
+            "第1天的事件", "第2天的事件", "第10天的事件"]
+        print("✓ 每次加载返回独立的事件列表")
+
+        # 只有变化和新增的每日文件需要重新读取
+        cached_files = history._read_cache_header(sim_dir / history.HISTORY_CACHE_FILE)
+        write_day(sim_dir, 2, "第2天的事件", "第2天补充的事件")
+        write_day(sim_dir, 3, "第3天的事件")
+        files = history._scan_day_files(sim_dir)
+        assert history._rebuild_cache(sim_dir, files, cached_files, max_workers=2) == (2, 2)
+
+        events = history.load_history_events(sim_dir)
+        assert [e["description"] for e in events] == [
+            "第1天的事件", "第2天的事件", "第2天补充的事件", "第3天的事件", "第10天的事件"]
+        print(f"✓ 增量更新后共 {len(events)} 条事件")
+
+        recent = history.load_recent_daily_events(sim_dir, days=2)
+        assert list(recent) == ["day_3", "day_10"]
+        print(f"✓ 最近两天: {list(recent)}")
+
+
+def test_session_journal_resume():
+    """测试AI-AI治疗会话中断后从会话日志恢复并继续"""
+    print("\n=== 测试 会话日志恢复 ===")
+    from core.ai_to_ai_therapy_manager import AIToAITherapyManager
+    from core.session_journal import SessionJournal, find_unfinished_journals
+
+    client = _TherapyClient()
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = _manager(tmp, client)
+        generate_therapist_response = manager._generate_therapist_response
+
+        async def crash_on_fourth_turn():
+            # 第4轮开始前模拟进程被中断
+            if len(manager.dialogue_history) == 3:
+                raise asyncio.CancelledError()
+            return await generate_therapist_response()
+
+        manager._generate_therapist_response = crash_on_fourth_turn
+        try:
+            asyncio.run(manager.start_therapy_session(5))
+        except asyncio.CancelledError:
+            pass
+        manager.session_journal.close()
+
+        journals = find_unfinished_journals(tmp)
+        assert journals == [SessionJournal.path_for(tmp, manager.session_id)]
+
+        # 恢复后回放已完成的轮次和患者状态，再继续到最大轮数
+        resumed = AIToAITherapyManager.resume_from_journal(journals[0], client)
+        resumed.turn_delay_seconds = 0
+        assert len(resumed.dialogue_history) == 3 and resumed.current_turn == 3 and resumed.max_turns == 5
+        assert resumed.patient_agent.cad_state.affective_tone == manager.patient_agent.cad_state.affective_tone
+        print(f"✓ 恢复 {len(resumed.dialogue_history)} 轮对话")
+
+        summary = asyncio.run(resumed.start_therapy_session(5))
+        assert [turn["turn_number"] for turn in summary["dialogue_history"]] == [1, 2, 3, 4, 5]
+        assert not journals[0].exists() and not find_unfinished_journals(tmp)
+        print("✓ 继续完成会话，日志已压缩为会话记录")
+
+
+def test_session_stopping_policy():
+    """测试AI-AI治疗会话的提前终止条件和结束原因"""
+    print("\n=== 测试 会话提前终止策略 ===")
+    from core.ai_to_ai_therapy_manager import AIToAITherapyManager, DEPRESSION_LEVELS
+    from core.session_stopping_policy import SessionStoppingPolicy, TurnObservation, cad_change
+
+    def observe_all(policy, rows):
+        for turn, (effectiveness, alliance, emotional, change, level) in enumerate(rows, 1):
+            policy.observe(TurnObservation(turn, effectiveness, alliance, emotional, change, level))
+        return policy
+
+    settings = {"early_stopping": {"min_turns": 4, "window": 2}}
+    assert SessionStoppingPolicy.from_config({"early_stopping": {"enabled": False}}, DEPRESSION_LEVELS) is None
+    assert cad_change({"cad_state": {"self_belief": -4, "rumination": 6}},
+                      {"cad_state": {"self_belief": -3, "rumination": 6}}) == 0.5
+
+    # 平台期：效果、联盟、情绪和CAD变化都趋于稳定
+    plateau = observe_all(SessionStoppingPolicy.from_config(settings, DEPRESSION_LEVELS, "MODERATE"),
+                          [(6.0, 5.0, 4.0, None, "MODERATE")] + [(6.0, 5.0, 4.0, 0.0, "MODERATE")] * 4)
+    assert plateau.stop_reason == "plateau_detected" and plateau.stop_turn == 4
+
+    # 显著改善：达到目标抑郁等级
+    levels = ["MODERATE", "MODERATE", "MILD", "MILD_RISK"]
+    improved = observe_all(SessionStoppingPolicy.from_config(settings, DEPRESSION_LEVELS, "MODERATE"),
+                           [(7.0, 5.0 + i, 4.0 + i, 0.5, level) for i, level in enumerate(levels)])
+    assert improved.stop_reason == "significant_improvement" and improved.stop_turn == 4
+
+    # 恶化：效果持续低下且联盟下降；关闭该条件后不再终止
+    rows = [(2.0, 5.0 - i * 0.5, 3.0, 0.5, "MODERATE") for i in range(4)]
+    assert observe_all(SessionStoppingPolicy.from_config(settings, DEPRESSION_LEVELS, "MODERATE"),
+                       rows).stop_reason == "deterioration_detected"
+    disabled = dict(settings, auto_termination_conditions={"deterioration_detected": False})
+    assert observe_all(SessionStoppingPolicy.from_config(disabled, DEPRESSION_LEVELS, "MODERATE"),
+                       rows).stop_reason is None
+    print(f"✓ 平台期、显著改善和恶化: {plateau.get_summary()['details']}")
+
+    # 只有策略提前结束的会话才计算节省的轮数
+    manager = AIToAITherapyManager.__new__(AIToAITherapyManager)
+    manager.dialogue_history, manager.max_turns = [None] * 4, 10
+    for policy, current_turn, reason, saved in ((plateau, 4, "plateau_detected", 6),
+                                                (None, 4, "interrupted", 0),
+                                                (None, 10, "max_turns_reached", 0)):
+        manager.stopping_policy, manager.current_turn = policy, current_turn
+        termination = manager._get_termination_summary()
+        assert (termination["reason"], termination["turns_saved"]) == (reason, saved)
+    print("✓ 结束原因和节省轮数")
+
+
+TESTS = [
+    ("后台轮次分析", test_turn_analysis_overlap),
+    ("批量AI-AI治疗", test_therapy_cohort),
+    ("滚动对话摘要", test_conversation_summarizer),
+    ("患者提示词静态前言", test_patient_prompt_preamble),
+    ("单次调用生成治疗回应", test_fused_therapeutic_response),
+    ("模拟历史事件缓存", test_simulation_history_cache),
+    ("会话日志恢复", test_session_journal_resume),
+    ("会话提前终止策略", test_session_stopping_policy),
+]
+
+
+def main():
+    """主测试函数"""
+    print("开始治疗会话测试...")
+    print("=" * 50)
+
+    passed = 0
+    for name, test in TESTS:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"✗ {name}测试失败: {e!r}")
+
+    print("\n" + "=" * 50)
+    print(f"测试完成: {passed}/{len(TESTS)} 项测试通过")
+    return 0 if passed == len(TESTS) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
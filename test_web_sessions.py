@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Web会话测试脚本
+测试Web界面共享的后台事件循环和人工治疗会话存储
+（不需要Flask和真实的AI客户端，可直接运行，也可由pytest收集）
+"""
+
+import asyncio
+import concurrent.futures
+import json
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+
+class _TherapyClient:
+    """不发起真实请求的AI客户端"""
+
+    async def generate_response(self, prompt: str, context=None) -> str:
+        return "嗯。"
+
+
+def _session_info(tmp: Path, name: str) -> dict:
+    """加载了患者数据、有一轮对话的人工治疗会话信息"""
+    from core.therapy_session_manager import TherapySessionManager
+    report = tmp / f"sim_{name}" / "final_report.json"
+    report.parent.mkdir(parents=True, exist_ok=True)
+    report.write_text(json.dumps({
+        "protagonist_character_profile": {"name": name, "age": 16},
+        "simulation_summary": {"final_depression_level": "MODERATE"}
+    }, ensure_ascii=False), encoding="utf-8")
+    manager = TherapySessionManager(_TherapyClient())
+    assert manager.load_patient_data_from_file(str(report))
+    manager.conversation_history.append({"therapist": f"{name}，你好", "patient": "你好。"})
+    return {"manager": manager, "patient_file": str(report), "ai_provider": "deepseek",
+            "created_at": "2026-01-01T00:00:00"}
+
+
+@contextmanager
+def _fake_client_factory():
+    """重建换出的会话时使用不发起请求的AI客户端"""
+    from core.ai_client_factory import ai_client_factory
+    get_client = ai_client_factory.get_client
+    ai_client_factory.get_client = lambda provider=None: _TherapyClient()
+    try:
+        yield
+    finally:
+        ai_client_factory.get_client = get_client
+
+
+def test_background_event_loop():
+    """测试后台事件循环的提交、等待、超时取消和关闭"""
+    print("\n=== 测试 后台事件循环 ===")
+    from web.background_loop import BackgroundEventLoop
+
+    background = BackgroundEventLoop(max_workers=2)
+
+    async def worker_thread():
+        # AI客户端通过asyncio.to_thread发起阻塞请求，使用循环自带的线程池
+        return await asyncio.to_thread(lambda: threading.current_thread().name)
+
+    async def loop_identity():
+        return id(asyncio.get_running_loop()), threading.current_thread().name
+
+    try:
+        # 多个请求线程的协程都在同一个循环线程中运行
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as requests:
+            identities = set(requests.map(lambda _: background.run(loop_identity()), range(4)))
+        assert len(identities) == 1 and next(iter(identities))[1] == "web-event-loop"
+        assert background.run(worker_thread()).startswith("web-llm")
+        print("✓ 请求共享同一个事件循环和线程池")
+
+        # submit立即返回，结果可稍后取回
+        future = background.submit(asyncio.sleep(0.01, result="完成"), "测试任务")
+        assert future.result(1) == "完成"
+
+        # 等待超时时取消协程
+        cancelled = threading.Event()
+
+        async def slow():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        try:
+            background.run(slow(), timeout=0.05)
+            assert False, "应当超时"
+        except concurrent.futures.TimeoutError:
+            pass
+        assert cancelled.wait(1)
+        print("✓ 超时的协程被取消")
+
+        # 关闭时取消未完成的任务并关闭循环；之后提交会重新启动
+        pending = background.submit(asyncio.sleep(10), "长任务")
+        loop = background.start()
+        background.shutdown()
+        assert pending.cancelled() and loop.is_closed() and not background.running
+        assert background.run(asyncio.sleep(0, result=1)) == 1 and background.running
+        print("✓ 关闭后可重新启动")
+    finally:
+        background.shutdown()
+
+
+def test_session_store_spill():
+    """测试会话按数量换出到磁盘、再次访问时重建，以及使用中的会话不被换出"""
+    print("\n=== 测试 Web会话换出与重建 ===")
+    from web.session_store import TherapySessionStore
+
+    with tempfile.TemporaryDirectory() as tmp, _fake_client_factory():
+        tmp = Path(tmp)
+        store = TherapySessionStore(tmp / "spill", max_sessions=2, ttl_seconds=0, max_memory_mb=0)
+        for name in ("a", "b", "c"):
+            store.put(name, _session_info(tmp, name))
+        assert len(store) == 2 and (tmp / "spill" / "a.json").exists() and "a" in store
+        print(f"✓ 超出数量上限的会话已换出: {store.get_stats()}")
+
+        # 再次访问时从快照重建对话历史和元信息，快照文件删除，最久未使用的会话被换出
+        session = store.get("a")
+        assert session["manager"].conversation_history == [{"therapist": "a，你好", "patient": "你好。"}]
+        assert session["patient_file"].endswith("final_report.json") and session["ai_provider"] == "deepseek"
+        assert not (tmp / "spill" / "a.json").exists() and (tmp / "spill" / "b.json").exists()
+        assert store.get_stats()["rehydrated"] == 1 and store.get("missing") is None
+
+        # 正在处理消息的会话不会被换出（换出其后较久未使用的会话），结束后恢复正常的LRU顺序
+        with store.checkout("c") as session:
+            assert session is not None
+            for name in ("d", "e"):
+                store.put(name, _session_info(tmp, name))
+            assert list(store._sessions) == ["c", "e"] and (tmp / "spill" / "d.json").exists()
+        store.put("f", _session_info(tmp, "f"))
+        assert list(store._sessions) == ["e", "f"] and (tmp / "spill" / "c.json").exists()
+        print("✓ 使用中的会话保留在内存中")
+
+
+def test_session_store_limits():
+    """测试内存上限和后台事件循环上的定时清理"""
+    print("\n=== 测试 Web会话内存上限与定时清理 ===")
+    from web.background_loop import BackgroundEventLoop
+    from web.session_store import TherapySessionStore
+
+    with tempfile.TemporaryDirectory() as tmp, _fake_client_factory():
+        tmp = Path(tmp)
+        # 估算大小超过上限时只保留最近使用的会话
+        store = TherapySessionStore(tmp / "spill", max_sessions=10, ttl_seconds=0, max_memory_mb=0.0001)
+        for name in ("a", "b", "c"):
+            store.put(name, _session_info(tmp, name))
+        stats = store.get_stats()
+        assert list(store._sessions) == ["c"] and stats["evicted_memory"] == 2 and stats["in_memory"] == 1
+        print(f"✓ 内存上限: {stats}")
+
+        # 没有请求访问时，定时清理也会换出空闲会话
+        assert not TherapySessionStore(tmp / "spill", sweep_interval_seconds=0).start_sweeper(None)
+        store = TherapySessionStore(tmp / "idle", ttl_seconds=0.05, max_memory_mb=0, sweep_interval_seconds=0.02)
+        store.put("idle", _session_info(tmp, "idle"))
+        background = BackgroundEventLoop(max_workers=2)
+        try:
+            assert store.start_sweeper(background) and not store.start_sweeper(background)
+            deadline = time.monotonic() + 2
+            while len(store) and time.monotonic() < deadline:
+                time.sleep(0.02)
+            assert len(store) == 0 and store.get_stats()["evicted_ttl"] == 1
+            assert store.get_stats()["sweeps"] >= 1 and (tmp / "idle" / "idle.json").exists()
+            store.stop_sweeper()
+        finally:
+            background.shutdown()
+        print(f"✓ 定时清理: {store.get_stats()}")
+
+
+TESTS = [
+    ("后台事件循环", test_background_event_loop),
+    ("Web会话换出与重建", test_session_store_spill),
+    ("Web会话内存上限与定时清理", test_session_store_limits),
+]
+
+
+def main():
+    """主测试函数"""
+    print("开始Web会话测试...")
+    print("=" * 50)
+
+    passed = 0
+    for name, test in TESTS:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"✗ {name}测试失败: {e!r}")
+
+    print("\n" + "=" * 50)
+    print(f"测试完成: {passed}/{len(TESTS)} 项测试通过")
+    return 0 if passed == len(TESTS) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -14,13 +14,14 @@ from typing import Dict, List, Any, Optional
 
 from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash
 from flask_socketio import SocketIO, emit
-import threading
 
 # 导入系统核心模块
 from core.simulation_engine import SimulationEngine
 from core.ai_to_ai_therapy_manager import AIToAITherapyManager
 from core.ai_client_factory import ai_client_factory
 from config.config_loader import load_scenario, list_scenarios, load_simulation_params
+from web.background_loop import get_background_loop
+from web.session_store import TherapySessionStore
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'depression_simulator_secret_key_2024'
@@ -30,6 +31,10 @@ socketio = SocketIO(app, cors_allowed_origins="*")
 simulation_manager = None
 current_session = None
 
+# 人工治疗会话：内存中数量和大小有限，空闲或超出上限的会话换出到磁盘，再次访问时自动重建
+app.therapy_sessions = TherapySessionStore.from_config()
+app.therapy_sessions.start_sweeper(get_background_loop())
+
 @app.route('/')
 def index():
     """主页 - 系统概览"""
@@ -126,7 +131,7 @@ def api_start_simulation():
         sim_days = data.get('simulation_days', 30)
         ai_provider = data.get('ai_provider', 'deepseek')
         
-        # 在后台线程启动模拟
+        # 在共享的后台事件循环中运行模拟
         simulation_id = f"sim_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         
         # 使用新的JSON配置系统创建模拟引擎
@@ -139,10 +144,12 @@ def api_start_simulation():
             model_provider=ai_provider
         )
         
-        def run_simulation():
+        engine = simulation_manager
+        
+        async def run_simulation():
             try:
-                # 初始化模拟引擎
-                simulation_manager.setup_simulation()
+                # 初始化模拟引擎（同步操作，放到线程池中避免阻塞共享事件循环）
+                await asyncio.to_thread(engine.setup_simulation)
                 
                 socketio.emit('simulation_status', {
                     'status': 'running', 
@@ -150,34 +157,25 @@ def api_start_simulation():
                     'simulation_id': simulation_id
                 })
                 
-                # 运行真实的模拟
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
+                # 创建进度报告任务
+                async def report_progress():
+                    for day in range(1, sim_days + 1):
+                        await asyncio.sleep(0.1)  # 短暂延迟
+                        socketio.emit('simulation_progress', {
+                            'day': day,
+                            'total_days': sim_days,
+                            'progress': (day / sim_days) * 100,
+                            'message': f'正在模拟第{day}天...'
+                        })
                 
-                async def simulation_with_progress():
-                    # 创建进度报告任务
-                    async def report_progress():
-                        for day in range(1, sim_days + 1):
-                            await asyncio.sleep(0.1)  # 短暂延迟
-                            socketio.emit('simulation_progress', {
-                                'day': day,
-                                'total_days': sim_days,
-                                'progress': (day / sim_days) * 100,
-                                'message': f'正在模拟第{day}天...'
-                            })
-                    
-                    # 启动进度报告
-                    progress_task = asyncio.create_task(report_progress())
-                    
-                    # 运行实际模拟
-                    final_report = await simulation_manager.run_simulation(sim_days)
-                    
-                    # 等待进度报告完成
-                    await progress_task
-                    
-                    return final_report
+                # 启动进度报告
+                progress_task = asyncio.create_task(report_progress())
                 
-                final_report = loop.run_until_complete(simulation_with_progress())
+                # 运行真实的模拟
+                final_report = await engine.run_simulation(sim_days)
+                
+                # 等待进度报告完成
+                await progress_task
                 
                 socketio.emit('simulation_status', {
                     'status': 'completed',
@@ -199,9 +197,7 @@ def api_start_simulation():
                     'message': error_msg
                 })
         
-        thread = threading.Thread(target=run_simulation)
-        thread.daemon = True
-        thread.start()
+        get_background_loop().submit(run_simulation(), f"模拟 {simulation_id}")
         
         return jsonify({
             'success': True, 
@@ -230,15 +226,11 @@ def api_start_ai_therapy():
         # 生成会话ID
         session_id = f"therapy_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         
-        def run_therapy():
+        async def run_therapy():
             try:
                 # 使用新的Web治疗管理器
                 from core.web_therapy_manager import run_web_ai_to_ai_therapy
                 
-                # 异步运行治疗会话
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                
                 # 发送初始状态
                 socketio.emit('therapy_status', {
                     'status': 'starting',
@@ -247,13 +239,11 @@ def api_start_ai_therapy():
                 })
                 
                 # 运行增强的Web治疗会话
-                summary = loop.run_until_complete(
-                    run_web_ai_to_ai_therapy(
-                        ai_client=ai_client,
-                        patient_log_path=patient_file,
-                        max_turns=max_turns,
-                        socketio_emit_func=socketio.emit
-                    )
+                summary = await run_web_ai_to_ai_therapy(
+                    ai_client=ai_client,
+                    patient_log_path=patient_file,
+                    max_turns=max_turns,
+                    socketio_emit_func=socketio.emit
                 )
                 
                 # 发送完成状态
@@ -274,9 +264,8 @@ def api_start_ai_therapy():
                     'session_id': session_id
                 })
         
-        thread = threading.Thread(target=run_therapy)
-        thread.daemon = True
-        thread.start()
+        # 在共享的后台事件循环中运行治疗会话
+        get_background_loop().submit(run_therapy(), f"治疗会话 {session_id}")
         
         return jsonify({
             'success': True,
@@ -429,13 +418,12 @@ def api_start_human_therapy():
             return jsonify({'success': False, 'error': '无法加载患者数据'})
         
         # 存储会话信息
-        app.therapy_sessions = getattr(app, 'therapy_sessions', {})
-        app.therapy_sessions[session_id] = {
+        app.therapy_sessions.put(session_id, {
             'manager': therapy_manager,
             'patient_file': patient_file,
             'ai_provider': ai_provider,
             'created_at': datetime.now().isoformat()
-        }
+        })
         
         return jsonify({
             'success': True,
@@ -463,26 +451,23 @@ def api_human_therapy_message():
         if not session_id or not message:
             return jsonify({'success': False, 'error': '缺少会话ID或消息内容'})
         
-        # 获取会话
-        if not hasattr(app, 'therapy_sessions') or session_id not in app.therapy_sessions:
-            return jsonify({'success': False, 'error': '会话不存在或已过期'})
-        
-        session_info = app.therapy_sessions[session_id]
-        therapy_manager = session_info['manager']
-        
-        # 处理消息
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        patient_response = loop.run_until_complete(
-            therapy_manager.process_therapist_message(message)
-        )
-        
-        return jsonify({
-            'success': True,
-            'patient_response': patient_response,
-            'session_progress': therapy_manager.get_session_progress()
-        })
+        # 获取会话（处理消息期间不会被换出）
+        with app.therapy_sessions.checkout(session_id) as session_info:
+            if session_info is None:
+                return jsonify({'success': False, 'error': '会话不存在或已过期'})
+            
+            therapy_manager = session_info['manager']
+            
+            # 在共享的后台事件循环中处理消息，请求线程只等待结果
+            patient_response = get_background_loop().run(
+                therapy_manager.process_therapist_message(message)
+            )
+            
+            return jsonify({
+                'success': True,
+                'patient_response': patient_response,
+                'session_progress': therapy_manager.get_session_progress()
+            })
     
     except Exception as e:
         import traceback
@@ -493,10 +478,10 @@ def api_human_therapy_message():
 def api_therapy_session_info(session_id):
     """API: 获取治疗会话信息"""
     try:
-        if not hasattr(app, 'therapy_sessions') or session_id not in app.therapy_sessions:
+        session_info = app.therapy_sessions.get(session_id)
+        if session_info is None:
             return jsonify({'success': False, 'error': '会话不存在'})
         
-        session_info = app.therapy_sessions[session_id]
         therapy_manager = session_info['manager']
         
         return jsonify({
@@ -0,0 +1,111 @@
+"""
+Web界面共享的后台事件循环
+Flask请求线程不再各自创建事件循环，而是把协程提交到同一个长期运行的事件循环：
+并发的治疗会话和模拟共享一个循环和一个线程池（AI客户端通过asyncio.to_thread发起请求），
+进程退出时取消未完成的任务并关闭循环。
+"""
+
+import asyncio
+import atexit
+import concurrent.futures
+import logging
+import threading
+from typing import Any, Awaitable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundEventLoop:
+    """在守护线程中运行的事件循环"""
+
+    def __init__(self, max_workers: int = 32):
+        """
+        Args:
+            max_workers: 循环默认线程池的大小（同时进行的阻塞式LLM请求数）
+        """
+        self.max_workers = max_workers
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> asyncio.AbstractEventLoop:
+        """启动事件循环线程（已启动时直接返回）"""
+        with self._lock:
+            if self.running:
+                return self._loop
+            self._loop = asyncio.new_event_loop()
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="web-llm")
+            self._loop.set_default_executor(self._executor)
+            ready = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(ready,), name="web-event-loop", daemon=True)
+            self._thread.start()
+            ready.wait()
+            return self._loop
+
+    def _run(self, ready: threading.Event):
+        asyncio.set_event_loop(self._loop)
+        self._loop.call_soon(ready.set)
+        self._loop.run_forever()
+
+    def submit(self, coro: Awaitable[Any], description: str = "后台任务") -> concurrent.futures.Future:
+        """提交协程，立即返回Future；未被取走结果的异常会写入日志"""
+        future = asyncio.run_coroutine_threadsafe(coro, self.start())
+
+        def _log_exception(done: concurrent.futures.Future):
+            if not done.cancelled() and done.exception() is not None:
+                logger.error(f"{description}失败: {done.exception()!r}")
+
+        future.add_done_callback(_log_exception)
+        return future
+
+    def run(self, coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+        """提交协程并在当前线程等待结果；超时时取消协程"""
+        future = asyncio.run_coroutine_threadsafe(coro, self.start())
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def shutdown(self, timeout: float = 5.0):
+        """取消未完成的任务，停止并关闭事件循环"""
+        with self._lock:
+            if not self.running:
+                return
+            loop, thread = self._loop, self._thread
+
+            async def _cancel_pending():
+                tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                await loop.shutdown_asyncgens()
+
+            try:
+                asyncio.run_coroutine_threadsafe(_cancel_pending(), loop).result(timeout)
+            except Exception as e:
+                logger.warning(f"取消后台任务时出错: {e}")
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout)
+            if not loop.is_running():
+                loop.close()
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._loop = self._thread = self._executor = None
+
+
+# 单例模式的后台事件循环
+_background_loop = None
+
+def get_background_loop() -> BackgroundEventLoop:
+    """获取Web界面共享的后台事件循环（首次提交任务时启动，进程退出时关闭）"""
+    global _background_loop
+    if _background_loop is None:
+        _background_loop = BackgroundEventLoop()
+        atexit.register(_background_loop.shutdown)
+    return _background_loop
@@ -0,0 +1,257 @@
+"""
+Web人工治疗会话存储
+内存中只保留有限的会话（LRU顺序，按数量、空闲时间和估算内存换出），
+换出的会话把快照写入磁盘，之后再用同一session_id访问时自动重建。
+正在处理消息的会话不会被换出。没有请求时由后台事件循环上的定时清理换出空闲会话。
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Union
+
+from config.config_loader import load_therapy_guidance_config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SESSION_STORE_SETTINGS = {
+    "max_sessions": 50,          # 内存中最多保留的会话数
+    "ttl_seconds": 1800,         # 空闲超过该时间的会话换出到磁盘
+    "max_memory_mb": 256,        # 内存中会话的估算总大小上限
+    "sweep_interval_seconds": 60, # 定时清理的间隔
+    "spill_dir": "logs/web_sessions"
+}
+
+
+class TherapySessionStore:
+    """有界的人工治疗会话存储（会话信息字典含 manager、patient_file、ai_provider、created_at）"""
+
+    def __init__(self, spill_dir: Union[str, Path] = DEFAULT_SESSION_STORE_SETTINGS["spill_dir"],
+                 max_sessions: int = DEFAULT_SESSION_STORE_SETTINGS["max_sessions"],
+                 ttl_seconds: float = DEFAULT_SESSION_STORE_SETTINGS["ttl_seconds"],
+                 max_memory_mb: float = DEFAULT_SESSION_STORE_SETTINGS["max_memory_mb"],
+                 sweep_interval_seconds: float = DEFAULT_SESSION_STORE_SETTINGS["sweep_interval_seconds"]):
+        """
+        Args:
+            spill_dir: 换出会话快照的保存目录
+            max_sessions: 内存中最多保留的会话数
+            ttl_seconds: 空闲超过该时间的会话换出（0表示不按时间换出）
+            max_memory_mb: 内存中会话的估算总大小上限（0表示不限制）
+            sweep_interval_seconds: 定时清理的间隔（0表示只在访问会话时清理）
+        """
+        self.spill_dir = Path(spill_dir)
+        self.max_sessions = max(1, int(max_sessions))
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_memory_bytes = float(max_memory_mb) * 1024 * 1024
+        self.sweep_interval_seconds = float(sweep_interval_seconds)
+        self._sweeper = None
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._last_access: Dict[str, float] = {}
+        self._sizes: Dict[str, int] = {}
+        self._patient_sizes: Dict[str, int] = {}  # 患者数据不随对话变化，只序列化一次
+        self._pinned: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self.stats = {"spilled": 0, "rehydrated": 0, "evicted_ttl": 0, "evicted_lru": 0, "evicted_memory": 0,
+                      "sweeps": 0}
+
+    @classmethod
+    def from_config(cls) -> "TherapySessionStore":
+        """按人工治疗配置的 web_session_store 部分创建"""
+        settings = dict(DEFAULT_SESSION_STORE_SETTINGS)
+        try:
+            settings.update(load_therapy_guidance_config("human_therapy").get("web_session_store", {}) or {})
+        except Exception as e:
+            logger.warning(f"加载Web会话存储配置失败，使用默认设置: {e}")
+        return cls(settings["spill_dir"], settings["max_sessions"], settings["ttl_seconds"],
+                   settings["max_memory_mb"], settings["sweep_interval_seconds"])
+
+    # ---- 访问 ----
+
+    def put(self, session_id: str, session_info: Dict[str, Any]):
+        """加入新会话（可能换出其他空闲会话）"""
+        with self._lock:
+            self._sessions[session_id] = session_info
+            self._sessions.move_to_end(session_id)
+            self._last_access[session_id] = time.monotonic()
+            self._sizes[session_id] = self._estimate_size(session_id, session_info)
+            self._evict()
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """获取会话信息（已换出时从磁盘重建）；不存在时返回None"""
+        with self._lock:
+            session_info = self._load(session_id)
+            self._evict()
+            return session_info
+
+    @contextmanager
+    def checkout(self, session_id: str) -> Iterator[Optional[Dict[str, Any]]]:
+        """在使用期间锁定会话不被换出，结束后按新的对话历史更新估算大小"""
+        with self._lock:
+            session_info = self._load(session_id)
+            if session_info is not None:
+                self._pinned[session_id] = self._pinned.get(session_id, 0) + 1
+        try:
+            yield session_info
+        finally:
+            if session_info is not None:
+                with self._lock:
+                    self._pinned[session_id] -= 1
+                    if not self._pinned[session_id]:
+                        del self._pinned[session_id]
+                    if session_id in self._sessions:
+                        self._last_access[session_id] = time.monotonic()
+                        self._sizes[session_id] = self._estimate_size(session_id, session_info)
+                    self._evict()
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            return session_id in self._sessions or self._spill_path(session_id).exists()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """内存中的会话数、估算大小和换出/重建次数"""
+        with self._lock:
+            return dict(self.stats, in_memory=len(self._sessions),
+                        estimated_mb=round(sum(self._sizes.values()) / (1024 * 1024), 2))
+
+    def _load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        if session_id in self._sessions:
+            self._sessions.move_to_end(session_id)
+            self._last_access[session_id] = time.monotonic()
+            return self._sessions[session_id]
+        session_info = self._rehydrate(session_id)
+        if session_info is not None:
+            self._sessions[session_id] = session_info
+            self._last_access[session_id] = time.monotonic()
+            self._sizes[session_id] = self._estimate_size(session_id, session_info)
+        return session_info
+
+    # ---- 换出 ----
+
+    def sweep(self) -> int:
+        """按当前的空闲时间和上限换出会话，返回换出的会话数"""
+        with self._lock:
+            spilled = self.stats["spilled"]
+            self._evict()
+            self.stats["sweeps"] += 1
+            return self.stats["spilled"] - spilled
+
+    def start_sweeper(self, background_loop) -> bool:
+        """
+        在后台事件循环上定时清理（没有请求访问时空闲会话也会按时换出）
+
+        Args:
+            background_loop: web.background_loop.BackgroundEventLoop
+
+        Returns:
+            是否启动了定时清理（间隔<=0或已在运行时返回False）
+        """
+        if self.sweep_interval_seconds <= 0 or (self._sweeper is not None and not self._sweeper.done()):
+            return False
+        self._sweeper = background_loop.submit(self._sweep_periodically(), "Web会话定时清理")
+        return True
+
+    def stop_sweeper(self):
+        """停止定时清理"""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+
+    async def _sweep_periodically(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval_seconds)
+            try:
+                # 换出要写磁盘并等待会话锁，放到线程池中执行，不阻塞事件循环上的其他请求
+                await asyncio.to_thread(self.sweep)
+            except Exception as e:
+                logger.warning(f"Web会话定时清理失败: {e}")
+
+    def _evict(self):
+        """按空闲时间、数量和估算内存依次换出最久未使用的会话"""
+        now = time.monotonic()
+        if self.ttl_seconds > 0:
+            for session_id in [s for s in self._sessions if now - self._last_access[s] > self.ttl_seconds]:
+                if self._spill(session_id):
+                    self.stats["evicted_ttl"] += 1
+        while len(self._sessions) > self.max_sessions and self._spill_oldest():
+            self.stats["evicted_lru"] += 1
+        # 至少保留最近使用的一个会话
+        while (self.max_memory_bytes > 0 and len(self._sessions) > 1
+               and sum(self._sizes.values()) > self.max_memory_bytes and self._spill_oldest()):
+            self.stats["evicted_memory"] += 1
+
+    def _spill_oldest(self) -> bool:
+        for session_id in list(self._sessions)[:-1]:
+            if self._spill(session_id):
+                return True
+        return False
+
+    def _spill(self, session_id: str) -> bool:
+        """把会话快照写入磁盘并移出内存；正在使用或写入失败的会话保留在内存中"""
+        if self._pinned.get(session_id):
+            return False
+        session_info = self._sessions[session_id]
+        manager = session_info["manager"]
+        snapshot = {key: value for key, value in session_info.items() if key != "manager"}
+        try:
+            snapshot["manager_state"] = manager.export_session_state()
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+            path = self._spill_path(session_id)
+            tmp_path = path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, ensure_ascii=False, default=str)
+            tmp_path.replace(path)
+        except Exception as e:
+            logger.warning(f"换出会话 {session_id} 失败，保留在内存中: {e}")
+            return False
+        manager._close_session_journal()
+        del self._sessions[session_id]
+        self._last_access.pop(session_id, None)
+        self._sizes.pop(session_id, None)
+        self._patient_sizes.pop(session_id, None)
+        self.stats["spilled"] += 1
+        return True
+
+    def _rehydrate(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """从磁盘快照重建会话；快照不存在或无法重建时返回None"""
+        path = self._spill_path(session_id)
+        if not path.exists():
+            return None
+        from core.ai_client_factory import ai_client_factory
+        from core.therapy_session_manager import TherapySessionManager
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            ai_client = ai_client_factory.get_client(snapshot.get("ai_provider"))
+            snapshot["manager"] = TherapySessionManager.from_session_state(snapshot.pop("manager_state"), ai_client)
+        except Exception as e:
+            logger.error(f"重建会话 {session_id} 失败: {e}")
+            return None
+        path.unlink()
+        self.stats["rehydrated"] += 1
+        return snapshot
+
+    def _spill_path(self, session_id: str) -> Path:
+        safe_id = "".join(c if c.isalnum() or c in "-_" else "_" for c in session_id)
+        return self.spill_dir / f"{safe_id}.json"
+
+    def _estimate_size(self, session_id: str, session_info: Dict[str, Any]) -> int:
+        """会话的估算大小：患者数据和对话历史序列化后的字节数"""
+        manager = session_info.get("manager")
+        if session_id not in self._patient_sizes:
+            self._patient_sizes[session_id] = self._json_size(getattr(manager, "patient_data", None))
+        return self._patient_sizes[session_id] + self._json_size(getattr(manager, "conversation_history", []))
+
+    @staticmethod
+    def _json_size(value: Any) -> int:
+        try:
+            return len(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+        except (TypeError, ValueError):
+            return 0